@@ -8,12 +8,14 @@ from botbuilder.schema import ChannelAccount, Activity, ActivityTypes, Attachmen
 from typing import Dict, List
 import uuid
 import json
-import psycopg2
 from psycopg2.extras import Json as PgJson, DictCursor
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
+from app.core.job_queue import PRIORITY_INTERACTIVE
+from app.core.queue_db import QueueDB
+
 load_dotenv('.env.devtest')
 
 # Database configuration
@@ -25,6 +27,15 @@ QUEUE_DB_CONFIG = {
     'password': os.getenv('QUEUE_DB_PASSWORD', 'postgres')
 }
 
+# Shared by every message, /status and /history (the pool opens on first use)
+queue_db = QueueDB(
+    QUEUE_DB_CONFIG,
+    minconn=int(os.getenv('QUEUE_DB_POOL_MIN', 1)),
+    maxconn=int(os.getenv('QUEUE_DB_POOL_MAX', 10)),
+    acquire_timeout=float(os.getenv('QUEUE_DB_POOL_TIMEOUT', 10)),
+    health_check_interval=float(os.getenv('QUEUE_DB_HEALTH_CHECK_INTERVAL', 30))
+)
+
 class TextToSQLBot(ActivityHandler):
     """
     Teams bot that handles text-to-SQL queries.
@@ -106,33 +117,34 @@ class TextToSQLBot(ActivityHandler):
             job_id = str(uuid.uuid4())
             environment = os.getenv('DEPLOYMENT_ENVIRONMENT', 'devtest')
 
-            conn = psycopg2.connect(**QUEUE_DB_CONFIG)
-            cursor = conn.cursor()
+            with queue_db.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                INSERT INTO sql_queue (
+                cursor.execute("""
+                    INSERT INTO sql_queue (
+                        job_id,
+                        question,
+                        schema_info,
+                        environment,
+                        language,
+                        status,
+                        user_id,
+                        priority
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
                     job_id,
                     question,
-                    schema_info,
+                    PgJson(schema_info),
                     environment,
                     language,
-                    status,
-                    user_id
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                job_id,
-                question,
-                PgJson(schema_info),
-                environment,
-                language,
-                'pending',
-                f"{user_id}:{user_name}"
-            ))
-
-            conn.commit()
-            cursor.close()
-            conn.close()
+                    'pending',
+                    f"{user_id}:{user_name}",
+                    PRIORITY_INTERACTIVE
+                ))
+
+                conn.commit()
+                cursor.close()
 
             # Send confirmation with adaptive card
             card = self.create_query_submitted_card(job_id, question, language)
@@ -164,29 +176,28 @@ class TextToSQLBot(ActivityHandler):
 
         # Update queue with confirmation
         try:
-            conn = psycopg2.connect(**QUEUE_DB_CONFIG)
-            cursor = conn.cursor()
+            with queue_db.connection() as conn:
+                cursor = conn.cursor()
 
-            if confirmed:
-                cursor.execute("""
-                    UPDATE sql_queue
-                    SET status = 'confirmed'
-                    WHERE job_id = %s
-                """, (job_id,))
+                if confirmed:
+                    cursor.execute("""
+                        UPDATE sql_queue
+                        SET status = 'confirmed'
+                        WHERE job_id = %s
+                    """, (job_id,))
 
-                msg = "✅ Confirmed! Processing..." if language == 'en' else "✅ אושר! מעבד..."
-            else:
-                cursor.execute("""
-                    UPDATE sql_queue
-                    SET status = 'cancelled'
-                    WHERE job_id = %s
-                """, (job_id,))
+                    msg = "✅ Confirmed! Processing..." if language == 'en' else "✅ אושר! מעבד..."
+                else:
+                    cursor.execute("""
+                        UPDATE sql_queue
+                        SET status = 'cancelled'
+                        WHERE job_id = %s
+                    """, (job_id,))
 
-                msg = "❌ Cancelled" if language == 'en' else "❌ בוטל"
+                    msg = "❌ Cancelled" if language == 'en' else "❌ בוטל"
 
-            conn.commit()
-            cursor.close()
-            conn.close()
+                conn.commit()
+                cursor.close()
 
             await turn_context.send_activity(msg)
 
@@ -255,20 +266,19 @@ Just ask your question in plain English or Hebrew!
     async def send_status(self, turn_context: TurnContext, language: str):
         """Send queue status"""
         try:
-            conn = psycopg2.connect(**QUEUE_DB_CONFIG)
-            cursor = conn.cursor(cursor_factory=DictCursor)
+            with queue_db.connection() as conn:
+                cursor = conn.cursor(cursor_factory=DictCursor)
 
-            cursor.execute("""
-                SELECT status, COUNT(*) as count
-                FROM sql_queue
-                WHERE created_at > NOW() - INTERVAL '1 hour'
-                GROUP BY status
-                ORDER BY status
-            """)
+                cursor.execute("""
+                    SELECT status, COUNT(*) as count
+                    FROM sql_queue
+                    WHERE created_at > NOW() - INTERVAL '1 hour'
+                    GROUP BY status
+                    ORDER BY status
+                """)
 
-            results = cursor.fetchall()
-            cursor.close()
-            conn.close()
+                results = cursor.fetchall()
+                cursor.close()
 
             if language == 'en':
                 status_text = "📊 **Queue Status (Last Hour)**\n\n"
@@ -288,24 +298,23 @@ Just ask your question in plain English or Hebrew!
     async def send_history(self, turn_context: TurnContext, user_id: str, language: str):
         """Send user's query history"""
         try:
-            conn = psycopg2.connect(**QUEUE_DB_CONFIG)
-            cursor = conn.cursor(cursor_factory=DictCursor)
+            with queue_db.connection() as conn:
+                cursor = conn.cursor(cursor_factory=DictCursor)
 
-            cursor.execute("""
-                SELECT
-                    question,
-                    status,
-                    natural_language_response,
-                    created_at
-                FROM sql_queue
-                WHERE user_id LIKE %s
-                ORDER BY created_at DESC
-                LIMIT 5
-            """, (f"{user_id}%",))
-
-            results = cursor.fetchall()
-            cursor.close()
-            conn.close()
+                cursor.execute("""
+                    SELECT
+                        question,
+                        status,
+                        natural_language_response,
+                        created_at
+                    FROM sql_queue
+                    WHERE user_id LIKE %s
+                    ORDER BY created_at DESC
+                    LIMIT 5
+                """, (f"{user_id}%",))
+
+                results = cursor.fetchall()
+                cursor.close()
 
             if not results:
                 msg = "No query history found" if language == 'en' else "לא נמצאו שאילתות"
@@ -14,10 +14,57 @@ class Settings(BaseSettings):
     # AI Configuration - Local Claude CLI (no API keys needed!)
     use_claude_cli: bool = Field(default=True, env="USE_CLAUDE_CLI")
     claude_cli_command: str = Field(default="claude", env="CLAUDE_CLI_COMMAND")
+    claude_cli_timeout: int = Field(default=30, env="CLAUDE_CLI_TIMEOUT")
+
+    # Persistent Claude CLI session pool (stream-json); disabled = process per question
+    claude_cli_pool_enabled: bool = Field(default=True, env="CLAUDE_CLI_POOL_ENABLED")
+    claude_cli_pool_size: int = Field(default=2, env="CLAUDE_CLI_POOL_SIZE")
+    claude_cli_pool_max_queue: int = Field(default=32, env="CLAUDE_CLI_POOL_MAX_QUEUE")
+    claude_cli_pool_warm: bool = Field(default=False, env="CLAUDE_CLI_POOL_WARM")
+    # Token-level stream events (--include-partial-messages) for early SQL extraction
+    claude_cli_partial_messages: bool = Field(default=True, env="CLAUDE_CLI_PARTIAL_MESSAGES")
+
+    # Async providers: concurrent in-flight calls per provider
+    ai_claude_cli_max_concurrency: int = Field(default=2, env="AI_CLAUDE_CLI_MAX_CONCURRENCY")
+    ai_claude_max_concurrency: int = Field(default=8, env="AI_CLAUDE_MAX_CONCURRENCY")
+    ai_openai_max_concurrency: int = Field(default=8, env="AI_OPENAI_MAX_CONCURRENCY")
+
+    # Hedged AI requests: start the fallback when the primary exceeds its p90
+    ai_hedging_enabled: bool = Field(default=True, env="AI_HEDGING_ENABLED")
+    ai_hedge_quantile: float = Field(default=0.9, env="AI_HEDGE_QUANTILE")
+    ai_hedge_default_budget: float = Field(default=8.0, env="AI_HEDGE_DEFAULT_BUDGET")
+    ai_hedge_min_budget: float = Field(default=1.0, env="AI_HEDGE_MIN_BUDGET")
+    ai_hedge_window: int = Field(default=50, env="AI_HEDGE_WINDOW")
+
+    # Adaptive AI routing (best expected latency) and per-provider circuit breakers
+    ai_adaptive_routing: bool = Field(default=True, env="AI_ADAPTIVE_ROUTING")
+    ai_ewma_alpha: float = Field(default=0.2, env="AI_EWMA_ALPHA")
+    ai_breaker_failure_threshold: int = Field(default=3, env="AI_BREAKER_FAILURE_THRESHOLD")
+    ai_breaker_error_rate: float = Field(default=0.5, env="AI_BREAKER_ERROR_RATE")
+    ai_breaker_min_calls: int = Field(default=5, env="AI_BREAKER_MIN_CALLS")
+    ai_breaker_cooldown: float = Field(default=30.0, env="AI_BREAKER_COOLDOWN")
+
+    # Streamed AI answers: execute read queries as soon as the SQL is complete
+    ai_streaming_enabled: bool = Field(default=True, env="AI_STREAMING_ENABLED")
+    ai_early_execution_workers: int = Field(default=4, env="AI_EARLY_EXECUTION_WORKERS")
+
+    # Record/replay of AI provider calls (offline benchmarks): off / record / replay
+    ai_replay_mode: str = Field(default="off", env="AI_REPLAY_MODE")
+    ai_replay_fixtures: str = Field(default="fixtures/ai_replay.jsonl", env="AI_REPLAY_FIXTURES")
+    ai_replay_latency: str = Field(default="recorded", env="AI_REPLAY_LATENCY")  # recorded / fixed / lognormal
+    ai_replay_fixed_latency: float = Field(default=1.0, env="AI_REPLAY_FIXED_LATENCY")
+    ai_replay_latency_sigma: float = Field(default=0.5, env="AI_REPLAY_LATENCY_SIGMA")
+    ai_replay_latency_scale: float = Field(default=1.0, env="AI_REPLAY_LATENCY_SCALE")
+    ai_replay_failure_rate: float = Field(default=0.0, env="AI_REPLAY_FAILURE_RATE")
+    ai_replay_parse_failure_rate: float = Field(default=0.0, env="AI_REPLAY_PARSE_FAILURE_RATE")
+    ai_replay_strict: bool = Field(default=False, env="AI_REPLAY_STRICT")
+    ai_replay_seed: Optional[int] = Field(default=None, env="AI_REPLAY_SEED")
 
     # API keys (optional - only if not using Claude CLI)
     anthropic_api_key: Optional[str] = Field(default=None, env="ANTHROPIC_API_KEY")
     anthropic_model: str = Field(default="claude-sonnet-4-20250514", env="ANTHROPIC_MODEL")
+    # System prompt + full schema as a cached prompt prefix (only the question varies)
+    anthropic_prompt_cache: bool = Field(default=True, env="ANTHROPIC_PROMPT_CACHE")
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
     openai_model: str = Field(default="gpt-4o-mini", env="OPENAI_MODEL")
 
@@ -62,6 +109,8 @@ class Settings(BaseSettings):
     # Language Settings
     default_language: str = Field(default="en", env="DEFAULT_LANGUAGE")
     supported_languages: str = Field(default="en,he", env="SUPPORTED_LANGUAGES")
+    # JSON object of extra synonyms: {"phrase": "Table"} or {"phrase": "Table.Column"}
+    hebrew_synonyms_file: Optional[str] = Field(default=None, env="HEBREW_SYNONYMS_FILE")
 
     # Queue Database (PostgreSQL)
     queue_db_host: str = Field(default="localhost", env="QUEUE_DB_HOST")
@@ -69,6 +118,56 @@ class Settings(BaseSettings):
     queue_db_name: str = Field(default="text_to_sql_queue", env="QUEUE_DB_NAME")
     queue_db_user: str = Field(default="postgres", env="QUEUE_DB_USER")
     queue_db_password: str = Field(default="postgres", env="QUEUE_DB_PASSWORD")
+    # Shared queue DB connection pool (worker; the Teams bot and
+    # process_queue.py read the same QUEUE_DB_POOL_* variables)
+    queue_db_pool_min: int = Field(default=1, env="QUEUE_DB_POOL_MIN")
+    queue_db_pool_max: int = Field(default=10, env="QUEUE_DB_POOL_MAX")
+    queue_db_pool_timeout: float = Field(default=10.0, env="QUEUE_DB_POOL_TIMEOUT")
+    queue_db_health_check_interval: float = Field(default=30.0, env="QUEUE_DB_HEALTH_CHECK_INTERVAL")
+    # Write-behind batching of final job statuses (flushed by size or age)
+    queue_status_batching_enabled: bool = Field(default=True, env="QUEUE_STATUS_BATCHING_ENABLED")
+    queue_status_batch_size: int = Field(default=100, env="QUEUE_STATUS_BATCH_SIZE")
+    queue_status_flush_interval: float = Field(default=0.005, env="QUEUE_STATUS_FLUSH_INTERVAL")
+    # Workers wake on NOTIFY from the insert trigger; the poll is a safety net
+    queue_listen_enabled: bool = Field(default=True, env="QUEUE_LISTEN_ENABLED")
+    queue_safety_poll_interval: int = Field(default=60, env="QUEUE_SAFETY_POLL_INTERVAL")
+    # Claims are leases renewed by heartbeats; expired leases are reaped back
+    # to pending with exponential backoff, or failed after QUEUE_MAX_ATTEMPTS
+    queue_lease_seconds: float = Field(default=120.0, env="QUEUE_LEASE_SECONDS")
+    queue_heartbeat_interval: float = Field(default=30.0, env="QUEUE_HEARTBEAT_INTERVAL")
+    queue_max_attempts: int = Field(default=3, env="QUEUE_MAX_ATTEMPTS")
+    queue_retry_backoff: float = Field(default=30.0, env="QUEUE_RETRY_BACKOFF")
+    queue_retry_backoff_max: float = Field(default=900.0, env="QUEUE_RETRY_BACKOFF_MAX")
+    # Requests a worker processes at once, and how many of them may be in
+    # the AI fallback / executing on the target database at the same time
+    worker_concurrency: int = Field(default=4, env="WORKER_CONCURRENCY")
+    worker_ai_concurrency: int = Field(default=2, env="WORKER_AI_CONCURRENCY")
+    worker_db_concurrency: int = Field(default=5, env="WORKER_DB_CONCURRENCY")
+    # Requests in flight with --async (tasks on one event loop, not threads)
+    worker_async_concurrency: int = Field(default=32, env="WORKER_ASYNC_CONCURRENCY")
+
+    # Question cache in front of the AI fallback
+    question_cache_enabled: bool = Field(default=True, env="QUESTION_CACHE_ENABLED")
+    question_cache_persistent: bool = Field(default=True, env="QUESTION_CACHE_PERSISTENT")
+    question_cache_memory_size: int = Field(default=1024, env="QUESTION_CACHE_MEMORY_SIZE")
+
+    # Similarity retrieval over completed question/SQL pairs
+    similarity_enabled: bool = Field(default=True, env="SIMILARITY_ENABLED")
+    similarity_max_pairs: int = Field(default=20000, env="SIMILARITY_MAX_PAIRS")
+    similarity_example_count: int = Field(default=3, env="SIMILARITY_EXAMPLE_COUNT")
+    similarity_example_min_score: float = Field(default=0.35, env="SIMILARITY_EXAMPLE_MIN_SCORE")
+
+    # Schema pruning for AI prompts (only relevant tables + FK neighbours)
+    schema_pruning_enabled: bool = Field(default=True, env="SCHEMA_PRUNING_ENABLED")
+    schema_prune_max_chars: int = Field(default=16000, env="SCHEMA_PRUNE_MAX_CHARS")
+    schema_prune_max_tables: int = Field(default=25, env="SCHEMA_PRUNE_MAX_TABLES")
+    # Schema text style in AI prompts: compact (DDL-like) or verbose
+    schema_prompt_style: str = Field(default="compact", env="SCHEMA_PROMPT_STYLE")
+
+    # Compile check of AI-generated SQL on the server (sp_describe_first_result_set)
+    sql_compile_check_enabled: bool = Field(default=True, env="SQL_COMPILE_CHECK_ENABLED")
+    sql_compile_cache_size: int = Field(default=2048, env="SQL_COMPILE_CACHE_SIZE")
+    sql_compile_max_regenerations: int = Field(default=1, env="SQL_COMPILE_MAX_REGENERATIONS")
 
     class Config:
         env_file = ".env"
@@ -2,10 +2,14 @@
 Unified AI client supporting multiple providers (OpenAI, Claude, etc.)
 with intelligent routing and fallback mechanisms.
 """
-from typing import Dict, Any, Optional, Literal
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Literal
 from enum import Enum
 
 from app.config import settings
+from app.core.provider_stats import ProviderStats
+from app.core.sql_lexer import is_read_only
 from loguru import logger
 
 
@@ -33,10 +37,62 @@ class UnifiedAIClient:
         self.primary_provider = getattr(settings, 'primary_ai_provider', 'claude_cli')
         self.fallback_provider = getattr(settings, 'fallback_ai_provider', 'openai')
 
+        if settings.ai_replay_mode == "replay":
+            self._init_replay_providers()
+        else:
+            self._init_live_providers()
+            if settings.ai_replay_mode == "record":
+                self._wrap_recording()
+
+        if not self.providers:
+            raise ValueError("No AI providers configured!")
+
+        # Async counterparts (same clients underneath) for event-loop callers
+        from app.core.ai_provider import make_async_provider
+        self.async_providers = {}
+        for name, client in self.providers.items():
+            try:
+                async_provider = make_async_provider(client)
+            except Exception as e:
+                logger.warning(f"Async provider {name} not available: {e}")
+                continue
+            if async_provider is not None:
+                self.async_providers[name] = async_provider
+
+        # Latency / error statistics and circuit breakers per provider
+        self.provider_stats = ProviderStats(
+            window=settings.ai_hedge_window,
+            quantile=settings.ai_hedge_quantile,
+            default_budget=settings.ai_hedge_default_budget,
+            min_budget=settings.ai_hedge_min_budget,
+            alpha=settings.ai_ewma_alpha,
+            failure_threshold=settings.ai_breaker_failure_threshold,
+            error_rate_threshold=settings.ai_breaker_error_rate,
+            min_calls=settings.ai_breaker_min_calls,
+            cooldown=settings.ai_breaker_cooldown
+        )
+
+        # Only relevant tables go into prompts
+        self.schema_pruner = None
+        if settings.schema_pruning_enabled:
+            from app.services.schema_pruner import SchemaPruner
+            self.schema_pruner = SchemaPruner(
+                max_chars=settings.schema_prune_max_chars,
+                max_tables=settings.schema_prune_max_tables
+            )
+
+        logger.info(f"Available providers: {list(self.providers.keys())}")
+        logger.info(f"Primary: {self.primary_provider}, Fallback: {self.fallback_provider}")
+
+    def _init_live_providers(self):
+        """Initialize the real providers that are available."""
         # Initialize Claude CLI (local - no API key needed!)
         try:
-            from app.core.claude_cli_client import ClaudeCLIClient
-            self.providers['claude_cli'] = ClaudeCLIClient()
+            # Shared instance, so its session pool is not duplicated
+            from app.core.claude_cli_client import claude_cli_client
+            if claude_cli_client is None:
+                raise RuntimeError("Claude CLI client failed to initialize")
+            self.providers['claude_cli'] = claude_cli_client
             logger.info("✓ Claude CLI provider initialized (local, no API key needed)")
         except Exception as e:
             logger.warning(f"Claude CLI provider not available: {e}")
@@ -57,11 +113,24 @@ class UnifiedAIClient:
         except Exception as e:
             logger.warning(f"Claude API provider not available: {e}")
 
-        if not self.providers:
-            raise ValueError("No AI providers configured!")
+    def _init_replay_providers(self):
+        """Replace the providers with replays of recorded calls (offline)."""
+        from app.core.replay_client import FixtureStore, replay_providers
 
-        logger.info(f"Available providers: {list(self.providers.keys())}")
-        logger.info(f"Primary: {self.primary_provider}, Fallback: {self.fallback_provider}")
+        store = FixtureStore(settings.ai_replay_fixtures)
+        self.providers = replay_providers(store)
+        logger.info(f"✓ Replaying recorded AI calls from {store.path} ({len(store)} fixtures)")
+
+    def _wrap_recording(self):
+        """Record every provider call to the fixture store."""
+        from app.core.replay_client import FixtureStore, RecordingClient
+
+        store = FixtureStore(settings.ai_replay_fixtures)
+        self.providers = {
+            name: RecordingClient(client, store, name)
+            for name, client in self.providers.items()
+        }
+        logger.info(f"✓ Recording AI calls to {store.path}")
 
     def generate_sql(
         self,
@@ -80,31 +149,39 @@ class UnifiedAIClient:
         Returns:
             Dictionary containing SQL, type, risk level, and explanation
         """
-        # Determine which provider to use
-        selected_provider = self._select_provider(question, provider)
+        # Determine which provider to use (and which one to fall back to)
+        route = self._route(question, provider, self.providers)
+        selected_provider = route[0]
+        fallback = route[1] if len(route) > 1 else None
 
         logger.info(f"Using provider: {selected_provider}")
 
+        # Prune once; every provider attempt gets the same reduced schema
+        pruning = None
+        full_schema = schema_info
+        if self.schema_pruner:
+            schema_info, pruning = self.schema_pruner.prune(question, schema_info)
+
         try:
             # Try primary provider
-            client = self.providers[selected_provider]
-            result = client.generate_sql(question, schema_info)
+            result = self._call(selected_provider, question, schema_info, full_schema)
 
             # Add metadata
             result['provider'] = selected_provider
+            result['schema_pruning'] = pruning.to_dict() if pruning else None
             return result
 
         except Exception as e:
             logger.error(f"Provider {selected_provider} failed: {e}")
 
             # Try fallback if available
-            if self.fallback_provider and self.fallback_provider in self.providers:
-                logger.info(f"Trying fallback provider: {self.fallback_provider}")
+            if fallback:
+                logger.info(f"Trying fallback provider: {fallback}")
                 try:
-                    client = self.providers[self.fallback_provider]
-                    result = client.generate_sql(question, schema_info)
-                    result['provider'] = self.fallback_provider
+                    result = self._call(fallback, question, schema_info, full_schema)
+                    result['provider'] = fallback
                     result['fallback_used'] = True
+                    result['schema_pruning'] = pruning.to_dict() if pruning else None
                     return result
                 except Exception as fallback_error:
                     logger.error(f"Fallback provider also failed: {fallback_error}")
@@ -112,13 +189,190 @@ class UnifiedAIClient:
             # No fallback or fallback failed
             raise
 
+    def _provider_schema(
+        self,
+        client: Any,
+        schema_info: Dict[str, Any],
+        full_schema: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Schema to send a provider: the pruned one, unless the provider caches
+        the schema as a prompt prefix (a per-question subset would never hit
+        the cache, while the cached full schema is cheap to re-read).
+        """
+        if full_schema is not None and getattr(client, 'caches_schema_prefix', False):
+            return full_schema
+        return schema_info
+
+    def _call(
+        self,
+        provider: str,
+        question: str,
+        schema_info: Dict[str, Any],
+        full_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """One sync provider call, recorded in the provider stats."""
+        client = self.providers[provider]
+        schema_info = self._provider_schema(client, schema_info, full_schema)
+        self.provider_stats.record_start(provider)
+        start = time.perf_counter()
+        try:
+            result = client.generate_sql(question, schema_info)
+        except Exception as e:
+            self.provider_stats.record_failure(provider, e, time.perf_counter() - start)
+            raise
+        self.provider_stats.record_success(provider, time.perf_counter() - start)
+        return result
+
+    async def agenerate_sql(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        provider: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async generate_sql: same routing, pruning and fallback, without
+        blocking the event loop.
+
+        With hedging enabled, the fallback is not kept waiting for the
+        primary to fail: if the primary has not answered within its latency
+        budget (its recent p90), the fallback starts in parallel and the
+        first valid, read-only SQL wins; the other call is cancelled.
+
+        Args:
+            question: Natural language question
+            schema_info: Database schema information
+            provider: Force specific provider (optional)
+
+        Returns:
+            Dictionary containing SQL, type, risk level, and explanation
+        """
+        route = self._route(question, provider, self.async_providers)
+        selected_provider = route[0]
+        fallback = route[1] if len(route) > 1 else None
+
+        logger.info(f"Using provider (async): {selected_provider}")
+
+        pruning = None
+        full_schema = schema_info
+        if self.schema_pruner:
+            schema_info, pruning = self.schema_pruner.prune(question, schema_info)
+
+        if settings.ai_hedging_enabled and fallback:
+            result = await self._hedged_generate(question, schema_info, full_schema, selected_provider, fallback)
+            result['schema_pruning'] = pruning.to_dict() if pruning else None
+            return result
+
+        try:
+            result = await self._acall(selected_provider, question, schema_info, full_schema)
+            result['provider'] = selected_provider
+            result['schema_pruning'] = pruning.to_dict() if pruning else None
+            return result
+
+        except Exception as e:
+            logger.error(f"Provider {selected_provider} failed: {e}")
+
+            if fallback:
+                logger.info(f"Trying fallback provider: {fallback}")
+                try:
+                    result = await self._acall(fallback, question, schema_info, full_schema)
+                    result['provider'] = fallback
+                    result['fallback_used'] = True
+                    result['schema_pruning'] = pruning.to_dict() if pruning else None
+                    return result
+                except Exception as fallback_error:
+                    logger.error(f"Fallback provider also failed: {fallback_error}")
+
+            raise
+
+    async def _acall(
+        self,
+        provider: str,
+        question: str,
+        schema_info: Dict[str, Any],
+        full_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """One async provider call, recorded in the provider stats."""
+        client = self.async_providers[provider]
+        schema_info = self._provider_schema(getattr(client, 'client', client), schema_info, full_schema)
+        self.provider_stats.record_start(provider)
+        start = time.perf_counter()
+        try:
+            result = await client.generate_sql(question, schema_info)
+        except asyncio.CancelledError:
+            self.provider_stats.record_cancelled(provider, time.perf_counter() - start)
+            raise
+        except Exception as e:
+            self.provider_stats.record_failure(provider, e, time.perf_counter() - start)
+            raise
+        self.provider_stats.record_success(provider, time.perf_counter() - start)
+        return result
+
+    async def _hedged_generate(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        full_schema: Dict[str, Any],
+        primary: str,
+        secondary: str
+    ) -> Dict[str, Any]:
+        """Race the secondary provider against a primary that is over budget."""
+
+        async def attempt(provider: str) -> Dict[str, Any]:
+            result = await self._acall(provider, question, schema_info, full_schema)
+            # Only valid, read-only SQL can win the race
+            sql = result.get('sql') or ''
+            if not is_read_only(sql):
+                raise ValueError(f"{provider} returned no read-only SQL")
+            result['provider'] = provider
+            return result
+
+        budget = self.provider_stats.budget(primary)
+        pending = {asyncio.create_task(attempt(primary))}
+        hedged = False
+        error: Optional[BaseException] = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=budget)
+            for task in done:
+                if task.exception() is None:
+                    return {**task.result(), 'hedged': False, 'hedge_budget': round(budget, 2)}
+                error = task.exception()
+                logger.error(f"Provider {primary} failed: {error}")
+
+            if pending:
+                logger.info(f"{primary} has not answered within {budget:.1f}s, hedging with {secondary}")
+            else:
+                logger.info(f"Trying fallback provider: {secondary}")
+            hedged = bool(pending)
+            pending.add(asyncio.create_task(attempt(secondary)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result = task.result()
+                        if hedged:
+                            logger.info(f"Hedged request won by {result['provider']}")
+                        result['fallback_used'] = result['provider'] != primary
+                        result['hedged'] = hedged
+                        result['hedge_budget'] = round(budget, 2)
+                        return result
+                    error = task.exception()
+                    logger.error(f"Provider call failed: {error}")
+
+            raise error
+        finally:
+            # The loser (or anything still running on error) is cancelled
+            for task in pending:
+                task.cancel()
+
     def _select_provider(
         self,
         question: str,
         forced_provider: Optional[str] = None
     ) -> str:
         """
-        Intelligently select AI provider based on query characteristics.
+        Intelligently select AI provider based on recent behaviour.
 
         Args:
             question: The user's question
@@ -127,16 +381,61 @@ class UnifiedAIClient:
         Returns:
             Provider name to use
         """
-        # If provider is forced, use it if available
-        if forced_provider and forced_provider in self.providers:
-            return forced_provider
+        return self._route(question, forced_provider, self.providers)[0]
+
+    def _route(
+        self,
+        question: str,
+        forced_provider: Optional[str],
+        available: Dict[str, Any]
+    ) -> List[str]:
+        """
+        Providers to try for a request, best first.
+
+        A forced provider always goes first. Otherwise, with adaptive
+        routing, providers whose circuit breaker lets requests through are
+        ranked by expected latency (EWMA latency / success rate); providers
+        with an open breaker go last. Ties (e.g. no data yet) keep the
+        configured order: primary, fallback, then the rest.
+
+        Args:
+            question: The user's question
+            forced_provider: Force specific provider
+            available: Provider name -> client (sync or async)
 
-        # Use primary provider if available
-        if self.primary_provider in self.providers:
-            return self.primary_provider
+        Returns:
+            Provider names (at least one)
+        """
+        priority = [p for p in (self.primary_provider, self.fallback_provider) if p in available]
+        priority += [p for p in available if p not in priority]
 
-        # Use any available provider
-        return list(self.providers.keys())[0]
+        if settings.ai_adaptive_routing:
+            route = self.provider_stats.rank(priority)
+        else:
+            route = priority
+
+        # If provider is forced, use it if available
+        if forced_provider and forced_provider in available:
+            route = [forced_provider] + [p for p in route if p != forced_provider]
+
+        if route[0] != self.primary_provider:
+            logger.info(f"Routing to {route[0]} (order: {route})")
+        return route
+
+    def get_provider_stats(self) -> Dict[str, Any]:
+        """Per-provider latency, error and breaker statistics plus the current route."""
+        return {
+            "adaptive_routing": settings.ai_adaptive_routing,
+            "primary": self.primary_provider,
+            "fallback": self.fallback_provider,
+            "route": self._route("", None, self.providers),
+            "providers": self.provider_stats.snapshot(),
+            "usage": {
+                name: client.usage_stats()
+                for name, client in self.providers.items()
+                if hasattr(client, 'usage_stats')
+            },
+        }
 
     def explain_query(self, sql: str, provider: Optional[str] = None) -> str:
         """
@@ -161,6 +460,19 @@ class UnifiedAIClient:
             logger.error(f"Query explanation failed: {e}")
             return "Unable to generate explanation"
 
+    async def aexplain_query(self, sql: str, provider: Optional[str] = None) -> str:
+        """Async explain_query."""
+        selected_provider = provider or self.primary_provider
+
+        if selected_provider not in self.async_providers:
+            selected_provider = list(self.async_providers.keys())[0]
+
+        try:
+            return await self.async_providers[selected_provider].explain_query(sql)
+        except Exception as e:
+            logger.error(f"Query explanation failed: {e}")
+            return "Unable to generate explanation"
+
     def get_available_providers(self) -> list[str]:
         """Get list of initialized providers."""
         return list(self.providers.keys())
@@ -0,0 +1,355 @@
+"""
+Asyncio-native AI provider interface.
+
+The provider clients (ClaudeCLIClient, ClaudeClient, OpenAIClient) are
+synchronous: an AI fallback inside an async FastAPI or Teams handler would
+block the event loop for seconds. The async providers here wrap a sync
+client - reusing its prompt building, schema formatting and response
+parsing - and do the slow part without blocking:
+
+- AsyncClaudeCLIClient: asyncio.create_subprocess_exec (or the shared CLI
+  session pool, awaited in a worker thread; cancelling kills the session)
+- AsyncClaudeClient: AsyncAnthropic
+- AsyncOpenAIClient: AsyncOpenAI
+
+Each provider is gated by its own semaphore (AI_<PROVIDER>_MAX_CONCURRENCY)
+so a burst of questions cannot overrun a provider. The sync clients stay as
+they are for scripts and the worker.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Protocol, runtime_checkable
+
+from loguru import logger
+
+from app.config import settings
+from app.core.claude_cli_pool import StreamTextRelay
+from app.utils.json_stream import sql_text_handler
+
+
+class ResponseParseError(RuntimeError, ValueError):
+    """
+    A provider answered, but not with the expected JSON.
+
+    Subclasses both RuntimeError and ValueError, which the CLI and API
+    clients raised for this before.
+    """
+
+
+@runtime_checkable
+class AsyncAIProvider(Protocol):
+    """What UnifiedAIClient needs from an async provider."""
+
+    name: str
+
+    async def generate_sql(self, question: str, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate {sql, query_type, risk_level, explanation} for a question."""
+        ...
+
+    async def explain_query(self, sql: str) -> str:
+        """Explain SQL in plain language."""
+        ...
+
+
+class ConcurrencyGate:
+    """
+    Per-provider concurrency limit usable from any event loop.
+
+    asyncio.Semaphore binds to the loop it is first used on; scripts that
+    call asyncio.run() repeatedly get a fresh semaphore per loop.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        async with self._semaphore:
+            yield
+
+
+class AsyncClaudeCLIClient:
+    """Async Claude CLI provider wrapping a ClaudeCLIClient."""
+
+    name = "claude_cli"
+
+    def __init__(self, client, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            client: ClaudeCLIClient (command lookup, pool, prompt, parsing)
+            max_concurrency: Concurrent CLI calls (default from settings)
+        """
+        self.client = client
+        self.gate = ConcurrencyGate(max_concurrency or settings.ai_claude_cli_max_concurrency)
+
+    async def _run(self, prompt: str, *args: str) -> str:
+        """Run the CLI once with prompt on stdin; kill it on timeout or cancel."""
+        process = await asyncio.create_subprocess_exec(
+            self.client.claude_cmd, *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(prompt.encode("utf-8")),
+                timeout=settings.claude_cli_timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+
+        if process.returncode != 0:
+            raise RuntimeError(f"Claude CLI error: {stderr.decode('utf-8', 'replace')}")
+        return stdout.decode("utf-8").strip()
+
+    async def _ask_pool(self, prompt: str, on_text: Optional[Callable[[str], None]]) -> str:
+        """
+        Run prompt on the session pool in a worker thread. On cancel (a lost
+        hedge, a timeout) the session is killed, and this returns only once
+        the thread is done, so the gate slot is not freed while it is busy.
+        """
+        cancel = threading.Event()
+        call = asyncio.ensure_future(asyncio.to_thread(
+            self.client.pool.ask, prompt, settings.claude_cli_timeout, on_text, cancel
+        ))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            cancel.set()
+            await asyncio.wait([call])
+            if not call.cancelled():
+                call.exception()
+            raise
+
+    async def _run_streaming(self, prompt: str, on_text: Callable[[str], None]) -> str:
+        """Run the CLI once with stream-json output, passing answer text to on_text."""
+        process = await asyncio.create_subprocess_exec(
+            *self.client._streaming_command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=2 ** 24,
+        )
+
+        async def consume() -> Optional[Dict[str, Any]]:
+            process.stdin.write(prompt.encode("utf-8"))
+            await process.stdin.drain()
+            process.stdin.close()
+
+            relay = StreamTextRelay(on_text)
+            result = None
+            async for line in process.stdout:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                relay.handle(event)
+                if event.get("type") == "result":
+                    result = event
+            await process.wait()
+            return result
+
+        try:
+            result = await asyncio.wait_for(consume(), timeout=settings.claude_cli_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+
+        if result is None:
+            stderr = await process.stderr.read()
+            raise RuntimeError(f"Claude CLI error: {stderr.decode('utf-8', 'replace')}")
+        if result.get("is_error") or result.get("subtype", "success") != "success":
+            raise RuntimeError(f"Claude CLI error: {result.get('result') or result.get('subtype')}")
+        return result.get("result", "").strip()
+
+    async def generate_sql(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        examples: Optional[List[Dict[str, str]]] = None,
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate SQL without blocking the event loop.
+
+        With on_sql the answer is streamed and on_sql gets the SQL as soon as
+        it is complete (called on the loop, or on a pool thread).
+        """
+        if not self.client.claude_cmd:
+            raise RuntimeError("Claude CLI not found. Please ensure Claude Code is installed")
+
+        prompt = self.client._build_prompt(question, schema_info, examples)
+        logger.info(f"Calling Claude CLI (async) for question: {question[:50]}...")
+
+        on_text = sql_text_handler(on_sql) if on_sql else None
+        async with self.gate.slot():
+            try:
+                if self.client.pool:
+                    output = await self._ask_pool(prompt, on_text)
+                elif on_text:
+                    output = await self._run_streaming(prompt, on_text)
+                else:
+                    output = await self._run(prompt, "--print")
+            except (asyncio.TimeoutError, TimeoutError):
+                raise RuntimeError(f"Claude CLI timed out after {settings.claude_cli_timeout} seconds")
+
+        return self.client._parse_output(output)
+
+    async def explain_query(self, sql: str) -> str:
+        """Explain SQL using the CLI."""
+        try:
+            async with self.gate.slot():
+                return await self._run(f"Explain this SQL query in simple terms:\n\n{sql}", "--print")
+        except Exception as e:
+            logger.error(f"Query explanation error: {e}")
+            return "Unable to generate explanation"
+
+
+class AsyncClaudeClient:
+    """Async Anthropic API provider wrapping a ClaudeClient."""
+
+    name = "claude"
+
+    def __init__(self, client, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            client: ClaudeClient (model, prompts, JSON extraction)
+            max_concurrency: Concurrent API calls (default from settings)
+        """
+        from anthropic import AsyncAnthropic
+
+        self.client = client
+        self.async_client = AsyncAnthropic(api_key=client.client.api_key)
+        self.gate = ConcurrencyGate(max_concurrency or settings.ai_claude_max_concurrency)
+
+    async def generate_sql(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Generate SQL with the async Anthropic client (streamed when on_sql is given)."""
+        logger.info(f"Generating SQL with Claude (async) for question: {question}")
+
+        request = self.client._build_request(question, schema_info)
+        messages = self.client._messages(self.async_client)
+        async with self.gate.slot():
+            start = time.perf_counter()
+            if on_sql:
+                on_text = sql_text_handler(on_sql)
+                async with messages.stream(**request) as stream:
+                    async for text in stream.text_stream:
+                        on_text(text)
+                    response = await stream.get_final_message()
+            else:
+                response = await messages.create(**request)
+            self.client._record_usage(response, time.perf_counter() - start)
+
+        result = self.client._extract_json(response.content[0].text)
+        logger.info(f"Generated SQL: {result.get('sql', 'N/A')}")
+        return result
+
+    async def explain_query(self, sql: str) -> str:
+        """Explain SQL with the async Anthropic client."""
+        try:
+            async with self.gate.slot():
+                response = await self.async_client.messages.create(
+                    model=self.client.model,
+                    max_tokens=1024,
+                    temperature=0.3,
+                    system="You are a database expert. Explain SQL queries in simple, non-technical language.",
+                    messages=[{"role": "user", "content": f"Explain this SQL query in simple terms:\n\n{sql}"}]
+                )
+            return response.content[0].text
+        except Exception as e:
+            logger.error(f"Query explanation error: {e}")
+            return "Unable to generate explanation"
+
+
+class AsyncOpenAIClient:
+    """Async OpenAI API provider wrapping an OpenAIClient."""
+
+    name = "openai"
+
+    def __init__(self, client, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            client: OpenAIClient (model, prompts)
+            max_concurrency: Concurrent API calls (default from settings)
+        """
+        from openai import AsyncOpenAI
+
+        self.client = client
+        self.async_client = AsyncOpenAI(api_key=client.client.api_key)
+        self.gate = ConcurrencyGate(max_concurrency or settings.ai_openai_max_concurrency)
+
+    async def generate_sql(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Generate SQL with the async OpenAI client (streamed when on_sql is given)."""
+        request = self.client._build_request(self.client._build_prompt(question, schema_info))
+        logger.info(f"Generating SQL (async) for question: {question}")
+
+        async with self.gate.slot():
+            if on_sql:
+                on_text = sql_text_handler(on_sql)
+                parts: List[str] = []
+                async for chunk in await self.async_client.chat.completions.create(**request, stream=True):
+                    text = self.client._chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        on_text(text)
+                content = "".join(parts)
+            else:
+                response = await self.async_client.chat.completions.create(**request)
+                content = response.choices[0].message.content
+
+        result = json.loads(content)
+        logger.info(f"Generated SQL: {result.get('sql', 'N/A')}")
+        return result
+
+    async def explain_query(self, sql: str) -> str:
+        """Explain SQL with the async OpenAI client."""
+        try:
+            async with self.gate.slot():
+                response = await self.async_client.chat.completions.create(
+                    model=self.client.model,
+                    messages=[
+                        {"role": "system", "content": "You are a database expert. Explain SQL queries in simple, non-technical language."},
+                        {"role": "user", "content": f"Explain this SQL query in simple terms:\n\n{sql}"}
+                    ],
+                    temperature=0.3,
+                )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Query explanation error: {e}")
+            return "Unable to generate explanation"
+
+
+# Sync client class name -> async provider wrapper
+ASYNC_PROVIDERS = {
+    "ClaudeCLIClient": AsyncClaudeCLIClient,
+    "ClaudeClient": AsyncClaudeClient,
+    "OpenAIClient": AsyncOpenAIClient,
+}
+
+
+def make_async_provider(client) -> Optional[AsyncAIProvider]:
+    """Wrap a sync provider client in its async counterpart (None if unknown)."""
+    wrapper = ASYNC_PROVIDERS.get(type(client).__name__)
+    return wrapper(client) if wrapper else None
@@ -0,0 +1,254 @@
+"""
+asyncpg access to the PostgreSQL queue database for the async worker.
+
+The async counterpart of queue_db.py and job_queue.py: a lazily created
+asyncpg pool, the same SKIP LOCKED claim, release and lease statements,
+status updates, and a LISTEN connection that calls back on the worker's
+loop when a job is inserted. asyncpg runs each statement in its own implicit
+transaction, so there is no commit step.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Set
+
+import asyncpg
+from loguru import logger
+
+from app.core.job_queue import (
+    CLAIM_SQL,
+    DEFAULT_LEASE_SECONDS,
+    EXTEND_LEASES_SQL,
+    NEXT_DUE_SQL,
+    NOTIFY_CHANNEL,
+    REAP_SQL,
+    RELEASE_SQL,
+    claim_order,
+)
+
+
+def _positional(sql: str, *names: str) -> str:
+    """Turn psycopg2 %(name)s parameters into asyncpg's $1, $2, ..."""
+    for index, name in enumerate(names, start=1):
+        sql = sql.replace(f"%({name})s", f"${index}")
+    return sql
+
+
+# Same statements as job_queue.py, with asyncpg's positional parameters
+ASYNC_CLAIM_SQL = _positional(CLAIM_SQL, "worker_id", "limit", "lease_seconds")
+ASYNC_RELEASE_SQL = _positional(RELEASE_SQL, "worker_id", "ids")
+ASYNC_EXTEND_LEASES_SQL = _positional(EXTEND_LEASES_SQL, "worker_id", "ids", "lease_seconds")
+ASYNC_REAP_SQL = _positional(REAP_SQL, "max_attempts", "backoff_seconds", "backoff_max_seconds")
+
+UPDATE_STATUS_SQL = """
+    UPDATE sql_queue
+    SET status = $2,
+        sql_query = COALESCE($3, sql_query),
+        query_results = COALESCE($4::jsonb, query_results),
+        error_message = COALESCE($5, error_message),
+        rows_affected = COALESCE($6, rows_affected),
+        execution_time_ms = COALESCE($7::integer, execution_time_ms),
+        completed_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+      AND claimed_by = $8
+"""
+
+
+class AsyncQueueDB:
+    """
+    asyncpg pool for the queue database.
+
+    Args:
+        config: asyncpg.connect keyword arguments
+        min_size: Connections kept open
+        max_size: Upper bound on open connections
+        acquire_timeout: Seconds to wait for a free connection
+    """
+
+    def __init__(self, config: Dict[str, Any], min_size: int = 1, max_size: int = 10, acquire_timeout: float = 10.0):
+        self.config = dict(config)
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.acquire_timeout = acquire_timeout
+        self._pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+
+    @classmethod
+    def from_settings(cls) -> "AsyncQueueDB":
+        """AsyncQueueDB configured by the QUEUE_DB_* settings."""
+        from app.config import settings
+
+        return cls(
+            {
+                "host": settings.queue_db_host,
+                "port": settings.queue_db_port,
+                "database": settings.queue_db_name,
+                "user": settings.queue_db_user,
+                "password": settings.queue_db_password,
+                "timeout": 5,
+            },
+            min_size=settings.queue_db_pool_min,
+            max_size=settings.queue_db_pool_max,
+            acquire_timeout=settings.queue_db_pool_timeout,
+        )
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(min_size=self.min_size, max_size=self.max_size, **self.config)
+                logger.info(f"Async queue DB pool ready (min {self.min_size}, max {self.max_size})")
+            return self._pool
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """Borrow a connection from the pool."""
+        pool = await self._get_pool()
+        async with pool.acquire(timeout=self.acquire_timeout) as conn:
+            self.acquired += 1
+            yield conn
+
+    async def connect(self) -> asyncpg.Connection:
+        """A new connection outside the pool (owned by the caller)."""
+        return await asyncpg.connect(**self.config)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics."""
+        if self._pool is None:
+            return {"min": self.min_size, "max": self.max_size, "size": 0, "idle": 0, "acquired": self.acquired}
+        return {
+            "min": self.min_size,
+            "max": self.max_size,
+            "size": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+            "acquired": self.acquired,
+        }
+
+    async def close(self):
+        """Close the pool (recreated on next use)."""
+        async with self._lock:
+            if self._pool is not None:
+                await self._pool.close()
+                self._pool = None
+
+
+async def claim_jobs(
+    conn: asyncpg.Connection,
+    worker_id: str,
+    limit: int = 10,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS
+) -> List[Dict[str, Any]]:
+    """Claim up to `limit` pending jobs for this worker (see job_queue.claim_jobs)."""
+    rows = [dict(row) for row in await conn.fetch(ASYNC_CLAIM_SQL, worker_id, limit, float(lease_seconds))]
+    rows.sort(key=claim_order)
+    return rows
+
+
+async def release_jobs(conn: asyncpg.Connection, worker_id: str, ids: Sequence[int]) -> int:
+    """Put claimed jobs back to 'pending' (see job_queue.release_jobs)."""
+    if not ids:
+        return 0
+    async with conn.transaction():
+        status = await conn.execute(ASYNC_RELEASE_SQL, worker_id, list(ids))
+        released = int(status.split()[-1])
+        if released:
+            await conn.execute("SELECT pg_notify($1, '')", NOTIFY_CHANNEL)
+    return released
+
+
+async def extend_leases(
+    conn: asyncpg.Connection,
+    worker_id: str,
+    ids: Sequence[int],
+    lease_seconds: float = DEFAULT_LEASE_SECONDS
+) -> Set[int]:
+    """Heartbeat this worker's leases; returns the ids still owned (see job_queue.extend_leases)."""
+    if not ids:
+        return set()
+    rows = await conn.fetch(ASYNC_EXTEND_LEASES_SQL, worker_id, list(ids), float(lease_seconds))
+    return {row["id"] for row in rows}
+
+
+async def reap_expired(
+    conn: asyncpg.Connection,
+    max_attempts: int = 3,
+    backoff_seconds: float = 30.0,
+    backoff_max_seconds: float = 900.0
+) -> List[Dict[str, Any]]:
+    """Requeue or fail jobs whose lease expired (see job_queue.reap_expired)."""
+    rows = await conn.fetch(ASYNC_REAP_SQL, max_attempts, float(backoff_seconds), float(backoff_max_seconds))
+    return [dict(row) for row in rows]
+
+
+async def seconds_until_due(conn: asyncpg.Connection) -> Optional[float]:
+    """Seconds until a job in retry backoff is claimable (see job_queue.seconds_until_due)."""
+    seconds = await conn.fetchval(NEXT_DUE_SQL)
+    return float(seconds) if seconds is not None else None
+
+
+async def update_status(
+    conn: asyncpg.Connection,
+    job_id: int,
+    worker_id: str,
+    status: str,
+    sql_query: Optional[str] = None,
+    query_results: Optional[str] = None,
+    error_message: Optional[str] = None,
+    rows_affected: Optional[int] = None,
+    execution_time_ms: Optional[float] = None,
+) -> bool:
+    """
+    Record a job's outcome (None fields keep their value), if worker_id
+    still holds its lease.
+
+    Returns:
+        Whether the job was updated
+    """
+    status_tag = await conn.execute(
+        UPDATE_STATUS_SQL,
+        job_id,
+        status,
+        sql_query,
+        query_results,
+        error_message,
+        rows_affected,
+        execution_time_ms,
+        worker_id,
+    )
+    return status_tag == "UPDATE 1"
+
+
+class AsyncQueueListener:
+    """
+    LISTENs for new-job notifications on a dedicated connection and calls
+    on_notify (on the event loop) for each one.
+    """
+
+    def __init__(self, queue_db: AsyncQueueDB, on_notify: Callable[[], None], channel: str = NOTIFY_CHANNEL):
+        self.queue_db = queue_db
+        self.on_notify = on_notify
+        self.channel = channel
+        self.conn: Optional[asyncpg.Connection] = None
+
+    @property
+    def listening(self) -> bool:
+        return self.conn is not None and not self.conn.is_closed()
+
+    async def listen(self):
+        """Open the connection and LISTEN (no-op when already listening)."""
+        if self.listening:
+            return
+        conn = await self.queue_db.connect()
+        await conn.add_listener(self.channel, self._notified)
+        self.conn = conn
+
+    def _notified(self, connection, pid, channel, payload):
+        self.on_notify()
+
+    async def close(self):
+        """Close the listening connection."""
+        if self.conn is not None:
+            try:
+                await self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
@@ -2,10 +2,16 @@
 Claude CLI Direct Client - Calls local Claude Code CLI directly
 No API keys needed - uses the Claude Code CLI already running on your computer.
 """
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional
 import subprocess
 import json
+import threading
 from loguru import logger
+from app.config import settings
+from app.core.schema_renderer import render_schema
+from app.core.ai_provider import ResponseParseError
+from app.core.claude_cli_pool import PARTIAL_MESSAGES_ARG, STREAM_JSON_ARGS, ClaudeCLIPool, StreamTextRelay
+from app.utils.json_stream import sql_text_handler
 from app.models.query_models import QueryType, RiskLevel
 
 
@@ -17,16 +23,16 @@ class ClaudeCLIClient:
         # Try to find claude command - check common locations
         self.claude_cmd = None
 
-        # Try standard 'claude' command first
+        # Try the configured command ('claude' by default) first
         try:
             check = subprocess.run(
-                ['claude', '--version'],
+                [settings.claude_cli_command, '--version'],
                 capture_output=True,
                 timeout=5
             )
             if check.returncode == 0:
-                self.claude_cmd = 'claude'
-                logger.info("✓ Claude CLI found in PATH")
+                self.claude_cmd = settings.claude_cli_command
+                logger.info(f"✓ Claude CLI found: {self.claude_cmd}")
         except (FileNotFoundError, Exception):
             pass
 
@@ -45,8 +51,23 @@ class ClaudeCLIClient:
             except (FileNotFoundError, Exception):
                 pass
 
+        # Long-lived stream-json sessions instead of a process per question
+        self.pool = None
+        if self.claude_cmd and settings.claude_cli_pool_enabled:
+            self.pool = ClaudeCLIPool(
+                [self.claude_cmd],
+                size=settings.claude_cli_pool_size,
+                max_queue=settings.claude_cli_pool_max_queue,
+                extra_args=STREAM_JSON_ARGS + self._partial_args()
+            )
+            if settings.claude_cli_pool_warm:
+                threading.Thread(target=self.pool.warm, daemon=True).start()
+
         if self.claude_cmd:
-            logger.info("✓ Claude CLI client initialized (using local claude command)")
+            logger.info(
+                "✓ Claude CLI client initialized "
+                f"({'session pool of ' + str(settings.claude_cli_pool_size) if self.pool else 'process per question'})"
+            )
         else:
             logger.warning("⚠ Claude command not found. Complex queries will fail.")
             logger.info("Install Claude Desktop or add claude to PATH")
@@ -54,7 +75,9 @@ class ClaudeCLIClient:
     def generate_sql(
         self,
         question: str,
-        schema_info: Dict[str, Any]
+        schema_info: Dict[str, Any],
+        examples: Optional[List[Dict[str, str]]] = None,
+        on_sql: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate SQL using local Claude Code CLI.
@@ -62,20 +85,137 @@ class ClaudeCLIClient:
         Args:
             question: Natural language question
             schema_info: Database schema information
+            examples: Optional similar past {question, sql} pairs (few-shot)
+            on_sql: Optional callback; the answer is then streamed and the
+                callback gets the SQL as soon as it is complete, while the
+                rest of the answer is still being generated
 
         Returns:
             Dictionary containing SQL, type, risk level, and explanation
         """
+        output = ""
+        try:
+            prompt = self._build_prompt(question, schema_info, examples)
+
+            if not self.claude_cmd:
+                raise RuntimeError(
+                    "Claude CLI not found. Please ensure Claude Code is installed and "
+                    "'claude' command is available in PATH"
+                )
+
+            logger.info(f"Calling Claude CLI for question: {question[:50]}...")
+
+            on_text = sql_text_handler(on_sql) if on_sql else None
+            if self.pool:
+                output = self.pool.ask(
+                    prompt,
+                    timeout=settings.claude_cli_timeout,
+                    on_text=on_text
+                ).strip()
+            elif on_text:
+                output = self._run_streaming(prompt, on_text).strip()
+            else:
+                # Call claude CLI using stdin (like teams-support-analyst bot)
+                # This approach is more reliable and matches the pattern from the support bot
+                result = subprocess.run(
+                    [self.claude_cmd, '--print'],
+                    input=prompt,
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    timeout=settings.claude_cli_timeout
+                )
+
+                if result.returncode != 0:
+                    raise RuntimeError(f"Claude CLI error: {result.stderr}")
+
+                output = result.stdout.strip()
+
+            return self._parse_output(output)
+
+        except (subprocess.TimeoutExpired, TimeoutError):
+            logger.error("Claude CLI timed out")
+            raise RuntimeError(f"Claude CLI timed out after {settings.claude_cli_timeout} seconds")
+
+        except Exception as e:
+            logger.error(f"Claude CLI error: {e}")
+            raise
+
+    def _partial_args(self) -> List[str]:
+        """Arguments for token-level stream events, if enabled."""
+        return [PARTIAL_MESSAGES_ARG] if settings.claude_cli_partial_messages else []
+
+    def _streaming_command(self) -> List[str]:
+        """One-shot CLI call with stream-json output."""
+        return [self.claude_cmd, '--print', '--output-format', 'stream-json', '--verbose'] + self._partial_args()
+
+    def _run_streaming(self, prompt: str, on_text: Callable[[str], None]) -> str:
+        """
+        Run the CLI once with stream-json output, passing answer text to
+        on_text as it arrives.
+
+        Returns:
+            The final result text (same as --print output)
+        """
+        process = subprocess.Popen(
+            self._streaming_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8'
+        )
+        stderr_lines: List[str] = []
+        threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True).start()
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(settings.claude_cli_timeout, kill)
+        timer.start()
         try:
-            # Format schema for prompt
-            schema_text = self._format_schema(schema_info)
+            process.stdin.write(prompt)
+            process.stdin.close()
+
+            relay = StreamTextRelay(on_text)
+            result = None
+            for line in process.stdout:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                relay.handle(event)
+                if event.get('type') == 'result':
+                    result = event
+            process.wait()
+        finally:
+            timer.cancel()
+
+        if timed_out.is_set():
+            raise TimeoutError("Claude CLI timed out")
+        if result is None:
+            raise RuntimeError(f"Claude CLI error: {''.join(stderr_lines)}")
+        if result.get('is_error') or result.get('subtype', 'success') != 'success':
+            raise RuntimeError(f"Claude CLI error: {result.get('result') or result.get('subtype')}")
+        return result.get('result', '')
+
+    def _build_prompt(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        examples: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """Build the SQL generation prompt (shared by the sync and async paths)."""
+        schema_text = self._format_schema(schema_info)
+        examples_text = self._format_examples(examples)
 
-            # Build prompt
-            prompt = f"""Generate a T-SQL query for this question.
+        return f"""Generate a T-SQL query for this question.
 
 DATABASE SCHEMA:
 {schema_text}
-
+{examples_text}
 QUESTION:
 {question}
 
@@ -89,76 +229,38 @@ Return ONLY a JSON object with these fields:
 
 IMPORTANT: Return ONLY the JSON, no markdown formatting or extra text."""
 
-            if not self.claude_cmd:
-                raise RuntimeError(
-                    "Claude CLI not found. Please ensure Claude Code is installed and "
-                    "'claude' command is available in PATH"
-                )
-
-            logger.info(f"Calling Claude CLI for question: {question[:50]}...")
-
-            # Call claude CLI using stdin (like teams-support-analyst bot)
-            # This approach is more reliable and matches the pattern from the support bot
-            result = subprocess.run(
-                [self.claude_cmd, '--print'],
-                input=prompt,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                timeout=30
-            )
-
-            if result.returncode != 0:
-                raise RuntimeError(f"Claude CLI error: {result.stderr}")
-
-            output = result.stdout.strip()
-
-            # Remove markdown code blocks if present
-            if '```json' in output:
-                output = output.split('```json')[1].split('```')[0].strip()
-            elif '```' in output:
-                output = output.split('```')[1].split('```')[0].strip()
-
-            # Parse JSON response
-            response = json.loads(output)
-
-            logger.info(f"Generated SQL: {response.get('sql', 'N/A')[:100]}")
-            return response
-
-        except subprocess.TimeoutExpired:
-            logger.error("Claude CLI timed out")
-            raise RuntimeError("Claude CLI timed out after 30 seconds")
+    def _parse_output(self, output: str) -> Dict[str, Any]:
+        """Parse the CLI's JSON answer (markdown code fences are stripped)."""
+        # Remove markdown code blocks if present
+        text = output.strip()
+        if '```json' in text:
+            text = text.split('```json')[1].split('```')[0].strip()
+        elif '```' in text:
+            text = text.split('```')[1].split('```')[0].strip()
 
+        try:
+            response = json.loads(text)
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse Claude response: {e}")
             logger.error(f"Raw output: {output[:500]}")
-            raise RuntimeError(f"Failed to parse Claude response: {e}")
+            raise ResponseParseError(f"Failed to parse Claude response: {e}")
 
-        except Exception as e:
-            logger.error(f"Claude CLI error: {e}")
-            raise
+        logger.info(f"Generated SQL: {response.get('sql', 'N/A')[:100]}")
+        return response
+
+    def _format_examples(self, examples: Optional[List[Dict[str, str]]]) -> str:
+        """Format similar past question/SQL pairs as few-shot examples."""
+        if not examples:
+            return ""
+
+        text = "\nSIMILAR PAST QUESTIONS AND THEIR SQL:\n"
+        for example in examples:
+            text += f"Q: {example['question']}\nSQL: {example['sql']}\n\n"
+        return text
 
     def _format_schema(self, schema_info: Dict[str, Any]) -> str:
-        """Format schema information for the prompt."""
-        lines = []
-
-        for table in schema_info.get("tables", []):
-            lines.append(f"\nTable: {table['name']}")
-            lines.append("  Columns:")
-            for col in table.get("columns", []):
-                pk_marker = " (PK)" if col.get("primary_key") else ""
-                nullable = "NULL" if col.get("nullable") else "NOT NULL"
-                lines.append(f"    - {col['name']}: {col['type']} {nullable}{pk_marker}")
-
-            if table.get("foreign_keys"):
-                lines.append("  Foreign Keys:")
-                for fk in table["foreign_keys"]:
-                    fk_cols = ", ".join(fk["columns"])
-                    ref_table = fk["referred_table"]
-                    ref_cols = ", ".join(fk["referred_columns"])
-                    lines.append(f"    - {fk_cols} -> {ref_table}({ref_cols})")
-
-        return "\n".join(lines)
+        """Format schema information for the prompt (shared, memoized renderer)."""
+        return render_schema(schema_info, settings.schema_prompt_style)
 
     def explain_query(self, sql: str) -> str:
         """Generate explanation using Claude CLI."""
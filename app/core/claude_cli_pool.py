@@ -0,0 +1,397 @@
+"""
+Pool of long-lived Claude CLI sessions.
+
+Spawning `claude --print` per question pays the process and Node start-up
+cost on the request's critical path. The pool keeps up to `size` sessions
+started ahead of time in stream-json mode:
+
+    claude -p --input-format stream-json --output-format stream-json --verbose
+
+Each request is written to a session's stdin as one JSON user message; the
+session answers with stream events ending in a {"type": "result"} line.
+
+- Fair scheduling: waiting requests are served strictly in arrival order
+- Bounded queue: when max_queue requests are already waiting, new ones
+  fail fast with PoolExhaustedError instead of piling up
+- Health checks: a session that exited, errored or timed out is discarded
+  and replaced on demand
+- Cancellation: a caller that gives up (e.g. an async caller awaiting the
+  call in a worker thread) sets its cancel event; the call stops waiting,
+  and a session already answering is killed rather than left busy
+- Single use: a session is one conversation, so a second question would
+  be answered on top of the first one's schema, question and answer
+  (growing prompts, and one user's data in another user's context). Every
+  session is retired after one answer; what the pool saves is the
+  start-up, since the replacement boots in the background
+"""
+import json
+import subprocess
+import threading
+import time
+from collections import deque
+from queue import Empty, Queue
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+
+STREAM_JSON_ARGS = ["-p", "--input-format", "stream-json", "--output-format", "stream-json", "--verbose"]
+# Token-level text deltas as "stream_event" lines (otherwise only whole messages)
+PARTIAL_MESSAGES_ARG = "--include-partial-messages"
+# How often a waiting or answering call checks its cancel event
+CANCEL_CHECK_INTERVAL = 0.05
+
+
+def stream_event_text(event: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+    """
+    Answer text carried by a stream-json event.
+
+    Returns:
+        (text, is_delta): a partial-message text delta, or the text of a
+        whole assistant message; (None, False) for other events
+    """
+    kind = event.get("type")
+    if kind == "stream_event":
+        inner = event.get("event") or {}
+        delta = inner.get("delta") or {}
+        if inner.get("type") == "content_block_delta" and delta.get("type") == "text_delta":
+            return delta.get("text", ""), True
+    elif kind == "assistant":
+        content = (event.get("message") or {}).get("content") or []
+        text = "".join(block.get("text", "") for block in content if block.get("type") == "text")
+        return text, False
+    return None, False
+
+
+class StreamTextRelay:
+    """
+    Passes the answer text of stream-json events to a callback.
+
+    With partial messages the text arrives as deltas; the whole assistant
+    message that follows repeats it and is skipped. Without them, whole
+    messages are passed on.
+    """
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self._saw_delta = False
+
+    def handle(self, event: Dict[str, Any]):
+        text, is_delta = stream_event_text(event)
+        if not text or (self._saw_delta and not is_delta):
+            return
+        self._saw_delta = self._saw_delta or is_delta
+        try:
+            self.on_text(text)
+        except Exception as e:
+            # Keep reading: the caller must consume the whole answer
+            logger.warning(f"Stream callback failed: {e}")
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when the pool's wait queue is full."""
+
+
+class CallCancelledError(RuntimeError):
+    """Raised when a pooled call's cancel event is set."""
+
+
+def _wait_slice(remaining: float, cancel: Optional[threading.Event]) -> float:
+    """How long to block before checking the deadline and cancel event again."""
+    return remaining if cancel is None else min(remaining, CANCEL_CHECK_INTERVAL)
+
+
+class CLISession:
+    """One long-lived CLI process speaking stream-json."""
+
+    def __init__(self, command: Sequence[str]):
+        self.command = list(command)
+        self.started_at = time.monotonic()
+        self._lines: Queue = Queue()
+        self._stderr: Deque[str] = deque(maxlen=20)
+
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr.append(line.rstrip())
+
+    def alive(self) -> bool:
+        """Check that the process is still running."""
+        return self.process.poll() is None
+
+    def ask(
+        self,
+        prompt: str,
+        timeout: float,
+        on_text: Optional[Callable[[str], None]] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Send one prompt and wait for its result.
+
+        Args:
+            prompt: Prompt text
+            timeout: Seconds to wait for the result
+            on_text: Called with answer text as it streams in (text deltas
+                with partial messages enabled, else whole assistant messages)
+            cancel: When set, the process is killed and the call gives up
+
+        Raises:
+            TimeoutError: No result within timeout
+            CallCancelledError: cancel was set
+            RuntimeError: The session exited or reported an error
+        """
+        message = {"type": "user", "message": {"role": "user", "content": [{"type": "text", "text": prompt}]}}
+        try:
+            self.process.stdin.write(json.dumps(message, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"Claude CLI session is gone: {e}")
+
+        deadline = time.monotonic() + timeout
+        relay = StreamTextRelay(on_text) if on_text is not None else None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Claude CLI session did not answer within {timeout}s")
+            if cancel is not None and cancel.is_set():
+                self.process.kill()
+                raise CallCancelledError("Claude CLI call cancelled")
+            try:
+                line = self._lines.get(timeout=_wait_slice(remaining, cancel))
+            except Empty:
+                continue
+            if line is None:
+                raise RuntimeError(f"Claude CLI session exited: {' | '.join(self._stderr)}")
+
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if relay is not None:
+                relay.handle(event)
+            if event.get("type") != "result":
+                continue
+
+            if event.get("is_error") or event.get("subtype", "success") != "success":
+                raise RuntimeError(f"Claude CLI error: {event.get('result') or event.get('subtype')}")
+            return event.get("result", "")
+
+    def close(self):
+        """Stop the process."""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class ClaudeCLIPool:
+    """
+    Bounded, FIFO-fair pool of pre-started, single-use Claude CLI sessions.
+
+    Args:
+        command: CLI executable (and any leading arguments)
+        size: Maximum concurrent sessions
+        max_queue: Maximum requests waiting for a session
+        extra_args: Arguments appended after the executable (stream-json mode)
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        size: int = 2,
+        max_queue: int = 32,
+        extra_args: Sequence[str] = STREAM_JSON_ARGS,
+    ):
+        self.command = list(command) + list(extra_args)
+        self.size = size
+        self.max_queue = max_queue
+
+        self._cond = threading.Condition()
+        self._waiters: Deque[object] = deque()
+        self._idle: List[CLISession] = []
+        self._sessions = 0
+        self._closed = False
+        self._stats = {"requests": 0, "failures": 0, "rejected": 0, "cancelled": 0, "spawned": 0, "recycled": 0}
+
+    def _spawn(self) -> CLISession:
+        session = CLISession(self.command)
+        self._stats["spawned"] += 1
+        return session
+
+    def warm(self):
+        """Start all sessions up front so the first requests skip start-up."""
+        with self._cond:
+            missing = self.size - self._sessions
+            self._sessions += missing
+        for _ in range(missing):
+            try:
+                session = self._spawn()
+            except Exception as e:
+                logger.warning(f"Could not start Claude CLI session: {e}")
+                with self._cond:
+                    self._sessions -= 1
+                continue
+            self._release(session, used=False)
+
+    def _acquire(self, deadline: float, cancel: Optional[threading.Event] = None) -> CLISession:
+        """Wait (in arrival order, until deadline) for an idle session or a free slot."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Claude CLI pool is closed")
+            if len(self._waiters) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise PoolExhaustedError(f"Claude CLI pool queue is full ({self.max_queue} waiting)")
+
+            ticket = object()
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    if self._waiters[0] is ticket:
+                        if self._idle:
+                            session = self._idle.pop()
+                            break
+                        if self._sessions < self.size:
+                            self._sessions += 1
+                            session = None
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No Claude CLI session became free in time")
+                    if cancel is not None and cancel.is_set():
+                        raise CallCancelledError("Claude CLI call cancelled while waiting for a session")
+                    self._cond.wait(_wait_slice(remaining, cancel))
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+        # Health check: replace sessions that died while idle
+        if session is not None and not session.alive():
+            session.close()
+            self._stats["recycled"] += 1
+            session = None
+        if session is None:
+            try:
+                session = self._spawn()
+            except Exception:
+                with self._cond:
+                    self._sessions -= 1
+                    self._cond.notify_all()
+                raise
+        return session
+
+    def _release(self, session: CLISession, used: bool):
+        """Make a fresh session available, or retire a used (or dead) one."""
+        if not used and not self._closed and session.alive():
+            with self._cond:
+                self._idle.append(session)
+                self._cond.notify_all()
+            return
+
+        session.close()
+        with self._cond:
+            self._stats["recycled"] += 1
+            if self._closed:
+                self._sessions -= 1
+                self._cond.notify_all()
+                return
+        # Boot the replacement in the background (it keeps the slot), so the
+        # next request does not pay start-up on its critical path
+        threading.Thread(target=self._replace, daemon=True).start()
+
+    def _replace(self):
+        """Start a session for a retired one's slot."""
+        try:
+            session = self._spawn()
+        except Exception as e:
+            logger.warning(f"Could not start Claude CLI session: {e}")
+            with self._cond:
+                self._sessions -= 1
+                self._cond.notify_all()
+            return
+        self._release(session, used=False)
+
+    def ask(
+        self,
+        prompt: str,
+        timeout: float = 30,
+        on_text: Optional[Callable[[str], None]] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Run one prompt on a pooled session.
+
+        Args:
+            prompt: Prompt text
+            timeout: Seconds for the whole call (queue wait and answer)
+            on_text: Called with answer text as it streams in (see CLISession.ask)
+            cancel: Set by the caller to give up: stops the queue wait, or
+                kills the session answering (raises CallCancelledError)
+
+        Returns:
+            The CLI's final result text (same as `claude --print` output)
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            session = self._acquire(deadline, cancel)
+        except CallCancelledError:
+            self._stats["cancelled"] += 1
+            raise
+        used = False
+        try:
+            self._stats["requests"] += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Claude CLI call did not finish within {timeout}s")
+            used = True
+            return session.ask(prompt, remaining, on_text, cancel)
+        except CallCancelledError:
+            self._stats["cancelled"] += 1
+            raise
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+        finally:
+            self._release(session, used)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters and current occupancy."""
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self.size,
+                "sessions": self._sessions,
+                "idle": len(self._idle),
+                "busy": self._sessions - len(self._idle),
+                "waiting": len(self._waiters),
+            }
+
+    def close(self):
+        """Stop idle sessions; busy ones are stopped when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._sessions -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.close()
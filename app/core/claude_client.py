@@ -3,10 +3,15 @@ Claude (Anthropic) integration for natural language to SQL conversion.
 Drop-in replacement for OpenAI client with enhanced features.
 """
 from anthropic import Anthropic
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 import json
+import threading
+import time
 
 from app.config import settings
+from app.core.schema_renderer import render_schema
+from app.core.ai_provider import ResponseParseError
+from app.utils.json_stream import sql_text_handler
 from app.models.query_models import QueryType, RiskLevel
 from loguru import logger
 
@@ -31,10 +36,26 @@ class ClaudeClient:
         # Model selection with fallback
         self.model = getattr(settings, 'anthropic_model', 'claude-3-5-sonnet-20241022')
 
+        # Prompt caching: system prompt + schema are a cached prefix, so the
+        # full (unpruned) schema is sent and only the question varies
+        self.caches_schema_prefix = settings.anthropic_prompt_cache
+        self._usage_lock = threading.Lock()
+        self._usage = {
+            "requests": 0,
+            "cache_hits": 0,
+            "input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "output_tokens": 0,
+            "seconds_cache_hit": 0.0,
+            "seconds_cache_miss": 0.0,
+        }
+
     def generate_sql(
         self,
         question: str,
-        schema_info: Dict[str, Any]
+        schema_info: Dict[str, Any],
+        on_sql: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate SQL query from natural language question.
@@ -42,29 +63,27 @@ class ClaudeClient:
         Args:
             question: Natural language question
             schema_info: Database schema information
+            on_sql: Optional callback; the response is then streamed and the
+                callback gets the SQL as soon as it is complete
 
         Returns:
             Dictionary containing SQL, type, risk level, and explanation
         """
         try:
-            # Build the prompt
-            prompt = self._build_prompt(question, schema_info)
-
             # Call Claude API
             logger.info(f"Generating SQL with Claude for question: {question}")
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.1,  # Low temperature for consistent SQL generation
-                system=self._get_system_prompt(),
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            start = time.perf_counter()
+            request = self._build_request(question, schema_info)
+            if on_sql:
+                on_text = sql_text_handler(on_sql)
+                with self._messages(self.client).stream(**request) as stream:
+                    for text in stream.text_stream:
+                        on_text(text)
+                    response = stream.get_final_message()
+            else:
+                response = self._messages(self.client).create(**request)
+            self._record_usage(response, time.perf_counter() - start)
 
             # Parse response
             content = response.content[0].text
@@ -103,7 +122,7 @@ class ClaudeClient:
             json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', content, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group())
-            raise ValueError(f"Could not extract valid JSON from response: {content[:200]}")
+            raise ResponseParseError(f"Could not extract valid JSON from response: {content[:200]}")
 
     def _get_system_prompt(self) -> str:
         """Get the system prompt for SQL generation."""
@@ -181,45 +200,98 @@ Return your response as JSON following the specified format. Return ONLY the JSO
 
         return prompt
 
-    def _format_schema(self, schema_info: Dict[str, Any]) -> str:
+    def _schema_prefix(self, schema_info: Dict[str, Any]) -> str:
         """
-        Format schema information for the prompt.
+        Schema and standing instructions: identical for every question on
+        the same schema (the renderer returns the same text per version),
+        so the provider can cache it.
+        """
+        schema_text = self._format_schema(schema_info)
 
-        Args:
-            schema_info: Database schema dictionary
+        return f"""DATABASE SCHEMA:
+{schema_text}
 
-        Returns:
-            Formatted schema string
+For each user question, generate a T-SQL query to answer it. Consider:
+1. Which tables and columns are needed
+2. Any necessary JOINs based on foreign key relationships
+3. Appropriate WHERE conditions
+4. Proper SQL Server syntax (use TOP, not LIMIT)
+5. For write operations, assess the impact and risk
+
+Return your response as JSON following the specified format. Return ONLY the JSON, no markdown or additional text."""
+
+    def _build_request(self, question: str, schema_info: Dict[str, Any]) -> Dict[str, Any]:
         """
-        lines = []
-
-        # Format tables
-        for table in schema_info.get("tables", []):
-            lines.append(f"\nTable: {table['name']}")
-
-            # Columns
-            lines.append("  Columns:")
-            for col in table.get("columns", []):
-                pk_marker = " (PRIMARY KEY)" if col.get("primary_key") else ""
-                nullable = "NULL" if col.get("nullable") else "NOT NULL"
-                lines.append(f"    - {col['name']}: {col['type']} {nullable}{pk_marker}")
-
-            # Foreign keys
-            if table.get("foreign_keys"):
-                lines.append("  Foreign Keys:")
-                for fk in table["foreign_keys"]:
-                    fk_cols = ", ".join(fk["columns"])
-                    ref_table = fk["referred_table"]
-                    ref_cols = ", ".join(fk["referred_columns"])
-                    lines.append(f"    - {fk_cols} -> {ref_table}({ref_cols})")
-
-        # Format views
-        if schema_info.get("views"):
-            lines.append("\nViews:")
-            for view in schema_info["views"]:
-                lines.append(f"  - {view}")
-
-        return "\n".join(lines)
+        Arguments for messages.create.
+
+        With prompt caching, the system prompt and schema are system blocks
+        with a cache breakpoint after the schema; the user message holds
+        only the question.
+        """
+        request = {"model": self.model, "max_tokens": 4096, "temperature": 0.1}
+
+        if not self.caches_schema_prefix:
+            request["system"] = self._get_system_prompt()
+            request["messages"] = [{"role": "user", "content": self._build_prompt(question, schema_info)}]
+            return request
+
+        request["system"] = [
+            {"type": "text", "text": self._get_system_prompt()},
+            {"type": "text", "text": self._schema_prefix(schema_info), "cache_control": {"type": "ephemeral"}},
+        ]
+        request["messages"] = [{"role": "user", "content": f"USER QUESTION:\n{question}"}]
+        return request
+
+    def _messages(self, client):
+        """Messages resource of an Anthropic / AsyncAnthropic client (prompt-caching API when enabled)."""
+        if self.caches_schema_prefix:
+            return client.beta.prompt_caching.messages
+        return client.messages
+
+    def _record_usage(self, response, seconds: float):
+        """Accumulate cached vs uncached input tokens and latency."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+
+        with self._usage_lock:
+            stats = self._usage
+            stats["requests"] += 1
+            stats["input_tokens"] += usage.input_tokens or 0
+            stats["output_tokens"] += usage.output_tokens or 0
+            stats["cache_creation_input_tokens"] += cache_write
+            stats["cache_read_input_tokens"] += cache_read
+            if cache_read:
+                stats["cache_hits"] += 1
+                stats["seconds_cache_hit"] += seconds
+            else:
+                stats["seconds_cache_miss"] += seconds
+
+        logger.info(
+            f"Claude usage: {usage.input_tokens} uncached + {cache_read} cache-read + "
+            f"{cache_write} cache-write input tokens, {seconds:.2f}s"
+        )
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """Token usage and latency split by prompt-cache hit / miss."""
+        with self._usage_lock:
+            stats = dict(self._usage)
+        hits = stats["cache_hits"]
+        misses = stats["requests"] - hits
+        total_input = stats["input_tokens"] + stats["cache_creation_input_tokens"] + stats["cache_read_input_tokens"]
+        return {
+            "prompt_cache": self.caches_schema_prefix,
+            **{key: value for key, value in stats.items() if not key.startswith("seconds_")},
+            "cached_input_ratio": round(stats["cache_read_input_tokens"] / total_input, 3) if total_input else 0.0,
+            "avg_seconds_cache_hit": round(stats["seconds_cache_hit"] / hits, 3) if hits else None,
+            "avg_seconds_cache_miss": round(stats["seconds_cache_miss"] / misses, 3) if misses else None,
+        }
+
+    def _format_schema(self, schema_info: Dict[str, Any]) -> str:
+        """Format schema information for the prompt (shared, memoized renderer)."""
+        return render_schema(schema_info, settings.schema_prompt_style)
 
     def explain_query(self, sql: str) -> str:
         """
@@ -0,0 +1,123 @@
+"""
+Server-side compile check of generated SQL, with a cached verdict.
+
+AI-generated SQL that names a column or table that does not exist used to
+fail only at execution time - after a pool connection, a round trip and a
+user-visible error. SQLCompileChecker asks SQL Server to compile the
+statement without running it (sp_describe_first_result_set, see
+DatabaseManager.describe_first_result_set) and returns a verdict:
+
+- valid:   compiled; `columns` is the result-set shape
+- invalid: SQL Server rejected it; `error` is its message, suitable to send
+           back to the AI for regeneration
+- unknown: could not be checked (no connection, temp tables, dynamic SQL);
+           callers go ahead as before
+
+Valid and invalid verdicts are cached per (schema version, normalized
+statement): comments, whitespace and keyword case do not matter, so a
+repeated statement skips the round trip. Unknown verdicts are not cached.
+"""
+import re
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from loguru import logger
+
+from app.core.sql_lexer import TokenType, code_tokens, tokenize
+from app.utils.cache import LRUCache
+
+
+class SQLCompileError(ValueError):
+    """SQL Server rejected a statement at compile time."""
+
+
+class CompileVerdict(NamedTuple):
+    """Outcome of one compile check."""
+    valid: Optional[bool]  # None: could not be checked
+    error: Optional[str] = None
+    columns: List[Dict[str, Any]] = []
+    cached: bool = False
+
+
+_SQL_SERVER_PREFIX_RE = re.compile(r"^.*\[SQL Server\]")
+_ODBC_SUFFIX_RE = re.compile(r"\s*\(\d+\)\s*\(SQL\w+\)\s*$")
+
+
+def clean_error_message(message: str) -> str:
+    """SQL Server's own message, without ODBC driver prefixes and codes."""
+    message = message.strip().splitlines()[0] if message.strip() else message
+    message = _SQL_SERVER_PREFIX_RE.sub("", message)
+    return _ODBC_SUFFIX_RE.sub("", message).strip()
+
+
+def normalize_statement(sql: str) -> str:
+    """Statement text with comments and layout removed and keywords upper-cased."""
+    tokens = code_tokens(tokenize(sql or ""))
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    return " ".join(token.upper if token.type == TokenType.KEYWORD else token.value for token in tokens)
+
+
+class SQLCompileChecker:
+    """
+    Compile-checks SQL and caches verdicts.
+
+    Args:
+        describe: Function returning the first result set's columns for a
+            statement, raising SQLCompileError when it does not compile
+            (DatabaseManager.describe_first_result_set)
+        maxsize: Cached verdicts
+    """
+
+    def __init__(self, describe: Callable[[str], List[Dict[str, Any]]], maxsize: int = 2048):
+        self.describe = describe
+        self._cache = LRUCache(maxsize=maxsize)
+        self.checks = 0
+        self.invalid = 0
+        self.unknown = 0
+        self.check_ms = 0.0
+
+    def check(self, sql: str, version: str = "") -> CompileVerdict:
+        """
+        Compile-check sql against the schema with the given version.
+
+        Args:
+            sql: Statement to check
+            version: Schema version (verdicts do not outlive schema changes)
+        """
+        key = (version, normalize_statement(sql))
+        verdict = self._cache.get(key)
+        if verdict is not None:
+            return verdict._replace(cached=True)
+
+        start = time.perf_counter()
+        try:
+            verdict = CompileVerdict(True, columns=self.describe(sql))
+        except SQLCompileError as e:
+            verdict = CompileVerdict(False, error=str(e))
+        except Exception as e:
+            logger.warning(f"Compile check skipped: {e}")
+            self.unknown += 1
+            return CompileVerdict(None, error=str(e))
+
+        self.checks += 1
+        self.check_ms += (time.perf_counter() - start) * 1000
+        if not verdict.valid:
+            self.invalid += 1
+            logger.info(f"Generated SQL does not compile: {verdict.error}")
+        self._cache.put(key, verdict)
+        return verdict
+
+    def stats(self) -> Dict[str, Any]:
+        """Round trips, verdicts and cache statistics."""
+        return {
+            "checks": self.checks,
+            "invalid": self.invalid,
+            "unknown": self.unknown,
+            "avg_check_ms": round(self.check_ms / self.checks, 2) if self.checks else None,
+            "cache": self._cache.stats(),
+        }
+
+    def clear(self):
+        """Forget all verdicts."""
+        self._cache.clear()
@@ -2,6 +2,7 @@
 Database connection and query execution module for SQL Server.
 """
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.engine import Engine
 from typing import List, Dict, Any, Optional, Tuple
@@ -92,6 +93,7 @@ class DatabaseManager:
         sql: str,
         params: Optional[Dict[str, Any]] = None,
         fetch_results: bool = True,
+        timeout: Optional[int] = None,
     ) -> Tuple[List[Dict[str, Any]], int, float]:
         """
         Execute SQL query and return results.
@@ -100,6 +102,8 @@ class DatabaseManager:
             sql: SQL query string
             params: Optional parameters for parameterized queries
             fetch_results: Whether to fetch and return results
+            timeout: Seconds before the driver cancels the statement
+                (pyodbc query timeout); None for no limit
 
         Returns:
             Tuple of (results, rows_affected, execution_time_ms)
@@ -110,8 +114,17 @@ class DatabaseManager:
 
         try:
             with self.get_session() as session:
-                # Execute query
-                result = session.execute(text(sql), params or {})
+                driver_connection = None
+                if timeout:
+                    driver_connection = session.connection().connection.dbapi_connection
+                    driver_connection.timeout = int(timeout)
+                try:
+                    # Execute query
+                    result = session.execute(text(sql), params or {})
+                finally:
+                    # The connection goes back to the pool: no limit for the next user
+                    if driver_connection is not None:
+                        driver_connection.timeout = 0
 
                 # Get rows affected
                 rows_affected = result.rowcount
@@ -193,6 +206,48 @@ class DatabaseManager:
         execution_time = (time.time() - start_time) * 1000
         return results, rows_affected, execution_time
 
+    def describe_first_result_set(self, sql: str) -> List[Dict[str, Any]]:
+        """
+        Compile a statement without running it (sp_describe_first_result_set).
+
+        Args:
+            sql: Statement to compile
+
+        Returns:
+            Columns of the first result set: name, type, nullable (empty for
+            statements without a result set)
+
+        Raises:
+            SQLCompileError: SQL Server rejected the statement (unknown
+                column or table, syntax error)
+        """
+        from app.core.compile_check import SQLCompileError, clean_error_message
+
+        try:
+            with self.get_session() as session:
+                result = session.execute(
+                    text("EXEC sp_describe_first_result_set @tsql = :tsql, @params = NULL, @browse_information_mode = 0"),
+                    {"tsql": sql}
+                )
+                rows = result.mappings().fetchall()
+        except ProgrammingError as e:
+            message = clean_error_message(str(e.orig) if e.orig is not None else str(e))
+            # Valid statements whose shape cannot be described (temp tables,
+            # dynamic SQL) are not compile errors
+            if "metadata could not be determined" in message:
+                raise RuntimeError(message) from e
+            raise SQLCompileError(message) from e
+
+        return [
+            {
+                "name": row["name"],
+                "type": row["system_type_name"],
+                "nullable": bool(row["is_nullable"]),
+            }
+            for row in rows
+            if not row.get("is_hidden")
+        ]
+
     def get_affected_rows_preview(
         self,
         sql: str,
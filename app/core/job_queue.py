@@ -0,0 +1,461 @@
+"""
+Atomic job claiming for the sql_queue table.
+
+Workers used to SELECT pending rows without locking, so two workers would
+pick up - and run - the same jobs. Claiming is now one statement:
+
+    UPDATE sql_queue SET status = 'processing', claimed_by = ..., claimed_at = NOW()
+    WHERE id IN (SELECT id ... WHERE status = 'pending' ... FOR UPDATE SKIP LOCKED)
+    RETURNING *
+
+Rows locked by a concurrent claim are skipped rather than waited for, and a
+row is only returned to the worker whose UPDATE moved it out of 'pending',
+so any number of workers on any number of hosts can drain the queue in
+parallel without duplicate work.
+
+Claim order is not FIFO (one user enqueuing hundreds of questions would
+hold everyone else up):
+- priority lanes: higher `priority` first; the Teams bot enqueues at
+  PRIORITY_INTERACTIVE, everything else defaults to PRIORITY_BATCH
+  (strict: batch jobs wait while interactive ones are pending)
+- fair share within a lane: each user's pending jobs are numbered oldest
+  first (user_turn) and jobs are claimed by turn, i.e. round-robin across
+  user_id - every user's oldest job goes before anyone's second
+
+Claims are leases (visibility timeout): a claimed job carries
+lease_expires_at, which LeaseKeeper pushes forward every heartbeat while
+the job runs. A worker that dies stops heartbeating; once its leases
+expire, reap_expired() (run by every worker's LeaseKeeper) puts the jobs
+back to 'pending' - after a backoff that doubles with each attempt - or
+fails them after max_attempts, so a job that keeps killing workers is not
+retried in a hot loop. Final status updates are conditional on
+claimed_by, so a worker that lost its lease cannot overwrite the outcome
+of the worker that took the job over.
+
+Idle workers do not poll: an insert trigger on sql_queue NOTIFYs
+NOTIFY_CHANNEL and QueueListener wakes the worker within milliseconds
+(database/migrations/004_queue_notify.sql). A long safety-net poll covers
+missed notifications (e.g. while the listening connection reconnects).
+
+Used by worker_service.py and process_queue.py; connections are plain
+psycopg2 connections owned by the caller.
+"""
+import os
+import select
+import socket
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Sequence, Set
+
+from loguru import logger
+from psycopg2.extras import RealDictCursor
+
+
+NOTIFY_CHANNEL = "sql_queue_jobs"
+
+
+# Interactive questions (Teams) outrank batch submissions; higher first
+PRIORITY_BATCH = 0
+PRIORITY_INTERACTIVE = 10
+
+# Seconds a claim stays valid without a heartbeat
+DEFAULT_LEASE_SECONDS = 120
+
+
+CLAIM_SQL = """
+    UPDATE sql_queue
+    SET status = 'processing',
+        claimed_by = %(worker_id)s,
+        claimed_at = NOW(),
+        lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s),
+        attempts = attempts + 1
+    WHERE id IN (
+        SELECT q.id
+        FROM sql_queue AS q
+        JOIN (
+            SELECT id,
+                   ROW_NUMBER() OVER (PARTITION BY priority, user_id ORDER BY created_at, id) AS user_turn
+            FROM sql_queue
+            WHERE status = 'pending'
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+        ) AS turns ON turns.id = q.id
+        WHERE q.status = 'pending'
+          AND (q.next_attempt_at IS NULL OR q.next_attempt_at <= NOW())
+        ORDER BY q.priority DESC, turns.user_turn, q.created_at
+        LIMIT %(limit)s
+        FOR UPDATE OF q SKIP LOCKED
+    )
+    RETURNING *
+"""
+
+# A released job was never started: the claim does not count as an attempt
+RELEASE_SQL = """
+    UPDATE sql_queue
+    SET status = 'pending',
+        claimed_by = NULL,
+        claimed_at = NULL,
+        lease_expires_at = NULL,
+        attempts = GREATEST(attempts - 1, 0)
+    WHERE id = ANY(%(ids)s)
+      AND status = 'processing'
+      AND claimed_by = %(worker_id)s
+"""
+
+EXTEND_LEASES_SQL = """
+    UPDATE sql_queue
+    SET lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s)
+    WHERE id = ANY(%(ids)s)
+      AND status = 'processing'
+      AND claimed_by = %(worker_id)s
+    RETURNING id
+"""
+
+# Expired leases go back to 'pending' no earlier than backoff * 2^(attempts-1)
+# seconds (capped), or to 'failed' once max_attempts claims have expired
+REAP_SQL = """
+    UPDATE sql_queue
+    SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'pending' END,
+        next_attempt_at = CASE WHEN attempts >= %(max_attempts)s THEN next_attempt_at
+            ELSE NOW() + make_interval(secs => LEAST(
+                %(backoff_seconds)s * POWER(2, GREATEST(attempts - 1, 0)),
+                %(backoff_max_seconds)s))
+            END,
+        error_message = CASE WHEN attempts >= %(max_attempts)s
+            THEN 'Worker lease expired on all ' || attempts || ' attempts'
+            ELSE error_message END,
+        error_type = CASE WHEN attempts >= %(max_attempts)s THEN 'lease_expired' ELSE error_type END,
+        completed_at = CASE WHEN attempts >= %(max_attempts)s THEN NOW() ELSE completed_at END,
+        claimed_by = NULL,
+        claimed_at = NULL,
+        lease_expires_at = NULL
+    WHERE id IN (
+        SELECT id
+        FROM sql_queue
+        WHERE status = 'processing'
+          AND lease_expires_at < NOW()
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, status, attempts
+"""
+
+# Reaped jobs come back to 'pending' silently (nothing NOTIFYs when their
+# backoff ends): workers cap their wait at the earliest one's due time
+NEXT_DUE_SQL = """
+    SELECT EXTRACT(EPOCH FROM MIN(next_attempt_at) - NOW())
+    FROM sql_queue
+    WHERE status = 'pending'
+      AND next_attempt_at > NOW()
+"""
+
+
+def claim_order(row: Dict[str, Any]):
+    """Sort key putting claimed rows back in claim order (priority, then age)."""
+    created_at = row.get("created_at")
+    return (-(row.get("priority") or 0), created_at is None, created_at, row.get("id"))
+
+
+def make_worker_id() -> str:
+    """Identifier of this worker process: hostname:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_jobs(
+    conn,
+    worker_id: str,
+    limit: int = 10,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS
+) -> List[Dict[str, Any]]:
+    """
+    Claim up to `limit` pending jobs for this worker (by priority, then
+    round-robin across users).
+
+    Commits the claim: the jobs are 'processing' and owned by worker_id
+    when this returns.
+
+    Args:
+        conn: psycopg2 connection to the queue database
+        worker_id: Claiming worker (make_worker_id())
+        limit: Maximum jobs to claim
+        lease_seconds: Lease on each job (extend with extend_leases)
+
+    Returns:
+        The claimed rows (all columns)
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(CLAIM_SQL, {"worker_id": worker_id, "limit": limit, "lease_seconds": lease_seconds})
+            rows = [dict(row) for row in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # RETURNING does not keep the subquery's order
+    rows.sort(key=claim_order)
+    return rows
+
+
+def release_jobs(conn, worker_id: str, ids: Sequence[int]) -> int:
+    """
+    Put claimed jobs this worker will not process back to 'pending'
+    (e.g. on shutdown with part of a batch left).
+
+    Returns:
+        Number of jobs released
+    """
+    if not ids:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RELEASE_SQL, {"worker_id": worker_id, "ids": list(ids)})
+            released = cur.rowcount
+            if released:
+                # Released jobs are not inserts: wake the other workers explicitly
+                cur.execute("SELECT pg_notify(%s, '')", (NOTIFY_CHANNEL,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return released
+
+
+def extend_leases(conn, worker_id: str, ids: Sequence[int], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Set[int]:
+    """
+    Heartbeat: extend this worker's leases on `ids`.
+
+    Returns:
+        The ids still owned by this worker (the others were reaped and
+        possibly claimed by another worker)
+    """
+    if not ids:
+        return set()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(EXTEND_LEASES_SQL, {"worker_id": worker_id, "ids": list(ids), "lease_seconds": lease_seconds})
+            owned = {row[0] for row in cur.fetchall()}
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return owned
+
+
+def reap_expired(
+    conn,
+    max_attempts: int = 3,
+    backoff_seconds: float = 30.0,
+    backoff_max_seconds: float = 900.0
+) -> List[Dict[str, Any]]:
+    """
+    Return jobs whose lease expired (their worker died or hung) to the
+    queue, or fail them after max_attempts. Safe to run from every worker
+    at once (SKIP LOCKED).
+
+    Returns:
+        The reaped rows (id, new status, attempts)
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(REAP_SQL, {
+                "max_attempts": max_attempts,
+                "backoff_seconds": backoff_seconds,
+                "backoff_max_seconds": backoff_max_seconds,
+            })
+            rows = [dict(row) for row in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows
+
+
+def seconds_until_due(conn) -> Optional[float]:
+    """
+    Seconds until the earliest pending job in retry backoff becomes
+    claimable (None when no job is waiting out a backoff).
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(NEXT_DUE_SQL)
+            row = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return float(row[0]) if row and row[0] is not None else None
+
+
+def capped_wait(timeout: float, due: Optional[float]) -> float:
+    """A wait of `timeout` seconds, ending early when a backed-off job is due."""
+    return timeout if due is None else max(0.0, min(timeout, due))
+
+
+class LeaseKeeper:
+    """
+    Background thread that heartbeats the leases of this worker's jobs and
+    reaps expired leases of any worker.
+
+    Args:
+        connection: Context manager factory lending a queue DB connection
+            (QueueDB.connection)
+        worker_id: This worker (make_worker_id())
+        lease_seconds: Lease length set on every heartbeat
+        interval: Seconds between heartbeats (well below lease_seconds)
+        max_attempts: Expired claims after which a job fails
+        backoff_seconds: Delay before the first retry of a reaped job
+            (doubles per attempt)
+        backoff_max_seconds: Upper bound on that delay
+    """
+
+    def __init__(
+        self,
+        connection: Callable[[], ContextManager],
+        worker_id: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        interval: float = 30.0,
+        max_attempts: int = 3,
+        backoff_seconds: float = 30.0,
+        backoff_max_seconds: float = 900.0
+    ):
+        self.connection = connection
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._ids: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.lost = 0
+        self.reaped = 0
+
+    def track(self, ids: Sequence[int]):
+        """Keep the leases on these claimed jobs alive."""
+        with self._lock:
+            self._ids.update(ids)
+
+    def untrack(self, ids: Sequence[int]):
+        """Stop heartbeating these jobs (finished or released)."""
+        with self._lock:
+            self._ids.difference_update(ids)
+
+    def heartbeat(self):
+        """Extend this worker's leases, then reap expired ones."""
+        with self._lock:
+            ids = list(self._ids)
+        if ids:
+            with self.connection() as conn:
+                owned = extend_leases(conn, self.worker_id, ids, self.lease_seconds)
+            lost = set(ids) - owned
+            if lost:
+                # Reaped while we were still working on them (e.g. a long
+                # stall): another worker may be running them now
+                self.lost += len(lost)
+                self.untrack(lost)
+                logger.warning(f"Lost lease on job(s) {sorted(lost)}; their results will not be recorded by this worker")
+
+        with self.connection() as conn:
+            reaped = reap_expired(conn, self.max_attempts, self.backoff_seconds, self.backoff_max_seconds)
+        if reaped:
+            self.reaped += len(reaped)
+            failed = [row["id"] for row in reaped if row["status"] == "failed"]
+            logger.warning(
+                f"Reaped {len(reaped)} job(s) with expired leases"
+                + (f", failed after {self.max_attempts} attempts: {failed}" if failed else "")
+            )
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Lease heartbeat failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start heartbeating (the first beat, and reap, happen right away)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the heartbeat thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Tracked jobs, lost leases and reaped jobs."""
+        with self._lock:
+            tracked = len(self._ids)
+        return {"tracked": tracked, "lost": self.lost, "reaped": self.reaped}
+
+
+class QueueListener:
+    """
+    LISTENs for new-job notifications on a dedicated autocommit connection.
+
+    Args:
+        connect: Function returning a new psycopg2 connection
+        channel: Notification channel
+        slice_seconds: How often wait() checks should_stop
+    """
+
+    def __init__(self, connect: Callable[[], Any], channel: str = NOTIFY_CHANNEL, slice_seconds: float = 1.0):
+        self.connect = connect
+        self.channel = channel
+        self.slice_seconds = slice_seconds
+        self.conn = None
+
+    def listen(self):
+        """Open the connection and LISTEN (no-op when already listening)."""
+        if self.conn is not None:
+            return
+        conn = self.connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        self.conn = conn
+
+    def wait(self, timeout: float, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Block until a notification arrives, timeout elapses or should_stop()
+        is true.
+
+        Notifications that arrived while the worker was busy count: the
+        worker claims again straight away rather than sleeping on jobs that
+        are already queued.
+
+        Returns:
+            True when notified
+        """
+        self.listen()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                self.conn.poll()
+                if self.conn.notifies:
+                    self.conn.notifies.clear()
+                    return True
+                if should_stop is not None and should_stop():
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                select.select([self.conn], [], [], min(self.slice_seconds, remaining))
+        except Exception:
+            # Broken connection: reconnect on the next wait
+            self.close()
+            raise
+
+    def close(self):
+        """Close the listening connection."""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
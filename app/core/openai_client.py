@@ -2,10 +2,12 @@
 OpenAI integration for natural language to SQL conversion.
 """
 from openai import OpenAI
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 import json
 
 from app.config import settings
+from app.core.schema_renderer import render_schema
+from app.utils.json_stream import sql_text_handler
 from app.models.query_models import QueryType, RiskLevel
 from loguru import logger
 
@@ -21,7 +23,8 @@ class OpenAIClient:
     def generate_sql(
         self,
         question: str,
-        schema_info: Dict[str, Any]
+        schema_info: Dict[str, Any],
+        on_sql: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate SQL query from natural language question.
@@ -29,6 +32,8 @@ class OpenAIClient:
         Args:
             question: Natural language question
             schema_info: Database schema information
+            on_sql: Optional callback; the response is then streamed and the
+                callback gets the SQL as soon as it is complete
 
         Returns:
             Dictionary containing SQL, type, risk level, and explanation
@@ -40,24 +45,21 @@ class OpenAIClient:
             # Call OpenAI API
             logger.info(f"Generating SQL for question: {question}")
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Low temperature for consistent SQL generation
-                response_format={"type": "json_object"}
-            )
+            request = self._build_request(prompt)
+            if on_sql:
+                on_text = sql_text_handler(on_sql)
+                parts: List[str] = []
+                for chunk in self.client.chat.completions.create(**request, stream=True):
+                    text = self._chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        on_text(text)
+                content = "".join(parts)
+            else:
+                response = self.client.chat.completions.create(**request)
+                content = response.choices[0].message.content
 
             # Parse response
-            content = response.choices[0].message.content
             result = json.loads(content)
 
             logger.info(f"Generated SQL: {result.get('sql', 'N/A')}")
@@ -67,6 +69,25 @@ class OpenAIClient:
             logger.error(f"OpenAI API error: {e}")
             raise
 
+    def _build_request(self, prompt: str) -> Dict[str, Any]:
+        """Arguments for chat.completions.create (sync and async clients)."""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,  # Low temperature for consistent SQL generation
+            "response_format": {"type": "json_object"},
+        }
+
+    @staticmethod
+    def _chunk_text(chunk) -> Optional[str]:
+        """Text delta of a streamed chat completion chunk."""
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content
+
     def _get_system_prompt(self) -> str:
         """Get the system prompt for SQL generation."""
         return """You are an expert SQL Server database assistant. Your task is to convert natural language questions into valid T-SQL queries.
@@ -143,44 +164,8 @@ Return your response as JSON following the specified format."""
         return prompt
 
     def _format_schema(self, schema_info: Dict[str, Any]) -> str:
-        """
-        Format schema information for the prompt.
-
-        Args:
-            schema_info: Database schema dictionary
-
-        Returns:
-            Formatted schema string
-        """
-        lines = []
-
-        # Format tables
-        for table in schema_info.get("tables", []):
-            lines.append(f"\nTable: {table['name']}")
-
-            # Columns
-            lines.append("  Columns:")
-            for col in table.get("columns", []):
-                pk_marker = " (PRIMARY KEY)" if col.get("primary_key") else ""
-                nullable = "NULL" if col.get("nullable") else "NOT NULL"
-                lines.append(f"    - {col['name']}: {col['type']} {nullable}{pk_marker}")
-
-            # Foreign keys
-            if table.get("foreign_keys"):
-                lines.append("  Foreign Keys:")
-                for fk in table["foreign_keys"]:
-                    fk_cols = ", ".join(fk["columns"])
-                    ref_table = fk["referred_table"]
-                    ref_cols = ", ".join(fk["referred_columns"])
-                    lines.append(f"    - {fk_cols} -> {ref_table}({ref_cols})")
-
-        # Format views
-        if schema_info.get("views"):
-            lines.append("\nViews:")
-            for view in schema_info["views"]:
-                lines.append(f"  - {view}")
-
-        return "\n".join(lines)
+        """Format schema information for the prompt (shared, memoized renderer)."""
+        return render_schema(schema_info, settings.schema_prompt_style)
 
     def explain_query(self, sql: str) -> str:
         """
@@ -0,0 +1,270 @@
+"""
+Per-provider call statistics for AI routing.
+
+For each provider this tracks:
+
+- Recent call latencies. The latency quantile (p90 by default) is the
+  provider's hedging budget: if it has not answered by then, the call is
+  probably in its slow tail and a second provider is started in parallel.
+  Until a provider has enough samples the default is used. Calls cancelled
+  after losing a hedge race are the slow tail itself; they count as
+  lasting at least their elapsed time (and no less than the budget), so
+  the quantile does not drift down to the calls that happened to win.
+- Exponentially weighted moving averages (EWMA) of latency, error rate and
+  JSON-parse failure rate, from which routing ranks providers by expected
+  latency: ewma_latency / (1 - error_rate), the expected time to a good
+  answer when failures have to be retried elsewhere.
+- A circuit breaker. After `failure_threshold` consecutive failures (or an
+  error-rate EWMA above `error_rate_threshold`) the breaker opens and the
+  provider is skipped. After `cooldown` seconds it is half-open: a single
+  probe request is let through; success closes the breaker, failure opens
+  it for another cooldown.
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from app.core.ai_provider import ResponseParseError
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_parse_failure(error: BaseException) -> bool:
+    """Whether a provider error means the answer was not valid JSON."""
+    return isinstance(error, (ResponseParseError, json.JSONDecodeError))
+
+
+class LatencyWindow:
+    """Sliding window of the last `size` latencies (seconds)."""
+
+    def __init__(self, size: int = 50):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile (None when empty)."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))
+        return ordered[index]
+
+
+class _ProviderState:
+    """Mutable counters for one provider (guarded by ProviderStats._lock)."""
+
+    def __init__(self, window: int):
+        self.latencies = LatencyWindow(window)
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+        self.ewma_parse_failure = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.parse_failures = 0
+        self.consecutive_failures = 0
+        self.breaker = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+
+
+class ProviderStats:
+    """
+    Thread-safe latency/error statistics, hedging budgets and circuit
+    breakers per provider.
+
+    Args:
+        window: Latencies kept per provider (for the hedging quantile)
+        quantile: Quantile used as the hedging budget (0.9 = p90)
+        default_budget: Budget (seconds) before min_samples are collected;
+            also the assumed latency of a provider with no successes yet
+        min_budget: Lower bound, so a fast streak does not hedge every call
+        min_samples: Samples needed before the measured quantile is used
+        alpha: EWMA weight of the newest observation
+        failure_threshold: Consecutive failures that open the breaker
+        error_rate_threshold: Error-rate EWMA that opens the breaker
+        min_calls: Calls before the error-rate threshold applies
+        cooldown: Seconds an open breaker waits before a half-open probe
+    """
+
+    def __init__(
+        self,
+        window: int = 50,
+        quantile: float = 0.9,
+        default_budget: float = 8.0,
+        min_budget: float = 1.0,
+        min_samples: int = 5,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        error_rate_threshold: float = 0.5,
+        min_calls: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.window = window
+        self.quantile = quantile
+        self.default_budget = default_budget
+        self.min_budget = min_budget
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._providers: Dict[str, _ProviderState] = {}
+
+    def _state(self, provider: str) -> _ProviderState:
+        state = self._providers.get(provider)
+        if state is None:
+            state = self._providers[provider] = _ProviderState(self.window)
+        return state
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    # -- recording -------------------------------------------------------
+
+    def record_start(self, provider: str):
+        """Note a call is starting (claims the probe of a half-open breaker)."""
+        with self._lock:
+            state = self._state(provider)
+            if state.breaker == OPEN and time.monotonic() - state.opened_at >= self.cooldown:
+                state.breaker = HALF_OPEN
+            if state.breaker == HALF_OPEN:
+                state.probe_in_flight = True
+
+    def record_success(self, provider: str, seconds: float):
+        """Record a successful call and its latency."""
+        with self._lock:
+            state = self._state(provider)
+            state.calls += 1
+            state.latencies.add(seconds)
+            state.ewma_latency = self._ewma(state.ewma_latency, seconds)
+            state.ewma_error = self._ewma(state.ewma_error, 0.0)
+            state.ewma_parse_failure = self._ewma(state.ewma_parse_failure, 0.0)
+            state.consecutive_failures = 0
+            state.breaker = CLOSED
+            state.probe_in_flight = False
+
+    def record_failure(self, provider: str, error: BaseException, seconds: Optional[float] = None):
+        """Record a failed call; may open the provider's breaker."""
+        parse_failure = is_parse_failure(error)
+        with self._lock:
+            state = self._state(provider)
+            state.calls += 1
+            state.failures += 1
+            state.parse_failures += parse_failure
+            state.last_error = str(error)[:200]
+            state.ewma_error = self._ewma(state.ewma_error, 1.0)
+            state.ewma_parse_failure = self._ewma(state.ewma_parse_failure, float(parse_failure))
+            # A slow failure is still evidence of latency (a timeout especially)
+            if seconds is not None:
+                state.ewma_latency = self._ewma(state.ewma_latency, seconds)
+            state.consecutive_failures += 1
+
+            if state.breaker == HALF_OPEN or (
+                state.breaker == CLOSED and (
+                    state.consecutive_failures >= self.failure_threshold
+                    or (state.calls >= self.min_calls and state.ewma_error >= self.error_rate_threshold)
+                )
+            ):
+                state.breaker = OPEN
+                state.opened_at = time.monotonic()
+            state.probe_in_flight = False
+
+    def record_cancelled(self, provider: str, seconds: Optional[float] = None):
+        """
+        A call was cancelled (e.g. lost a hedge race): release its probe, and
+        record its latency as censored at `seconds` (see the module docstring).
+        """
+        with self._lock:
+            state = self._state(provider)
+            if seconds is not None:
+                state.latencies.add(max(seconds, self._budget(state)))
+            if state.probe_in_flight:
+                state.probe_in_flight = False
+                state.breaker = OPEN
+
+    # -- routing ---------------------------------------------------------
+
+    def breaker_state(self, provider: str) -> str:
+        """closed / open / half_open (open past its cooldown reads as half_open)."""
+        with self._lock:
+            return self._breaker_state(self._state(provider))
+
+    def _breaker_state(self, state: _ProviderState) -> str:
+        if state.breaker == OPEN and time.monotonic() - state.opened_at >= self.cooldown:
+            return HALF_OPEN
+        return state.breaker
+
+    def available(self, provider: str) -> bool:
+        """Whether a request may go to the provider now."""
+        with self._lock:
+            state = self._state(provider)
+            breaker = self._breaker_state(state)
+            return breaker == CLOSED or (breaker == HALF_OPEN and not state.probe_in_flight)
+
+    def expected_latency(self, provider: str) -> float:
+        """Expected seconds to a good answer (latency EWMA / success rate)."""
+        with self._lock:
+            state = self._state(provider)
+            latency = state.ewma_latency if state.ewma_latency is not None else self.default_budget
+            return latency / max(1.0 - state.ewma_error, 0.05)
+
+    def rank(self, providers: Iterable[str]) -> List[str]:
+        """
+        Order providers for a request: available ones by expected latency
+        (ties keep the given priority order), then unavailable ones.
+        """
+        providers = list(providers)
+        available = [p for p in providers if self.available(p)]
+        available.sort(key=lambda p: (self.expected_latency(p), providers.index(p)))
+        return available + [p for p in providers if p not in available]
+
+    def budget(self, provider: str) -> float:
+        """Seconds to wait for the provider before hedging."""
+        with self._lock:
+            return self._budget(self._providers.get(provider))
+
+    def _budget(self, state: Optional[_ProviderState]) -> float:
+        if state is None or len(state.latencies) < self.min_samples:
+            return self.default_budget
+        return max(self.min_budget, state.latencies.quantile(self.quantile))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider statistics (for the stats endpoint and logs)."""
+        with self._lock:
+            providers = list(self._providers)
+        result = {}
+        for name in providers:
+            budget = self.budget(name)
+            expected = self.expected_latency(name)
+            with self._lock:
+                state = self._providers[name]
+                result[name] = {
+                    "breaker": self._breaker_state(state),
+                    "calls": state.calls,
+                    "failures": state.failures,
+                    "parse_failures": state.parse_failures,
+                    "consecutive_failures": state.consecutive_failures,
+                    "ewma_latency": round(state.ewma_latency, 3) if state.ewma_latency is not None else None,
+                    "ewma_error_rate": round(state.ewma_error, 3),
+                    "ewma_parse_failure_rate": round(state.ewma_parse_failure, 3),
+                    "expected_latency": round(expected, 3),
+                    "samples": len(state.latencies),
+                    "p50": state.latencies.quantile(0.5),
+                    "p90": state.latencies.quantile(0.9),
+                    "hedge_budget": budget,
+                    "last_error": state.last_error,
+                }
+        return result
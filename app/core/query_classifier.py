@@ -1,72 +1,161 @@
 """
 Query classification and validation module.
 """
-import re
-from typing import Tuple, List
-
+from typing import Any, Dict, Tuple, List, Optional, Sequence
+
+from app.core.sql_lexer import (
+    Token,
+    TokenType,
+    tokenize,
+    code_tokens,
+    split_statements,
+    statement_keyword,
+    clause_tokens,
+    object_name,
+)
 from app.models.query_models import QueryType, RiskLevel
+from app.utils.cache import LRUCache
 from loguru import logger
 
 
+# Risk ordering used to pick the riskiest statement of a batch
+_RISK_ORDER = {
+    RiskLevel.LOW: 0,
+    RiskLevel.MEDIUM: 1,
+    RiskLevel.HIGH: 2,
+    RiskLevel.CRITICAL: 3,
+}
+
+
 class QueryClassifier:
-    """Classifies and validates SQL queries."""
+    """
+    Classifies and validates SQL queries.
+
+    The same generated statements are classified over and over, so results
+    are memoized in bounded LRU caches keyed by the SQL text (a dictionary
+    lookup on the string's hash). All keyword sets are frozen at class load
+    and the lexer's patterns are compiled once at import.
+    """
 
     # SQL keywords for different operation types
-    READ_KEYWORDS = ["SELECT", "SHOW", "DESCRIBE", "EXPLAIN", "WITH"]
-    WRITE_SAFE_KEYWORDS = ["INSERT"]
-    WRITE_RISKY_KEYWORDS = ["UPDATE", "DELETE", "TRUNCATE", "MERGE"]
-    ADMIN_KEYWORDS = ["CREATE", "DROP", "ALTER", "GRANT", "REVOKE", "EXEC", "EXECUTE"]
+    READ_KEYWORDS = frozenset(["SELECT", "SHOW", "DESCRIBE", "EXPLAIN", "WITH"])
+    WRITE_SAFE_KEYWORDS = frozenset(["INSERT"])
+    WRITE_RISKY_KEYWORDS = frozenset(["UPDATE", "DELETE", "TRUNCATE", "MERGE"])
+    ADMIN_KEYWORDS = frozenset(["CREATE", "DROP", "ALTER", "GRANT", "REVOKE", "EXEC", "EXECUTE"])
+
+    # Classification rule names reported by classify_with_rule()
+    RULES = (
+        "read",
+        "admin",
+        "write_specific_where",
+        "write_broad_where",
+        "write_no_where",
+        "truncate_merge",
+        "insert",
+        "unknown_operation",
+        "empty",
+    )
+
+    # Default number of distinct statements to remember
+    CACHE_SIZE = 4096
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        """
+        Initialize classifier.
+
+        Args:
+            cache_size: Entries per result cache (0 disables memoization)
+        """
+        self._token_cache = LRUCache(cache_size)
+        self._classification_cache = LRUCache(cache_size)
+        self._validation_cache = LRUCache(cache_size)
+
+    def _tokenize(self, sql: str) -> Tuple[List[Token], List[List[Token]]]:
+        """Tokenize once per distinct statement: (tokens, statements)."""
+        def compute():
+            tokens = tokenize(sql)
+            return tokens, split_statements(tokens)
+
+        return self._token_cache.get_or_compute(sql, compute)
 
     def classify_query(self, sql: str) -> Tuple[QueryType, RiskLevel]:
         """
         Classify SQL query by type and assess risk level.
 
+        Every statement of a batch is classified and the riskiest one wins,
+        so "SELECT 1; DELETE FROM t" - or the same batch without the
+        semicolon - is not reported as a read.
+
         Args:
             sql: SQL query string
 
         Returns:
             Tuple of (QueryType, RiskLevel)
         """
-        sql_upper = sql.strip().upper()
+        query_type, risk_level, _ = self.classify_with_rule(sql)
+        return query_type, risk_level
 
-        # Remove comments
-        sql_upper = self._remove_comments(sql_upper)
+    def classify_with_rule(self, sql: str) -> Tuple[QueryType, RiskLevel, str]:
+        """
+        Classify SQL query and report which classification rule decided it.
 
-        # Get first significant keyword
-        first_keyword = self._get_first_keyword(sql_upper)
+        Rule names (see RULES) let bulk re-scoring report per-rule hit
+        counts after the rules change.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Tuple of (QueryType, RiskLevel, rule_name)
+        """
+        return self._classification_cache.get_or_compute(sql, lambda: self._classify(sql))
+
+    def _classify(self, sql: str) -> Tuple[QueryType, RiskLevel, str]:
+        """Uncached classification."""
+        _, statements = self._tokenize(sql)
+        if not statements:
+            logger.warning("Unknown SQL operation: ")
+            return QueryType.WRITE_RISKY, RiskLevel.HIGH, "empty"
+
+        results = [self._classify_statement(statement) for statement in statements]
+        return max(results, key=lambda result: _RISK_ORDER[result[1]])
+
+    def _classify_statement(self, statement: Sequence[Token]) -> Tuple[QueryType, RiskLevel, str]:
+        """Classify a single statement's tokens."""
+        keyword = statement_keyword(statement)
 
         # Classify by type
-        if first_keyword in self.READ_KEYWORDS:
-            return QueryType.READ, RiskLevel.LOW
+        if keyword in self.READ_KEYWORDS:
+            return QueryType.READ, RiskLevel.LOW, "read"
 
-        elif first_keyword in self.ADMIN_KEYWORDS:
-            return QueryType.ADMIN, RiskLevel.CRITICAL
+        elif keyword in self.ADMIN_KEYWORDS:
+            return QueryType.ADMIN, RiskLevel.CRITICAL, "admin"
 
-        elif first_keyword in self.WRITE_RISKY_KEYWORDS:
+        elif keyword in self.WRITE_RISKY_KEYWORDS:
             # Check if UPDATE/DELETE has WHERE clause
-            if first_keyword in ["UPDATE", "DELETE"]:
-                has_where = self._has_where_clause(sql_upper)
-                if has_where:
+            if keyword in ("UPDATE", "DELETE"):
+                where_clause = clause_tokens(statement, "WHERE")
+                if where_clause:
                     # Check if WHERE clause is specific enough
-                    if self._is_where_clause_safe(sql_upper):
-                        return QueryType.WRITE_SAFE, RiskLevel.MEDIUM
+                    if self._is_where_clause_safe(where_clause):
+                        return QueryType.WRITE_SAFE, RiskLevel.MEDIUM, "write_specific_where"
                     else:
-                        return QueryType.WRITE_RISKY, RiskLevel.HIGH
+                        return QueryType.WRITE_RISKY, RiskLevel.HIGH, "write_broad_where"
                 else:
                     # No WHERE clause - very risky
-                    return QueryType.WRITE_RISKY, RiskLevel.CRITICAL
+                    return QueryType.WRITE_RISKY, RiskLevel.CRITICAL, "write_no_where"
             else:
                 # TRUNCATE, MERGE
-                return QueryType.WRITE_RISKY, RiskLevel.HIGH
+                return QueryType.WRITE_RISKY, RiskLevel.HIGH, "truncate_merge"
 
-        elif first_keyword in self.WRITE_SAFE_KEYWORDS:
+        elif keyword in self.WRITE_SAFE_KEYWORDS:
             # INSERT operations
-            return QueryType.WRITE_SAFE, RiskLevel.MEDIUM
+            return QueryType.WRITE_SAFE, RiskLevel.MEDIUM, "insert"
 
         else:
             # Unknown operation - treat as risky
-            logger.warning(f"Unknown SQL operation: {first_keyword}")
-            return QueryType.WRITE_RISKY, RiskLevel.HIGH
+            logger.warning(f"Unknown SQL operation: {keyword}")
+            return QueryType.WRITE_RISKY, RiskLevel.HIGH, "unknown_operation"
 
     def validate_query(self, sql: str, query_type: QueryType) -> Tuple[bool, List[str]]:
         """
@@ -79,88 +168,114 @@ class QueryClassifier:
         Returns:
             Tuple of (is_valid, warnings_list)
         """
+        is_valid, warnings = self._validation_cache.get_or_compute(
+            (sql, query_type),
+            lambda: self._validate(sql, query_type),
+        )
+        # Callers may append to the list; never hand out the cached tuple
+        return is_valid, list(warnings)
+
+    def _validate(self, sql: str, query_type: QueryType) -> Tuple[bool, Tuple[str, ...]]:
+        """Uncached validation; warnings are returned as an immutable tuple."""
         warnings = []
 
         # Basic syntax validation
         if not sql.strip():
-            return False, ["Empty query"]
+            return False, ("Empty query",)
 
-        sql_upper = sql.strip().upper()
+        tokens, statements = self._tokenize(sql)
+        code = code_tokens(tokens)
 
         # Check for dangerous patterns
-        dangerous_patterns = [
-            (r";\s*DROP", "Possible SQL injection: DROP after semicolon"),
-            (r";\s*DELETE", "Multiple statements detected with DELETE"),
-            (r"--", "SQL comment detected"),
-            (r"/\*.*\*/", "Block comment detected"),
-        ]
-
-        for pattern, warning in dangerous_patterns:
-            if re.search(pattern, sql_upper):
-                warnings.append(warning)
+        for index, token in enumerate(code[:-1]):
+            if token.value == ";":
+                following = code[index + 1]
+                if following.is_keyword("DROP"):
+                    warnings.append("Possible SQL injection: DROP after semicolon")
+                elif following.is_keyword("DELETE"):
+                    warnings.append("Multiple statements detected with DELETE")
+
+        comments = [t.value for t in tokens if t.type == TokenType.COMMENT]
+        if any(comment.startswith("--") for comment in comments):
+            warnings.append("SQL comment detected")
+        if any(comment.startswith("/*") for comment in comments):
+            warnings.append("Block comment detected")
 
         # Type-specific validation
         if query_type == QueryType.WRITE_RISKY:
-            if not self._has_where_clause(sql_upper):
+            if not all(clause_tokens(statement, "WHERE") for statement in statements):
                 warnings.append("WARNING: No WHERE clause - will affect ALL rows!")
 
         # Check for very broad WHERE clauses
-        if "WHERE 1=1" in sql_upper or "WHERE 1 = 1" in sql_upper:
-            warnings.append("WHERE 1=1 detected - effectively no filtering")
+        for statement in statements:
+            where_clause = clause_tokens(statement, "WHERE")
+            if where_clause and self._is_tautology(where_clause, 0):
+                warnings.append("WHERE 1=1 detected - effectively no filtering")
+                break
 
         # Validate has required keywords
-        if query_type == QueryType.READ and "SELECT" not in sql_upper:
-            return False, ["Invalid SELECT query"]
-
-        return True, warnings
-
-    def _remove_comments(self, sql: str) -> str:
-        """Remove SQL comments from query."""
-        # Remove single-line comments
-        sql = re.sub(r"--.*$", "", sql, flags=re.MULTILINE)
-        # Remove block comments
-        sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.DOTALL)
-        return sql
-
-    def _get_first_keyword(self, sql: str) -> str:
-        """Get the first SQL keyword from query."""
-        # Remove leading whitespace and get first word
-        words = sql.split()
-        if words:
-            return words[0].upper()
-        return ""
-
-    def _has_where_clause(self, sql: str) -> bool:
-        """Check if query has a WHERE clause."""
-        return "WHERE" in sql.upper()
-
-    def _is_where_clause_safe(self, sql: str) -> bool:
+        if query_type == QueryType.READ and not any(t.is_keyword("SELECT") for t in code):
+            return False, ("Invalid SELECT query",)
+
+        return True, tuple(warnings)
+
+    def _is_tautology(self, tokens: Sequence[Token], index: int) -> bool:
+        """Check for a literal 1 = 1 comparison starting at index."""
+        return (
+            index + 2 < len(tokens)
+            and tokens[index].type == TokenType.NUMBER
+            and tokens[index].value == "1"
+            and tokens[index + 1].value == "="
+            and tokens[index + 2].type == TokenType.NUMBER
+            and tokens[index + 2].value == "1"
+        )
+
+    def _is_where_clause_safe(self, where_clause: Sequence[Token]) -> bool:
         """
         Determine if WHERE clause is specific enough.
 
         A safe WHERE clause should reference specific values,
         not overly broad conditions.
-        """
-        where_match = re.search(r"WHERE\s+(.+?)(?:ORDER BY|GROUP BY|;|$)", sql, re.IGNORECASE | re.DOTALL)
 
-        if not where_match:
+        Args:
+            where_clause: Tokens of the WHERE clause (without the keyword)
+        """
+        if not where_clause:
             return False
 
-        where_clause = where_match.group(1).strip()
+        has_specific_value = False
+
+        for index, token in enumerate(where_clause):
+            # Unsafe: WHERE 1=1
+            if self._is_tautology(where_clause, index):
+                return False
+
+            # Unsafe: WHERE column IS NOT NULL (too broad)
+            if (
+                token.is_keyword("IS")
+                and index + 2 < len(where_clause)
+                and where_clause[index + 1].is_keyword("NOT")
+                and where_clause[index + 2].is_keyword("NULL")
+            ):
+                return False
 
-        # Unsafe patterns
-        unsafe_patterns = [
-            r"1\s*=\s*1",  # WHERE 1=1
-            r".*IS NOT NULL",  # WHERE column IS NOT NULL (too broad)
-            r".*>\s*0",  # WHERE id > 0 (too broad)
-        ]
+            if token.type != TokenType.OPERATOR or index + 1 >= len(where_clause):
+                continue
+            operand = where_clause[index + 1]
 
-        for pattern in unsafe_patterns:
-            if re.search(pattern, where_clause, re.IGNORECASE):
+            # Unsafe: WHERE id > 0 (too broad)
+            if token.value == ">" and operand.type == TokenType.NUMBER and operand.value == "0":
                 return False
 
-        # Safe if it has specific value comparisons
-        has_specific_value = bool(re.search(r"=\s*['\"]?\w+['\"]?", where_clause))
+            # Safe if it has specific value comparisons
+            if token.value == "=" and operand.type in (
+                TokenType.STRING,
+                TokenType.NUMBER,
+                TokenType.IDENTIFIER,
+                TokenType.QUOTED_IDENTIFIER,
+                TokenType.VARIABLE,
+            ):
+                has_specific_value = True
 
         return has_specific_value
 
@@ -178,54 +293,80 @@ class QueryClassifier:
         if query_type == QueryType.READ:
             return "Read operation - no data will be modified"
 
-        sql_upper = sql.upper()
+        _, statements = self._tokenize(sql)
+        statement = statements[0] if statements else []
+        keyword = statement_keyword(statement)
 
         # Extract table name
-        table_name = self._extract_table_name(sql_upper)
+        table_name = self._extract_table_name(statement)
 
         if query_type == QueryType.WRITE_RISKY:
-            if not self._has_where_clause(sql_upper):
+            if not clause_tokens(statement, "WHERE"):
                 return f"⚠️ CRITICAL: Will affect ALL rows in table '{table_name}'"
             else:
                 return f"⚠️ HIGH RISK: Will modify multiple rows in table '{table_name}'"
 
         elif query_type == QueryType.WRITE_SAFE:
-            if "INSERT" in sql_upper:
+            if keyword == "INSERT":
                 return f"Will insert new row(s) into table '{table_name}'"
             else:
                 return f"Will modify specific row(s) in table '{table_name}'"
 
         elif query_type == QueryType.ADMIN:
-            if "DROP" in sql_upper:
+            if keyword == "DROP":
                 return f"🚨 CRITICAL: Will permanently delete {table_name}"
-            elif "CREATE" in sql_upper:
+            elif keyword == "CREATE":
                 return f"Will create new database object: {table_name}"
-            elif "ALTER" in sql_upper:
+            elif keyword == "ALTER":
                 return f"Will modify structure of {table_name}"
             else:
                 return "Administrative operation"
 
         return "Unknown impact"
 
-    def _extract_table_name(self, sql: str) -> str:
-        """Extract table name from SQL query."""
-        # Try different patterns
-        patterns = [
-            r"FROM\s+(\w+)",
-            r"UPDATE\s+(\w+)",
-            r"INSERT\s+INTO\s+(\w+)",
-            r"DELETE\s+FROM\s+(\w+)",
-            r"DROP\s+TABLE\s+(\w+)",
-            r"CREATE\s+TABLE\s+(\w+)",
-            r"ALTER\s+TABLE\s+(\w+)",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, sql, re.IGNORECASE)
-            if match:
-                return match.group(1)
-
-        return "unknown"
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return hit-rate statistics for the memoization caches."""
+        return {
+            "tokens": self._token_cache.stats(),
+            "classification": self._classification_cache.stats(),
+            "validation": self._validation_cache.stats(),
+        }
+
+    def _extract_table_name(self, statement: Sequence[Token]) -> str:
+        """Extract the target table name from a statement's tokens."""
+        tokens = code_tokens(statement)
+        keyword = statement_keyword(tokens)
+        name: Optional[str] = None
+
+        # Index of the main statement keyword (after any CTE)
+        start = next(
+            (i for i, t in enumerate(tokens) if t.is_keyword(keyword)),
+            0,
+        )
+
+        if keyword in ("INSERT", "DELETE", "UPDATE", "MERGE", "TRUNCATE", "DROP", "CREATE", "ALTER"):
+            # Skip optional/object-type keywords: INSERT INTO, DELETE FROM,
+            # TRUNCATE TABLE, DROP TABLE IF EXISTS, CREATE UNIQUE INDEX, ...
+            index = start + 1
+            while index < len(tokens) and tokens[index].type == TokenType.KEYWORD:
+                index += 1
+            name = object_name(tokens, index)
+
+        # UPDATE ... FROM and SELECT read the table from the FROM clause
+        if keyword in ("UPDATE", "SELECT") or name is None:
+            depth = 0
+            for index in range(start, len(tokens) - 1):
+                if tokens[index].value == "(":
+                    depth += 1
+                elif tokens[index].value == ")":
+                    depth -= 1
+                elif depth == 0 and tokens[index].is_keyword("FROM"):
+                    from_name = object_name(tokens, index + 1)
+                    if from_name:
+                        name = from_name
+                        break
+
+        return name or "unknown"
 
 
 # Global classifier instance
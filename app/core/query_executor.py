@@ -1,11 +1,14 @@
 """
 Query executor with confirmation workflow and transaction support.
 """
+import asyncio
 import uuid
+from functools import partial
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 from app.core.database import db_manager
+from app.services.early_execution import EarlyExecution
 from app.services.sql_generator import IntelligentSQLGenerator
 from app.core.query_classifier import query_classifier
 from app.models.query_models import (
@@ -61,97 +64,178 @@ class QueryExecutor:
         try:
             # Get schema
             schema = self.get_schema()
-
-            # Detect language (simple Hebrew detection)
-            language = 'he' if any(ord(char) >= 0x0590 and ord(char) <= 0x05FF for char in question) else 'en'
-            logger.info(f"Detected language: {language}")
+            language = self._detect_language(question)
 
             # Generate SQL using pattern-based generator
-            ai_result = self.sql_generator.generate_sql(question, language=language, schema_info=schema)
-
-            # Check if generation was successful
-            if not ai_result.get("success", False):
-                error_msg = ai_result.get("error", "Could not generate SQL")
-                raise ValueError(error_msg)
-
-            # Extract components
-            sql = ai_result.get("sql", "")
-
-            # Pattern-based generator doesn't provide these, so we'll classify them ourselves
-            query_type_str = "READ"  # Default, will be classified below
-            risk_level_str = "low"   # Default, will be classified below
-            explanation = f"Generated using {ai_result.get('method', 'pattern')} method (confidence: {ai_result.get('confidence', 0):.0%})"
-            estimated_impact = f"Pattern type: {ai_result.get('pattern_type', 'unknown')}"
-
-            # Validate and classify
-            query_type = QueryType(query_type_str)
-            risk_level = RiskLevel(risk_level_str)
-
-            # Double-check classification with our classifier
-            classified_type, classified_risk = query_classifier.classify_query(sql)
-
-            # Use higher risk level
-            if classified_risk.value in ["high", "critical"]:
-                risk_level = classified_risk
-                query_type = classified_type
-
-            # Validate query
-            is_valid, warnings = query_classifier.validate_query(sql, query_type)
-
-            if not is_valid:
-                raise ValueError(f"Invalid query: {', '.join(warnings)}")
-
-            # Generate query ID
-            query_id = str(uuid.uuid4())
-
-            # Determine if confirmation needed
-            requires_confirmation = self._requires_confirmation(query_type, risk_level)
-
-            # Store as pending query
-            self.pending_queries[query_id] = {
-                "question": question,
-                "sql": sql,
-                "query_type": query_type,
-                "risk_level": risk_level,
-                "explanation": explanation,
-                "estimated_impact": estimated_impact,
-                "warnings": warnings,
-                "timestamp": datetime.now(),
-            }
-
-            # Execute immediately if allowed
-            executed = False
-            results = None
-            row_count = None
-
-            if execute_immediately and query_type == QueryType.READ:
-                logger.info(f"Executing READ query immediately: {query_id}")
-                exec_result = self._execute_query(query_id)
-                if exec_result.success:
-                    executed = True
-                    results = exec_result.results
-                    row_count = exec_result.rows_affected
-
-            # Add to history
-            self._add_to_history(query_id, executed=executed)
-
-            return QueryResponse(
-                query_id=query_id,
-                sql=sql,
-                query_type=query_type,
-                risk_level=risk_level,
-                explanation=explanation,
-                estimated_impact=estimated_impact,
-                requires_confirmation=requires_confirmation,
-                executed=executed,
-                results=results,
-                row_count=row_count,
+            early = self._early_execution(execute_immediately)
+            ai_result = self.sql_generator.generate_sql(
+                question, language=language, schema_info=schema,
+                on_sql=early.on_sql if early else None
+            )
+            return self._build_response(question, ai_result, execute_immediately, early)
+
+        except Exception as e:
+            logger.error(f"Question processing error: {e}")
+            raise
+
+    async def aprocess_question(
+        self,
+        question: str,
+        execute_immediately: bool = False
+    ) -> QueryResponse:
+        """
+        Async process_question for the API: AI generation is awaited, and the
+        blocking database work (schema load, immediate execution) runs in a
+        worker thread.
+        """
+        try:
+            schema = self.schema_cache or await asyncio.to_thread(self.get_schema)
+            language = self._detect_language(question)
+
+            early = self._early_execution(execute_immediately)
+            ai_result = await self.sql_generator.agenerate_sql(
+                question, language=language, schema_info=schema,
+                on_sql=early.on_sql if early else None
             )
+            if execute_immediately:
+                return await asyncio.to_thread(self._build_response, question, ai_result, True, early)
+            return self._build_response(question, ai_result, False)
 
         except Exception as e:
             logger.error(f"Question processing error: {e}")
             raise
 
+    def _early_execution(self, execute_immediately: bool) -> Optional[EarlyExecution]:
+        """
+        Early execution of streamed AI SQL, when results are wanted now.
+
+        Not with the compile check on: the streamed SQL has no verdict yet,
+        and SQL the check sends back for regeneration would cost a target
+        database round trip (and an early-execution thread) for nothing.
+        Early runs are limited to QUERY_TIMEOUT_SECONDS, which bounds how
+        long a discarded one can hold its thread.
+        """
+        if (
+            execute_immediately
+            and settings.ai_streaming_enabled
+            and self.sql_generator.compile_checker is None
+        ):
+            return EarlyExecution(partial(db_manager.execute_query, timeout=settings.query_timeout_seconds))
+        return None
+
+    def _detect_language(self, question: str) -> str:
+        """Detect language (simple Hebrew detection)."""
+        language = 'he' if any(ord(char) >= 0x0590 and ord(char) <= 0x05FF for char in question) else 'en'
+        logger.info(f"Detected language: {language}")
+        return language
+
+    def _build_response(
+        self,
+        question: str,
+        ai_result: Dict[str, Any],
+        execute_immediately: bool,
+        early: Optional[EarlyExecution] = None
+    ) -> QueryResponse:
+        """
+        Classify, validate, store (and optionally execute) generated SQL.
+
+        early: execution started while the answer was streaming; its result
+        is used if it ran the final SQL and the query is a READ.
+        """
+        try:
+            return self._build_response_checked(question, ai_result, execute_immediately, early)
+        finally:
+            # Not used (failed, blocked, not a READ): drop the early run
+            if early:
+                early.discard()
+
+    def _build_response_checked(
+        self,
+        question: str,
+        ai_result: Dict[str, Any],
+        execute_immediately: bool,
+        early: Optional[EarlyExecution]
+    ) -> QueryResponse:
+        # Check if generation was successful
+        if not ai_result.get("success", False):
+            error_msg = ai_result.get("error", "Could not generate SQL")
+            raise ValueError(error_msg)
+
+        # Extract components
+        sql = ai_result.get("sql", "")
+
+        # Pattern-based generator doesn't provide these, so we'll classify them ourselves
+        query_type_str = "READ"  # Default, will be classified below
+        risk_level_str = "low"   # Default, will be classified below
+        explanation = f"Generated using {ai_result.get('method', 'pattern')} method (confidence: {ai_result.get('confidence', 0):.0%})"
+        estimated_impact = f"Pattern type: {ai_result.get('pattern_type', 'unknown')}"
+
+        # Validate and classify
+        query_type = QueryType(query_type_str)
+        risk_level = RiskLevel(risk_level_str)
+
+        # Double-check classification with our classifier
+        classified_type, classified_risk = query_classifier.classify_query(sql)
+
+        # Use higher risk level
+        if classified_risk.value in ["high", "critical"]:
+            risk_level = classified_risk
+            query_type = classified_type
+
+        # Validate query
+        is_valid, warnings = query_classifier.validate_query(sql, query_type)
+
+        if not is_valid:
+            raise ValueError(f"Invalid query: {', '.join(warnings)}")
+
+        # Generate query ID
+        query_id = str(uuid.uuid4())
+
+        # Determine if confirmation needed
+        requires_confirmation = self._requires_confirmation(query_type, risk_level)
+
+        # Store as pending query
+        self.pending_queries[query_id] = {
+            "question": question,
+            "sql": sql,
+            "query_type": query_type,
+            "risk_level": risk_level,
+            "explanation": explanation,
+            "estimated_impact": estimated_impact,
+            "warnings": warnings,
+            "generation": ai_result,
+            "timestamp": datetime.now(),
+        }
+
+        # Execute immediately if allowed
+        executed = False
+        results = None
+        row_count = None
+
+        if execute_immediately and query_type == QueryType.READ:
+            logger.info(f"Executing READ query immediately: {query_id}")
+            exec_result = self._execute_query(query_id, early)
+            if exec_result.success:
+                executed = True
+                results = exec_result.results
+                row_count = exec_result.rows_affected
+
+        # Add to history
+        self._add_to_history(query_id, executed=executed)
+
+        return QueryResponse(
+            query_id=query_id,
+            sql=sql,
+            query_type=query_type,
+            risk_level=risk_level,
+            explanation=explanation,
+            estimated_impact=estimated_impact,
+            requires_confirmation=requires_confirmation,
+            executed=executed,
+            results=results,
+            row_count=row_count,
+        )
+
     def preview_query(self, query_id: str) -> QueryPreview:
         """
         Preview affected rows for write operations.
@@ -230,12 +314,13 @@ class QueryExecutor:
 
         return result
 
-    def _execute_query(self, query_id: str) -> ExecutionResult:
+    def _execute_query(self, query_id: str, early: Optional[EarlyExecution] = None) -> ExecutionResult:
         """
         Internal method to execute query.
 
         Args:
             query_id: Query ID
+            early: Early execution of the streamed SQL (READ queries only)
 
         Returns:
             ExecutionResult
@@ -247,8 +332,9 @@ class QueryExecutor:
         try:
             # Execute based on type
             if query_type == QueryType.READ:
-                # Simple execution for reads
-                results, rows_affected, exec_time = db_manager.execute_query(sql)
+                # Simple execution for reads (possibly already run while streaming)
+                prefetched = early.result_for(sql) if early else None
+                results, rows_affected, exec_time = prefetched or db_manager.execute_query(sql)
                 success = True
                 message = f"Query executed successfully. {len(results)} rows returned."
                 can_rollback = False
@@ -260,6 +346,9 @@ class QueryExecutor:
                 message = f"Query executed successfully. {rows_affected} rows affected."
                 can_rollback = False  # Already committed
 
+            # Executed AI answers are cached and become examples for similar questions
+            self.sql_generator.record_success(query_info["question"], query_info["generation"])
+
             return ExecutionResult(
                 query_id=query_id,
                 success=success,
@@ -0,0 +1,259 @@
+"""
+Pooled access to the PostgreSQL queue database.
+
+The worker, the Teams bot and process_queue.py used to open a new psycopg2
+connection for every claim, status update, message, /status and /history -
+a TCP and authentication handshake per operation, and connection storms
+against PostgreSQL under load. QueueDB keeps a bounded pool instead:
+
+- min/max size (psycopg2 ThreadedConnectionPool, created on first use so
+  importing a module never needs the database)
+- callers beyond max wait up to acquire_timeout for a free connection
+  instead of failing at once
+- connections idle for longer than health_check_interval are checked with
+  SELECT 1 before being handed out; dead ones are replaced
+- a connection returned mid-transaction is rolled back, a broken one is
+  discarded
+- stats(): acquisitions, waits, connections opened/discarded, failed health
+  checks, in use
+
+Usage:
+    with queue_db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(...)
+        conn.commit()
+
+A LISTEN connection must not come from the pool (it is held for the
+worker's lifetime); use QueueDB.connect() for that.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+from loguru import logger
+
+
+class PoolTimeoutError(RuntimeError):
+    """No queue DB connection became free within acquire_timeout."""
+
+
+class QueueDB:
+    """
+    Bounded, health-checked connection pool for the queue database.
+
+    Args:
+        config: psycopg2.connect keyword arguments
+        minconn: Connections opened up front and kept
+        maxconn: Upper bound on open connections
+        acquire_timeout: Seconds to wait for a free connection
+        health_check_interval: Idle seconds after which a connection is
+            checked before use (0: check every time)
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        minconn: int = 1,
+        maxconn: int = 10,
+        acquire_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+    ):
+        self.config = dict(config)
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        # id(connection) -> when it was last returned (None: never used yet)
+        self._last_used: Dict[int, Optional[float]] = {}
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_ms = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.discarded = 0
+        self.health_check_failures = 0
+        self.in_use = 0
+
+    @classmethod
+    def from_settings(cls) -> "QueueDB":
+        """QueueDB configured by the QUEUE_DB_* settings."""
+        from app.config import settings
+
+        return cls(
+            {
+                "host": settings.queue_db_host,
+                "port": settings.queue_db_port,
+                "dbname": settings.queue_db_name,
+                "user": settings.queue_db_user,
+                "password": settings.queue_db_password,
+                "connect_timeout": 5,
+            },
+            minconn=settings.queue_db_pool_min,
+            maxconn=settings.queue_db_pool_max,
+            acquire_timeout=settings.queue_db_pool_timeout,
+            health_check_interval=settings.queue_db_health_check_interval,
+        )
+
+    def connect(self):
+        """A new connection outside the pool (owned by the caller)."""
+        return psycopg2.connect(**self.config)
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.config)
+                logger.info(f"Queue DB pool ready (min {self.minconn}, max {self.maxconn})")
+            return self._pool
+
+    def _count(self, name: str, amount: float = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _checkout(self, pool: ThreadedConnectionPool):
+        """A healthy connection from the pool (at most one replacement attempt)."""
+        for attempt in range(2):
+            conn = pool.getconn()
+            if id(conn) not in self._last_used:
+                self._last_used[id(conn)] = None
+                self._count("opened")
+            if self._healthy(conn):
+                return conn
+            self._count("health_check_failures")
+            self._discard(pool, conn)
+        raise psycopg2.OperationalError("Queue DB connections failed their health check")
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Queue DB connection failed health check: {e}")
+            return False
+
+    def _discard(self, pool: ThreadedConnectionPool, conn):
+        self._last_used.pop(id(conn), None)
+        self._count("discarded")
+        try:
+            pool.putconn(conn, close=True)
+        except Exception:
+            pass
+
+    def _checkin(self, pool: ThreadedConnectionPool, conn):
+        """Return a connection clean (no open transaction) or discard it."""
+        if not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(pool, conn)
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._discard(pool, conn)
+                    return
+        if conn.closed:
+            self._discard(pool, conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Borrow a connection. Commit what you want kept: an open transaction
+        is rolled back when the connection goes back to the pool.
+
+        Raises:
+            PoolTimeoutError: No connection free within acquire_timeout
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self._count("waited")
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                self._count("timeouts")
+                raise PoolTimeoutError(
+                    f"No queue DB connection free within {self.acquire_timeout}s (max {self.maxconn})"
+                )
+            self._count("wait_ms", (time.perf_counter() - start) * 1000)
+
+        try:
+            pool = self._get_pool()
+            conn = self._checkout(pool)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._count("acquired")
+        self._count("in_use")
+        try:
+            yield conn
+        finally:
+            self._count("in_use", -1)
+            try:
+                self._checkin(pool, conn)
+            finally:
+                self._slots.release()
+
+    def check(self) -> bool:
+        """True when the queue database answers."""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Queue DB unreachable: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics."""
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "in_use": self.in_use,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_ms / self.waited, 2) if self.waited else None,
+            "timeouts": self.timeouts,
+            "opened": self.opened,
+            "discarded": self.discarded,
+            "health_check_failures": self.health_check_failures,
+        }
+
+    def close(self):
+        """Close every pooled connection (the pool is recreated on next use)."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
+
+
+_shared: Optional[QueueDB] = None
+_shared_lock = threading.Lock()
+
+
+def get_queue_db() -> QueueDB:
+    """The process-wide QueueDB, configured from settings."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = QueueDB.from_settings()
+        return _shared
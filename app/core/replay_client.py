@@ -0,0 +1,347 @@
+"""
+Record/replay stand-in for the AI providers.
+
+The generation pipeline cannot be benchmarked or load-tested offline: every
+provider needs the Claude CLI or the network, and their latency varies from
+run to run. This module makes provider calls repeatable:
+
+- RecordingClient wraps a real provider client and appends each answer
+  (or error) and its latency to a JSONL fixture store.
+- ReplayClient answers from the store, with a configurable latency
+  distribution and injected failures, so the same routing, hedging and
+  fallback code runs against controlled provider behaviour.
+
+Entries are keyed by provider, normalized question and schema version (not
+the full prompt text, so a prompt wording change does not invalidate the
+recordings). Pruned schemas key by their source schema's version.
+
+Latency modes:
+    recorded   - the latency measured when recording (times latency_scale)
+    fixed      - fixed_latency seconds for every call
+    lognormal  - lognormal around the recorded (or fixed) latency as median,
+                 with shape sigma; gives a realistic slow tail
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.core.ai_provider import ASYNC_PROVIDERS, ResponseParseError, make_async_provider
+from app.utils.schema_version import schema_version
+
+
+LATENCY_MODES = ("recorded", "fixed", "lognormal")
+
+
+class ReplayMissError(LookupError):
+    """No recording for the question (strict replay)."""
+
+
+class InjectedFailureError(RuntimeError):
+    """Failure injected by ReplayClient."""
+
+
+def replay_key(provider: str, question: str, schema_info: Dict[str, Any]) -> str:
+    """Fixture key for one provider call."""
+    version = schema_info.get("source_version") or schema_version(schema_info)
+    normalized = " ".join(question.lower().split())
+    payload = f"{provider}\n{version}\n{normalized}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class FixtureStore:
+    """
+    Append-only JSONL store of recorded provider calls.
+
+    Args:
+        path: Fixture file (created on first record)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._by_provider: Dict[str, List[Dict[str, Any]]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+        logger.info(f"Loaded {len(self._entries)} AI replay fixtures from {self.path}")
+
+    def _index(self, entry: Dict[str, Any]):
+        # Later recordings of the same call replace earlier ones
+        previous = self._entries.get(entry["key"])
+        entries = self._by_provider.setdefault(entry["provider"], [])
+        if previous is not None:
+            entries.remove(previous)
+        entries.append(entry)
+        self._entries[entry["key"]] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def providers(self) -> List[str]:
+        """Providers with recordings, in first-recorded order."""
+        return list(self._by_provider)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def entries(self, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded entries (of one provider, or all)."""
+        if provider is not None:
+            return list(self._by_provider.get(provider, []))
+        return list(self._entries.values())
+
+    def record(self, entry: Dict[str, Any]):
+        """Append an entry to the file and the index."""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index(entry)
+
+
+class RecordingClient:
+    """
+    Wraps a provider client and records its answers and latencies.
+
+    Other attributes (model, caches_schema_prefix, usage_stats, ...) are
+    those of the wrapped client.
+    """
+
+    def __init__(self, client: Any, store: FixtureStore, provider: str):
+        self.client = client
+        self.store = store
+        self.provider = provider
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def start(self, question: str, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+        """New fixture entry for a call that is starting."""
+        return {
+            "key": replay_key(self.provider, question, schema_info),
+            "provider": self.provider,
+            "question": question,
+            "recorded_at": time.time(),
+            "_start": time.perf_counter(),
+        }
+
+    def finish(self, entry: Dict[str, Any], result: Any = None, error: Optional[BaseException] = None):
+        """Record the call's latency and outcome."""
+        entry["latency"] = round(time.perf_counter() - entry.pop("_start"), 4)
+        if error is not None:
+            entry["error"] = {"type": type(error).__name__, "message": str(error)[:500]}
+        else:
+            entry["response"] = result
+        self.store.record(entry)
+
+    def generate_sql(self, question: str, schema_info: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Call the wrapped client and record the outcome."""
+        entry = self.start(question, schema_info)
+        try:
+            result = self.client.generate_sql(question, schema_info, **kwargs)
+        except Exception as e:
+            self.finish(entry, error=e)
+            raise
+        self.finish(entry, result)
+        return result
+
+    def explain_query(self, sql: str) -> str:
+        return self.client.explain_query(sql)
+
+
+class ReplayClient:
+    """
+    Provider stand-in that answers from recordings.
+
+    Args:
+        store: Recorded calls
+        provider: Whose recordings to replay (and the name used in keys)
+        latency: "recorded", "fixed" or "lognormal"
+        fixed_latency: Seconds per call in fixed mode (lognormal median
+            when an entry has no recorded latency)
+        sigma: Lognormal shape (0.5 -> p95 is about 2.3x the median)
+        latency_scale: Multiplier on every replayed latency (0 = no sleep)
+        failure_rate: Probability of an injected provider error
+        parse_failure_rate: Probability of an injected invalid-JSON answer
+        strict: Raise ReplayMissError for unrecorded questions; otherwise
+            the provider's recordings are replayed round-robin
+        seed: Random seed for latencies and failures (repeatable runs)
+    """
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        provider: str = "replay",
+        latency: str = "recorded",
+        fixed_latency: float = 1.0,
+        sigma: float = 0.5,
+        latency_scale: float = 1.0,
+        failure_rate: float = 0.0,
+        parse_failure_rate: float = 0.0,
+        strict: bool = False,
+        seed: Optional[int] = None,
+    ):
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Unknown replay latency mode '{latency}' (expected one of {', '.join(LATENCY_MODES)})")
+        self.store = store
+        self.provider = provider
+        self.latency = latency
+        self.fixed_latency = fixed_latency
+        self.sigma = sigma
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.parse_failure_rate = parse_failure_rate
+        self.strict = strict
+        # Per-provider stream, so providers sharing a seed are not in lockstep
+        self._random = random.Random(None if seed is None else f"{seed}:{provider}")
+        self._lock = threading.Lock()
+        self._cursor = 0
+
+    @classmethod
+    def from_settings(cls, store: FixtureStore, provider: str = "replay") -> "ReplayClient":
+        """ReplayClient configured by the AI_REPLAY_* settings."""
+        return cls(
+            store,
+            provider=provider,
+            latency=settings.ai_replay_latency,
+            fixed_latency=settings.ai_replay_fixed_latency,
+            sigma=settings.ai_replay_latency_sigma,
+            latency_scale=settings.ai_replay_latency_scale,
+            failure_rate=settings.ai_replay_failure_rate,
+            parse_failure_rate=settings.ai_replay_parse_failure_rate,
+            strict=settings.ai_replay_strict,
+            seed=settings.ai_replay_seed,
+        )
+
+    def _entry(self, question: str, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self.store.get(replay_key(self.provider, question, schema_info))
+        if entry is not None:
+            return entry
+        if self.strict:
+            raise ReplayMissError(f"No {self.provider} recording for question: {question[:80]}")
+
+        entries = self.store.entries(self.provider) or self.store.entries()
+        if not entries:
+            raise ReplayMissError(f"No recordings in {self.store.path}")
+        with self._lock:
+            entry = entries[self._cursor % len(entries)]
+            self._cursor += 1
+        return entry
+
+    def plan(self, question: str, schema_info: Dict[str, Any]):
+        """
+        Decide one call: (delay seconds, entry, injected error or None).
+        Shared by the sync and async clients.
+        """
+        entry = self._entry(question, schema_info)
+        recorded = entry.get("latency")
+        with self._lock:
+            if self.latency == "fixed" or recorded is None:
+                base = self.fixed_latency
+            else:
+                base = recorded
+            if self.latency == "lognormal":
+                base = base * math.exp(self._random.gauss(0.0, self.sigma))
+            roll = self._random.random()
+
+        error: Optional[Exception] = None
+        if roll < self.failure_rate:
+            error = InjectedFailureError(f"Injected {self.provider} failure")
+        elif roll < self.failure_rate + self.parse_failure_rate:
+            error = ResponseParseError(f"Injected {self.provider} invalid JSON")
+        return base * self.latency_scale, entry, error
+
+    @staticmethod
+    def outcome(entry: Dict[str, Any], error: Optional[Exception]) -> Dict[str, Any]:
+        """Replayed result, or the injected / recorded error raised."""
+        if error is not None:
+            raise error
+        if "error" in entry:
+            raise RuntimeError(f"Replayed {entry['error']['type']}: {entry['error']['message']}")
+        return dict(entry["response"])
+
+    def generate_sql(self, question: str, schema_info: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Replay the recorded answer after the configured latency."""
+        delay, entry, error = self.plan(question, schema_info)
+        if delay > 0:
+            time.sleep(delay)
+        return self.outcome(entry, error)
+
+    def explain_query(self, sql: str) -> str:
+        return f"Replayed {self.provider} answer"
+
+
+class AsyncReplayClient:
+    """Async replay provider (asyncio.sleep for the latency)."""
+
+    def __init__(self, client: ReplayClient, max_concurrency: Optional[int] = None):
+        self.client = client
+        self.name = client.provider
+
+    async def generate_sql(self, question: str, schema_info: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        delay, entry, error = self.client.plan(question, schema_info)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.client.outcome(entry, error)
+
+    async def explain_query(self, sql: str) -> str:
+        return self.client.explain_query(sql)
+
+
+class AsyncRecordingClient:
+    """Async counterpart of RecordingClient (records the wrapped async provider)."""
+
+    def __init__(self, client: RecordingClient, max_concurrency: Optional[int] = None):
+        self.client = client
+        self.inner = make_async_provider(client.client)
+        if self.inner is None:
+            raise ValueError(f"No async provider for {type(client.client).__name__}")
+        self.name = self.inner.name
+
+    async def generate_sql(self, question: str, schema_info: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        entry = self.client.start(question, schema_info)
+        try:
+            result = await self.inner.generate_sql(question, schema_info, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled call (lost hedge race) says nothing about the provider
+            raise
+        except Exception as e:
+            self.client.finish(entry, error=e)
+            raise
+        self.client.finish(entry, result)
+        return result
+
+    async def explain_query(self, sql: str) -> str:
+        return await self.inner.explain_query(sql)
+
+
+ASYNC_PROVIDERS[ReplayClient.__name__] = AsyncReplayClient
+ASYNC_PROVIDERS[RecordingClient.__name__] = AsyncRecordingClient
+
+
+def replay_providers(store: FixtureStore) -> Dict[str, ReplayClient]:
+    """
+    One ReplayClient per recorded provider, under the provider's name, so
+    routing and fallback run as they would live. An empty store gives a
+    single "replay" provider.
+    """
+    names = store.providers() or ["replay"]
+    return {name: ReplayClient.from_settings(store, provider=name) for name in names}
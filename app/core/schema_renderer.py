@@ -0,0 +1,155 @@
+"""
+Shared schema prompt renderer.
+
+Every AI client used to rebuild the schema text from the schema dict on
+every call. The renderer does it once per schema version and style:
+
+- Per-table fragments are cached per (schema version, style). A table's
+  text depends only on the version, so any subset of tables - the pruned
+  schema of one question - is a join of cached fragments.
+- The joined text is cached per (version, style, table names), so repeat
+  prompts over the same (pruned) schema cost a dict lookup.
+
+Pruned schemas (SchemaPruner.prune) carry their full schema's version as
+"source_version", so they share the full schema's fragments.
+
+Styles:
+    verbose  - one line per column, "(PRIMARY KEY)" markers, FK section
+    compact  - DDL-like, one line per table: Name(Col type PK, Col type NULL)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.cache import LRUCache
+from app.utils.schema_version import schema_version
+
+
+STYLES = ("verbose", "compact")
+
+
+def _render_table_verbose(table: Dict[str, Any]) -> str:
+    lines = [f"\nTable: {table['name']}", "  Columns:"]
+    for col in table.get("columns", []):
+        pk_marker = " (PRIMARY KEY)" if col.get("primary_key") else ""
+        nullable = "NULL" if col.get("nullable") else "NOT NULL"
+        lines.append(f"    - {col['name']}: {col['type']} {nullable}{pk_marker}")
+
+    if table.get("foreign_keys"):
+        lines.append("  Foreign Keys:")
+        for fk in table["foreign_keys"]:
+            fk_cols = ", ".join(fk["columns"])
+            ref_cols = ", ".join(fk["referred_columns"])
+            lines.append(f"    - {fk_cols} -> {fk['referred_table']}({ref_cols})")
+    return "\n".join(lines)
+
+
+def _render_table_compact(table: Dict[str, Any]) -> str:
+    columns = []
+    for col in table.get("columns", []):
+        text = f"{col['name']} {col['type']}"
+        if col.get("primary_key"):
+            text += " PK"
+        elif col.get("nullable"):
+            text += " NULL"
+        columns.append(text)
+
+    lines = [f"{table['name']}({', '.join(columns)})"]
+    for fk in table.get("foreign_keys", []):
+        lines.append(
+            f"  FK ({', '.join(fk['columns'])}) -> "
+            f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+        )
+    return "\n".join(lines)
+
+
+def _render_views(views: List[Any], style: str) -> str:
+    if style == "compact":
+        return "Views: " + ", ".join(str(view) for view in views)
+    return "\nViews:\n" + "\n".join(f"  - {view}" for view in views)
+
+
+_TABLE_RENDERERS = {
+    "verbose": _render_table_verbose,
+    "compact": _render_table_compact,
+}
+
+
+class SchemaRenderer:
+    """
+    Memoized schema -> prompt text renderer.
+
+    Args:
+        max_versions: (version, style) fragment sets kept
+        max_texts: Rendered texts kept (full schema + pruned subsets)
+    """
+
+    def __init__(self, max_versions: int = 8, max_texts: int = 256):
+        self._fragments = LRUCache(maxsize=max_versions)
+        self._texts = LRUCache(maxsize=max_texts)
+
+    def render(
+        self,
+        schema_info: Dict[str, Any],
+        style: str = "compact",
+        tables: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Render schema_info as prompt text.
+
+        Args:
+            schema_info: Schema (DatabaseManager.get_schema_info format),
+                full or pruned
+            style: "verbose" or "compact"
+            tables: Only render these tables (pruned subset; default: all
+                tables in schema_info)
+
+        Returns:
+            Schema text for the prompt
+        """
+        if style not in _TABLE_RENDERERS:
+            raise ValueError(f"Unknown schema style '{style}' (expected one of {', '.join(STYLES)})")
+
+        version = schema_info.get("source_version") or schema_version(schema_info)
+        selected = schema_info.get("tables", [])
+        if tables is not None:
+            wanted = set(tables)
+            selected = [table for table in selected if table["name"] in wanted]
+        names = tuple(table["name"] for table in selected)
+
+        key: Tuple = (version, style, names)
+        text = self._texts.get(key)
+        if text is not None:
+            return text
+
+        fragments = self._fragments.get_or_compute((version, style), dict)
+        render_table = _TABLE_RENDERERS[style]
+        parts = []
+        for table in selected:
+            fragment = fragments.get(table["name"])
+            if fragment is None:
+                fragment = fragments[table["name"]] = render_table(table)
+            parts.append(fragment)
+
+        if schema_info.get("views"):
+            parts.append(_render_views(schema_info["views"], style))
+
+        text = "\n".join(parts)
+        self._texts.put(key, text)
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for rendered texts and fragment sets."""
+        return {"texts": self._texts.stats(), "fragments": self._fragments.stats()}
+
+    def clear(self):
+        """Drop all cached renderings."""
+        self._fragments.clear()
+        self._texts.clear()
+
+
+# Global schema renderer instance (shared by all AI clients)
+schema_renderer = SchemaRenderer()
+
+
+def render_schema(schema_info: Dict[str, Any], style: str = "compact", tables: Optional[List[str]] = None) -> str:
+    """Render schema_info with the shared renderer."""
+    return schema_renderer.render(schema_info, style, tables)
@@ -0,0 +1,398 @@
+"""
+T-SQL lexer shared by query classification, validation and impact estimation.
+
+Tokenizes a statement once so that every analysis works on the same token
+stream instead of re-scanning upper-cased text with ad-hoc regexes. String
+literals, bracketed/quoted identifiers, comments (including nested block
+comments) and CTE prefixes are understood, so a keyword only counts when it
+is actually a keyword - "WHERE" inside a string or "UPDATE" inside
+LastUpdated no longer trip the checks.
+"""
+import re
+from enum import Enum
+from typing import List, NamedTuple, Optional, Sequence, Set
+
+
+class TokenType(str, Enum):
+    """Lexical token categories."""
+    KEYWORD = "keyword"
+    IDENTIFIER = "identifier"
+    QUOTED_IDENTIFIER = "quoted_identifier"
+    STRING = "string"
+    NUMBER = "number"
+    VARIABLE = "variable"
+    OPERATOR = "operator"
+    PUNCTUATION = "punctuation"
+    COMMENT = "comment"
+
+
+class Token(NamedTuple):
+    """A single lexical token."""
+    type: TokenType
+    value: str
+    position: int
+
+    @property
+    def upper(self) -> str:
+        """Upper-cased token text (used for keyword comparisons)."""
+        return self.value.upper()
+
+    def is_keyword(self, *names: str) -> bool:
+        """Check whether this token is one of the given keywords."""
+        return self.type == TokenType.KEYWORD and (not names or self.value.upper() in names)
+
+
+# T-SQL reserved words (plus a few common non-reserved statement words).
+# Anything else that looks like a word is treated as an identifier.
+KEYWORDS = frozenset("""
+    ADD ALL ALTER AND ANY AS ASC AUTHORIZATION BACKUP BEGIN BETWEEN BREAK BROWSE
+    BULK BY CASCADE CASE CHECK CHECKPOINT CLOSE CLUSTERED COALESCE COLLATE COLUMN
+    COMMIT COMPUTE CONSTRAINT CONTAINS CONTAINSTABLE CONTINUE CONVERT CREATE CROSS
+    CURRENT CURSOR DATABASE DBCC DEALLOCATE DECLARE DEFAULT DELETE DENY DESC
+    DESCRIBE DISK DISTINCT DISTRIBUTED DROP DUMP ELSE END ERRLVL ESCAPE EXCEPT EXEC
+    EXECUTE EXISTS EXIT EXPLAIN EXTERNAL FETCH FILE FILLFACTOR FOR FOREIGN FREETEXT
+    FREETEXTTABLE FROM FULL FUNCTION GOTO GRANT GROUP HAVING HOLDLOCK IDENTITY
+    IDENTITY_INSERT IDENTITYCOL IF IN INDEX INNER INSERT INTERSECT INTO IS JOIN KEY
+    KILL LEFT LIKE LINENO LOAD MERGE NATIONAL NOCHECK NONCLUSTERED NOT NULL NULLIF
+    OF OFF OFFSET OFFSETS ON OPEN OPENDATASOURCE OPENQUERY OPENROWSET OPENXML
+    OPTION OR ORDER OUTER OVER PERCENT PIVOT PLAN PRIMARY PRINT PROC PROCEDURE
+    PUBLIC RAISERROR READ READTEXT RECONFIGURE REFERENCES REPLICATION RESTORE
+    RESTRICT RETURN REVERT REVOKE RIGHT ROLLBACK ROWCOUNT ROWGUIDCOL RULE SAVE
+    SCHEMA SELECT SET SETUSER SHOW SHUTDOWN SOME STATISTICS TABLE TABLESAMPLE
+    TEXTSIZE THEN TO TOP TRAN TRANSACTION TRIGGER TRUNCATE TRY_CONVERT TSEQUAL
+    UNION UNIQUE UNPIVOT UPDATE UPDATETEXT USE USER VALUES VARYING VIEW WAITFOR
+    WHEN WHERE WHILE WITH WRITETEXT
+""".split())
+
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<ws>\s+)
+    | (?P<line_comment>--[^\r\n]*)
+    | (?P<block_comment>/\*)
+    | (?P<string>[Nn]?'(?:[^']|'')*(?:'|\Z))
+    | (?P<bracket>\[(?:[^\]]|\]\])*(?:\]|\Z))
+    | (?P<dquote>"(?:[^"]|"")*(?:"|\Z))
+    | (?P<variable>@@?[\w@$#]+)
+    | (?P<temp>\#{1,2}[\w@$#]+)
+    | (?P<number>0[xX][0-9A-Fa-f]*|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<word>[^\W\d][\w@$#]*)
+    | (?P<operator><>|!=|>=|<=|!<|!>|\+=|-=|\*=|/=|%=|&=|\^=|\|=|::|[=<>+\-*/%&|^~!])
+    | (?P<punct>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_BLOCK_COMMENT_RE = re.compile(r"/\*|\*/")
+
+
+def _block_comment_end(sql: str, start: int) -> int:
+    """Return the index just past a (possibly nested) block comment."""
+    depth = 0
+    for match in _BLOCK_COMMENT_RE.finditer(sql, start):
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return match.end()
+    return len(sql)
+
+
+def tokenize(sql: str) -> List[Token]:
+    """
+    Tokenize a T-SQL batch in a single pass.
+
+    Whitespace is dropped; comments are kept as COMMENT tokens so callers
+    can report them, and are ignored by the analysis helpers below.
+
+    Args:
+        sql: SQL text
+
+    Returns:
+        List of tokens in source order
+    """
+    tokens: List[Token] = []
+    pos = 0
+    length = len(sql)
+    previous: Optional[Token] = None
+
+    while pos < length:
+        match = _TOKEN_RE.match(sql, pos)
+        kind = match.lastgroup
+        end = match.end()
+
+        if kind == "ws":
+            pos = end
+            continue
+
+        if kind == "block_comment":
+            end = _block_comment_end(sql, pos)
+            token = Token(TokenType.COMMENT, sql[pos:end], pos)
+        elif kind == "line_comment":
+            token = Token(TokenType.COMMENT, match.group(), pos)
+        elif kind == "string":
+            token = Token(TokenType.STRING, match.group(), pos)
+        elif kind in ("bracket", "dquote"):
+            token = Token(TokenType.QUOTED_IDENTIFIER, match.group(), pos)
+        elif kind == "variable":
+            token = Token(TokenType.VARIABLE, match.group(), pos)
+        elif kind == "temp":
+            token = Token(TokenType.IDENTIFIER, match.group(), pos)
+        elif kind == "number":
+            token = Token(TokenType.NUMBER, match.group(), pos)
+        elif kind == "word":
+            word = match.group()
+            # A word right after "." is a member name (t.[Order], dbo.Update)
+            after_dot = previous is not None and previous.value == "."
+            if word.upper() in KEYWORDS and not after_dot:
+                token = Token(TokenType.KEYWORD, word, pos)
+            else:
+                token = Token(TokenType.IDENTIFIER, word, pos)
+        elif kind == "operator":
+            token = Token(TokenType.OPERATOR, match.group(), pos)
+        else:
+            token = Token(TokenType.PUNCTUATION, match.group(), pos)
+
+        tokens.append(token)
+        if token.type != TokenType.COMMENT:
+            previous = token
+        pos = end
+
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Token stream helpers
+# ---------------------------------------------------------------------------
+
+def code_tokens(tokens: Sequence[Token]) -> List[Token]:
+    """Drop comment tokens."""
+    return [t for t in tokens if t.type != TokenType.COMMENT]
+
+
+# Keywords that begin a statement. T-SQL does not require semicolons, so
+# "SELECT 1 DELETE FROM t" is two statements.
+STATEMENT_KEYWORDS = frozenset([
+    "SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "EXEC", "EXECUTE",
+    "DROP", "ALTER", "CREATE", "TRUNCATE",
+])
+
+# A statement keyword right after one of these continues the current
+# statement: UNION SELECT, MERGE ... THEN DELETE, CREATE VIEW v AS SELECT,
+# cursor FOR SELECT, trigger FOR INSERT, UPDATE and INSTEAD OF DELETE.
+_CONTINUING_PREDECESSORS = frozenset([
+    "UNION", "ALL", "EXCEPT", "INTERSECT", "THEN", "AS", "FOR", "OF", ",",
+])
+
+
+def _continues_statement(main: str, keyword: str, previous: Token, insert_open: bool) -> bool:
+    """Check whether a top-level statement keyword belongs to the current statement."""
+    if previous.upper in _CONTINUING_PREDECESSORS:
+        return True
+    if previous.upper in ("ON", "AFTER") and main in ("CREATE", "ALTER"):
+        # ON DELETE CASCADE, trigger AFTER INSERT - but SET NOCOUNT ON DELETE splits
+        return True
+    if main in ("GRANT", "REVOKE", "DENY"):
+        # GRANT SELECT, INSERT ON t TO u
+        return True
+    if main == "ALTER" and keyword in ("ALTER", "DROP"):
+        # ALTER TABLE t ALTER COLUMN / DROP COLUMN
+        return True
+    # INSERT INTO t SELECT ... / INSERT INTO t EXEC p
+    return insert_open and keyword in ("SELECT", "EXEC", "EXECUTE")
+
+
+def split_statements(tokens: Sequence[Token]) -> List[List[Token]]:
+    """
+    Split a token stream into statements.
+
+    A statement ends at a top-level semicolon or where a new one begins: a
+    statement keyword (see STATEMENT_KEYWORDS) at nesting depth 0 that does
+    not continue the current statement. Keywords inside parentheses
+    (subqueries, CTE bodies) never split, and neither do the main statement
+    of a CTE, the source of an INSERT, set operators or MERGE actions.
+    """
+    statements: List[List[Token]] = []
+    current: List[Token] = []
+    depth = 0
+    main = ""  # main operation of the current statement once known
+    insert_open = False  # INSERT whose row source has not been seen yet
+
+    for token in tokens:
+        if token.type == TokenType.COMMENT:
+            continue
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth = max(depth - 1, 0)
+        elif token.value == ";" and depth == 0:
+            if current:
+                statements.append(current)
+            current = []
+            main = ""
+            insert_open = False
+            continue
+        elif depth == 0 and token.type == TokenType.KEYWORD:
+            keyword = token.upper
+            if (
+                keyword in STATEMENT_KEYWORDS
+                and main
+                and not _continues_statement(main, keyword, current[-1], insert_open)
+            ):
+                statements.append(current)
+                current = []
+                main = ""
+                insert_open = False
+
+            if not main and keyword != "WITH" and not (current and keyword == "AS"):
+                # First keyword, or the statement after a CTE's definitions
+                main = keyword
+                insert_open = keyword == "INSERT"
+            elif insert_open and keyword in ("SELECT", "EXEC", "EXECUTE", "VALUES", "DEFAULT"):
+                insert_open = False
+        elif not main and not current:
+            # Statement starting with a non-keyword (e.g. a procedure name)
+            main = token.upper
+        current.append(token)
+
+    if current:
+        statements.append(current)
+    return statements
+
+
+def first_keyword(tokens: Sequence[Token]) -> str:
+    """Return the first significant word of a statement, upper-cased."""
+    for token in tokens:
+        if token.type in (TokenType.KEYWORD, TokenType.IDENTIFIER):
+            return token.upper
+    return ""
+
+
+def statement_keyword(tokens: Sequence[Token]) -> str:
+    """
+    Return the keyword of the statement's main operation.
+
+    For a CTE (WITH a AS (...), b AS (...) <stmt>) this skips the CTE
+    definitions and returns the keyword of <stmt>, so a CTE that feeds a
+    DELETE is not mistaken for a read.
+    """
+    statement = code_tokens(tokens)
+    leading = first_keyword(statement)
+    if leading != "WITH":
+        return leading
+
+    depth = 0
+    for token in statement[1:]:
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth -= 1
+        elif depth == 0 and token.type == TokenType.KEYWORD and token.upper != "AS":
+            return token.upper
+    return leading
+
+
+def keyword_set(tokens: Sequence[Token]) -> Set[str]:
+    """Return the set of keywords that appear anywhere in the stream."""
+    return {t.upper for t in tokens if t.type == TokenType.KEYWORD}
+
+
+def find_keyword(tokens: Sequence[Token], keyword: str, start: int = 0) -> int:
+    """Return the index of the next occurrence of keyword, or -1."""
+    for index in range(start, len(tokens)):
+        if tokens[index].is_keyword(keyword):
+            return index
+    return -1
+
+
+def clause_tokens(
+    tokens: Sequence[Token],
+    keyword: str,
+    terminators: Sequence[str] = ("ORDER", "GROUP", "HAVING", "UNION", "EXCEPT", "INTERSECT", "OPTION"),
+) -> Optional[List[Token]]:
+    """
+    Return the tokens of the first top-level clause introduced by keyword.
+
+    The clause ends at a terminator keyword or at a closing parenthesis of
+    the enclosing level. Returns None if the clause is absent.
+    """
+    statement = code_tokens(tokens)
+    depth = 0
+    start = None
+
+    for index, token in enumerate(statement):
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth -= 1
+        elif depth == 0 and token.is_keyword(keyword):
+            start = index + 1
+            break
+
+    if start is None:
+        return None
+
+    clause: List[Token] = []
+    depth = 0
+    for token in statement[start:]:
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            if depth == 0:
+                break
+            depth -= 1
+        elif depth == 0 and token.type == TokenType.KEYWORD and token.upper in terminators:
+            break
+        clause.append(token)
+    return clause
+
+
+def object_name(tokens: Sequence[Token], start: int) -> Optional[str]:
+    """
+    Read a (possibly multi-part, bracketed) object name starting at start.
+
+    Returns e.g. "dbo.Companies" for [dbo].[Companies], or None if no name
+    starts at that position.
+    """
+    parts: List[str] = []
+    index = start
+    while index < len(tokens):
+        token = tokens[index]
+        if token.type == TokenType.IDENTIFIER:
+            parts.append(token.value)
+        elif token.type == TokenType.QUOTED_IDENTIFIER:
+            parts.append(token.value[1:-1].replace("]]", "]").replace('""', '"'))
+        else:
+            break
+        if index + 1 < len(tokens) and tokens[index + 1].value == ".":
+            index += 2
+            continue
+        break
+    return ".".join(parts) if parts else None
+
+
+# Keywords that make a statement something other than a plain read
+WRITE_KEYWORDS = frozenset([
+    "UPDATE", "DELETE", "INSERT", "DROP", "CREATE", "ALTER",
+    "TRUNCATE", "EXEC", "EXECUTE", "MERGE", "GRANT", "REVOKE",
+])
+
+
+def is_read_only(sql: str) -> bool:
+    """
+    Check that SQL is a single read-only SELECT (optionally behind a CTE).
+
+    Every statement in the batch must be a SELECT and no write keyword may
+    appear as a keyword anywhere - identifiers such as LastUpdated and
+    string literals such as 'DELETE' are fine.
+    """
+    if not sql or not sql.strip():
+        return False
+
+    tokens = tokenize(sql)
+    statements = split_statements(tokens)
+    if not statements:
+        return False
+
+    for statement in statements:
+        if statement_keyword(statement) != "SELECT":
+            return False
+
+    return not (keyword_set(tokens) & WRITE_KEYWORDS)
@@ -0,0 +1,339 @@
+"""
+Write-behind batching of sql_queue status updates.
+
+Every finished job used to write its outcome with its own UPDATE and
+COMMIT, so at high job rates the workers spent their time waiting on
+commit latency (and the audit trigger fired once per row). StatusBatcher
+collects status transitions from all worker threads and writes them as one
+multi-row statement per flush:
+
+    UPDATE sql_queue AS q
+    SET status = v.status, rows_affected = v.rows_affected, completed_at = NOW()
+    FROM (VALUES (%s::integer, %s::varchar, %s::integer), ...) AS v(key, status, rows_affected)
+    WHERE q.id = v.key
+
+A flush happens when max_batch updates are waiting or the oldest has
+waited max_delay seconds, whichever comes first; one commit covers the
+whole batch (group commit).
+
+Durability:
+- submit() returns as soon as the update is queued in memory. It is durable
+  once the Future it returns has completed without an exception - wait on
+  it before anything that must not happen twice (e.g. notifying the user).
+- flush() and close() write everything queued and wait for it.
+- A process that dies loses the updates not yet flushed (at most max_delay
+  seconds' worth). Those jobs are still 'processing' under the dead
+  worker's lease; once it expires the reaper returns them to the queue
+  (see leases in job_queue.py) and they are run again, SQL included.
+  Delivery is at-least-once, with QUEUE_MAX_ATTEMPTS bounding the
+  retries; an outcome is never recorded for a job that did not finish.
+- If a flush fails, the whole batch is rolled back and every Future in it
+  gets the exception; nothing is retried automatically.
+- With an owner, only rows still claimed by that worker are written (see
+  leases in job_queue.py) and each Future resolves to whether its job's
+  row was updated; without one they resolve to None.
+- Several updates to one job within a batch are merged (later values win;
+  the audit log then sees one transition). Batches are committed in the
+  order they were taken.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+# SQL type of each column that can be written (VALUES needs explicit types;
+# anything else is rejected, since column names are part of the statement)
+COLUMN_TYPES = {
+    "id": "integer",
+    "job_id": "uuid",
+    "status": "varchar",
+    "sql_query": "text",
+    "query_type": "varchar",
+    "risk_level": "varchar",
+    "execution_allowed": "boolean",
+    "query_results": "jsonb",
+    "rows_affected": "integer",
+    "execution_time_ms": "integer",
+    "natural_language_response": "text",
+    "error_message": "text",
+    "error_type": "varchar",
+}
+
+
+class _Pending:
+    """Merged updates of one job waiting for the next flush."""
+
+    __slots__ = ("values", "now_columns", "expressions", "futures")
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.now_columns: set = set()
+        self.expressions: Dict[str, str] = {}
+        self.futures: List[Future] = []
+
+    def signature(self) -> Tuple:
+        """Updates with the same signature share one statement."""
+        return (
+            tuple(sorted(self.values)),
+            tuple(sorted(self.now_columns)),
+            tuple(sorted(self.expressions.items())),
+        )
+
+
+def build_update(
+    key_column: str,
+    rows: List[Tuple[Any, Dict[str, Any]]],
+    now_columns: Iterable[str] = (),
+    expressions: Optional[Dict[str, str]] = None,
+    owner: Optional[str] = None,
+) -> Tuple[str, List[Any]]:
+    """
+    Multi-row UPDATE of sql_queue for rows with the same columns.
+
+    Args:
+        key_column: Column identifying the row ("id" or "job_id")
+        rows: (key, {column: value}) pairs, all with the same columns
+        now_columns: Columns set to NOW()
+        expressions: Columns set to a SQL expression (trusted, not parameters)
+        owner: Only update rows claimed by this worker, RETURNING their keys
+
+    Returns:
+        (sql, params)
+    """
+    columns = sorted(rows[0][1])
+    for column in [key_column, *columns]:
+        if column not in COLUMN_TYPES:
+            raise ValueError(f"Unknown sql_queue column for batched update: {column}")
+
+    assignments = [f"{column} = v.{column}" for column in columns]
+    assignments += [f"{column} = NOW()" for column in sorted(now_columns)]
+    assignments += [f"{column} = {expression}" for column, expression in sorted((expressions or {}).items())]
+
+    placeholders = ", ".join(f"%s::{COLUMN_TYPES[column]}" for column in [key_column, *columns])
+    values_sql = ",\n           ".join(f"({placeholders})" for _ in rows)
+    params: List[Any] = []
+    for key, values in rows:
+        params.append(key)
+        params.extend(values[column] for column in columns)
+
+    sql = (
+        f"UPDATE sql_queue AS q\n"
+        f"SET {', '.join(assignments)}\n"
+        f"FROM (VALUES {values_sql}) AS v(key, {', '.join(columns)})\n"
+        f"WHERE q.{key_column} = v.key"
+    )
+    if owner is not None:
+        sql += f" AND q.claimed_by = %s\nRETURNING q.{key_column}"
+        params.append(owner)
+    return sql, params
+
+
+class StatusBatcher:
+    """
+    Groups status updates from many jobs into few statements and commits.
+
+    Args:
+        queue_db: QueueDB to write through
+        key_column: Column the submitted keys refer to ("id" or "job_id")
+        max_batch: Queued updates that trigger a flush
+        max_delay: Seconds the oldest queued update may wait
+        owner: Only write jobs still claimed by this worker (claimed_by)
+    """
+
+    def __init__(
+        self,
+        queue_db,
+        key_column: str = "id",
+        max_batch: int = 100,
+        max_delay: float = 0.005,
+        owner: Optional[str] = None
+    ):
+        if key_column not in COLUMN_TYPES:
+            raise ValueError(f"Unknown sql_queue key column: {key_column}")
+        self.queue_db = queue_db
+        self.key_column = key_column
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.owner = owner
+
+        self._pending: Dict[Any, _Pending] = {}
+        self._oldest: Optional[float] = None
+        self._closed = False
+        self._condition = threading.Condition()
+        # Serializes taking and writing batches (flush thread and flush()),
+        # so batches are committed in the order they were taken
+        self._write_lock = threading.Lock()
+
+        self.flushes = 0
+        self.statements = 0
+        self.rows = 0
+        self.failures = 0
+        self.not_owned = 0
+        self.flush_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="status-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        key: Any,
+        values: Dict[str, Any],
+        now_columns: Iterable[str] = (),
+        expressions: Optional[Dict[str, str]] = None,
+    ) -> Future:
+        """
+        Queue an update of one job.
+
+        Args:
+            key: The job's key_column value
+            values: Columns to set (None values are left out: the column
+                keeps its current value)
+            now_columns: Columns to set to NOW()
+            expressions: Columns to set to a SQL expression
+
+        Returns:
+            Future completed when the update is committed (with an owner:
+            True if the job was still ours and was updated)
+        """
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("StatusBatcher is closed")
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending()
+            pending.values.update({column: value for column, value in values.items() if value is not None})
+            pending.now_columns.update(now_columns)
+            pending.expressions.update(expressions or {})
+            pending.futures.append(future)
+            if self._oldest is None:
+                # Start of a batch: the flush thread starts its max_delay timer
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            elif len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return future
+
+    def _due(self) -> bool:
+        return bool(self._pending) and (
+            self._closed
+            or len(self._pending) >= self.max_batch
+            or time.monotonic() - self._oldest >= self.max_delay
+        )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due():
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0.0, self.max_delay - (time.monotonic() - self._oldest))
+                    self._condition.wait(timeout)
+            self.flush()
+
+    def _write(self, batch: Dict[Any, _Pending]):
+        if not batch:
+            return
+        groups: Dict[Tuple, List[Tuple[Any, _Pending]]] = {}
+        for key, pending in batch.items():
+            groups.setdefault(pending.signature(), []).append((key, pending))
+
+        futures = [future for pending in batch.values() for future in pending.futures]
+        updated = set()
+        skipped = set()
+        start = time.perf_counter()
+        try:
+            with self.queue_db.connection() as conn:
+                with conn.cursor() as cur:
+                    for entries in groups.values():
+                        first = entries[0][1]
+                        if not (first.values or first.now_columns or first.expressions):
+                            skipped.update(str(key) for key, _ in entries)
+                            continue  # nothing to set
+                        if not first.values:
+                            # Only NOW()/expression columns: no VALUES list needed
+                            sql, params = self._keys_only_update(entries, first)
+                        else:
+                            sql, params = build_update(
+                                self.key_column,
+                                [(key, pending.values) for key, pending in entries],
+                                first.now_columns,
+                                first.expressions,
+                                self.owner,
+                            )
+                        cur.execute(sql, params)
+                        if self.owner is not None:
+                            updated.update(str(row[0]) for row in cur.fetchall())
+                conn.commit()
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Batched status update of {len(batch)} job(s) failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        self.flushes += 1
+        self.statements += len(groups)
+        self.rows += len(batch)
+        self.flush_ms += (time.perf_counter() - start) * 1000
+        if self.owner is None:
+            for future in futures:
+                future.set_result(None)
+            return
+        for key, pending in batch.items():
+            if str(key) in skipped:
+                owned = None
+            else:
+                owned = str(key) in updated
+            if owned is False:
+                self.not_owned += 1
+                logger.warning(f"Job {key} is no longer claimed by {self.owner} (lease expired); update skipped")
+            for future in pending.futures:
+                future.set_result(owned)
+
+    def _keys_only_update(self, entries, first: _Pending) -> Tuple[str, List[Any]]:
+        assignments = [f"{column} = NOW()" for column in sorted(first.now_columns)]
+        assignments += [f"{column} = {expression}" for column, expression in sorted(first.expressions.items())]
+        key_type = COLUMN_TYPES[self.key_column]
+        sql = f"UPDATE sql_queue AS q SET {', '.join(assignments)} WHERE {self.key_column} = ANY(%s::{key_type}[])"
+        params: List[Any] = [[key for key, _ in entries]]
+        if self.owner is not None:
+            sql += f" AND q.claimed_by = %s RETURNING q.{self.key_column}"
+            params.append(self.owner)
+        return sql, params
+
+    def flush(self):
+        """Write everything queued so far and wait until it is committed."""
+        with self._write_lock:
+            with self._condition:
+                batch, self._pending = self._pending, {}
+                self._oldest = None
+            self._write(batch)
+
+    def close(self):
+        """Flush and stop the flush thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Flush and batch-size statistics."""
+        with self._condition:
+            queued = len(self._pending)
+        return {
+            "queued": queued,
+            "flushes": self.flushes,
+            "statements": self.statements,
+            "rows": self.rows,
+            "failures": self.failures,
+            "not_owned": self.not_owned,
+            "avg_batch": round(self.rows / self.flushes, 2) if self.flushes else None,
+            "avg_flush_ms": round(self.flush_ms / self.flushes, 2) if self.flushes else None,
+        }
@@ -160,7 +160,8 @@ async def ask_question(request: QueryRequest):
     """
     try:
         logger.info(f"Processing question: {request.question}")
-        response = query_executor.process_question(
+        # Async path: the AI fallback does not block the event loop
+        response = await query_executor.aprocess_question(
             question=request.question,
             execute_immediately=request.execute_immediately,
         )
@@ -261,6 +262,52 @@ async def get_history(limit: int = 50):
         )
 
 
+@app.get("/query/cache/stats")
+async def get_question_cache_stats():
+    """
+    Get question cache hit rates for this process.
+
+    Returns:
+        Hit/miss counters, or {"enabled": false}
+    """
+    cache = query_executor.sql_generator.question_cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@app.get("/query/compile-check/stats")
+async def get_compile_check_stats():
+    """
+    Get server-side compile check statistics (round trips, invalid SQL,
+    verdict cache hit rate) for this process.
+
+    Returns:
+        Check counters, or {"enabled": false}
+    """
+    checker = query_executor.sql_generator.compile_checker
+    if checker is None:
+        return {"enabled": False}
+    return {"enabled": True, **checker.stats()}
+
+
+@app.get("/ai/providers/stats")
+async def get_ai_provider_stats():
+    """
+    Get per-provider latency/error EWMAs, circuit breaker states and the
+    current routing order of the unified AI client.
+
+    Returns:
+        Provider statistics, or {"enabled": false}
+    """
+    # Imported here: creating the unified client initializes every provider
+    from app.core.ai_client import ai_client
+
+    if ai_client is None:
+        return {"enabled": False}
+    return {"enabled": True, **ai_client.get_provider_stats()}
+
+
 @app.post("/query/execute-sql", response_model=DirectSQLResponse)
 async def execute_direct_sql(request: DirectSQLRequest):
     """
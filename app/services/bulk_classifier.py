@@ -0,0 +1,314 @@
+"""
+Bulk classification and risk re-scoring over historical queue rows.
+
+After classification rules change we need to know how past outcomes would
+move. Instead of calling QueryClassifier row by row, this module streams
+sql_query values from PostgreSQL through a server-side (named) cursor,
+classifies them in chunks across a process pool, and writes per-rule hit
+statistics (and optionally every changed row, chunk by chunk as results
+arrive) back with multi-row INSERTs.
+
+Sources:
+- sql_queue: every row with a generated sql_query, compared with the stored
+  query_type / risk_level
+- sql_audit_log: 'completed' and 'blocked' audit events joined to their
+  queue row, so we can see which recorded outcomes would change
+"""
+import multiprocessing
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+from loguru import logger
+
+
+# Streaming queries per source: (row_id, sql, stored_query_type, stored_risk_level)
+SOURCE_QUERIES = {
+    "sql_queue": """
+        SELECT id, sql_query, query_type, risk_level
+        FROM sql_queue
+        WHERE sql_query IS NOT NULL
+        ORDER BY id
+    """,
+    "sql_audit_log": """
+        SELECT a.id, q.sql_query,
+               COALESCE(a.event_data->>'query_type', q.query_type),
+               q.risk_level
+        FROM sql_audit_log a
+        JOIN sql_queue q ON q.job_id = a.job_id
+        WHERE q.sql_query IS NOT NULL
+          AND a.event_type IN ('completed', 'blocked')
+        ORDER BY a.id
+    """,
+}
+
+# Row tuple exchanged with pool workers
+Row = Tuple[int, str, Optional[str], Optional[str]]
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs in pool processes)
+# ---------------------------------------------------------------------------
+
+_worker_classifier = None
+
+
+def _init_worker():
+    """Create one memoized classifier per worker process."""
+    global _worker_classifier
+    from app.core.query_classifier import QueryClassifier
+
+    # Unknown operations are counted as a rule; don't log every row
+    logger.disable("app.core.query_classifier")
+    _worker_classifier = QueryClassifier(cache_size=65536)
+
+
+def classify_chunk(rows: List[Row]) -> Tuple[Counter, List[Tuple]]:
+    """
+    Classify a chunk of rows.
+
+    Returns:
+        Tuple of (stats Counter, changed rows). Stats keys are
+        (rule_kind, rule, query_type, risk_level, changed).
+    """
+    classifier = _worker_classifier
+    if classifier is None:
+        _init_worker()
+        classifier = _worker_classifier
+
+    stats: Counter = Counter()
+    changed: List[Tuple] = []
+
+    for row_id, sql, old_type, old_risk in rows:
+        query_type, risk_level, rule = classifier.classify_with_rule(sql)
+        _, warnings = classifier.validate_query(sql, query_type)
+
+        is_changed = (old_type, old_risk) != (query_type.value, risk_level.value)
+        stats[("classification", rule, query_type.value, risk_level.value, is_changed)] += 1
+        for warning in warnings:
+            stats[("validation", warning, query_type.value, risk_level.value, is_changed)] += 1
+
+        if is_changed:
+            changed.append((row_id, old_type, old_risk, query_type.value, risk_level.value, rule))
+
+    return stats, changed
+
+
+# ---------------------------------------------------------------------------
+# Coordinator
+# ---------------------------------------------------------------------------
+
+class RescoreReport:
+    """Aggregated outcome of one re-scoring run."""
+
+    def __init__(self, run_id: str, source: str):
+        self.run_id = run_id
+        self.source = source
+        self.rows_scanned = 0
+        self.rows_changed = 0
+        self.stats: Counter = Counter()
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+    def rule_hits(self, rule_kind: str = "classification") -> Dict[str, int]:
+        """Total hits per rule of the given kind."""
+        hits: Counter = Counter()
+        for (kind, rule, _, _, _), count in self.stats.items():
+            if kind == rule_kind:
+                hits[rule] += count
+        return dict(hits.most_common())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary for printing / JSON output."""
+        elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        return {
+            "run_id": self.run_id,
+            "source": self.source,
+            "rows_scanned": self.rows_scanned,
+            "rows_changed": self.rows_changed,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.rows_scanned / elapsed) if elapsed else None,
+            "classification_rules": self.rule_hits("classification"),
+            "validation_rules": self.rule_hits("validation"),
+        }
+
+
+class BulkClassifier:
+    """
+    Re-scores historical SQL with the current classification rules.
+
+    Args:
+        connect: Callable returning a new psycopg2 connection to the queue DB
+        workers: Worker processes (1 classifies in-process)
+        chunk_size: Rows per server-side fetch and per pool task
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        workers: Optional[int] = None,
+        chunk_size: int = 5000,
+    ):
+        self.connect = connect
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+
+    def _stream_chunks(self, conn, source: str, limit: Optional[int]) -> Iterator[List[Row]]:
+        """Stream rows through a named (server-side) cursor in chunks."""
+        query = SOURCE_QUERIES[source]
+        params: Tuple = ()
+        if limit:
+            query += " LIMIT %s"
+            params = (limit,)
+
+        with conn.cursor(name=f"rescore_{source}_{uuid.uuid4().hex[:8]}") as cursor:
+            cursor.itersize = self.chunk_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def _classify_chunks(self, pool, chunks: Iterator[List[Row]]) -> Iterator[Tuple[Counter, List[Tuple]]]:
+        """
+        Classify chunks in the pool with bounded look-ahead.
+
+        Pool.imap would drain the cursor as fast as it can and buffer the
+        whole table in memory; keeping at most two chunks per worker in
+        flight preserves the server-side cursor's streaming behaviour.
+        """
+        if pool is None:
+            yield from map(classify_chunk, chunks)
+            return
+
+        in_flight: Deque = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(classify_chunk, (chunk,)))
+            if len(in_flight) >= self.workers * 2:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+    def run(
+        self,
+        source: str = "sql_queue",
+        write_results: bool = True,
+        write_changes: bool = False,
+        limit: Optional[int] = None,
+    ) -> RescoreReport:
+        """
+        Classify every row of a source and optionally persist statistics.
+
+        Args:
+            source: 'sql_queue' or 'sql_audit_log'
+            write_results: Store the run and per-rule statistics
+            write_changes: Also store every row whose outcome changed
+                (written per chunk; needs write_results)
+            limit: Only scan the first N rows (for trial runs)
+
+        Returns:
+            RescoreReport with aggregated statistics
+        """
+        if source not in SOURCE_QUERIES:
+            raise ValueError(f"Unknown source '{source}'. Use one of: {', '.join(SOURCE_QUERIES)}")
+
+        report = RescoreReport(str(uuid.uuid4()), source)
+
+        # Changed rows are written per chunk, so memory stays bounded by the
+        # chunks in flight; the run row goes first (the changes reference it)
+        # and gets its totals at the end (finished_at stays NULL if we fail)
+        write_conn = self.connect() if write_results else None
+        read_conn = None
+        pool = None
+        try:
+            if write_conn is not None:
+                self._start_run(write_conn, report)
+
+            read_conn = self.connect()
+            pool = multiprocessing.Pool(self.workers, initializer=_init_worker) if self.workers > 1 else None
+            chunks = self._stream_chunks(read_conn, source, limit)
+            for chunk_number, (stats, changed) in enumerate(self._classify_chunks(pool, chunks), 1):
+                report.stats.update(stats)
+                report.rows_scanned += sum(
+                    count for key, count in stats.items() if key[0] == "classification"
+                )
+                report.rows_changed += len(changed)
+                if write_conn is not None and write_changes and changed:
+                    self._write_changes(write_conn, report, changed)
+
+                if chunk_number % 20 == 0:
+                    logger.info(f"Re-scored {report.rows_scanned} rows ({report.rows_changed} changed)")
+
+            report.finished_at = datetime.now()
+            logger.info(
+                f"Re-scoring of {source} finished: {report.rows_scanned} rows, "
+                f"{report.rows_changed} changed"
+            )
+            if write_conn is not None:
+                self._finish_run(write_conn, report)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            if read_conn is not None:
+                read_conn.close()
+            if write_conn is not None:
+                write_conn.close()
+
+        return report
+
+    def _start_run(self, conn, report: RescoreReport):
+        """Insert the run row (totals are filled in by _finish_run)."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO sql_rescore_runs (run_id, source, started_at)
+                    VALUES (%s, %s, %s)
+                """, (report.run_id, report.source, report.started_at))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _write_changes(self, conn, report: RescoreReport, changes: List[Tuple]):
+        """Write one chunk's changed rows with a multi-row INSERT."""
+        try:
+            with conn.cursor() as cursor:
+                execute_values(cursor, """
+                    INSERT INTO sql_rescore_changes
+                        (run_id, row_id, old_query_type, old_risk_level,
+                         new_query_type, new_risk_level, rule)
+                    VALUES %s
+                """, [(report.run_id,) + change for change in changes], page_size=5000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _finish_run(self, conn, report: RescoreReport):
+        """Write the run's totals and per-rule statistics."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE sql_rescore_runs
+                    SET finished_at = %s, rows_scanned = %s, rows_changed = %s
+                    WHERE run_id = %s
+                """, (report.finished_at, report.rows_scanned, report.rows_changed, report.run_id))
+
+                execute_values(cursor, """
+                    INSERT INTO sql_rescore_stats
+                        (run_id, rule_kind, rule, query_type, risk_level, changed, hits)
+                    VALUES %s
+                """, [
+                    (report.run_id, kind, rule, query_type, risk_level, is_changed, hits)
+                    for (kind, rule, query_type, risk_level, is_changed), hits in report.stats.items()
+                ], page_size=1000)
+
+            conn.commit()
+            logger.info(f"Stored re-scoring run {report.run_id} ({len(report.stats)} stat rows)")
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,105 @@
+"""
+Early execution of streamed SQL.
+
+With streaming providers the "sql" field of the answer is complete well
+before the explanation that follows it. EarlyExecution receives that SQL
+(the generator only passes on read-only SQL over known tables) and starts
+running it on a worker thread right away. When generation finishes, the
+executor asks for the result of the final SQL: if it is the SQL that was
+started early, the (possibly already finished) result is reused; otherwise
+the early run is discarded and the query runs as usual.
+
+A discarded run that has already started cannot be stopped: it keeps its
+thread (one of AI_EARLY_EXECUTION_WORKERS) until the query finishes, which
+QueryExecutor bounds with the QUERY_TIMEOUT_SECONDS driver timeout. So that
+such runs never hold up other requests, a result is only awaited from a
+run that has started; one still queued for a thread is cancelled and the
+caller runs the query itself.
+
+One EarlyExecution serves one question.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from app.config import settings
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared worker threads for early execution (created on first use)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.ai_early_execution_workers),
+                thread_name_prefix="early-sql"
+            )
+        return _executor
+
+
+class EarlyExecution:
+    """
+    Runs the first streamed SQL of one question ahead of time.
+
+    Args:
+        execute: Function running SQL (e.g. db_manager.execute_query)
+        executor: Thread pool to run on (default: shared pool)
+    """
+
+    def __init__(self, execute: Callable[[str], Any], executor: Optional[ThreadPoolExecutor] = None):
+        self.execute = execute
+        self._executor = executor
+        self._lock = threading.Lock()
+        self.sql: Optional[str] = None
+        self._future: Optional[Future] = None
+
+    def on_sql(self, sql: str):
+        """Streaming callback: start executing sql (first call only)."""
+        with self._lock:
+            if self._future is not None:
+                return
+            self.sql = sql
+            self._future = (self._executor or _get_executor()).submit(self.execute, sql)
+        logger.info("Started early execution of streamed SQL")
+
+    @property
+    def started(self) -> bool:
+        """Whether streamed SQL was received and submitted."""
+        return self._future is not None
+
+    def result_for(self, sql: str) -> Optional[Any]:
+        """
+        Result of the early run if it executed exactly this SQL, else None
+        (the early run is then discarded). Also None when the run is still
+        waiting for a pool thread: it is cancelled rather than waited for.
+
+        Raises:
+            Whatever the early run raised
+        """
+        with self._lock:
+            future, early_sql = self._future, self.sql
+        if future is None:
+            return None
+        if early_sql.strip() != (sql or "").strip():
+            logger.info("Final SQL differs from streamed SQL; discarding early execution")
+            self.discard()
+            return None
+        if future.cancel():
+            logger.info("Early execution still queued for a thread; running the final SQL directly")
+            self.discard()
+            return None
+        return future.result()
+
+    def discard(self):
+        """Drop the early run (cancelled if it has not started yet)."""
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+            self._future = None
+            self.sql = None
@@ -0,0 +1,254 @@
+"""
+Schema-derived entity index for the pattern-based SQL generator.
+
+Turns the cached schema into keyword -> entity entries so the fast pattern
+path can resolve any table (and its columns), not only the hand-written
+WeSign dictionaries:
+
+- Table and column names are split into words (CamelCase, snake_case,
+  digits dropped) and de-pluralized: ContactsGroups -> "contacts groups",
+  "contact groups", "contact group", ...
+- Multi-word tables are also reachable by their head noun ("invoices" for
+  PaymentInvoices), ranked after every full table name.
+- Curated English/Hebrew synonyms and an optional Hebrew synonyms file
+  (HEBREW_SYNONYMS_FILE) are layered on top and win ties.
+- Entries are cached per table fingerprint, so a schema refresh only
+  re-derives the tables that actually changed.
+- Updates build new tables off to the side and swap them in under a lock,
+  so threads reading the index never see it half-updated.
+
+Entries are (keyword, payload) pairs for KeywordMatcher:
+    ('table', table_name)
+    ('column', table_name, column_name, is_date, is_numeric)
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from app.utils.schema_version import schema_version, table_fingerprint
+
+
+Entry = Tuple[str, Tuple]
+
+_WORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_DATE_TYPES = ("DATE", "TIME")
+_NUMERIC_TYPES = ("INT", "DECIMAL", "NUMERIC", "MONEY", "FLOAT", "REAL")
+
+# Column names too generic to be useful as keywords on their own
+_IGNORED_COLUMN_PHRASES = frozenset(["id", "is", "by"])
+
+
+def split_identifier(name: str) -> List[str]:
+    """
+    Split a table/column name into lower-case words.
+
+    Digits are dropped ("CompanySigner1Details" -> company, signer, details).
+    """
+    words = []
+    for part in re.split(r"[_\W]+", name):
+        words.extend(w.lower() for w in _WORD_RE.findall(part) if not w.isdigit())
+    return words
+
+
+def singularize(word: str) -> str:
+    """Naive English de-pluralization (companies -> company, boxes -> box)."""
+    if len(word) <= 3 or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def name_phrases(name: str) -> List[str]:
+    """
+    Keyword phrases for an identifier.
+
+    Returns the split words as written plus de-pluralized variants (all
+    words singular, only the head singular, only the modifiers singular).
+    """
+    words = split_identifier(name)
+    if not words:
+        return []
+
+    singular = [singularize(w) for w in words]
+    variants = [
+        words,
+        singular,
+        words[:-1] + singular[-1:],
+        singular[:-1] + words[-1:],
+    ]
+
+    phrases: List[str] = []
+    for variant in variants:
+        phrase = " ".join(variant)
+        if phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+
+def load_synonyms(path: Optional[str]) -> Dict[str, str]:
+    """
+    Load a synonyms file: {"phrase": "Table"} or {"phrase": "Table.Column"}.
+
+    A missing or malformed file is logged and ignored.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return {str(k): str(v) for k, v in data.items()}
+    except Exception as e:
+        logger.warning(f"Could not load synonyms file {path}: {e}")
+        return {}
+
+
+class EntityIndex:
+    """
+    Keyword entries for every table and column of the cached schema.
+
+    Args:
+        synonyms: Curated keyword -> table mappings (take precedence on ties)
+        synonyms_file: Optional JSON file with extra (e.g. Hebrew) synonyms
+    """
+
+    def __init__(
+        self,
+        synonyms: Optional[Dict[str, str]] = None,
+        synonyms_file: Optional[str] = None,
+    ):
+        self.synonyms = dict(synonyms or {})
+        self.synonyms.update(load_synonyms(synonyms_file))
+        self.version: Optional[str] = None
+
+        # table name -> (fingerprint, entries, head-noun aliases, default date column)
+        self._tables: Dict[str, Tuple[str, List[Entry], List[Entry], Optional[str]]] = {}
+        self._columns: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Serializes updates and the swap of _tables/_columns/version
+        self._lock = threading.Lock()
+
+    def _snapshot(self) -> Tuple[Dict[str, Tuple], Dict[str, Dict[str, Dict[str, Any]]]]:
+        """Consistent (tables, columns) pair; both are replaced, never mutated."""
+        with self._lock:
+            return self._tables, self._columns
+
+    @property
+    def tables(self) -> List[str]:
+        """Indexed schema tables."""
+        tables, _ = self._snapshot()
+        return list(tables)
+
+    def update(self, schema_info: Dict[str, Any]) -> bool:
+        """
+        Bring the index up to date with a schema, re-deriving changed tables only.
+
+        Returns:
+            True if any entry changed (callers rebuild their matcher)
+        """
+        version = schema_version(schema_info)
+        if version == self.version:
+            return False
+
+        with self._lock:
+            if version == self.version:
+                return False
+
+            tables = dict(self._tables)
+            columns = dict(self._columns)
+            seen = set()
+            rebuilt = 0
+            for table in schema_info.get("tables", []):
+                name = table.get("name")
+                if not name:
+                    continue
+                seen.add(name)
+                fingerprint = table_fingerprint(table)
+                cached = tables.get(name)
+                if cached and cached[0] == fingerprint:
+                    continue
+                tables[name] = (fingerprint,) + self._index_table(table)
+                columns[name] = {col["name"]: col for col in table.get("columns", []) if col.get("name")}
+                rebuilt += 1
+
+            removed = [name for name in tables if name not in seen]
+            for name in removed:
+                del tables[name]
+                columns.pop(name, None)
+
+            self._tables, self._columns, self.version = tables, columns, version
+
+        logger.info(
+            f"Entity index updated to schema {version}: {rebuilt} tables re-indexed, "
+            f"{len(removed)} removed, {len(tables)} total"
+        )
+        return bool(rebuilt or removed)
+
+    def _index_table(self, table: Dict[str, Any]) -> Tuple[List[Entry], List[Entry], Optional[str]]:
+        """Derive keyword entries, head-noun aliases and the default date column for one table."""
+        name = table["name"]
+        entries: List[Entry] = [(phrase, ("table", name)) for phrase in name_phrases(name)]
+        entries.append((name.lower(), ("table", name)))
+
+        words = split_identifier(name)
+        aliases: List[Entry] = []
+        if len(words) > 1:
+            aliases = [(phrase, ("table", name)) for phrase in name_phrases(words[-1])]
+
+        date_column = None
+        for column in table.get("columns", []):
+            column_name = column.get("name")
+            if not column_name:
+                continue
+            column_type = str(column.get("type", "")).upper()
+            is_date = any(t in column_type for t in _DATE_TYPES)
+            is_numeric = any(t in column_type for t in _NUMERIC_TYPES)
+
+            if is_date and (
+                date_column is None
+                or ("created" in column_name.lower() and "created" not in date_column.lower())
+            ):
+                date_column = column_name
+
+            payload = ("column", name, column_name, is_date, is_numeric)
+            for phrase in name_phrases(column_name):
+                if phrase not in _IGNORED_COLUMN_PHRASES:
+                    entries.append((phrase, payload))
+
+        return entries, aliases, date_column
+
+    def entries(self) -> Iterable[Entry]:
+        """All keyword entries: curated synonyms first, then schema-derived."""
+        tables, columns = self._snapshot()
+        for keyword, target in self.synonyms.items():
+            table, _, column = target.partition(".")
+            if column:
+                info = columns.get(table, {}).get(column, {})
+                column_type = str(info.get("type", "")).upper()
+                yield keyword, (
+                    "column", table, column,
+                    any(t in column_type for t in _DATE_TYPES),
+                    any(t in column_type for t in _NUMERIC_TYPES),
+                )
+            else:
+                yield keyword, ("table", table)
+
+        for _, table_entries, _, _ in tables.values():
+            yield from table_entries
+        for _, _, aliases, _ in tables.values():
+            yield from aliases
+
+    def date_column(self, table: str) -> Optional[str]:
+        """Preferred date column of a table (a *Created* one if present)."""
+        tables, _ = self._snapshot()
+        cached = tables.get(table)
+        return cached[3] if cached else None
@@ -0,0 +1,263 @@
+"""
+Normalized question -> SQL cache in front of the AI fallback.
+
+Questions the patterns miss go to the Claude CLI, which takes seconds even
+for a question answered an hour ago. This cache keys answers by a
+normalized form of the question:
+
+- case-folded, whitespace collapsed, trailing punctuation dropped
+- Hebrew niqqud / cantillation marks stripped
+- numbers and dates replaced by <num> / <date> placeholders
+
+The generated SQL is stored as a template in which the literals that came
+from the question are slots, so "top 10 companies" answers "top 25
+companies" with the number re-bound. Answers whose literals cannot be
+traced back to the question are not cached.
+
+Entries are tagged with the schema version and live in PostgreSQL
+(sql_question_cache) behind an in-process LRU; hit counts are stored per
+entry and overall hit rates are available from stats().
+"""
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor
+from loguru import logger
+
+from app.config import settings
+from app.core.sql_lexer import TokenType, tokenize
+from app.utils.cache import LRUCache
+
+
+# Hebrew points and cantillation marks (maqaf U+05BE and sof pasuq U+05C3 are kept)
+_NIQQUD_RE = re.compile("[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]")
+_DATE_RE = re.compile(r"\b(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/.]\d{1,2}[/.]\d{2,4})\b")
+_LITERAL_RE = re.compile(r"(?P<date>%s)|(?P<num>\d+(?:\.\d+)?)" % _DATE_RE.pattern)
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.,;:\u05c3]+$")
+
+# Seconds to wait before reconnecting after the queue DB was unreachable
+RECONNECT_DELAY = 60
+
+
+def connect_queue_db():
+    """Open a new connection to the PostgreSQL queue database."""
+    return psycopg2.connect(
+        host=settings.queue_db_host,
+        port=settings.queue_db_port,
+        dbname=settings.queue_db_name,
+        user=settings.queue_db_user,
+        password=settings.queue_db_password,
+        connect_timeout=5
+    )
+
+
+def normalize_question(question: str) -> Tuple[str, List[str]]:
+    """
+    Normalize a question into a cache key and its literal parameters.
+
+    Returns:
+        (key, params): e.g. ("top <num> companies from <date>", ["10", "2024-01-01"])
+    """
+    text = unicodedata.normalize("NFKC", question)
+    text = _NIQQUD_RE.sub("", text).casefold()
+    text = " ".join(text.split())
+    text = _TRAILING_PUNCT_RE.sub("", text)
+
+    params: List[str] = []
+
+    def _placeholder(match: "re.Match") -> str:
+        params.append(match.group())
+        return "<%s>" % match.lastgroup
+
+    return _LITERAL_RE.sub(_placeholder, text), params
+
+
+def _escape(text: str) -> str:
+    """Escape braces for str.format templates."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def templatize_sql(sql: str, params: List[str]) -> Optional[str]:
+    """
+    Turn SQL into a str.format template with one slot per question literal.
+
+    Number tokens equal to a numeric parameter and string literals containing
+    a date parameter become slots. Returns None when some parameter does not
+    appear in the SQL (it was rewritten, e.g. "2 weeks" -> -14 days), since
+    re-binding it would then give wrong SQL, or when a literal repeats - in
+    the question, or in the SQL (in "TOP 1 ... WHERE IsActive = 1" only one
+    of the 1s came from the question, and there is no telling which).
+    """
+    if not params:
+        return _escape(sql)
+
+    slots = {value: index for index, value in enumerate(params)}
+    if len(slots) != len(params):
+        # The same literal twice ("between 5 and 5"): slots would be ambiguous
+        return None
+
+    used: Dict[str, int] = {}
+    pieces: List[str] = []
+    last = 0
+    for token in tokenize(sql):
+        replacement = None
+        if token.type == TokenType.NUMBER and token.value in slots:
+            replacement = "{%d}" % slots[token.value]
+            used[token.value] = used.get(token.value, 0) + 1
+        elif token.type == TokenType.STRING:
+            literal = _escape(token.value)
+            for value, index in slots.items():
+                if _DATE_RE.fullmatch(value) and value in token.value:
+                    literal = literal.replace(_escape(value), "{%d}" % index)
+                    used[value] = used.get(value, 0) + token.value.count(value)
+            if literal != _escape(token.value):
+                replacement = literal
+
+        if replacement is not None:
+            pieces.append(_escape(sql[last:token.position]))
+            pieces.append(replacement)
+            last = token.position + len(token.value)
+
+    pieces.append(_escape(sql[last:]))
+
+    if set(used) != set(slots) or any(count > 1 for count in used.values()):
+        return None
+    return "".join(pieces)
+
+
+class QuestionCache:
+    """
+    Persistent question -> SQL cache with an in-memory LRU in front.
+
+    Args:
+        connect: Callable returning a psycopg2 connection to the queue DB, or
+            None for a memory-only cache
+        memory_size: Entries kept in the in-process LRU
+    """
+
+    def __init__(self, connect: Optional[Callable[[], Any]] = None, memory_size: int = 1024):
+        self.connect = connect
+        self._memory = LRUCache(memory_size)
+        self._conn = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "skipped": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    # -- persistence -----------------------------------------------------
+
+    def _execute(self, query: str, params: Tuple, fetch: bool = False) -> Optional[Dict]:
+        """Run one statement on the shared connection; DB errors are logged, not raised."""
+        if self.connect is None or time.monotonic() < self._retry_at:
+            return None
+        with self._lock:
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = self.connect()
+                with self._conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, params)
+                    row = cursor.fetchone() if fetch else None
+                self._conn.commit()
+                return row
+            except psycopg2.Error as e:
+                logger.warning(f"Question cache unavailable: {e}")
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except psycopg2.Error:
+                        pass
+                self._conn = None
+                self._retry_at = time.monotonic() + RECONNECT_DELAY
+                return None
+
+    # -- API -------------------------------------------------------------
+
+    def lookup(self, question: str, schema_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached answer for a question, literals re-bound, or None.
+
+        The returned dict has 'sql' plus the metadata stored with it.
+        """
+        key, params = normalize_question(question)
+        cache_key = (key, schema_version)
+
+        entry = self._memory.get(cache_key)
+        if entry is not None:
+            self._count("memory_hits")
+        else:
+            entry = self._execute("""
+                SELECT sql_template, metadata
+                FROM sql_question_cache
+                WHERE question_key = %s AND schema_version = %s
+            """, (key, schema_version), fetch=True)
+            if entry is None:
+                self._count("misses")
+                return None
+            entry = dict(entry)
+            self._memory.put(cache_key, entry)
+            self._count("db_hits")
+
+        self._execute("""
+            UPDATE sql_question_cache
+            SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+            WHERE question_key = %s AND schema_version = %s
+        """, (key, schema_version))
+
+        result = dict(entry.get("metadata") or {})
+        result["sql"] = entry["sql_template"].format(*params)
+        return result
+
+    def store(
+        self,
+        question: str,
+        schema_version: str,
+        sql: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Cache the SQL generated for a question.
+
+        Returns:
+            False if the SQL could not be templatized (nothing stored)
+        """
+        key, params = normalize_question(question)
+        template = templatize_sql(sql, params)
+        if template is None:
+            self._count("skipped")
+            logger.debug(f"Not caching answer for '{key}': question literals not found in SQL")
+            return False
+
+        entry = {"sql_template": template, "metadata": metadata or {}}
+        self._memory.put((key, schema_version), entry)
+        self._execute("""
+            INSERT INTO sql_question_cache
+                (question_key, schema_version, sql_template, metadata, example_question)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (question_key, schema_version) DO UPDATE
+            SET sql_template = EXCLUDED.sql_template,
+                metadata = EXCLUDED.metadata,
+                created_at = CURRENT_TIMESTAMP
+        """, (key, schema_version, template, Json(metadata or {}), question))
+        self._count("stores")
+        return True
+
+    def clear(self):
+        """Drop in-memory entries (persistent entries expire by schema version)."""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        stats["memory"] = self._memory.stats()
+        return stats
@@ -0,0 +1,190 @@
+"""
+Relevance-based schema pruning for AI prompts.
+
+The AI clients format every table and column into every prompt, which on
+the full database is tens of thousands of tokens per question. The pruner
+keeps only the tables a question is about:
+
+1. Seeds: tables whose name/synonym or columns match the question
+   (via the entity index keyword matches), ranked by match strength
+2. Join neighbours: tables one foreign key away from a seed - referenced
+   tables first, then referencing ones. Tables mentioned by name and
+   their neighbours rank before tables that only matched on a column.
+3. Budget: tables are added in that order until the character or table
+   budget is spent
+
+A question with no matches gets the full schema (same as before). Every
+call returns a PruneReport saying how much was cut.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.services.entity_index import EntityIndex
+from app.utils.keyword_matcher import KeywordMatch, KeywordMatcher
+from app.utils.schema_version import schema_version
+
+
+class PruneReport(NamedTuple):
+    """How much of the schema a prompt kept."""
+    pruned: bool
+    tables_total: int
+    tables_kept: int
+    chars_total: int
+    chars_kept: int
+    seeds: Tuple[str, ...]
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of schema characters cut (0.0 - 1.0)."""
+        return 1 - self.chars_kept / self.chars_total if self.chars_total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary for logs / API responses."""
+        return {**self._asdict(), "seeds": list(self.seeds), "reduction": round(self.reduction, 3)}
+
+
+def table_text_size(table: Dict[str, Any]) -> int:
+    """Approximate characters a table takes in a formatted schema prompt."""
+    size = len(table.get("name", "")) + 20
+    for column in table.get("columns", []):
+        size += len(column.get("name", "")) + len(str(column.get("type", ""))) + 20
+    for fk in table.get("foreign_keys", []):
+        size += sum(len(c) for c in fk.get("columns", []) + fk.get("referred_columns", []))
+        size += len(fk.get("referred_table", "")) + 12
+    return size
+
+
+class SchemaPruner:
+    """
+    Selects the tables relevant to a question within a size budget.
+
+    Args:
+        max_chars: Character budget for the kept tables
+        max_tables: Table budget
+        synonyms: Curated keyword -> table synonyms for the pruner's own index
+            (only used when the caller does not pass keyword matches)
+    """
+
+    def __init__(
+        self,
+        max_chars: int = 16000,
+        max_tables: int = 25,
+        synonyms: Optional[Dict[str, str]] = None,
+    ):
+        self.max_chars = max_chars
+        self.max_tables = max_tables
+        self._index = EntityIndex(synonyms=synonyms)
+        self._matcher: Optional[KeywordMatcher] = None
+        # (table sizes, outgoing FK edges, incoming FK edges) for _graph_version
+        self._graph_version: Optional[str] = None
+        self._graph: Tuple[Dict[str, int], Dict[str, List[str]], Dict[str, List[str]]] = ({}, {}, {})
+
+    def _match(self, question: str, schema_info: Dict[str, Any]) -> List[KeywordMatch]:
+        """Keyword matches from the pruner's own entity index."""
+        if self._index.update(schema_info) or self._matcher is None:
+            self._matcher = KeywordMatcher(self._index.entries())
+        return self._matcher.find_all(" ".join(question.split()))
+
+    def _schema_graph(self, schema_info: Dict[str, Any]):
+        """Table sizes and FK adjacency, cached per schema version."""
+        version = schema_version(schema_info)
+        if version != self._graph_version:
+            sizes: Dict[str, int] = {}
+            outgoing: Dict[str, List[str]] = {}
+            incoming: Dict[str, List[str]] = {}
+            for table in schema_info.get("tables", []):
+                name = table["name"]
+                sizes[name] = table_text_size(table)
+                for fk in table.get("foreign_keys", []):
+                    referred = fk.get("referred_table")
+                    if referred and referred != name:
+                        outgoing.setdefault(name, []).append(referred)
+                        incoming.setdefault(referred, []).append(name)
+            self._graph = (sizes, outgoing, incoming)
+            self._graph_version = version
+        return self._graph
+
+    def prune(
+        self,
+        question: str,
+        schema_info: Dict[str, Any],
+        matches: Optional[List[KeywordMatch]] = None,
+    ) -> Tuple[Dict[str, Any], PruneReport]:
+        """
+        Return a schema with only the tables relevant to the question.
+
+        Args:
+            question: Natural language question
+            schema_info: Full schema (DatabaseManager.get_schema_info format)
+            matches: Keyword matches with ('table', ...) / ('column', ...)
+                payloads, e.g. from IntelligentSQLGenerator.match_keywords
+
+        Returns:
+            (pruned schema_info, PruneReport)
+        """
+        sizes, outgoing, incoming = self._schema_graph(schema_info)
+        chars_total = sum(sizes.values())
+
+        if matches is None:
+            matches = self._match(question, schema_info)
+
+        # Seed scores: table mentions weigh double; a column mention is shared
+        # by every table that has that column ("Name", "Status", ...)
+        scores: Dict[str, float] = {}
+        mentioned: Set[str] = set()
+        for match in matches:
+            column_tables = {p[1] for p in match.payloads if p[0] == "column" and p[1] in sizes}
+            for table in {p[1] for p in match.payloads if p[0] == "table" and p[1] in sizes}:
+                scores[table] = scores.get(table, 0) + 2 * match.length
+                mentioned.add(table)
+            for table in column_tables:
+                scores[table] = scores.get(table, 0) + match.length / len(column_tables)
+
+        if not scores:
+            report = PruneReport(False, len(sizes), len(sizes), chars_total, chars_total, ())
+            logger.info("Schema pruning: no table matched the question, sending the full schema")
+            return schema_info, report
+
+        seeds = sorted(scores, key=lambda name: -scores[name])
+
+        # Mentioned tables and their join neighbours come before tables that
+        # only matched on a column name
+        candidates: List[str] = []
+        seen: Set[str] = set()
+        for group in ([s for s in seeds if s in mentioned], [s for s in seeds if s not in mentioned]):
+            group_candidates = list(group)
+            for edges in (outgoing, incoming):
+                for seed in group:
+                    group_candidates.extend(edges.get(seed, ()))
+            for name in group_candidates:
+                if name not in seen and name in sizes:
+                    seen.add(name)
+                    candidates.append(name)
+
+        kept: Set[str] = set()
+        chars_kept = 0
+        for name in candidates:
+            if len(kept) >= self.max_tables:
+                break
+            # Always keep the best seed, even if it alone exceeds the budget
+            if kept and chars_kept + sizes[name] > self.max_chars:
+                continue
+            kept.add(name)
+            chars_kept += sizes[name]
+
+        pruned = dict(schema_info)
+        pruned.pop("version", None)
+        # Lets the schema renderer reuse the full schema's table fragments
+        pruned["source_version"] = schema_version(schema_info)
+        pruned["tables"] = [t for t in schema_info.get("tables", []) if t["name"] in kept]
+
+        report = PruneReport(
+            len(kept) < len(sizes), len(sizes), len(kept), chars_total, chars_kept, tuple(seeds)
+        )
+        logger.info(
+            f"Schema pruning: kept {report.tables_kept}/{report.tables_total} tables, "
+            f"{report.chars_kept}/{report.chars_total} chars ({report.reduction:.0%} cut), "
+            f"seeds: {', '.join(seeds[:5])}"
+        )
+        return pruned, report
@@ -0,0 +1,193 @@
+"""
+Local similarity retrieval over past successful question -> SQL pairs.
+
+Completed sql_queue rows are indexed in-process as character 3-gram TF-IDF
+vectors (over the normalized question, so numbers and dates compare as
+placeholders). A query is scored against every pair by cosine similarity
+through an inverted index: only pairs sharing at least one n-gram with the
+question are touched, so a lookup over thousands of pairs stays in the
+sub-millisecond to low-millisecond range without numpy.
+
+The generator passes the top-k pairs to the AI fallback as few-shot
+examples. Pairs are never answered directly: character similarity does
+not tell "show orders" from "do not show orders". New pairs are added only
+after the SQL executed successfully (IntelligentSQLGenerator.record_success).
+"""
+import heapq
+import math
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from app.core.sql_lexer import is_read_only
+from app.services.question_cache import normalize_question
+
+
+NGRAM_SIZE = 3
+
+
+class SimilarMatch(NamedTuple):
+    """A stored pair and its cosine similarity to the query."""
+    score: float
+    question: str
+    sql: str
+    params: Tuple[str, ...]
+
+
+def char_ngrams(key: str, n: int = NGRAM_SIZE) -> Counter:
+    """Character n-gram counts of a normalized question (space padded)."""
+    padded = f" {key} "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+class SimilarityIndex:
+    """
+    Character n-gram TF-IDF index with cosine-similarity search.
+
+    Pairs are deduplicated by normalized question (the latest one wins).
+    New pairs are weighted with the current IDF and added to the postings
+    immediately; IDF is recomputed once enough pairs were added since the
+    last full build.
+
+    Args:
+        max_pairs: Upper bound on indexed pairs (oldest are dropped on rebuild)
+    """
+
+    def __init__(self, max_pairs: int = 20000):
+        self.max_pairs = max_pairs
+        self._lock = threading.Lock()
+        # normalized key -> (question, sql, params); insertion order = age
+        self._pairs: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._keys: List[str] = []
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._idf: Dict[str, float] = {}
+        self._default_idf = 1.0
+        self._stale = 0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    # -- building --------------------------------------------------------
+
+    def _vector(self, key: str) -> Dict[str, float]:
+        """L2-normalized TF-IDF vector of a normalized question."""
+        counts = char_ngrams(key)
+        weights = {
+            gram: (1 + math.log(count)) * self._idf.get(gram, self._default_idf)
+            for gram, count in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {gram: w / norm for gram, w in weights.items()}
+
+    def _rebuild(self):
+        """Recompute IDF and all postings from the stored pairs."""
+        if len(self._pairs) > self.max_pairs:
+            for key in list(self._pairs)[:len(self._pairs) - self.max_pairs]:
+                del self._pairs[key]
+
+        self._keys = list(self._pairs)
+        doc_freq: Counter = Counter()
+        for key in self._keys:
+            doc_freq.update(char_ngrams(key).keys())
+
+        total = len(self._keys)
+        self._idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in doc_freq.items()}
+        self._default_idf = math.log(1 + total) + 1
+
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc_id, key in enumerate(self._keys):
+            for gram, weight in self._vector(key).items():
+                postings.setdefault(gram, []).append((doc_id, weight))
+        self._postings = postings
+        self._stale = 0
+
+    def add_many(self, pairs: List[Tuple[str, str]]):
+        """Index (question, sql) pairs and rebuild."""
+        with self._lock:
+            for question, sql in pairs:
+                key, params = normalize_question(question)
+                self._pairs.pop(key, None)
+                self._pairs[key] = (question, sql, tuple(params))
+            self._rebuild()
+
+    def add(self, question: str, sql: str):
+        """Index one pair incrementally (full rebuild once 10% is stale)."""
+        key, params = normalize_question(question)
+        with self._lock:
+            if key in self._pairs:
+                # Replace in place; the posting weights depend only on the key
+                self._pairs[key] = (question, sql, tuple(params))
+                return
+            self._pairs[key] = (question, sql, tuple(params))
+            self._stale += 1
+            if self._stale > max(50, len(self._keys) // 10):
+                self._rebuild()
+                return
+            doc_id = len(self._keys)
+            self._keys.append(key)
+            for gram, weight in self._vector(key).items():
+                self._postings.setdefault(gram, []).append((doc_id, weight))
+
+    def load_from_queue(self, connect: Callable[[], Any], limit: Optional[int] = None) -> int:
+        """
+        Index completed, read-only question/SQL pairs from sql_queue.
+
+        Returns:
+            Number of pairs indexed
+        """
+        limit = limit or self.max_pairs
+        conn = connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT question, sql_query
+                    FROM sql_queue
+                    WHERE status = 'completed'
+                      AND sql_query IS NOT NULL
+                      AND error_message IS NULL
+                    ORDER BY completed_at DESC NULLS LAST
+                    LIMIT %s
+                """, (limit,))
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        # Oldest first so the newest answer wins for duplicate questions
+        pairs = [(question, sql) for question, sql in reversed(rows) if is_read_only(sql)]
+        self.add_many(pairs)
+        self.loaded = True
+        logger.info(f"Similarity index loaded {len(self)} question/SQL pairs from {len(rows)} rows")
+        return len(self)
+
+    # -- search ----------------------------------------------------------
+
+    def search(self, question: str, k: int = 3, min_score: float = 0.0) -> List[SimilarMatch]:
+        """
+        Return the k most similar stored pairs, best first.
+
+        Args:
+            question: Question to match
+            k: Number of results
+            min_score: Minimum cosine similarity
+        """
+        key, _ = normalize_question(question)
+        with self._lock:
+            if not self._keys:
+                return []
+            scores: Dict[int, float] = {}
+            for gram, q_weight in self._vector(key).items():
+                for doc_id, d_weight in self._postings.get(gram, ()):
+                    scores[doc_id] = scores.get(doc_id, 0.0) + q_weight * d_weight
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = []
+            for doc_id, score in best:
+                if score < min_score:
+                    break
+                pair = self._pairs.get(self._keys[doc_id])
+                if pair is not None:
+                    results.append(SimilarMatch(round(score, 4), pair[0], pair[1], pair[2]))
+            return results
@@ -2,10 +2,33 @@
 Intelligent SQL Generator - Pattern-based with Claude CLI fallback
 Generates SQL queries from natural language questions
 """
+import asyncio
+import contextlib
 import re
-from typing import Dict, Any, Optional, List
+import threading
+from typing import AsyncContextManager, Callable, ContextManager, Dict, Any, Optional, List, NamedTuple, Tuple
 from loguru import logger
 from app.config import settings
+from app.core.ai_provider import AsyncClaudeCLIClient
+from app.core.compile_check import CompileVerdict, SQLCompileChecker
+from app.core.sql_lexer import code_tokens, is_read_only, object_name, tokenize
+from app.services.entity_index import EntityIndex
+from app.services.question_cache import QuestionCache, connect_queue_db
+from app.services.schema_pruner import SchemaPruner
+from app.services.similarity_index import SimilarityIndex
+from app.utils.schema_version import schema_version
+from app.utils.keyword_matcher import KeywordMatcher, KeywordMatch
+
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+class _AIRequest(NamedTuple):
+    """Everything the AI fallback call needs, prepared before the call."""
+    version: str
+    prompt_schema: Dict
+    examples: List[Dict[str, str]]
+    pruning: Any
 
 
 class IntelligentSQLGenerator:
@@ -18,11 +41,102 @@ class IntelligentSQLGenerator:
     3. AI API fallback for complex queries (future)
     """
 
+    # Curated English synonyms -> WeSign table (schema-derived names are
+    # added by the entity index)
+    TABLE_MAPPINGS = {
+        'companies': 'Companies',
+        'company': 'Companies',
+        'contacts': 'Contacts',
+        'contact': 'Contacts',
+        'documents': 'Documents',
+        'document': 'Documents',
+        'document collections': 'DocumentCollections',
+        'collections': 'DocumentCollections',
+        'groups': 'Groups',
+        'group': 'Groups',
+        'contact groups': 'ContactsGroups',
+        'configurations': 'ActiveDirectoryConfigurations',
+        'configuration': 'ActiveDirectoryConfigurations',
+        'active directory': 'ActiveDirectoryConfigurations',
+        'logs': 'Logs',
+        'log': 'Logs',
+        'licenses': 'AvailableLicenses',
+        'license': 'AvailableLicenses',
+        'signers': 'CompanySigner1Details',
+        'signer': 'CompanySigner1Details',
+        'messages': 'CompanyMessages',
+        'message': 'CompanyMessages',
+    }
+
+    # Hebrew table mappings
+    HEBREW_TABLES = {
+        'חברות': 'Companies',
+        'חברה': 'Companies',
+        'אנשי קשר': 'Contacts',
+        'קשר': 'Contacts',
+        'מסמכים': 'Documents',
+        'מסמך': 'Documents',
+        'אוספים': 'DocumentCollections',
+        'קבוצות': 'Groups',
+        'קבוצה': 'Groups',
+        'תצורות': 'ActiveDirectoryConfigurations',
+        'תצורה': 'ActiveDirectoryConfigurations',
+        'לוגים': 'Logs',
+        'רישיונות': 'AvailableLicenses',
+        'חותמים': 'CompanySigner1Details',
+        'הודעות': 'CompanyMessages',
+    }
+
+    # Time phrases -> (unit, value), in priority order
+    TIME_PERIODS = [
+        (['last month', 'בחודש שעבר'], 'month', 1),
+        (['last week', 'בשבוע שעבר'], 'week', 1),
+        (['last year', 'בשנה שעברה'], 'year', 1),
+        (['today', 'היום'], 'day', 0),
+    ]
+
     def __init__(self):
         """Initialize SQL generator with patterns."""
         self.patterns = self._load_patterns()
+        self.entity_index = EntityIndex(
+            synonyms={**self.TABLE_MAPPINGS, **self.HEBREW_TABLES},
+            synonyms_file=settings.hebrew_synonyms_file,
+        )
+        self._matcher = self._build_matcher()
+        # Held while the index and matcher are brought up to a new schema
+        self._entities_lock = threading.Lock()
         self.use_ai_fallback = settings.use_claude_cli
 
+        # Answers to questions the patterns miss, keyed by normalized question
+        self.question_cache = None
+        if settings.question_cache_enabled:
+            self.question_cache = QuestionCache(
+                connect=connect_queue_db if settings.question_cache_persistent else None,
+                memory_size=settings.question_cache_memory_size
+            )
+
+        # Past successful question/SQL pairs (loaded from the queue on first use)
+        self.similarity_index = None
+        if settings.similarity_enabled:
+            self.similarity_index = SimilarityIndex(max_pairs=settings.similarity_max_pairs)
+
+        # Only relevant tables go into AI prompts
+        self.schema_pruner = None
+        if settings.schema_pruning_enabled:
+            self.schema_pruner = SchemaPruner(
+                max_chars=settings.schema_prune_max_chars,
+                max_tables=settings.schema_prune_max_tables
+            )
+
+        # Server-side compile check of AI-generated SQL (cached verdicts)
+        self.compile_checker = None
+        if settings.sql_compile_check_enabled:
+            from app.core.database import db_manager
+            self.compile_checker = SQLCompileChecker(
+                db_manager.describe_first_result_set,
+                maxsize=settings.sql_compile_cache_size
+            )
+
         # Import Claude CLI client if enabled
         self.claude_cli_client = None
         if self.use_ai_fallback:
@@ -34,6 +148,15 @@ class IntelligentSQLGenerator:
                 logger.warning(f"Claude CLI not available: {e}")
                 self.use_ai_fallback = False
 
+        # Same CLI client for async callers (FastAPI, Teams)
+        self.async_cli_client = None
+        if self.claude_cli_client:
+            try:
+                self.async_cli_client = AsyncClaudeCLIClient(self.claude_cli_client)
+            except Exception as e:
+                logger.warning(f"Claude CLI not available: {e}")
+                self.use_ai_fallback = False
+
     def _load_patterns(self) -> List[Dict]:
         """
         Load SQL generation patterns.
@@ -88,26 +211,78 @@ class IntelligentSQLGenerator:
             },
         ]
 
-    def detect_pattern(self, question: str) -> Optional[Dict]:
-        """Detect which pattern best matches the question."""
-        question_lower = question.lower()
+    def _build_matcher(self) -> KeywordMatcher:
+        """
+        Compile one multi-pattern automaton over every pattern keyword,
+        table/column entity and time phrase (English and Hebrew).
+        """
+        keywords = []
+        for index, pattern in enumerate(self.patterns):
+            keywords.extend((kw, ('pattern', index)) for kw in pattern['keywords'])
+        keywords.extend(self.entity_index.entries())
+        for priority, (phrases, unit, value) in enumerate(self.TIME_PERIODS):
+            keywords.extend((phrase, ('time', priority, unit, value)) for phrase in phrases)
+        return KeywordMatcher(keywords)
+
+    def refresh_entities(self, schema_info: Dict) -> None:
+        """
+        Re-index entities when the schema changed and rebuild the matcher.
+
+        Concurrent callers wait for the new matcher; it is swapped in whole,
+        so match_keywords never sees a half-built one.
+        """
+        if self.entity_index.version == schema_version(schema_info):
+            return
+        with self._entities_lock:
+            if self.entity_index.update(schema_info):
+                self._matcher = self._build_matcher()
+
+    def match_keywords(self, question: str) -> List[KeywordMatch]:
+        """Find every keyword, table synonym and time phrase in a single pass."""
+        return self._matcher.find_all(' '.join(question.split()))
+
+    def detect_pattern(
+        self,
+        question: str,
+        matches: Optional[List[KeywordMatch]] = None
+    ) -> Optional[Dict]:
+        """
+        Detect which pattern best matches the question.
+
+        Args:
+            question: Natural language question
+            matches: Precomputed match_keywords() result (optional)
+        """
+        if matches is None:
+            matches = self.match_keywords(question)
+
+        # Distinct matching keywords per pattern
+        pattern_keywords: Dict[int, set] = {}
+        for match in matches:
+            for payload in match.payloads:
+                if payload[0] == 'pattern':
+                    pattern_keywords.setdefault(payload[1], set()).add(match.keyword)
 
         best_match = None
         best_score = 0
 
-        for pattern in self.patterns:
+        for index, pattern in enumerate(self.patterns):
             # Count matching keywords
-            matches = sum(1 for kw in pattern['keywords'] if kw in question_lower)
+            keyword_count = len(pattern_keywords.get(index, ()))
 
-            if matches > 0:
-                score = matches * pattern['confidence']
+            if keyword_count > 0:
+                score = keyword_count * pattern['confidence']
                 if score > best_score:
                     best_score = score
                     best_match = pattern
 
         return best_match if best_score > 0.5 else None
 
-    def extract_entities(self, question: str) -> Dict[str, Any]:
+    def extract_entities(
+        self,
+        question: str,
+        matches: Optional[List[KeywordMatch]] = None
+    ) -> Dict[str, Any]:
         """
         Extract entities from question.
 
@@ -118,6 +293,10 @@ class IntelligentSQLGenerator:
         - limit: Result limit
         - date_column: Date column for time filters
         - unit: Time unit (day, week, month)
+
+        Args:
+            question: Natural language question
+            matches: Precomputed match_keywords() result (optional)
         """
         entities = {
             'table': None,
@@ -131,79 +310,52 @@ class IntelligentSQLGenerator:
             'group_column': None
         }
 
-        # Extract table name (WeSign-specific tables)
-        table_mappings = {
-            # English keywords -> WeSign table
-            'companies': 'Companies',
-            'company': 'Companies',
-            'contacts': 'Contacts',
-            'contact': 'Contacts',
-            'documents': 'Documents',
-            'document': 'Documents',
-            'document collections': 'DocumentCollections',
-            'collections': 'DocumentCollections',
-            'groups': 'Groups',
-            'group': 'Groups',
-            'contact groups': 'ContactsGroups',
-            'configurations': 'ActiveDirectoryConfigurations',
-            'configuration': 'ActiveDirectoryConfigurations',
-            'active directory': 'ActiveDirectoryConfigurations',
-            'logs': 'Logs',
-            'log': 'Logs',
-            'licenses': 'AvailableLicenses',
-            'license': 'AvailableLicenses',
-            'signers': 'CompanySigner1Details',
-            'signer': 'CompanySigner1Details',
-            'messages': 'CompanyMessages',
-            'message': 'CompanyMessages',
-        }
+        if matches is None:
+            matches = self.match_keywords(question)
 
-        # Check for table matches
-        question_lower = question.lower()
-        for keyword, table in table_mappings.items():
-            if keyword in question_lower:
-                entities['table'] = table
-                break
-
-        # Hebrew table mappings
-        hebrew_tables = {
-            'חברות': 'Companies',
-            'חברה': 'Companies',
-            'אנשי קשר': 'Contacts',
-            'קשר': 'Contacts',
-            'מסמכים': 'Documents',
-            'מסמך': 'Documents',
-            'אוספים': 'DocumentCollections',
-            'קבוצות': 'Groups',
-            'קבוצה': 'Groups',
-            'תצורות': 'ActiveDirectoryConfigurations',
-            'תצורה': 'ActiveDirectoryConfigurations',
-            'לוגים': 'Logs',
-            'רישיונות': 'AvailableLicenses',
-            'חותמים': 'CompanySigner1Details',
-            'הודעות': 'CompanyMessages',
-        }
-        for hebrew, table in hebrew_tables.items():
-            if hebrew in question:
-                entities['table'] = table
-                break
-
-        # Extract time period
-        if 'last month' in question.lower() or 'בחודש שעבר' in question:
-            entities['unit'] = 'month'
-            entities['value'] = 1
-        elif 'last week' in question.lower() or 'בשבוע שעבר' in question:
-            entities['unit'] = 'week'
-            entities['value'] = 1
-        elif 'last year' in question.lower() or 'בשנה שעברה' in question:
-            entities['unit'] = 'year'
-            entities['value'] = 1
-        elif 'today' in question.lower() or 'היום' in question:
-            entities['unit'] = 'day'
-            entities['value'] = 0
+        # Table: longest synonym wins ("contact groups" beats "contact"),
+        # earliest on ties
+        table_matches = [
+            (match, payload[1])
+            for match in matches
+            for payload in match.payloads
+            if payload[0] == 'table'
+        ]
+        if table_matches:
+            _, entities['table'] = min(table_matches, key=lambda m: (-m[0].length, m[0].start))
+
+        # Columns of the chosen table mentioned in the question
+        if entities['table']:
+            table = entities['table']
+            entities['date_column'] = self.entity_index.date_column(table) or entities['date_column']
+
+            column_matches = sorted(
+                (
+                    (match, payload)
+                    for match in matches
+                    for payload in match.payloads
+                    if payload[0] == 'column' and payload[1] == table
+                ),
+                key=lambda m: (-m[0].length, m[0].start)
+            )
+            numeric = [payload for _, payload in column_matches if payload[4]]
+            dates = [payload for _, payload in column_matches if payload[3]]
+            others = [payload for _, payload in column_matches if not payload[3]]
+
+            if column_matches:
+                entities['column'] = (numeric or [payload for _, payload in column_matches])[0][2]
+            if dates:
+                entities['date_column'] = dates[0][2]
+            if others:
+                entities['group_column'] = others[0][2]
+
+        # Extract time period (month > week > year > today, as listed)
+        time_periods = [payload for match in matches for payload in match.payloads if payload[0] == 'time']
+        if time_periods:
+            _, _, entities['unit'], entities['value'] = min(time_periods, key=lambda p: p[1])
 
         # Extract numeric values
-        numbers = re.findall(r'\d+', question)
+        numbers = _NUMBER_RE.findall(question)
         if numbers:
             entities['value'] = int(numbers[0])
 
@@ -225,7 +377,9 @@ class IntelligentSQLGenerator:
         self,
         question: str,
         language: str = 'en',
-        schema_info: Optional[Dict] = None
+        schema_info: Optional[Dict] = None,
+        on_sql: Optional[Callable[[str], None]] = None,
+        ai_limit: Optional[ContextManager] = None
     ) -> Dict[str, Any]:
         """
         Generate SQL from natural language question.
@@ -234,6 +388,12 @@ class IntelligentSQLGenerator:
             question: Natural language question
             language: Question language (en/he)
             schema_info: Optional database schema information
+            on_sql: Optional callback for early execution: gets AI-generated
+                SQL as soon as it has streamed in, if it passes the read-only
+                and known-table checks (the final result is checked again)
+            ai_limit: Optional context manager (e.g. a semaphore) held around
+                the AI fallback only, so callers can bound concurrent AI
+                calls without queueing pattern-matched questions behind them
 
         Returns:
             Dict with: success, sql, confidence, method
@@ -241,76 +401,44 @@ class IntelligentSQLGenerator:
         logger.info(f"Generating SQL for: {question} (language: {language})")
 
         try:
-            # Step 1: Detect pattern
-            pattern = self.detect_pattern(question)
-
-            if not pattern:
-                logger.warning("No pattern matched")
-                logger.warning(f"  use_ai_fallback={self.use_ai_fallback}, claude_cli_client={self.claude_cli_client}, schema_info={'present' if schema_info else 'missing'}")
-
-                # Try Claude CLI fallback for complex queries
-                if self.use_ai_fallback and self.claude_cli_client and schema_info:
-                    logger.info("→ Using Claude CLI for complex query...")
-                    return self.generate_with_ai(question, schema_info)
-                else:
-                    if not self.use_ai_fallback:
-                        logger.warning("  Claude CLI fallback is disabled (use_ai_fallback=False)")
-                    if not self.claude_cli_client:
-                        logger.warning("  Claude CLI client not available")
-                    if not schema_info:
-                        logger.warning("  Schema info not provided")
-
-                    return {
-                        'success': False,
-                        'error': 'Could not understand the question. Please rephrase or ask something like: "How many companies are in the system?"',
-                        'sql': None,
-                        'confidence': 0,
-                        'method': 'no_match'
-                    }
-
-            logger.info(f"Matched pattern: {pattern['pattern_type']} (confidence: {pattern['confidence']})")
-
-            # Step 2: Extract entities
-            entities = self.extract_entities(question)
-
-            if not entities['table']:
-                return {
-                    'success': False,
-                    'error': 'Could not identify which table to query. Please mention a table name like "customers", "orders", etc.',
-                    'sql': None,
-                    'confidence': 0,
-                    'method': 'no_table'
-                }
-
-            logger.info(f"Extracted entities: {entities}")
-
-            # Step 3: Generate SQL
-            sql = self.generate_from_pattern(pattern, entities)
-
-            logger.success(f"Generated SQL: {sql}")
-
-            # ═══════════════════════════════════════════════════════════
-            # SECURITY: READ-ONLY MODE - Block non-SELECT queries
-            # ═══════════════════════════════════════════════════════════
-            if not self._is_read_only_query(sql):
-                logger.warning(f"SECURITY BLOCK: Non-SELECT query blocked: {sql}")
-                return {
-                    'success': False,
-                    'error': 'The bot only supports read queries (SELECT)\nהבוט תומך רק בשאילתות קריאה (SELECT)',
-                    'sql': None,
-                    'confidence': 0,
-                    'method': 'security_block'
-                }
+            result, matches = self._generate_local(question, schema_info)
+            if result is None:
+                with ai_limit if ai_limit is not None else contextlib.nullcontext():
+                    return self.generate_with_ai(question, schema_info, matches, on_sql)
+            return result
 
+        except Exception as e:
+            logger.error(f"SQL generation error: {e}")
             return {
-                'success': True,
-                'sql': sql,
-                'confidence': pattern['confidence'],
-                'method': 'pattern_matching',
-                'pattern_type': pattern['pattern_type'],
-                'entities': entities
+                'success': False,
+                'error': f'Failed to generate SQL: {str(e)}',
+                'sql': None,
+                'confidence': 0,
+                'method': 'error'
             }
 
+    async def agenerate_sql(
+        self,
+        question: str,
+        language: str = 'en',
+        schema_info: Optional[Dict] = None,
+        on_sql: Optional[Callable[[str], None]] = None,
+        ai_limit: Optional[AsyncContextManager] = None
+    ) -> Dict[str, Any]:
+        """
+        Async generate_sql: the pattern path is the same; the AI fallback is
+        awaited instead of blocking the event loop. ai_limit (e.g. an
+        asyncio.Semaphore) is held around the AI fallback only.
+        """
+        logger.info(f"Generating SQL for: {question} (language: {language})")
+
+        try:
+            result, matches = self._generate_local(question, schema_info)
+            if result is None:
+                async with ai_limit if ai_limit is not None else contextlib.nullcontext():
+                    return await self.agenerate_with_ai(question, schema_info, matches, on_sql)
+            return result
+
         except Exception as e:
             logger.error(f"SQL generation error: {e}")
             return {
@@ -321,98 +449,387 @@ class IntelligentSQLGenerator:
                 'method': 'error'
             }
 
-    def generate_with_ai(self, question: str, schema_info: Dict) -> Dict[str, Any]:
+    def _generate_local(
+        self,
+        question: str,
+        schema_info: Optional[Dict]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[List[KeywordMatch]]]:
         """
-        Generate SQL using local Claude CLI for complex queries.
+        Pattern-matching path of generate_sql.
 
-        This is used as a fallback when pattern matching doesn't work.
-        No API keys needed - uses local Claude Code CLI.
+        Returns:
+            (result, None), or (None, keyword matches) when the AI fallback
+            should answer
         """
-        try:
-            if not self.claude_cli_client:
+        if schema_info:
+            self.refresh_entities(schema_info)
+
+        # Step 1: Detect pattern (one automaton pass serves steps 1 and 2)
+        matches = self.match_keywords(question)
+        pattern = self.detect_pattern(question, matches)
+
+        if not pattern:
+            logger.warning("No pattern matched")
+            logger.warning(f"  use_ai_fallback={self.use_ai_fallback}, claude_cli_client={self.claude_cli_client}, schema_info={'present' if schema_info else 'missing'}")
+
+            # Try Claude CLI fallback for complex queries
+            if self.use_ai_fallback and self.claude_cli_client and schema_info:
+                logger.info("→ Using Claude CLI for complex query...")
+                return None, matches
+            else:
+                if not self.use_ai_fallback:
+                    logger.warning("  Claude CLI fallback is disabled (use_ai_fallback=False)")
+                if not self.claude_cli_client:
+                    logger.warning("  Claude CLI client not available")
+                if not schema_info:
+                    logger.warning("  Schema info not provided")
+
                 return {
                     'success': False,
-                    'error': 'Claude CLI not available. Please ensure Claude Code is installed.',
+                    'error': 'Could not understand the question. Please rephrase or ask something like: "How many companies are in the system?"',
                     'sql': None,
                     'confidence': 0,
-                    'method': 'ai_not_available'
-                }
+                    'method': 'no_match'
+                }, None
 
-            logger.info("Calling Claude CLI for complex query...")
-            result = self.claude_cli_client.generate_sql(question, schema_info)
+        logger.info(f"Matched pattern: {pattern['pattern_type']} (confidence: {pattern['confidence']})")
 
-            # SECURITY: Check Claude CLI generated SQL is also read-only
-            sql = result.get('sql', '')
-            if not self._is_read_only_query(sql):
-                logger.warning(f"SECURITY BLOCK: Claude CLI generated non-SELECT query: {sql}")
-                return {
-                    'success': False,
-                    'error': 'The bot only supports read queries (SELECT)\nהבוט תומך רק בשאילתות קריאה (SELECT)',
-                    'sql': None,
-                    'confidence': 0,
-                    'method': 'security_block'
-                }
+        # Step 2: Extract entities
+        entities = self.extract_entities(question, matches)
 
-            # Claude CLI returns: {sql, query_type, risk_level, explanation}
+        if not entities['table']:
             return {
-                'success': True,
-                'sql': sql,
-                'confidence': 0.85,  # AI-generated, high confidence
-                'method': 'claude_cli',
-                'pattern_type': 'AI_GENERATED',
-                'query_type': result.get('query_type', 'READ'),
-                'risk_level': result.get('risk_level', 'low'),
-                'explanation': result.get('explanation', '')
-            }
+                'success': False,
+                'error': 'Could not identify which table to query. Please mention a table name like "customers", "orders", etc.',
+                'sql': None,
+                'confidence': 0,
+                'method': 'no_table'
+            }, None
+
+        logger.info(f"Extracted entities: {entities}")
+
+        # Step 3: Generate SQL
+        sql = self.generate_from_pattern(pattern, entities)
+
+        logger.success(f"Generated SQL: {sql}")
+
+        # ═══════════════════════════════════════════════════════════
+        # SECURITY: READ-ONLY MODE - Block non-SELECT queries
+        # ═══════════════════════════════════════════════════════════
+        if not self._is_read_only_query(sql):
+            logger.warning(f"SECURITY BLOCK: Non-SELECT query blocked: {sql}")
+            return {
+                'success': False,
+                'error': 'The bot only supports read queries (SELECT)\nהבוט תומך רק בשאילתות קריאה (SELECT)',
+                'sql': None,
+                'confidence': 0,
+                'method': 'security_block'
+            }, None
+
+        return {
+            'success': True,
+            'sql': sql,
+            'confidence': pattern['confidence'],
+            'method': 'pattern_matching',
+            'pattern_type': pattern['pattern_type'],
+            'entities': entities
+        }, None
+
+    def generate_with_ai(
+        self,
+        question: str,
+        schema_info: Dict,
+        matches: Optional[List[KeywordMatch]] = None,
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate SQL using local Claude CLI for complex queries.
+
+        This is used as a fallback when pattern matching doesn't work.
+        No API keys needed - uses local Claude Code CLI.
+
+        Args:
+            question: Natural language question
+            schema_info: Full database schema
+            matches: Precomputed match_keywords() result (optional, used for
+                schema pruning)
+            on_sql: Optional early-SQL callback (see generate_sql)
+        """
+        try:
+            answer, request = self._prepare_ai(question, schema_info, matches)
+            if answer:
+                return answer
+
+            logger.info(f"Calling Claude CLI for complex query ({len(request.examples)} examples)...")
+            prompt_question = question
+            for _ in range(settings.sql_compile_max_regenerations + 1):
+                result = self.claude_cli_client.generate_sql(
+                    prompt_question, request.prompt_schema, examples=request.examples,
+                    on_sql=self._guard_early_sql(on_sql, schema_info)
+                )
+                verdict = self._compile_check(result, request)
+                if verdict.valid is not False:
+                    break
+                prompt_question = self._regeneration_question(question, result, verdict)
+            return self._finish_ai(question, request, result, verdict)
+
+        except Exception as e:
+            return self._ai_error(e)
+
+    async def agenerate_with_ai(
+        self,
+        question: str,
+        schema_info: Dict,
+        matches: Optional[List[KeywordMatch]] = None,
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async generate_with_ai: the CLI call is awaited, and the blocking
+        work around it (question cache and similarity index queries, compile
+        check) runs in a worker thread.
+        """
+        try:
+            answer, request = await asyncio.to_thread(self._prepare_ai, question, schema_info, matches)
+            if answer:
+                return answer
+
+            logger.info(f"Calling Claude CLI (async) for complex query ({len(request.examples)} examples)...")
+            prompt_question = question
+            for _ in range(settings.sql_compile_max_regenerations + 1):
+                result = await self.async_cli_client.generate_sql(
+                    prompt_question, request.prompt_schema, examples=request.examples,
+                    on_sql=self._guard_early_sql(on_sql, schema_info)
+                )
+                # The check is a database round trip (skipped on a cached verdict)
+                verdict = await asyncio.to_thread(self._compile_check, result, request)
+                if verdict.valid is not False:
+                    break
+                prompt_question = self._regeneration_question(question, result, verdict)
+            return self._finish_ai(question, request, result, verdict)
 
         except Exception as e:
-            logger.error(f"Claude CLI error: {e}")
+            return self._ai_error(e)
+
+    def _prepare_ai(
+        self,
+        question: str,
+        schema_info: Dict,
+        matches: Optional[List[KeywordMatch]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[_AIRequest]]:
+        """
+        Everything before the AI call: cache, similar-pair examples, schema
+        pruning.
+
+        Returns:
+            (answer, None) when no AI call is needed, else (None, request)
+        """
+        if not self.claude_cli_client:
             return {
                 'success': False,
-                'error': f'Claude CLI failed: {str(e)}',
+                'error': 'Claude CLI not available. Please ensure Claude Code is installed.',
                 'sql': None,
                 'confidence': 0,
-                'method': 'ai_error'
+                'method': 'ai_not_available'
+            }, None
+
+        version = schema_version(schema_info)
+        if self.question_cache:
+            cached = self.question_cache.lookup(question, version)
+            if cached and self._is_read_only_query(cached['sql']):
+                logger.info("✓ Answered from question cache")
+                return {
+                    'success': True,
+                    'sql': cached['sql'],
+                    'confidence': 0.85,
+                    'method': 'question_cache',
+                    'pattern_type': 'AI_GENERATED',
+                    'query_type': cached.get('query_type', 'READ'),
+                    'risk_level': cached.get('risk_level', 'low'),
+                    'explanation': cached.get('explanation', '')
+                }, None
+
+        # Similar past pairs are few-shot examples only: a high character
+        # similarity does not mean the same question ("do not" changes little)
+        examples = []
+        if self.similarity_index is not None:
+            similar = self._similar_pairs(question)
+            examples = [
+                {'question': pair.question, 'sql': pair.sql}
+                for pair in similar
+                if pair.score >= settings.similarity_example_min_score
+            ]
+
+        prompt_schema, pruning = schema_info, None
+        if self.schema_pruner:
+            if matches is None:
+                self.refresh_entities(schema_info)
+                matches = self.match_keywords(question)
+            prompt_schema, pruning = self.schema_pruner.prune(question, schema_info, matches)
+
+        return None, _AIRequest(version, prompt_schema, examples, pruning)
+
+    def _compile_check(self, result: Dict[str, Any], request: _AIRequest) -> CompileVerdict:
+        """Compile-check generated read-only SQL (unknown when disabled or not applicable)."""
+        sql = result.get('sql') or ''
+        if not self.compile_checker or not self._is_read_only_query(sql):
+            return CompileVerdict(None)
+        return self.compile_checker.check(sql, request.version)
+
+    def _regeneration_question(self, question: str, result: Dict[str, Any], verdict: CompileVerdict) -> str:
+        """Question for another AI attempt, with SQL Server's compile error as feedback."""
+        logger.info(f"Regenerating SQL that failed the compile check: {verdict.error}")
+        return (
+            f"{question}\n\n"
+            f"A previous attempt produced this SQL, which SQL Server rejected:\n{result.get('sql', '')}\n"
+            f"Error: {verdict.error}\n"
+            f"Use only tables and columns from the schema."
+        )
+
+    def _finish_ai(
+        self,
+        question: str,
+        request: _AIRequest,
+        result: Dict[str, Any],
+        verdict: CompileVerdict = CompileVerdict(None)
+    ) -> Dict[str, Any]:
+        """
+        Everything after the AI call: security and compile checks. The answer
+        is cached and indexed only once it has run (see record_success).
+        """
+        # SECURITY: Check Claude CLI generated SQL is also read-only
+        sql = result.get('sql', '')
+        if not self._is_read_only_query(sql):
+            logger.warning(f"SECURITY BLOCK: Claude CLI generated non-SELECT query: {sql}")
+            return {
+                'success': False,
+                'error': 'The bot only supports read queries (SELECT)\nהבוט תומך רק בשאילתות קריאה (SELECT)',
+                'sql': None,
+                'confidence': 0,
+                'method': 'security_block'
             }
 
-    def _is_read_only_query(self, sql: str) -> bool:
-        """
-        Check if SQL query is read-only (SELECT only).
+        if verdict.valid is False:
+            return {
+                'success': False,
+                'error': f'Generated SQL does not compile: {verdict.error}',
+                'sql': sql,
+                'confidence': 0,
+                'method': 'compile_error'
+            }
 
-        Returns True if query is SELECT, False for any write operation.
+        # Claude CLI returns: {sql, query_type, risk_level, explanation}
+        return {
+            'success': True,
+            'sql': sql,
+            'confidence': 0.85,  # AI-generated, high confidence
+            'method': 'claude_cli',
+            'pattern_type': 'AI_GENERATED',
+            'query_type': result.get('query_type', 'READ'),
+            'risk_level': result.get('risk_level', 'low'),
+            'explanation': result.get('explanation', ''),
+            'schema_pruning': request.pruning.to_dict() if request.pruning else None,
+            'result_columns': verdict.columns if verdict.valid else None,
+            'schema_version': request.version
+        }
+
+    def record_success(self, question: str, result: Dict[str, Any]) -> None:
         """
-        if not sql:
-            return False
+        Cache an AI answer and index it as a similar-pair example once it has
+        executed successfully (called by whoever executes it: QueryExecutor,
+        workers), so SQL that fails at runtime is never served again.
+        Pattern and cached answers are skipped - they are not new answers.
 
-        # Remove leading/trailing whitespace
-        sql_clean = sql.strip().upper()
+        Args:
+            question: The question asked
+            result: Its generate_sql / agenerate_sql result
+        """
+        sql = result.get('sql')
+        if result.get('method') != 'claude_cli' or not sql:
+            return
+        try:
+            if not self._is_read_only_query(sql):
+                return
+            if self.question_cache and result.get('schema_version'):
+                self.question_cache.store(question, result['schema_version'], sql, {
+                    'query_type': result.get('query_type', 'READ'),
+                    'risk_level': result.get('risk_level', 'low'),
+                    'explanation': result.get('explanation', '')
+                })
+            if self.similarity_index is not None:
+                self.similarity_index.add(question, sql)
+        except Exception as e:
+            logger.warning(f"Question cache / similarity index not updated: {e}")
 
-        # Remove SQL comments
-        sql_clean = re.sub(r'--.*$', '', sql_clean, flags=re.MULTILINE)
-        sql_clean = re.sub(r'/\*.*?\*/', '', sql_clean, flags=re.DOTALL)
+    def _guard_early_sql(
+        self,
+        on_sql: Optional[Callable[[str], None]],
+        schema_info: Dict
+    ) -> Optional[Callable[[str], None]]:
+        """
+        Wrap an early-SQL callback so it only sees streamed SQL that is
+        read-only and references known tables (None disables streaming).
+        """
+        if on_sql is None:
+            return None
+
+        def guarded(sql: str):
+            if self._is_read_only_query(sql) and self._references_known_tables(sql, schema_info):
+                on_sql(sql)
+            else:
+                logger.info("Streamed SQL not eligible for early execution")
+
+        return guarded
+
+    def _ai_error(self, error: Exception) -> Dict[str, Any]:
+        """Failure result for the AI fallback."""
+        logger.error(f"Claude CLI error: {error}")
+        return {
+            'success': False,
+            'error': f'Claude CLI failed: {str(error)}',
+            'sql': None,
+            'confidence': 0,
+            'method': 'ai_error'
+        }
 
-        # Get first keyword
-        first_word = sql_clean.split()[0] if sql_clean.split() else ''
+    def _similar_pairs(self, question: str) -> List:
+        """Top similar past pairs, loading the index from the queue on first use."""
+        if not self.similarity_index.loaded:
+            # Mark first so an unreachable queue DB is tried once, not per question
+            self.similarity_index.loaded = True
+            try:
+                self.similarity_index.load_from_queue(connect_queue_db)
+            except Exception as e:
+                logger.warning(f"Similarity index not loaded: {e}")
 
-        # Only allow SELECT and WITH (for CTEs that lead to SELECT)
-        allowed_keywords = ['SELECT', 'WITH']
+        return self.similarity_index.search(question, k=max(settings.similarity_example_count, 1))
 
-        if first_word not in allowed_keywords:
-            logger.warning(f"Non-SELECT query detected: starts with '{first_word}'")
+    def _references_known_tables(self, sql: str, schema_info: Dict) -> bool:
+        """Check that every FROM/JOIN table of the SQL exists in the schema."""
+        known = {table.get('name', '').lower() for table in schema_info.get('tables', [])}
+        if not known:
             return False
 
-        # Additional check: ensure no dangerous keywords anywhere
-        dangerous_keywords = [
-            'UPDATE', 'DELETE', 'INSERT', 'DROP', 'CREATE', 'ALTER',
-            'TRUNCATE', 'EXEC', 'EXECUTE', 'MERGE', 'GRANT', 'REVOKE'
-        ]
+        tokens = code_tokens(tokenize(sql))
+        for index, token in enumerate(tokens):
+            if token.is_keyword('FROM', 'JOIN'):
+                name = object_name(tokens, index + 1)
+                if name and name.split('.')[-1].lower() not in known:
+                    return False
+        return True
+
+    def _is_read_only_query(self, sql: str) -> bool:
+        """
+        Check if SQL query is read-only (SELECT only).
 
-        for keyword in dangerous_keywords:
-            if keyword in sql_clean:
-                logger.warning(f"Dangerous keyword '{keyword}' found in query")
-                return False
+        Returns True if query is SELECT, False for any write operation.
+        Uses the shared T-SQL lexer, so keywords inside identifiers
+        (e.g. LastUpdated) or string literals do not cause false blocks.
+        """
+        if is_read_only(sql):
+            return True
 
-        return True
+        logger.warning(f"Non-SELECT or write keyword detected in query: {(sql or '')[:100]}")
+        return False
 
 
 # Global instance
@@ -0,0 +1,92 @@
+"""
+Small thread-safe LRU cache with hit/miss accounting.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache.
+
+    Safe to share between worker threads. A maxsize of 0 disables caching
+    (every lookup is a miss and nothing is stored), which is handy for
+    benchmarks and for turning a cache off through configuration.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return cached value (marking it recently used) or default."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return cached value, computing and storing it on a miss."""
+        sentinel = _MISSING
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove and return an entry."""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """Drop all entries (statistics are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit-rate statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+
+_MISSING = object()
@@ -0,0 +1,112 @@
+"""
+Incremental extraction of one field from a streamed JSON answer.
+
+The AI providers answer with a JSON object whose "sql" field comes first
+and whose "explanation" can take seconds more to generate. Waiting for the
+whole answer before parsing wastes that time. SQLFieldExtractor is fed the
+text as it streams in and reports the top-level "sql" string as soon as its
+closing quote arrives, so validation and execution can start while the rest
+of the answer is still being generated.
+
+Text before the object (prose, a ```json fence) is ignored; strings nested
+deeper than the top-level object never match.
+"""
+import json
+from typing import Callable, Optional
+
+
+class SQLFieldExtractor:
+    """
+    Streaming scanner for one top-level string field of a JSON object.
+
+    Args:
+        field: Field name to extract (default "sql")
+    """
+
+    def __init__(self, field: str = "sql"):
+        self.field = field
+        self.text = ""
+        self.value: Optional[str] = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._candidate_key: Optional[str] = None
+        self._key: Optional[str] = None
+        self._expect_value = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the field value is complete."""
+        return self.value is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add streamed text.
+
+        Returns:
+            The decoded field value the first time it is complete, else None
+        """
+        self.text += chunk
+        if self.value is not None:
+            return None
+
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        raw = text[self._string_start:i]
+                        if self._expect_value:
+                            self._expect_value = False
+                            if self._key == self.field:
+                                try:
+                                    self.value = json.loads(f'"{raw}"')
+                                except json.JSONDecodeError:
+                                    return None
+                                self._pos = i + 1
+                                return self.value
+                        else:
+                            self._candidate_key = raw
+            elif ch == '"':
+                # Strings only count inside the object (prose may contain quotes)
+                if self._depth >= 1:
+                    self._in_string = True
+                    self._string_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth = max(0, self._depth - 1)
+            elif self._depth == 1:
+                if ch == ":":
+                    self._key = self._candidate_key
+                    self._expect_value = True
+                elif ch == ",":
+                    self._expect_value = False
+            i += 1
+
+        self._pos = i
+        return None
+
+
+def sql_text_handler(on_sql: Callable[[str], None], field: str = "sql") -> Callable[[str], None]:
+    """
+    Text callback for a streaming provider: feeds an extractor and calls
+    on_sql once, as soon as the field is complete.
+    """
+    extractor = SQLFieldExtractor(field)
+
+    def handle(text: str):
+        value = extractor.feed(text)
+        if value is not None:
+            on_sql(value)
+
+    return handle
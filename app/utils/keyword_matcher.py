@@ -0,0 +1,169 @@
+"""
+Multi-pattern keyword matcher (Aho-Corasick automaton).
+
+Finds every occurrence of every keyword in one pass over the text, with
+positions, so callers can prefer the longest match ("contact groups" over
+"contact") instead of whichever keyword happens to be tested first.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+
+# Hebrew one-letter prefixes that attach to the following word
+# (ה the, ו and, ב in, ל to, מ from, ש that, כ as)
+HEBREW_PREFIXES = frozenset("הובלמשכ")
+
+# English inflections a Latin keyword may carry ("count" in "counts",
+# "list" in "listing"), as the substring matching this replaced allowed
+LATIN_SUFFIXES = ("s", "es", "ing")
+
+
+class KeywordMatch(NamedTuple):
+    """A keyword occurrence in the searched text."""
+    start: int
+    end: int
+    keyword: str
+    payloads: Tuple[Any, ...]
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a set of keywords.
+
+    Each keyword carries one or more payloads (e.g. ("table", "Contacts")),
+    so a single automaton can serve several lookup tables. Matching is
+    case-insensitive and only reports whole-word matches: the match must
+    start at a word boundary (optionally after Hebrew prefix letters) and,
+    for keywords ending in a Latin letter or digit, end at one too - or
+    after an inflection suffix (LATIN_SUFFIXES).
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]] = ()):
+        """
+        Build the automaton.
+
+        Args:
+            keywords: (keyword, payload) pairs; a keyword may appear more than once
+        """
+        self._payloads: Dict[str, List[Any]] = {}
+        for keyword, payload in keywords:
+            keyword = keyword.lower()
+            if keyword:
+                self._payloads.setdefault(keyword, []).append(payload)
+        self._build()
+
+    def _build(self):
+        """Construct goto, failure and output tables."""
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[str]] = [[]]
+
+        for keyword in self._payloads:
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(keyword)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                if state:
+                    fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(out) for out in outputs]
+        self._frozen_payloads = {kw: tuple(p) for kw, p in self._payloads.items()}
+
+    @property
+    def keywords(self) -> List[str]:
+        """All indexed keywords."""
+        return list(self._payloads)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        Return every whole-word keyword occurrence, in order of end position.
+
+        Args:
+            text: Text to search (case-insensitive)
+        """
+        text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        matches: List[KeywordMatch] = []
+
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in outputs[state]:
+                start = index - len(keyword) + 1
+                if self._is_whole_word(text, start, index + 1, keyword):
+                    matches.append(KeywordMatch(start, index + 1, keyword, self._frozen_payloads[keyword]))
+
+        return matches
+
+    def find_longest(self, text: str) -> List[KeywordMatch]:
+        """
+        Return non-overlapping matches, preferring the longest at each position.
+
+        Longer matches win over any shorter match they overlap, so
+        "document collections" hides both "document" and "collections".
+        """
+        chosen: List[KeywordMatch] = []
+        for match in sorted(self.find_all(text), key=lambda m: (-m.length, m.start)):
+            if all(match.end <= other.start or match.start >= other.end for other in chosen):
+                chosen.append(match)
+        return sorted(chosen, key=lambda m: m.start)
+
+    @staticmethod
+    def _is_whole_word(text: str, start: int, end: int, keyword: str) -> bool:
+        """Check word boundaries around text[start:end]."""
+        if start > 0 and text[start - 1].isalnum():
+            # Only Hebrew keywords may carry attached prefixes (e.g. "החברות")
+            if not _is_hebrew(keyword[0]):
+                return False
+            position = start
+            while position > 0 and start - position < 3 and text[position - 1] in HEBREW_PREFIXES:
+                position -= 1
+            if position == start or (position > 0 and text[position - 1].isalnum()):
+                return False
+
+        # Latin keywords must also end at a boundary ("log" must not match "logo"),
+        # possibly after an inflection ("shows", "listing"); Hebrew keywords
+        # may carry any suffix, as with the previous substring test
+        last = keyword[-1]
+        if last.isascii() and last.isalnum() and end < len(text) and text[end].isalnum():
+            return any(
+                text.startswith(suffix, end) and not _continues_word(text, end + len(suffix))
+                for suffix in LATIN_SUFFIXES
+            )
+        return True
+
+
+def _continues_word(text: str, index: int) -> bool:
+    """Check whether a word character follows at index."""
+    return index < len(text) and text[index].isalnum()
+
+
+def _is_hebrew(char: str) -> bool:
+    """Check whether a character is in the Hebrew block."""
+    return "\u0590" <= char <= "\u05ff"
@@ -0,0 +1,46 @@
+"""
+Schema fingerprints.
+
+A schema_info dict (see DatabaseManager.get_schema_info) is hashed per table
+and as a whole so that caches derived from it - the entity index, rendered
+schema prompts, cached answers - can tell when they are stale and rebuild
+only what changed.
+"""
+import hashlib
+import json
+from typing import Any, Dict
+
+from app.utils.cache import LRUCache
+
+
+# id(schema_info) -> (schema_info, version); the entry keeps the schema
+# alive, so its id cannot be reused by another dict while cached
+_versions = LRUCache(maxsize=8)
+
+
+def table_fingerprint(table: Dict[str, Any]) -> str:
+    """Stable hash of one table entry (name, columns, keys)."""
+    payload = json.dumps(table, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def schema_version(schema_info: Dict[str, Any]) -> str:
+    """
+    Return the schema's version hash.
+
+    A "version" key set by whoever built the schema is used as is. Otherwise
+    the hash is computed once per schema object and memoized; schema_info is
+    not modified (it is shared between threads). Schema caches are replaced,
+    not mutated, on refresh, so a memoized version never goes stale.
+    """
+    version = schema_info.get("version")
+    if version is not None:
+        return version
+
+    cached = _versions.get(id(schema_info))
+    if cached is not None and cached[0] is schema_info:
+        return cached[1]
+    payload = json.dumps(schema_info, sort_keys=True, default=str, ensure_ascii=False)
+    version = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+    _versions.put(id(schema_info), (schema_info, version))
+    return version
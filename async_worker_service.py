@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Async Worker Service - Queue Processing on a Single Event Loop
+
+Same queue contract as worker_service.py (SKIP LOCKED claims, leases
+renewed by heartbeats, LISTEN/NOTIFY wakeup, release on shutdown), but
+every request is a task on one long-lived event loop instead of a thread:
+- queue database access goes through an asyncpg pool
+- the AI fallback is awaited (agenerate_sql), limited by an asyncio.Semaphore
+- the target database driver (pyodbc) is blocking, so queries run on a
+  small thread pool of WORKER_DB_CONCURRENCY threads
+- Teams notifications are awaited on the same loop (no asyncio.run per
+  request)
+
+Run with: python worker_service.py --async
+"""
+import asyncio
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.services.sql_generator import intelligent_sql_generator
+from app.core.database import db_manager
+from app.core.async_queue_db import (
+    AsyncQueueDB,
+    AsyncQueueListener,
+    claim_jobs,
+    extend_leases,
+    reap_expired,
+    release_jobs,
+    seconds_until_due,
+    update_status,
+)
+from app.core.job_queue import capped_wait, make_worker_id
+from app.services.teams_notifier import send_proactive_message
+
+
+class AsyncWorkerService:
+    """Background worker processing queue requests as asyncio tasks."""
+
+    def __init__(
+        self,
+        poll_interval: int = 10,
+        batch_size: int = 10,
+        listen: Optional[bool] = None,
+        concurrency: Optional[int] = None
+    ):
+        """
+        Initialize async worker service.
+
+        Args:
+            poll_interval: Seconds between queue checks without LISTEN/NOTIFY
+                (default: 10)
+            batch_size: Jobs claimed per poll (default: 10)
+            listen: Wake on queue notifications (default: QUEUE_LISTEN_ENABLED)
+            concurrency: Requests in flight at once (default: WORKER_ASYNC_CONCURRENCY)
+        """
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency or settings.worker_async_concurrency)
+        self.worker_id = make_worker_id()
+        self.queue_db = AsyncQueueDB.from_settings()
+        listen = settings.queue_listen_enabled if listen is None else listen
+        self.listener = AsyncQueueListener(self.queue_db, self._wake_up) if listen else None
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.worker_db_concurrency),
+            thread_name_prefix="worker-db"
+        )
+        # Target database schema (see WorkerService.get_schema)
+        self.schema_cache: Optional[dict] = None
+        # Loop objects, created in run()
+        self.ai_slots: Optional[asyncio.Semaphore] = None
+        self._schema_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        # Claimed jobs whose leases the heartbeat keeps alive
+        self.leased = set()
+        self.running = False
+        self.processed_count = 0
+        self.error_count = 0
+
+        logger.info(
+            f"Async worker service {self.worker_id} initialized "
+            f"(poll_interval={poll_interval}s, concurrency={self.concurrency})"
+        )
+
+    def _wake_up(self):
+        """Called on the loop for each queue notification (and on shutdown)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self):
+        """Stop claiming; in-flight requests finish first."""
+        logger.info("Shutdown requested, finishing in-flight requests...")
+        self.running = False
+        self._wake_up()
+
+    async def fetch_pending_requests(self, limit: Optional[int] = None) -> list:
+        """Claim pending requests from queue (see WorkerService.fetch_pending_requests)."""
+        try:
+            async with self.queue_db.connection() as conn:
+                claimed = await claim_jobs(conn, self.worker_id, limit or self.batch_size, settings.queue_lease_seconds)
+        except Exception as e:
+            logger.error(f"Failed to fetch pending requests: {e}")
+            return []
+        self.leased.update(r['id'] for r in claimed)
+        return claimed
+
+    async def release_requests(self, requests: list):
+        """Hand claimed requests this worker will not process back to the queue."""
+        if not requests:
+            return
+        self.leased.difference_update(r['id'] for r in requests)
+        try:
+            async with self.queue_db.connection() as conn:
+                released = await release_jobs(conn, self.worker_id, [r['id'] for r in requests])
+            logger.info(f"Released {released} unprocessed request(s) back to the queue")
+        except Exception as e:
+            logger.error(f"Failed to release requests: {e}")
+
+    async def heartbeat(self):
+        """Extend the leases of this worker's jobs, then reap expired ones (see LeaseKeeper)."""
+        if self.leased:
+            ids = list(self.leased)
+            async with self.queue_db.connection() as conn:
+                owned = await extend_leases(conn, self.worker_id, ids, settings.queue_lease_seconds)
+            lost = set(ids) - owned
+            if lost:
+                self.leased.difference_update(lost)
+                logger.warning(f"Lost lease on job(s) {sorted(lost)}; their results will not be recorded by this worker")
+
+        async with self.queue_db.connection() as conn:
+            reaped = await reap_expired(
+                conn,
+                settings.queue_max_attempts,
+                settings.queue_retry_backoff,
+                settings.queue_retry_backoff_max
+            )
+        if reaped:
+            failed = [row['id'] for row in reaped if row['status'] == 'failed']
+            logger.warning(
+                f"Reaped {len(reaped)} job(s) with expired leases"
+                + (f", failed after {settings.queue_max_attempts} attempts: {failed}" if failed else "")
+            )
+
+    async def keep_leases(self):
+        """Heartbeat every QUEUE_HEARTBEAT_INTERVAL seconds until cancelled."""
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Lease heartbeat failed: {e}")
+            await asyncio.sleep(settings.queue_heartbeat_interval)
+
+    async def next_due(self) -> Optional[float]:
+        """Seconds until a job in retry backoff is claimable (see WorkerService.next_due)."""
+        try:
+            async with self.queue_db.connection() as conn:
+                return await seconds_until_due(conn)
+        except Exception as e:
+            logger.warning(f"Could not check retry backoffs: {e}")
+            return None
+
+    async def wait_for_requests(self):
+        """
+        Wait until new requests may be pending: a queue notification, the
+        safety-net poll interval, a reaped job's backoff ending, or shutdown.
+        Without a listener (or while it cannot connect) this waits
+        poll_interval seconds.
+        """
+        timeout = self.poll_interval
+        if self.listener is not None:
+            try:
+                await self.listener.listen()
+                timeout = settings.queue_safety_poll_interval
+            except Exception as e:
+                logger.warning(f"Queue listener unavailable, polling: {e}")
+        try:
+            await asyncio.wait_for(self._wake.wait(), capped_wait(timeout, await self.next_due()))
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def update_request_status(
+        self,
+        request_id: int,
+        status: str,
+        generated_sql: Optional[str] = None,
+        result_data: Optional[str] = None,
+        error_message: Optional[str] = None,
+        rows_affected: Optional[int] = None,
+        execution_time_ms: Optional[float] = None
+    ) -> bool:
+        """
+        Update request status in queue, if this worker still holds the
+        job's lease. Returns whether it was committed.
+        """
+        try:
+            async with self.queue_db.connection() as conn:
+                owned = await update_status(
+                    conn,
+                    request_id,
+                    self.worker_id,
+                    status,
+                    sql_query=generated_sql,
+                    query_results=result_data,
+                    error_message=error_message,
+                    rows_affected=rows_affected,
+                    execution_time_ms=round(execution_time_ms) if execution_time_ms is not None else None
+                )
+            if not owned:
+                logger.warning(f"Request {request_id} is no longer claimed by this worker (lease expired); update skipped")
+            return owned
+        except Exception as e:
+            logger.error(f"Failed to update request {request_id}: {e}")
+            return False
+
+    async def execute_sql(self, sql: str):
+        """Run a query on the target database without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.db_executor,
+            partial(db_manager.execute_query, sql=sql, fetch_results=True)
+        )
+
+    async def get_schema(self) -> dict:
+        """Get the target database schema (cached; loaded on the DB thread pool)."""
+        if self.schema_cache is None:
+            async with self._schema_lock:
+                if self.schema_cache is None:
+                    logger.info("Loading database schema...")
+                    loop = asyncio.get_running_loop()
+                    self.schema_cache = await loop.run_in_executor(self.db_executor, db_manager.get_schema_info)
+        return self.schema_cache
+
+    async def process_request(self, request: dict):
+        """Process a single request from queue."""
+        request_id = request['id']
+        question = request['question']
+        language = request.get('language', 'en')
+        user_id = request.get('user_id')
+        conversation_id = request.get('conversation_id')
+
+        logger.info(f"Processing request {request_id}: {question[:50]}...")
+
+        try:
+            # Step 1: Generate SQL (the AI fallback is awaited, not blocking)
+            sql_result = await intelligent_sql_generator.agenerate_sql(
+                question=question,
+                language=language,
+                schema_info=await self.get_schema(),
+                ai_limit=self.ai_slots
+            )
+
+            if not sql_result['success']:
+                raise Exception(sql_result.get('error', 'SQL generation failed'))
+
+            generated_sql = sql_result['sql']
+            logger.info(f"Generated SQL: {generated_sql}")
+
+            # Step 2: Execute SQL query on the DB thread pool
+            results, rows_affected, execution_time = await self.execute_sql(generated_sql)
+            logger.info(f"Query executed: {rows_affected} rows, {execution_time:.2f}ms")
+            # An AI answer that ran is cached and an example for similar questions
+            intelligent_sql_generator.record_success(question, sql_result)
+
+            # Step 3: Format results
+            result_data = json.dumps(results, default=str, ensure_ascii=False)
+
+            # Step 4: Update database
+            durable = await self.update_request_status(
+                request_id=request_id,
+                status='completed',
+                generated_sql=generated_sql,
+                result_data=result_data,
+                rows_affected=rows_affected,
+                execution_time_ms=execution_time
+            )
+
+            # Step 5: Send proactive Teams message, only once the result is
+            # committed (a job whose status was lost - or that was reaped and
+            # taken over by another worker - is processed again)
+            if user_id and conversation_id and durable:
+                try:
+                    await send_proactive_message(
+                        user_id=user_id,
+                        conversation_id=conversation_id,
+                        language=language,
+                        question=question,
+                        results=results,
+                        rows_affected=rows_affected,
+                        execution_time=execution_time
+                    )
+                    logger.info("Teams notification sent successfully")
+                except Exception as e:
+                    logger.warning(f"Failed to send Teams notification: {e}")
+            elif not (user_id and conversation_id):
+                logger.info("Skipping Teams notification (no user_id/conversation_id)")
+
+            self.processed_count += 1
+            logger.success(f"Request {request_id} completed successfully")
+
+        except Exception as e:
+            logger.error(f"Failed to process request {request_id}: {e}")
+            await self.update_request_status(
+                request_id=request_id,
+                status='failed',
+                error_message=str(e)
+            )
+            self.error_count += 1
+        finally:
+            self.leased.discard(request_id)
+
+    async def run(self):
+        """Main worker loop - runs until SIGINT/SIGTERM."""
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+
+        self.ai_slots = asyncio.Semaphore(max(1, settings.worker_ai_concurrency))
+        self._schema_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self.running = True
+
+        logger.info("=" * 60)
+        logger.info("🚀 Async Worker Service Started")
+        logger.info(f"Worker ID: {self.worker_id}")
+        if self.listener is not None:
+            logger.info(f"Wakeup: LISTEN/NOTIFY (safety poll {settings.queue_safety_poll_interval}s)")
+        else:
+            logger.info(f"Poll Interval: {self.poll_interval}s")
+        logger.info(
+            f"Concurrency: {self.concurrency} "
+            f"(AI {settings.worker_ai_concurrency}, DB {settings.worker_db_concurrency})"
+        )
+        logger.info(f"Environment: {settings.deployment_environment}")
+        logger.info("=" * 60)
+
+        # Listen before the first claim, so a request inserted in between
+        # still wakes us (wait_for_requests reconnects if this fails)
+        if self.listener is not None:
+            try:
+                await self.listener.listen()
+            except Exception as e:
+                logger.warning(f"Queue listener unavailable, polling: {e}")
+
+        lease_task = asyncio.create_task(self.keep_leases())
+        in_flight = set()
+
+        while self.running:
+            try:
+                in_flight = {task for task in in_flight if not task.done()}
+                free = self.concurrency - len(in_flight)
+                if free <= 0:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                # Claim only what can start now; the rest stays available
+                # to other workers
+                limit = min(self.batch_size, free)
+                pending = await self.fetch_pending_requests(limit)
+
+                if pending:
+                    logger.info(f"Found {len(pending)} pending request(s)")
+                    for index, request in enumerate(pending):
+                        if not self.running:
+                            await self.release_requests(pending[index:])
+                            break
+                        in_flight.add(asyncio.create_task(self.process_request(request)))
+                elif self.processed_count > 0 and self.processed_count % 10 == 0:
+                    logger.info(
+                        f"Status: {self.processed_count} processed, "
+                        f"{self.error_count} errors, "
+                        f"queue DB pool {self.queue_db.stats()}"
+                    )
+
+                # A full claim means more are likely queued: claim again now
+                if len(pending) < limit:
+                    await self.wait_for_requests()
+
+            except Exception as e:
+                logger.error(f"Worker loop error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+        # Graceful shutdown: let in-flight requests finish
+        if in_flight:
+            logger.info(f"Waiting for {len(in_flight)} in-flight request(s) to finish...")
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        lease_task.cancel()
+        await asyncio.gather(lease_task, return_exceptions=True)
+
+        if self.listener is not None:
+            await self.listener.close()
+        self.db_executor.shutdown(wait=True)
+
+        logger.info("=" * 60)
+        logger.info("Async Worker Service Stopped")
+        logger.info(f"Total Processed: {self.processed_count}")
+        logger.info(f"Total Errors: {self.error_count}")
+        logger.info(f"Queue DB pool: {self.queue_db.stats()}")
+        logger.info("=" * 60)
+        await self.queue_db.close()
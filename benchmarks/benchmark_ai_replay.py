@@ -0,0 +1,152 @@
+"""
+Throughput benchmark of UnifiedAIClient against replayed provider calls.
+
+Replays the test_ai_providers.py scenario through the real routing,
+hedging and fallback code, with no Claude CLI or network: provider answers
+come from a fixture file (recorded with `python test_ai_providers.py
+--record FIXTURES`, or AI_REPLAY_MODE=record). Without --fixtures, a
+synthetic recording is used: claude_cli at 2.0s and openai at 1.2s.
+
+Each scenario fires --requests questions, --concurrency at a time, and
+reports p50/p95 latency, throughput, errors and how often the fallback or
+a hedge answered. --scale shrinks all latencies so a run takes seconds;
+with a fixed --seed the runs are repeatable.
+
+Usage:
+    python benchmarks/benchmark_ai_replay.py
+    python benchmarks/benchmark_ai_replay.py --fixtures fixtures/ai_replay.jsonl --latency recorded --scale 1
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.config import settings
+from app.core.ai_client import UnifiedAIClient
+from app.core.replay_client import FixtureStore, replay_key
+from test_ai_providers import QUESTION, SCHEMA
+
+
+SYNTHETIC_LATENCY = {"claude_cli": 2.0, "openai": 1.2}
+SYNTHETIC_ANSWER = {
+    "sql": "SELECT TOP 10 c.name, SUM(o.total_amount) AS total_spent FROM customers c "
+           "JOIN orders o ON o.customer_id = c.id GROUP BY c.name ORDER BY total_spent DESC",
+    "query_type": "READ",
+    "risk_level": "low",
+    "explanation": "Top 10 customers by total order amount",
+}
+
+
+def synthetic_fixtures() -> str:
+    """Write a synthetic recording of the scenario; returns its path."""
+    path = os.path.join(tempfile.mkdtemp(prefix="ai-replay-"), "fixtures.jsonl")
+    store = FixtureStore(path)
+    for provider, latency in SYNTHETIC_LATENCY.items():
+        store.record({
+            "key": replay_key(provider, QUESTION, SCHEMA),
+            "provider": provider,
+            "question": QUESTION,
+            "latency": latency,
+            "response": SYNTHETIC_ANSWER,
+        })
+    return path
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1)]
+
+
+async def run_scenario(client, requests, concurrency):
+    """Fire the scenario question; returns (latencies, results, errors, wall)."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies, results, errors = [], [], 0
+
+    async def one():
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                results.append(await client.agenerate_sql(QUESTION, SCHEMA))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, results, errors, time.perf_counter() - start
+
+
+def report(name, latencies, results, errors, wall, scale):
+    # Latencies are reported unscaled (as the providers would take)
+    p50 = statistics.median(latencies) / scale
+    p95 = percentile(latencies, 95) / scale
+    fallback = sum(1 for r in results if r.get("fallback_used"))
+    hedged = sum(1 for r in results if r.get("hedged"))
+    print(
+        f"{name:<24} p50 {p50:6.2f}s   p95 {p95:6.2f}s   "
+        f"throughput {len(latencies) / wall:8.1f} req/s   "
+        f"errors {errors:3d}   fallback {fallback:3d}   hedged {hedged:3d}"
+    )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Replayed AI provider throughput benchmark")
+    parser.add_argument("--fixtures", help="Recorded fixtures (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", default="lognormal", choices=["recorded", "fixed", "lognormal"])
+    parser.add_argument("--scale", type=float, default=0.01, help="Latency multiplier (run faster than real time)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Per-call provider logs would dominate the run
+    logger.disable("app")
+
+    path = args.fixtures or synthetic_fixtures()
+    settings.ai_replay_mode = "replay"
+    settings.ai_replay_fixtures = path
+    settings.ai_replay_latency = args.latency
+    settings.ai_replay_latency_scale = args.scale
+    settings.ai_replay_seed = args.seed
+    # Hedge budgets and breaker cooldown shrink with the latencies
+    settings.ai_hedge_default_budget *= args.scale
+    settings.ai_hedge_min_budget *= args.scale
+    settings.ai_breaker_cooldown *= args.scale
+
+    scenarios = [
+        ("baseline, no hedging", {"ai_hedging_enabled": False}),
+        ("baseline, hedging", {"ai_hedging_enabled": True}),
+        ("10% failures", {"ai_hedging_enabled": True, "ai_replay_failure_rate": 0.1}),
+        ("10% invalid JSON", {"ai_hedging_enabled": True, "ai_replay_parse_failure_rate": 0.1}),
+    ]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, latency {args.latency}, "
+          f"scale {args.scale}, seed {args.seed}")
+    print(f"fixtures: {path}\n")
+
+    for name, overrides in scenarios:
+        saved = {key: getattr(settings, key) for key in ("ai_hedging_enabled", "ai_replay_failure_rate", "ai_replay_parse_failure_rate")}
+        for key, value in overrides.items():
+            setattr(settings, key, value)
+        try:
+            client = UnifiedAIClient()
+            latencies, results, errors, wall = asyncio.run(run_scenario(client, args.requests, args.concurrency))
+            report(name, latencies, results, errors, wall, args.scale)
+        finally:
+            for key, value in saved.items():
+                setattr(settings, key, value)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Latency benchmark: spawn-per-call Claude CLI vs the persistent session pool.
+
+Uses benchmarks/fake_claude_cli.py (tunable with FAKE_CLI_STARTUP and
+FAKE_CLI_THINK) so it runs anywhere. Requests are fired from a thread pool
+to simulate concurrent questions; p50/p95 latency per request is reported.
+Pool numbers are steady-state: one warm-up request per session runs first.
+Sessions are single-use, so each answer's replacement boots in the
+background inside the run; under load requests can still wait for one.
+
+Usage:
+    python benchmarks/benchmark_claude_cli_pool.py
+    python benchmarks/benchmark_claude_cli_pool.py --requests 60 --concurrency 4 --pool-size 4
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.claude_cli_pool import ClaudeCLIPool
+
+
+FAKE_CLI = [sys.executable, os.path.join(os.path.dirname(__file__), "fake_claude_cli.py")]
+PROMPT = "Generate a T-SQL query for this question.\n\nQUESTION:\nLatest companies"
+
+
+def spawn_per_call(_):
+    """Current behaviour: one `claude --print` process per question."""
+    start = time.perf_counter()
+    subprocess.run(FAKE_CLI + ["--print"], input=PROMPT, capture_output=True, text=True, timeout=30, check=True)
+    return time.perf_counter() - start
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1)]
+
+
+def report(name, latencies, wall):
+    print(
+        f"{name:<16} p50 {statistics.median(latencies) * 1000:8.0f} ms   "
+        f"p95 {percentile(latencies, 95) * 1000:8.0f} ms   "
+        f"throughput {len(latencies) / wall:6.2f} req/s"
+    )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Claude CLI pool benchmark")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, pool size {args.pool_size}")
+    print(f"fake CLI start-up {os.getenv('FAKE_CLI_STARTUP', '0.8')}s, answer {os.getenv('FAKE_CLI_THINK', '0.2')}s\n")
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(spawn_per_call, range(args.requests)))
+        report("spawn-per-call", latencies, time.perf_counter() - start)
+
+    pool = ClaudeCLIPool(FAKE_CLI, size=args.pool_size, max_queue=args.requests)
+    pool.warm()
+
+    def pooled(_):
+        start = time.perf_counter()
+        pool.ask(PROMPT, timeout=30)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        # Let the warmed sessions finish booting (happens once per process)
+        list(executor.map(pooled, range(args.pool_size)))
+
+        start = time.perf_counter()
+        latencies = list(executor.map(pooled, range(args.requests)))
+        report("session pool", latencies, time.perf_counter() - start)
+
+    print(f"\npool stats: {pool.stats()}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for QueryClassifier over a corpus of queue SQL.
+
+Compares uncached classification (cache disabled) with the memoized
+classifier on the same corpus. By default a built-in corpus shaped like
+pattern-generator and Claude CLI output is used; pass --from-queue to pull
+real sql_query values from the PostgreSQL queue instead.
+
+Usage:
+    python benchmarks/benchmark_query_classifier.py
+    python benchmarks/benchmark_query_classifier.py --from-queue 5000 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.query_classifier import QueryClassifier
+
+
+SAMPLE_CORPUS = [
+    "SELECT COUNT(*) as count FROM Companies ",
+    "SELECT COUNT(*) as count FROM Contacts ",
+    "SELECT TOP 100 * FROM Documents  ",
+    "SELECT TOP 100 * FROM Contacts  ",
+    "SELECT TOP 100 * FROM Logs WHERE created_at >= DATEADD(week, -1, GETDATE()) ",
+    "SELECT TOP 100 * FROM DocumentCollections WHERE created_at >= DATEADD(month, -1, GETDATE()) ",
+    "SELECT None, COUNT(*) as count FROM Groups  GROUP BY None",
+    "SELECT c.CompanyName, COUNT(d.Id) AS DocumentCount FROM Companies c "
+    "LEFT JOIN Documents d ON d.CompanyId = c.Id GROUP BY c.CompanyName ORDER BY DocumentCount DESC",
+    "WITH recent AS (SELECT * FROM Documents WHERE CreatedDate >= DATEADD(day, -7, GETDATE())) "
+    "SELECT Status, COUNT(*) FROM recent GROUP BY Status",
+    "SELECT TOP 10 c.FirstName, c.LastName, c.Email FROM Contacts c "
+    "WHERE c.LastUpdated > '2024-01-01' AND c.Email LIKE N'%@example.com' ORDER BY c.LastUpdated DESC",
+    "UPDATE Companies SET IsActive = 0 WHERE Id = 42",
+    "DELETE FROM Logs WHERE Timestamp < DATEADD(year, -1, GETDATE())",
+]
+
+
+def load_queue_corpus(limit: int) -> list:
+    """Load generated SQL from the sql_queue table."""
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv("QUEUE_DB_HOST", "localhost"),
+        port=int(os.getenv("QUEUE_DB_PORT", 5432)),
+        dbname=os.getenv("QUEUE_DB_NAME", "text_to_sql_queue"),
+        user=os.getenv("QUEUE_DB_USER", "postgres"),
+        password=os.getenv("QUEUE_DB_PASSWORD", "postgres"),
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT sql_query FROM sql_queue WHERE sql_query IS NOT NULL "
+                "ORDER BY created_at DESC LIMIT %s",
+                (limit,),
+            )
+            return [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def run(classifier: QueryClassifier, corpus: list) -> float:
+    """Classify + validate every statement; return seconds elapsed."""
+    start = time.perf_counter()
+    for sql in corpus:
+        query_type, _ = classifier.classify_query(sql)
+        classifier.validate_query(sql, query_type)
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="QueryClassifier micro-benchmark")
+    parser.add_argument("--from-queue", type=int, default=0, metavar="N",
+                        help="Load N statements from sql_queue instead of the sample corpus")
+    parser.add_argument("--size", type=int, default=20000,
+                        help="Workload size drawn from the corpus (default: 20000)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds (default: 3)")
+    args = parser.parse_args()
+
+    corpus = load_queue_corpus(args.from_queue) if args.from_queue else SAMPLE_CORPUS
+    if not corpus:
+        print("❌ Empty corpus")
+        sys.exit(1)
+
+    random.seed(7)
+    workload = [random.choice(corpus) for _ in range(args.size)]
+
+    print("=" * 60)
+    print("QUERY CLASSIFIER BENCHMARK")
+    print("=" * 60)
+    print(f"Corpus: {len(corpus)} distinct statements, workload: {len(workload)} calls")
+
+    uncached = min(run(QueryClassifier(cache_size=0), workload) for _ in range(args.rounds))
+
+    memoized_classifier = QueryClassifier()
+    memoized = min(run(memoized_classifier, workload) for _ in range(args.rounds))
+
+    per_call_uncached = uncached / len(workload) * 1e6
+    per_call_memoized = memoized / len(workload) * 1e6
+
+    print(f"\nUncached: {uncached * 1000:8.1f} ms  ({per_call_uncached:6.2f} µs/call)")
+    print(f"Memoized: {memoized * 1000:8.1f} ms  ({per_call_memoized:6.2f} µs/call)")
+    print(f"Speedup:  {uncached / memoized:8.1f}x")
+
+    stats = memoized_classifier.cache_stats()["classification"]
+    print(f"\nClassification cache: {stats['size']} entries, hit rate {stats['hit_rate']:.1%}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
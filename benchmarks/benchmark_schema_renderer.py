@@ -0,0 +1,106 @@
+"""
+Micro-benchmark for the shared schema prompt renderer.
+
+Renders a synthetic schema shaped like the production database (many
+tables, a few foreign keys each) the way the AI clients do per request:
+the full schema and per-question pruned subsets. Compares rendering from
+scratch on every call (caches disabled) with the memoized renderer, and
+shows the prompt size of each style.
+
+Usage:
+    python benchmarks/benchmark_schema_renderer.py
+    python benchmarks/benchmark_schema_renderer.py --tables 400 --columns 25 --calls 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.schema_renderer import STYLES, SchemaRenderer
+from app.utils.schema_version import schema_version
+
+
+def build_schema(table_count: int, column_count: int) -> dict:
+    """Synthetic schema_info with FK chains between neighbouring tables."""
+    types = ["INT", "NVARCHAR(200)", "DATETIME", "DECIMAL(18, 2)", "BIT", "UNIQUEIDENTIFIER"]
+    tables = []
+    for t in range(table_count):
+        columns = [{"name": "Id", "type": "INT", "nullable": False, "primary_key": True}]
+        columns += [
+            {"name": f"Column{c}", "type": random.choice(types), "nullable": c % 3 == 0, "primary_key": False}
+            for c in range(column_count - 1)
+        ]
+        foreign_keys = [
+            {"columns": [f"Table{ref}Id"], "referred_table": f"Table{ref}", "referred_columns": ["Id"]}
+            for ref in random.sample(range(table_count), k=min(3, table_count))
+            if ref != t
+        ]
+        tables.append({"name": f"Table{t}", "columns": columns, "foreign_keys": foreign_keys})
+    return {"tables": tables, "views": [f"View{v}" for v in range(20)]}
+
+
+def pruned_subsets(schema: dict, count: int, size: int) -> list:
+    """Pruned schemas like SchemaPruner returns (subset + source_version)."""
+    version = schema_version(schema)
+    subsets = []
+    for _ in range(count):
+        tables = random.sample(schema["tables"], k=size)
+        subsets.append({"tables": tables, "views": schema["views"], "source_version": version})
+    return subsets
+
+
+def run(renderer: SchemaRenderer, workload: list, style: str) -> float:
+    """Render every schema in the workload; return seconds elapsed."""
+    start = time.perf_counter()
+    for schema in workload:
+        renderer.render(schema, style)
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Schema renderer micro-benchmark")
+    parser.add_argument("--tables", type=int, default=300, help="Tables in the schema (default: 300)")
+    parser.add_argument("--columns", type=int, default=20, help="Columns per table (default: 20)")
+    parser.add_argument("--calls", type=int, default=500, help="Renders per scenario (default: 500)")
+    parser.add_argument("--questions", type=int, default=50,
+                        help="Distinct pruned subsets (default: 50)")
+    args = parser.parse_args()
+
+    random.seed(7)
+    schema = build_schema(args.tables, args.columns)
+    subsets = pruned_subsets(schema, args.questions, size=min(12, args.tables))
+
+    print("=" * 60)
+    print("SCHEMA RENDERER BENCHMARK")
+    print("=" * 60)
+    print(f"Schema: {args.tables} tables x {args.columns} columns, {args.calls} renders per scenario")
+
+    sizes = {style: len(SchemaRenderer().render(schema, style)) for style in STYLES}
+    print("\nFull schema prompt size:")
+    for style, size in sizes.items():
+        print(f"  {style:8s} {size:10,d} chars")
+
+    scenarios = [
+        ("full schema", [schema] * args.calls),
+        ("pruned subsets", [random.choice(subsets) for _ in range(args.calls)]),
+    ]
+    for name, workload in scenarios:
+        print(f"\n{name}:")
+        for style in STYLES:
+            uncached = run(SchemaRenderer(max_versions=0, max_texts=0), workload, style)
+            memoized = run(SchemaRenderer(), workload, style)
+            print(
+                f"  {style:8s} uncached {uncached / len(workload) * 1e6:9.1f} µs/call   "
+                f"memoized {memoized / len(workload) * 1e6:7.2f} µs/call   "
+                f"speedup {uncached / memoized:7.1f}x"
+            )
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Throughput benchmark: one UPDATE + COMMIT per finished job vs StatusBatcher.
+
+Simulates the queue database so it runs anywhere: each commit costs
+--commit-ms (WAL flush), each statement --statement-ms plus --row-us per
+row, and at most --connections statements run at once (the QueueDB pool).
+--threads worker threads each finish --jobs jobs as fast as they can.
+
+Usage:
+    python benchmarks/benchmark_status_updates.py
+    python benchmarks/benchmark_status_updates.py --threads 16 --commit-ms 10
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.status_batcher import StatusBatcher, build_update
+
+
+class SimulatedQueueDB:
+    """QueueDB stand-in with commit and statement latency."""
+
+    def __init__(self, connections, commit_ms, statement_ms, row_us):
+        self._slots = threading.BoundedSemaphore(connections)
+        self.commit_seconds = commit_ms / 1000
+        self.statement_seconds = statement_ms / 1000
+        self.row_seconds = row_us / 1_000_000
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        db = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                rows = max(1, sql.count("(%s::"))
+                time.sleep(db.statement_seconds + rows * db.row_seconds)
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def commit(self):
+                time.sleep(db.commit_seconds)
+                with db._lock:
+                    db.commits += 1
+
+        with self._slots:
+            yield Connection()
+
+
+def direct_update(db, job_id):
+    """Current behaviour: UPDATE and COMMIT per job."""
+    sql, params = build_update("id", [(job_id, {"status": "completed", "rows_affected": 1})], ["completed_at"])
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+        conn.commit()
+
+
+def run(name, update, threads, jobs, db):
+    def worker(offset):
+        for i in range(jobs):
+            update(offset * jobs + i)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - start
+    print(f"{name:<10} {threads * jobs / wall:9.0f} updates/s   commits {db.commits:6d}   wall {wall:6.2f}s")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Status update batching benchmark")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--jobs", type=int, default=50, help="Jobs finished per thread")
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--commit-ms", type=float, default=5.0)
+    parser.add_argument("--statement-ms", type=float, default=0.5)
+    parser.add_argument("--row-us", type=float, default=20.0)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    logger.disable("app")
+    print(f"{args.threads} threads x {args.jobs} jobs, commit {args.commit_ms} ms, "
+          f"{args.connections} connections\n")
+
+    def make_db():
+        return SimulatedQueueDB(args.connections, args.commit_ms, args.statement_ms, args.row_us)
+
+    db = make_db()
+    run("direct", lambda job_id: direct_update(db, job_id), args.threads, args.jobs, db)
+
+    db = make_db()
+    batcher = StatusBatcher(db, max_batch=args.batch_size, max_delay=args.flush_ms / 1000)
+
+    def batched(job_id):
+        # Workers wait for durability before notifying the user
+        batcher.submit(job_id, {"status": "completed", "rows_affected": 1}, ["completed_at"]).result()
+
+    run("batched", batched, args.threads, args.jobs, db)
+    batcher.close()
+    print(f"\nbatcher: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
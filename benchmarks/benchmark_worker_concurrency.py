@@ -0,0 +1,149 @@
+"""
+Throughput benchmark of WorkerService at different concurrency levels.
+
+Runs the real worker loop (claiming, thread pool, AI/DB stage limits,
+graceful shutdown) over an in-memory queue, with simulated stages so it
+runs without PostgreSQL, SQL Server or Claude: pattern-matched questions
+take --pattern-ms, the AI fallback --ai-ms (a slow Claude CLI answer) and
+every execution --db-ms. --ai-fraction of the questions need the AI.
+
+For each level it reports wall time, throughput and the p95 time to
+completion of the cheap (pattern) questions - the ones that used to queue
+behind a slow AI answer.
+
+Usage:
+    python benchmarks/benchmark_worker_concurrency.py
+    python benchmarks/benchmark_worker_concurrency.py --requests 200 --levels 1,4,8,16 --ai-ms 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from loguru import logger
+
+# Add app to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import worker_service
+from app.config import settings
+from worker_service import WorkerService
+
+
+class SimulatedGenerator:
+    """Stands in for intelligent_sql_generator (same ai_limit contract)."""
+
+    def __init__(self, pattern_seconds: float, ai_seconds: float):
+        self.pattern_seconds = pattern_seconds
+        self.ai_seconds = ai_seconds
+
+    def record_success(self, question, result):
+        pass
+
+    def generate_sql(self, question, language='en', ai_limit=None, **kwargs):
+        time.sleep(self.pattern_seconds)
+        if question.startswith("ai:"):
+            with ai_limit:
+                time.sleep(self.ai_seconds)
+        return {'success': True, 'sql': "SELECT 1 AS n", 'method': 'simulated'}
+
+
+class SimulatedDatabase:
+    """Stands in for db_manager."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def get_schema_info(self):
+        return {"tables": []}
+
+    def execute_query(self, sql, fetch_results=True):
+        time.sleep(self.seconds)
+        return [{"n": 1}], 1, self.seconds * 1000
+
+
+class InMemoryWorker(WorkerService):
+    """WorkerService over a list instead of the PostgreSQL queue; stops when it is drained."""
+
+    def __init__(self, requests, **kwargs):
+        super().__init__(listen=False, **kwargs)
+        self.queue = list(requests)
+        self.finished = {}
+        self.lease_keeper.heartbeat = lambda: None
+
+    def fetch_pending_requests(self, limit=None):
+        claimed, self.queue = self.queue[:limit], self.queue[limit:]
+        return claimed
+
+    def update_request_status(self, request_id, status, **kwargs):
+        self.finished[request_id] = time.perf_counter()
+
+    def wait_for_requests(self):
+        if not self.queue:
+            self.running = False
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1)]
+
+
+def make_requests(count, ai_fraction, seed):
+    rng = random.Random(seed)
+    return [
+        {'id': i, 'question': f"{'ai:' if rng.random() < ai_fraction else ''}question {i}", 'language': 'en'}
+        for i in range(count)
+    ]
+
+
+def run_level(requests, concurrency, batch_size):
+    worker = InMemoryWorker(requests, poll_interval=0, batch_size=batch_size, concurrency=concurrency)
+    start = time.perf_counter()
+    worker.run()
+    wall = time.perf_counter() - start
+
+    cheap = [worker.finished[r['id']] - start for r in requests if not r['question'].startswith("ai:")]
+    return wall, cheap, worker.processed_count, worker.error_count
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Worker concurrency benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--ai-fraction", type=float, default=0.1)
+    parser.add_argument("--pattern-ms", type=float, default=5)
+    parser.add_argument("--ai-ms", type=float, default=1000)
+    parser.add_argument("--db-ms", type=float, default=50)
+    parser.add_argument("--ai-limit", type=int, default=settings.worker_ai_concurrency)
+    parser.add_argument("--db-limit", type=int, default=settings.worker_db_concurrency)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Per-request worker logs would dominate the run
+    logger.disable("app")
+    logger.disable("worker_service")
+
+    worker_service.intelligent_sql_generator = SimulatedGenerator(args.pattern_ms / 1000, args.ai_ms / 1000)
+    worker_service.db_manager = SimulatedDatabase(args.db_ms / 1000)
+    settings.worker_ai_concurrency = args.ai_limit
+    settings.worker_db_concurrency = args.db_limit
+
+    requests = make_requests(args.requests, args.ai_fraction, args.seed)
+    ai_count = sum(1 for r in requests if r['question'].startswith("ai:"))
+    print(f"{args.requests} requests ({ai_count} AI at {args.ai_ms:.0f} ms), pattern {args.pattern_ms:.0f} ms, "
+          f"DB {args.db_ms:.0f} ms, AI limit {args.ai_limit}, DB limit {args.db_limit}\n")
+
+    for level in (int(value) for value in args.levels.split(",")):
+        wall, cheap, processed, errors = run_level(requests, level, args.batch_size)
+        print(
+            f"concurrency {level:3d}   wall {wall:7.2f}s   throughput {processed / wall:7.1f} req/s   "
+            f"pattern p95 {percentile(cheap, 95):6.2f}s   errors {errors}"
+        )
+
+
+if __name__ == "__main__":
+    main()
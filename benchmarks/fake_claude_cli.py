@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Fake Claude CLI for benchmarks and tests.
+
+Simulates start-up cost (FAKE_CLI_STARTUP, default 0.8s - process + Node
+boot) and per-answer model time (FAKE_CLI_THINK, default 0.2s). Supports:
+
+    fake_claude_cli.py --print                  read prompt from stdin, print answer
+    fake_claude_cli.py -p --input-format stream-json --output-format stream-json --verbose
+                                                one JSON user message per stdin line,
+                                                stream events + result line per message
+    fake_claude_cli.py --print --output-format stream-json --verbose
+                                                read prompt from stdin, stream events + result
+
+With --include-partial-messages the answer is streamed as text deltas
+(FAKE_CLI_CHUNKS of them, default 8) with the think time spread across
+them, so the "sql" field completes well before the answer does.
+"""
+import json
+import os
+import sys
+import time
+
+STARTUP = float(os.getenv("FAKE_CLI_STARTUP", "0.8"))
+THINK = float(os.getenv("FAKE_CLI_THINK", "0.2"))
+CHUNKS = int(os.getenv("FAKE_CLI_CHUNKS", "8"))
+
+ANSWER = json.dumps({
+    "sql": "SELECT TOP 10 CompanyName FROM Companies ORDER BY CreatedDate DESC",
+    "query_type": "READ",
+    "risk_level": "low",
+    "explanation": "Lists the ten most recently created companies, newest first, "
+                   "showing only their names. " * 4,
+})
+
+
+def emit(event):
+    print(json.dumps(event), flush=True)
+
+
+def answer(partial: bool):
+    """Stream one answer: deltas (if partial) or one pause, then the whole message."""
+    if partial:
+        size = -(-len(ANSWER) // CHUNKS)
+        for start in range(0, len(ANSWER), size):
+            time.sleep(THINK / CHUNKS)
+            emit({"type": "stream_event", "event": {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": ANSWER[start:start + size]},
+            }})
+    else:
+        time.sleep(THINK)
+    emit({"type": "assistant", "message": {"content": [{"type": "text", "text": ANSWER}]}})
+    emit({"type": "result", "subtype": "success", "is_error": False, "result": ANSWER})
+
+
+def main():
+    time.sleep(STARTUP)
+
+    if "stream-json" not in sys.argv:
+        sys.stdin.read()
+        time.sleep(THINK)
+        print(ANSWER)
+        return
+
+    partial = "--include-partial-messages" in sys.argv
+    emit({"type": "system", "subtype": "init"})
+
+    if "--input-format" not in sys.argv:
+        sys.stdin.read()
+        answer(partial)
+        return
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        json.loads(line)
+        answer(partial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+-- Migration 001: tables for bulk re-scoring of historical queue SQL
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Re-scoring runs: re-classification of historical SQL after rule changes
+-- (written in bulk by rescore_queue.py)
+CREATE TABLE IF NOT EXISTS sql_rescore_runs (
+    run_id UUID PRIMARY KEY,
+    source VARCHAR(20) NOT NULL CHECK (source IN ('sql_queue', 'sql_audit_log')),
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    rows_scanned INTEGER NOT NULL DEFAULT 0,
+    rows_changed INTEGER NOT NULL DEFAULT 0
+);
+
+-- Per-rule hit statistics for a run
+CREATE TABLE IF NOT EXISTS sql_rescore_stats (
+    id SERIAL PRIMARY KEY,
+    run_id UUID NOT NULL REFERENCES sql_rescore_runs(run_id) ON DELETE CASCADE,
+    rule_kind VARCHAR(20) NOT NULL,  -- 'classification' or 'validation'
+    rule TEXT NOT NULL,
+    query_type VARCHAR(20),
+    risk_level VARCHAR(20),
+    changed BOOLEAN NOT NULL,        -- outcome differs from the stored one
+    hits INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rescore_stats_run ON sql_rescore_stats(run_id);
+
+-- Rows whose outcome would change (only with --write-changes)
+CREATE TABLE IF NOT EXISTS sql_rescore_changes (
+    run_id UUID NOT NULL REFERENCES sql_rescore_runs(run_id) ON DELETE CASCADE,
+    row_id INTEGER NOT NULL,         -- sql_queue.id or sql_audit_log.id, per run source
+    old_query_type VARCHAR(20),
+    old_risk_level VARCHAR(20),
+    new_query_type VARCHAR(20),
+    new_risk_level VARCHAR(20),
+    rule TEXT,
+    PRIMARY KEY (run_id, row_id)
+);
@@ -0,0 +1,42 @@
+-- Migration 002: normalized question -> SQL cache
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Normalized question -> SQL cache in front of the AI fallback
+-- (app/services/question_cache.py). Literals from the question are
+-- {n} slots in sql_template; entries are per schema version.
+CREATE TABLE IF NOT EXISTS sql_question_cache (
+    id SERIAL PRIMARY KEY,
+    question_key TEXT NOT NULL,          -- normalized question with <num>/<date> placeholders
+    schema_version VARCHAR(32) NOT NULL,
+    sql_template TEXT NOT NULL,
+    metadata JSONB,                      -- explanation, query_type, risk_level
+    example_question TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP,
+    UNIQUE (question_key, schema_version)
+);
+
+CREATE OR REPLACE VIEW question_cache_stats AS
+SELECT
+    schema_version,
+    COUNT(*) as entries,
+    SUM(hit_count) as hits,
+    COUNT(*) FILTER (WHERE hit_count > 0) as entries_hit,
+    MAX(last_hit_at) as last_hit
+FROM sql_question_cache
+GROUP BY schema_version;
+
+-- Housekeeping now also expires unused cache entries
+CREATE OR REPLACE FUNCTION cleanup_old_requests()
+RETURNS void AS $$
+BEGIN
+    DELETE FROM sql_queue
+    WHERE status IN ('completed', 'failed')
+    AND completed_at < NOW() - INTERVAL '30 days';
+
+    -- Cached answers unused for 30 days (includes old schema versions)
+    DELETE FROM sql_question_cache
+    WHERE COALESCE(last_hit_at, created_at) < NOW() - INTERVAL '30 days';
+END;
+$$ LANGUAGE plpgsql;
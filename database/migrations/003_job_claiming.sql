@@ -0,0 +1,10 @@
+-- Migration 003: atomic job claiming for parallel queue workers
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Workers claim jobs with UPDATE ... FOR UPDATE SKIP LOCKED
+-- (app/core/job_queue.py) and record who claimed them and when.
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255);
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+
+-- Claim order: oldest pending first
+CREATE INDEX IF NOT EXISTS idx_sql_queue_pending ON sql_queue(created_at) WHERE status = 'pending';
@@ -0,0 +1,18 @@
+-- Migration 004: wake queue workers on insert (LISTEN/NOTIFY)
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Workers LISTEN on sql_queue_jobs (app/core/job_queue.py) instead of
+-- sleep-polling. One notification per INSERT statement; workers claim
+-- whatever is pending when they wake, so a payload is not needed.
+CREATE OR REPLACE FUNCTION sql_queue_notify_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('sql_queue_jobs', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sql_queue_notify ON sql_queue;
+CREATE TRIGGER sql_queue_notify
+AFTER INSERT ON sql_queue
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_notify_trigger();
@@ -0,0 +1,72 @@
+-- Migration 005: statement-level audit triggers for batched status updates
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Queue workers now write status transitions in batches
+-- (UPDATE ... FROM (VALUES ...), app/core/status_batcher.py). The row-level
+-- audit trigger ran once per row; these run once per statement and insert
+-- the same audit rows set-based from the transition tables.
+DROP TRIGGER IF EXISTS sql_queue_audit ON sql_queue;
+DROP FUNCTION IF EXISTS sql_queue_audit_trigger();
+
+CREATE OR REPLACE FUNCTION sql_queue_audit_insert_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sql_audit_log (job_id, event_type, event_data)
+    SELECT n.job_id, 'submitted',
+           jsonb_build_object('question', n.question, 'environment', n.environment)
+    FROM new_rows n
+    ORDER BY n.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sql_queue_audit_update_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sql_audit_log (job_id, event_type, event_data)
+    SELECT job_id, event_type, event_data
+    FROM (
+        SELECT n.id, 1 AS seq, n.job_id, n.status AS event_type,
+               jsonb_build_object('old_status', o.status, 'new_status', n.status) AS event_data
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o.status != n.status
+
+        UNION ALL
+
+        SELECT n.id, 2, n.job_id, 'completed',
+               jsonb_build_object(
+                   'query_type', n.query_type,
+                   'execution_allowed', n.execution_allowed,
+                   'processing_time_ms', n.total_processing_time_ms
+               )
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.status = 'completed' AND o.status != 'completed'
+
+        UNION ALL
+
+        SELECT n.id, 3, n.job_id, 'blocked',
+               jsonb_build_object(
+                   'query_type', n.query_type,
+                   'environment', n.environment,
+                   'reason', 'Query type not allowed in this environment'
+               )
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.execution_allowed = false AND o.execution_allowed IS NULL
+    ) events
+    ORDER BY id, seq;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS sql_queue_audit_insert ON sql_queue;
+CREATE TRIGGER sql_queue_audit_insert
+AFTER INSERT ON sql_queue
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_audit_insert_trigger();
+
+DROP TRIGGER IF EXISTS sql_queue_audit_update ON sql_queue;
+CREATE TRIGGER sql_queue_audit_update
+AFTER UPDATE ON sql_queue
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_audit_update_trigger();
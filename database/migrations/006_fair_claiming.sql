@@ -0,0 +1,11 @@
+-- Migration 006: priority lanes and per-user fair share for job claiming
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Claim lane, higher first: the Teams bot enqueues at 10, anything else
+-- (orchestrator, scripts) defaults to 0
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 0;
+
+-- Claims rank pending jobs per (priority, user_id) by age and take them
+-- round-robin across users (app/core/job_queue.py)
+DROP INDEX IF EXISTS idx_sql_queue_pending;
+CREATE INDEX IF NOT EXISTS idx_sql_queue_pending_fair ON sql_queue(priority DESC, user_id, created_at) WHERE status = 'pending';
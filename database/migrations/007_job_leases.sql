@@ -0,0 +1,20 @@
+-- Migration 007: leases (visibility timeout) and retry backoff for claimed jobs
+-- Safe to re-run. New installs get these from database/schema.sql.
+
+-- Claims carry a lease the worker extends with heartbeats; expired leases
+-- are reaped back to 'pending' after a backoff, or 'failed' after the
+-- maximum number of attempts (app/core/job_queue.py)
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE sql_queue ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_sql_queue_leases ON sql_queue(lease_expires_at) WHERE status = 'processing';
+
+-- Jobs claimed before leases existed count as one attempt and get a lease
+-- based on when they were claimed, so ones stuck behind a dead worker are
+-- reaped instead of staying 'processing' forever
+UPDATE sql_queue
+SET attempts = GREATEST(attempts, 1),
+    lease_expires_at = COALESCE(claimed_at, created_at) + INTERVAL '10 minutes'
+WHERE status = 'processing'
+  AND lease_expires_at IS NULL;
@@ -0,0 +1,7 @@
+-- Migration 008: index for the earliest pending job in retry backoff
+-- Safe to re-run. New installs get this from database/schema.sql.
+
+-- Reaped jobs return to 'pending' without a NOTIFY; idle workers cap their
+-- wait at MIN(next_attempt_at) so the retry is not delayed to the next
+-- safety poll (app/core/job_queue.py)
+CREATE INDEX IF NOT EXISTS idx_sql_queue_retry_due ON sql_queue(next_attempt_at) WHERE status = 'pending';
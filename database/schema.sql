@@ -10,6 +10,7 @@ CREATE TABLE IF NOT EXISTS sql_queue (
     environment VARCHAR(20) NOT NULL CHECK (environment IN ('devtest', 'prod')),
     language VARCHAR(5) NOT NULL CHECK (language IN ('en', 'he')),
     user_id VARCHAR(100),
+    priority SMALLINT NOT NULL DEFAULT 0,  -- claim lane: higher first (Teams 10, batch 0)
 
     -- Input
     question TEXT NOT NULL,
@@ -18,6 +19,11 @@ CREATE TABLE IF NOT EXISTS sql_queue (
     -- Processing status
     status VARCHAR(20) NOT NULL DEFAULT 'pending'
         CHECK (status IN ('pending', 'processing', 'executed', 'completed', 'failed')),
+    claimed_by VARCHAR(255),             -- worker (hostname:pid) processing the job
+    claimed_at TIMESTAMP,
+    lease_expires_at TIMESTAMP,          -- extended by the worker's heartbeat; reaped once past
+    attempts INTEGER NOT NULL DEFAULT 0, -- claims so far
+    next_attempt_at TIMESTAMP,           -- retry backoff after a reaped claim
 
     -- SQL Generation
     sql_query TEXT,
@@ -53,6 +59,13 @@ CREATE INDEX IF NOT EXISTS idx_sql_queue_job_id ON sql_queue(job_id);
 CREATE INDEX IF NOT EXISTS idx_sql_queue_created ON sql_queue(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_sql_queue_environment ON sql_queue(environment);
 CREATE INDEX IF NOT EXISTS idx_sql_queue_user ON sql_queue(user_id);
+-- Claim order for workers: priority lane, then each user's oldest first
+-- (app/core/job_queue.py)
+CREATE INDEX IF NOT EXISTS idx_sql_queue_pending_fair ON sql_queue(priority DESC, user_id, created_at) WHERE status = 'pending';
+-- Expired leases for the reaper
+CREATE INDEX IF NOT EXISTS idx_sql_queue_leases ON sql_queue(lease_expires_at) WHERE status = 'processing';
+-- Earliest retry after a backoff (workers wake for it; no NOTIFY is sent)
+CREATE INDEX IF NOT EXISTS idx_sql_queue_retry_due ON sql_queue(next_attempt_at) WHERE status = 'pending';
 
 -- View for pending queries (what Claude Code needs to process)
 CREATE OR REPLACE VIEW pending_queries AS
@@ -106,44 +119,146 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger to automatically create audit entries
-CREATE OR REPLACE FUNCTION sql_queue_audit_trigger()
+-- Triggers to automatically create audit entries. Statement-level with
+-- transition tables: a batched multi-row status UPDATE (app/core/status_batcher.py)
+-- writes its audit rows in one INSERT instead of one trigger call per row.
+CREATE OR REPLACE FUNCTION sql_queue_audit_insert_trigger()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF TG_OP = 'INSERT' THEN
-        PERFORM log_audit_event(NEW.job_id, 'submitted',
-            jsonb_build_object('question', NEW.question, 'environment', NEW.environment));
-    ELSIF TG_OP = 'UPDATE' THEN
-        IF OLD.status != NEW.status THEN
-            PERFORM log_audit_event(NEW.job_id, NEW.status,
-                jsonb_build_object('old_status', OLD.status, 'new_status', NEW.status));
-        END IF;
-
-        IF NEW.status = 'completed' AND OLD.status != 'completed' THEN
-            PERFORM log_audit_event(NEW.job_id, 'completed',
-                jsonb_build_object(
-                    'query_type', NEW.query_type,
-                    'execution_allowed', NEW.execution_allowed,
-                    'processing_time_ms', NEW.total_processing_time_ms
-                ));
-        END IF;
-
-        IF NEW.execution_allowed = false AND OLD.execution_allowed IS NULL THEN
-            PERFORM log_audit_event(NEW.job_id, 'blocked',
-                jsonb_build_object(
-                    'query_type', NEW.query_type,
-                    'environment', NEW.environment,
-                    'reason', 'Query type not allowed in this environment'
-                ));
-        END IF;
-    END IF;
-    RETURN NEW;
+    INSERT INTO sql_audit_log (job_id, event_type, event_data)
+    SELECT n.job_id, 'submitted',
+           jsonb_build_object('question', n.question, 'environment', n.environment)
+    FROM new_rows n
+    ORDER BY n.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sql_queue_audit_update_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sql_audit_log (job_id, event_type, event_data)
+    SELECT job_id, event_type, event_data
+    FROM (
+        SELECT n.id, 1 AS seq, n.job_id, n.status AS event_type,
+               jsonb_build_object('old_status', o.status, 'new_status', n.status) AS event_data
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o.status != n.status
+
+        UNION ALL
+
+        SELECT n.id, 2, n.job_id, 'completed',
+               jsonb_build_object(
+                   'query_type', n.query_type,
+                   'execution_allowed', n.execution_allowed,
+                   'processing_time_ms', n.total_processing_time_ms
+               )
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.status = 'completed' AND o.status != 'completed'
+
+        UNION ALL
+
+        SELECT n.id, 3, n.job_id, 'blocked',
+               jsonb_build_object(
+                   'query_type', n.query_type,
+                   'environment', n.environment,
+                   'reason', 'Query type not allowed in this environment'
+               )
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.execution_allowed = false AND o.execution_allowed IS NULL
+    ) events
+    ORDER BY id, seq;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+CREATE TRIGGER sql_queue_audit_insert
+AFTER INSERT ON sql_queue
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_audit_insert_trigger();
+
+CREATE TRIGGER sql_queue_audit_update
+AFTER UPDATE ON sql_queue
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_audit_update_trigger();
+
+-- Wake queue workers listening on sql_queue_jobs (app/core/job_queue.py);
+-- one notification per INSERT statement
+CREATE OR REPLACE FUNCTION sql_queue_notify_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('sql_queue_jobs', '');
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER sql_queue_audit
-AFTER INSERT OR UPDATE ON sql_queue
-FOR EACH ROW EXECUTE FUNCTION sql_queue_audit_trigger();
+CREATE TRIGGER sql_queue_notify
+AFTER INSERT ON sql_queue
+FOR EACH STATEMENT EXECUTE FUNCTION sql_queue_notify_trigger();
+
+-- Re-scoring runs: re-classification of historical SQL after rule changes
+-- (written in bulk by rescore_queue.py)
+CREATE TABLE IF NOT EXISTS sql_rescore_runs (
+    run_id UUID PRIMARY KEY,
+    source VARCHAR(20) NOT NULL CHECK (source IN ('sql_queue', 'sql_audit_log')),
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    rows_scanned INTEGER NOT NULL DEFAULT 0,
+    rows_changed INTEGER NOT NULL DEFAULT 0
+);
+
+-- Per-rule hit statistics for a run
+CREATE TABLE IF NOT EXISTS sql_rescore_stats (
+    id SERIAL PRIMARY KEY,
+    run_id UUID NOT NULL REFERENCES sql_rescore_runs(run_id) ON DELETE CASCADE,
+    rule_kind VARCHAR(20) NOT NULL,  -- 'classification' or 'validation'
+    rule TEXT NOT NULL,
+    query_type VARCHAR(20),
+    risk_level VARCHAR(20),
+    changed BOOLEAN NOT NULL,        -- outcome differs from the stored one
+    hits INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rescore_stats_run ON sql_rescore_stats(run_id);
+
+-- Rows whose outcome would change (only with --write-changes)
+CREATE TABLE IF NOT EXISTS sql_rescore_changes (
+    run_id UUID NOT NULL REFERENCES sql_rescore_runs(run_id) ON DELETE CASCADE,
+    row_id INTEGER NOT NULL,         -- sql_queue.id or sql_audit_log.id, per run source
+    old_query_type VARCHAR(20),
+    old_risk_level VARCHAR(20),
+    new_query_type VARCHAR(20),
+    new_risk_level VARCHAR(20),
+    rule TEXT,
+    PRIMARY KEY (run_id, row_id)
+);
+
+-- Normalized question -> SQL cache in front of the AI fallback
+-- (app/services/question_cache.py). Literals from the question are
+-- {n} slots in sql_template; entries are per schema version.
+CREATE TABLE IF NOT EXISTS sql_question_cache (
+    id SERIAL PRIMARY KEY,
+    question_key TEXT NOT NULL,          -- normalized question with <num>/<date> placeholders
+    schema_version VARCHAR(32) NOT NULL,
+    sql_template TEXT NOT NULL,
+    metadata JSONB,                      -- explanation, query_type, risk_level
+    example_question TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP,
+    UNIQUE (question_key, schema_version)
+);
+
+CREATE OR REPLACE VIEW question_cache_stats AS
+SELECT
+    schema_version,
+    COUNT(*) as entries,
+    SUM(hit_count) as hits,
+    COUNT(*) FILTER (WHERE hit_count > 0) as entries_hit,
+    MAX(last_hit_at) as last_hit
+FROM sql_question_cache
+GROUP BY schema_version;
 
 -- Clean up old completed requests (optional housekeeping)
 CREATE OR REPLACE FUNCTION cleanup_old_requests()
@@ -152,6 +267,10 @@ BEGIN
     DELETE FROM sql_queue
     WHERE status IN ('completed', 'failed')
     AND completed_at < NOW() - INTERVAL '30 days';
+
+    -- Cached answers unused for 30 days (includes old schema versions)
+    DELETE FROM sql_question_cache
+    WHERE COALESCE(last_hit_at, created_at) < NOW() - INTERVAL '30 days';
 END;
 $$ LANGUAGE plpgsql;
 
@@ -167,13 +286,15 @@ $$ LANGUAGE plpgsql;
 SELECT * FROM queue_stats ORDER BY environment, status;
 */
 
--- Find stuck queries
+-- Find stuck queries (leases the reaper has not picked up yet, and jobs
+-- that keep getting retried)
 /*
-SELECT job_id, question, environment, status,
-       EXTRACT(EPOCH FROM (NOW() - created_at))/60 as minutes_old
+SELECT job_id, question, environment, status, claimed_by, attempts,
+       EXTRACT(EPOCH FROM (NOW() - claimed_at))/60 as minutes_claimed,
+       lease_expires_at, next_attempt_at
 FROM sql_queue
-WHERE status = 'processing'
-  AND sql_generated_at < NOW() - INTERVAL '10 minutes';
+WHERE (status = 'processing' AND lease_expires_at < NOW())
+   OR (status = 'pending' AND attempts > 0);
 */
 
 -- Recent audit events
@@ -190,6 +311,14 @@ ORDER BY a.created_at DESC
 LIMIT 20;
 */
 
+-- Rule hit changes for the latest re-scoring run
+/*
+SELECT rule_kind, rule, query_type, risk_level, changed, hits
+FROM sql_rescore_stats
+WHERE run_id = (SELECT run_id FROM sql_rescore_runs ORDER BY started_at DESC LIMIT 1)
+ORDER BY hits DESC;
+*/
+
 -- Security violations (blocked queries)
 /*
 SELECT
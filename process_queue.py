@@ -6,13 +6,16 @@ Processes pending natural language queries from the PostgreSQL queue
 
 import os
 import json
-import psycopg2
-from psycopg2.extras import Json, DictCursor
+from psycopg2.extras import Json
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import pyodbc
 from dotenv import load_dotenv
 
+from app.core.job_queue import LeaseKeeper, claim_jobs, make_worker_id
+from app.core.queue_db import QueueDB
+from app.core.status_batcher import StatusBatcher
+
 # Load environment variables
 load_dotenv('.env.devtest')
 
@@ -37,6 +40,7 @@ TARGET_DB_CONFIG = {
 
 ENVIRONMENT = os.getenv('DEPLOYMENT_ENVIRONMENT', 'devtest')
 BATCH_SIZE = int(os.getenv('BATCH_PROCESSING_SIZE', 10))
+LEASE_SECONDS = float(os.getenv('QUEUE_LEASE_SECONDS', 120))
 
 
 class QueryClassifier:
@@ -174,14 +178,33 @@ class SQLQueueProcessor:
     def __init__(self):
         self.classifier = QueryClassifier()
         self.nl_generator = NaturalLanguageGenerator()
-        self.queue_conn = None
+        self.queue_db = QueueDB(QUEUE_DB_CONFIG, minconn=1, maxconn=2)
+        self.worker_id = make_worker_id()
+        self.status_batcher = StatusBatcher(
+            self.queue_db,
+            key_column='job_id',
+            max_batch=int(os.getenv('QUEUE_STATUS_BATCH_SIZE', 100)),
+            max_delay=float(os.getenv('QUEUE_STATUS_FLUSH_INTERVAL', 0.005)),
+            owner=self.worker_id
+        )
+        # Keeps the whole claimed batch leased while it is worked through
+        # one by one (and reaps jobs of crashed workers)
+        self.lease_keeper = LeaseKeeper(
+            self.queue_db.connection,
+            self.worker_id,
+            lease_seconds=LEASE_SECONDS,
+            interval=float(os.getenv('QUEUE_HEARTBEAT_INTERVAL', 30)),
+            max_attempts=int(os.getenv('QUEUE_MAX_ATTEMPTS', 3)),
+            backoff_seconds=float(os.getenv('QUEUE_RETRY_BACKOFF', 30)),
+            backoff_max_seconds=float(os.getenv('QUEUE_RETRY_BACKOFF_MAX', 900))
+        )
         self.target_conn = None
 
     def connect_to_queue_db(self):
         """Connect to PostgreSQL queue database"""
         try:
-            self.queue_conn = psycopg2.connect(**QUEUE_DB_CONFIG)
-            return True
+            with self.queue_db.connection():
+                return True
         except Exception as e:
             print(f"❌ Failed to connect to queue database: {e}")
             return False
@@ -205,26 +228,12 @@ class SQLQueueProcessor:
             return False
 
     def fetch_pending_requests(self, limit: int = BATCH_SIZE) -> List[Dict]:
-        """Fetch pending requests from queue"""
+        """Claim pending requests from queue (marked 'processing' for this worker)"""
         try:
-            with self.queue_conn.cursor(cursor_factory=DictCursor) as cursor:
-                cursor.execute("""
-                    SELECT
-                        job_id,
-                        question,
-                        schema_info,
-                        environment,
-                        language,
-                        user_id,
-                        created_at
-                    FROM sql_queue
-                    WHERE status = 'pending'
-                    ORDER BY created_at ASC
-                    LIMIT %s
-                """, (limit,))
-
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+            with self.queue_db.connection() as conn:
+                claimed = claim_jobs(conn, self.worker_id, limit, LEASE_SECONDS)
+            self.lease_keeper.track([r['id'] for r in claimed])
+            return claimed
         except Exception as e:
             print(f"❌ Error fetching pending requests: {e}")
             return []
@@ -309,77 +318,41 @@ class SQLQueueProcessor:
         error_message: Optional[str] = None,
         error_type: Optional[str] = None
     ):
-        """Update request status in queue database"""
-        try:
-            with self.queue_conn.cursor() as cursor:
-                update_fields = ['status = %s']
-                params = [status]
-
-                if sql_query is not None:
-                    update_fields.append('sql_query = %s')
-                    params.append(sql_query)
-
-                if query_type is not None:
-                    update_fields.append('query_type = %s')
-                    params.append(query_type)
-
-                if risk_level is not None:
-                    update_fields.append('risk_level = %s')
-                    params.append(risk_level)
-
-                if execution_allowed is not None:
-                    update_fields.append('execution_allowed = %s')
-                    params.append(execution_allowed)
-
-                if query_results is not None:
-                    update_fields.append('query_results = %s')
-                    params.append(Json(query_results))
-
-                if rows_affected is not None:
-                    update_fields.append('rows_affected = %s')
-                    params.append(rows_affected)
-
-                if execution_time_ms is not None:
-                    update_fields.append('execution_time_ms = %s')
-                    params.append(execution_time_ms)
-
-                if natural_language_response is not None:
-                    update_fields.append('natural_language_response = %s')
-                    params.append(natural_language_response)
-
-                if error_message is not None:
-                    update_fields.append('error_message = %s')
-                    params.append(error_message)
-
-                if error_type is not None:
-                    update_fields.append('error_type = %s')
-                    params.append(error_type)
-
-                if status == 'completed':
-                    update_fields.append('completed_at = NOW()')
-                    update_fields.append('executed_at = NOW()')
-                elif status == 'failed':
-                    update_fields.append('completed_at = NOW()')
-
-                if sql_query is not None:
-                    update_fields.append('sql_generated_at = NOW()')
-
-                update_fields.append('total_processing_time_ms = EXTRACT(EPOCH FROM (NOW() - created_at)) * 1000')
-
-                params.append(job_id)
-
-                sql = f"""
-                    UPDATE sql_queue
-                    SET {', '.join(update_fields)}
-                    WHERE job_id = %s
-                """
-
-                cursor.execute(sql, params)
-                self.queue_conn.commit()
+        """
+        Queue a status update (written in batches, see StatusBatcher;
+        close() flushes whatever is still queued)
+        """
+        now_columns = []
+        if status == 'completed':
+            now_columns += ['completed_at', 'executed_at']
+        elif status == 'failed':
+            now_columns.append('completed_at')
+        if sql_query is not None:
+            now_columns.append('sql_generated_at')
 
+        try:
+            self.status_batcher.submit(
+                job_id,
+                {
+                    'status': status,
+                    'sql_query': sql_query,
+                    'query_type': query_type,
+                    'risk_level': risk_level,
+                    'execution_allowed': execution_allowed,
+                    'query_results': Json(query_results) if query_results is not None else None,
+                    'rows_affected': rows_affected,
+                    'execution_time_ms': execution_time_ms,
+                    'natural_language_response': natural_language_response,
+                    'error_message': error_message,
+                    'error_type': error_type,
+                },
+                now_columns=now_columns,
+                expressions={
+                    'total_processing_time_ms': 'EXTRACT(EPOCH FROM (NOW() - q.created_at)) * 1000'
+                }
+            )
         except Exception as e:
             print(f"❌ Error updating request {job_id}: {e}")
-            self.queue_conn.rollback()
 
     def process_request(self, request: Dict) -> Dict:
         """Process a single request"""
@@ -401,9 +374,6 @@ class SQLQueueProcessor:
         }
 
         try:
-            # Mark as processing
-            self.update_request_status(job_id, 'processing')
-
             # Generate SQL
             print("📝 Generating SQL...")
             sql = self.generate_sql(question, schema_info)
@@ -536,6 +506,7 @@ class SQLQueueProcessor:
         if not self.connect_to_queue_db():
             return
         print("   ✅ Connected to queue database")
+        self.lease_keeper.start()
 
         if self.connect_to_target_db():
             print("   ✅ Connected to target database")
@@ -543,7 +514,7 @@ class SQLQueueProcessor:
             print("   ⚠️  Target database not available - will process but not execute")
 
         # Fetch pending requests
-        print(f"\n📥 Fetching pending requests (batch size: {BATCH_SIZE})...")
+        print(f"\n📥 Claiming pending requests as {self.worker_id} (batch size: {BATCH_SIZE})...")
         requests = self.fetch_pending_requests()
 
         if not requests:
@@ -561,6 +532,7 @@ class SQLQueueProcessor:
 
         for request in requests:
             result = self.process_request(request)
+            self.lease_keeper.untrack([request['id']])
             results[result['status']] += 1
 
         # Summary
@@ -573,9 +545,10 @@ class SQLQueueProcessor:
         print(f"{'='*60}\n")
 
     def close(self):
-        """Close database connections"""
-        if self.queue_conn:
-            self.queue_conn.close()
+        """Flush queued status updates and close database connections"""
+        self.status_batcher.close()
+        self.lease_keeper.close()
+        self.queue_db.close()
         if self.target_conn:
             self.target_conn.close()
 
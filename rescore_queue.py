@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Bulk Re-scoring CLI
+Re-classifies historical queue SQL with the current QueryClassifier rules
+and reports how outcomes would change.
+
+Usage:
+    python rescore_queue.py                         # sql_queue, store stats
+    python rescore_queue.py --source sql_audit_log
+    python rescore_queue.py --dry-run --limit 10000 # trial run, no writes
+    python rescore_queue.py --write-changes         # also store changed rows
+"""
+import argparse
+import json
+import sys
+
+import psycopg2
+from loguru import logger
+
+from app.config import settings
+from app.services.bulk_classifier import BulkClassifier, SOURCE_QUERIES
+
+
+def connect_queue_db():
+    """Open a new connection to the PostgreSQL queue database."""
+    return psycopg2.connect(
+        host=settings.queue_db_host,
+        port=settings.queue_db_port,
+        dbname=settings.queue_db_name,
+        user=settings.queue_db_user,
+        password=settings.queue_db_password
+    )
+
+
+def main():
+    """Entry point for bulk re-scoring."""
+    parser = argparse.ArgumentParser(description='Re-score historical queue SQL')
+    parser.add_argument(
+        '--source',
+        choices=sorted(SOURCE_QUERIES) + ['all'],
+        default='sql_queue',
+        help='Rows to re-score (default: sql_queue)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Classifier processes (default: CPU count, 1 = in-process)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=5000,
+        help='Rows per cursor fetch / pool task (default: 5000)'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=None,
+        help='Only scan the first N rows'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Print the report without writing statistics'
+    )
+    parser.add_argument(
+        '--write-changes',
+        action='store_true',
+        help='Also store every row whose outcome changed'
+    )
+
+    args = parser.parse_args()
+
+    sources = sorted(SOURCE_QUERIES) if args.source == 'all' else [args.source]
+    bulk = BulkClassifier(connect_queue_db, workers=args.workers, chunk_size=args.chunk_size)
+
+    try:
+        for source in sources:
+            report = bulk.run(
+                source=source,
+                write_results=not args.dry_run,
+                write_changes=args.write_changes and not args.dry_run,
+                limit=args.limit
+            )
+            print(json.dumps(report.to_dict(), indent=2, ensure_ascii=False))
+    except Exception as e:
+        logger.error(f"Re-scoring failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
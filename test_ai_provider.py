@@ -0,0 +1,294 @@
+"""
+Tests for the async AI providers, using benchmarks/fake_claude_cli.py.
+Runs without Claude installed: python -m pytest test_ai_provider.py
+"""
+import asyncio
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from app.config import settings
+from app.core.ai_client import UnifiedAIClient
+from app.core.ai_provider import AsyncClaudeCLIClient, ConcurrencyGate
+from app.core.claude_cli_client import ClaudeCLIClient
+from app.core.ai_provider import ResponseParseError
+from app.core.claude_cli_pool import ClaudeCLIPool
+from app.core.provider_stats import ProviderStats
+
+
+FAKE_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fake_claude_cli.py")
+
+
+@pytest.fixture
+def cli_client(tmp_path, monkeypatch):
+    """ClaudeCLIClient pointed at the fake CLI, process per question."""
+    monkeypatch.setenv("FAKE_CLI_STARTUP", "0")
+    monkeypatch.setenv("FAKE_CLI_THINK", "0.3")
+
+    wrapper = tmp_path / "claude"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_CLI}" "$@"\n')
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IEXEC)
+
+    client = ClaudeCLIClient.__new__(ClaudeCLIClient)
+    client.claude_cmd = str(wrapper)
+    client.pool = None
+    return client
+
+
+def test_cli_calls_do_not_block_and_respect_concurrency(cli_client):
+    provider = AsyncClaudeCLIClient(cli_client, max_concurrency=2)
+    schema = {"tables": [{"name": "Companies", "columns": [{"name": "CompanyName", "type": "NVARCHAR"}]}]}
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(provider.generate_sql("latest companies", schema) for _ in range(4)))
+        elapsed = time.perf_counter() - start
+        tick_task.cancel()
+        return results, elapsed, ticks
+
+    results, elapsed, ticks = asyncio.run(run())
+
+    assert all(r["sql"].startswith("SELECT") for r in results)
+    # 4 calls of ~0.3s, 2 at a time: two rounds, not one and not four
+    assert 0.55 < elapsed < 1.2
+    # The event loop kept running while the CLI processes worked
+    assert ticks >= 8
+
+
+def test_cli_timeout_kills_process(cli_client, monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_THINK", "5")
+    monkeypatch.setattr(settings, "claude_cli_timeout", 0.3)
+    provider = AsyncClaudeCLIClient(cli_client, max_concurrency=1)
+
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="timed out"):
+        asyncio.run(provider.generate_sql("latest companies", {"tables": []}))
+    assert time.perf_counter() - start < 2
+
+
+def test_cancelled_pooled_call_kills_its_session(cli_client, monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_THINK", "5")
+    cli_client.pool = ClaudeCLIPool([cli_client.claude_cmd], size=1)
+    provider = AsyncClaudeCLIClient(cli_client, max_concurrency=1)
+
+    async def run():
+        task = asyncio.create_task(provider.generate_sql("latest companies", {"tables": []}))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        start = time.perf_counter()
+        asyncio.run(run())
+        assert time.perf_counter() - start < 1.5
+
+        # The call returned only after its session was killed and retired
+        stats = cli_client.pool.stats()
+        assert stats["cancelled"] == 1
+        assert stats["recycled"] == 1
+    finally:
+        cli_client.pool.close()
+
+
+def test_gate_works_across_event_loops():
+    gate = ConcurrencyGate(1)
+
+    async def use():
+        async with gate.slot():
+            await asyncio.sleep(0)
+        return True
+
+    # asyncio.run creates a new loop each time (as scripts do)
+    assert asyncio.run(use())
+    assert asyncio.run(use())
+
+
+class _Provider:
+    def __init__(self, name, fail=False, delay=0.0, sql="SELECT 1"):
+        self.name = name
+        self.fail = fail
+        self.delay = delay
+        self.sql = sql
+        self.cancelled = False
+
+    async def generate_sql(self, question, schema_info):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return {"sql": self.sql, "query_type": "READ", "risk_level": "low", "explanation": ""}
+
+    async def explain_query(self, sql):
+        return f"{self.name} explanation"
+
+
+def _unified(primary, fallback, default_budget=8.0):
+    client = UnifiedAIClient.__new__(UnifiedAIClient)
+    client.providers = {primary.name: primary, fallback.name: fallback}
+    client.async_providers = {primary.name: primary, fallback.name: fallback}
+    client.primary_provider = primary.name
+    client.fallback_provider = fallback.name
+    client.schema_pruner = None
+    client.provider_stats = ProviderStats(default_budget=default_budget, min_budget=0.05)
+    return client
+
+
+def test_unified_client_async_fallback():
+    client = _unified(_Provider("claude_cli", fail=True), _Provider("openai"))
+
+    result = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+
+    assert result["provider"] == "openai"
+    assert result["fallback_used"] is True
+    assert result["hedged"] is False
+    assert asyncio.run(client.aexplain_query("SELECT 1")) == "claude_cli explanation"
+
+
+def test_hedge_starts_fallback_when_primary_is_over_budget():
+    primary, fallback = _Provider("claude_cli", delay=5), _Provider("openai", delay=0.05)
+    client = _unified(primary, fallback, default_budget=0.2)
+
+    start = time.perf_counter()
+    result = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+
+    assert time.perf_counter() - start < 1
+    assert result["provider"] == "openai"
+    assert result["hedged"] is True
+    # The slow primary was cancelled
+    assert primary.cancelled
+
+
+def test_fast_primary_is_not_hedged():
+    primary, fallback = _Provider("claude_cli", delay=0.01), _Provider("openai")
+    client = _unified(primary, fallback, default_budget=0.5)
+
+    result = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+
+    assert result["provider"] == "claude_cli"
+    assert result["hedged"] is False
+    assert "fallback_used" not in result
+
+
+def test_hedge_ignores_write_sql():
+    primary = _Provider("claude_cli", delay=0.3)
+    fallback = _Provider("openai", delay=0.01, sql="DELETE FROM Companies")
+    client = _unified(primary, fallback, default_budget=0.1)
+
+    result = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+
+    # The fallback answered first, but not with read-only SQL
+    assert result["provider"] == "claude_cli"
+
+
+def test_hedge_budget_adapts_to_latency():
+    stats = ProviderStats(default_budget=8.0, min_budget=0.5, min_samples=5)
+    assert stats.budget("claude_cli") == 8.0
+
+    for seconds in [1, 1, 1, 1, 1, 1, 1, 1, 1, 4]:
+        stats.record_success("claude_cli", seconds)
+    assert stats.budget("claude_cli") == 1
+
+    for seconds in [4] * 10:
+        stats.record_success("claude_cli", seconds)
+    assert stats.budget("claude_cli") == 4
+
+
+def test_hedge_losers_keep_the_budget_from_drifting_down():
+    stats = ProviderStats(default_budget=8.0, min_budget=0.5, min_samples=5, window=10)
+    for _ in range(10):
+        stats.record_success("claude_cli", 1.0)
+    assert stats.budget("claude_cli") == 1
+
+    # Every slow call is hedged and cancelled: only the fast ones succeed
+    for _ in range(5):
+        stats.record_success("claude_cli", 1.0)
+        stats.record_cancelled("claude_cli", 3.0)
+    assert stats.budget("claude_cli") == 3
+
+    # A call cancelled early says nothing about the tail
+    stats.record_cancelled("claude_cli", 0.1)
+    assert stats.budget("claude_cli") == 3
+
+
+def test_routing_prefers_lowest_expected_latency():
+    stats = ProviderStats(alpha=0.5)
+    for _ in range(5):
+        stats.record_success("claude_cli", 6.0)
+        stats.record_success("openai", 2.0)
+    assert stats.rank(["claude_cli", "openai"]) == ["openai", "claude_cli"]
+
+    # Errors inflate the expected latency
+    for _ in range(2):
+        stats.record_failure("openai", RuntimeError("boom"), 2.0)
+    assert stats.expected_latency("openai") > 6.0
+    assert stats.rank(["claude_cli", "openai"]) == ["claude_cli", "openai"]
+
+
+def test_unknown_providers_keep_priority_order():
+    stats = ProviderStats()
+    assert stats.rank(["claude_cli", "openai", "claude"]) == ["claude_cli", "openai", "claude"]
+
+
+def test_circuit_breaker_opens_and_probes_half_open(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.provider_stats.time.monotonic", lambda: now[0])
+    stats = ProviderStats(failure_threshold=3, cooldown=30)
+
+    for _ in range(3):
+        stats.record_failure("claude_cli", ResponseParseError("not JSON"))
+    assert stats.breaker_state("claude_cli") == "open"
+    assert not stats.available("claude_cli")
+    assert stats.rank(["claude_cli", "openai"]) == ["openai", "claude_cli"]
+    assert stats.snapshot()["claude_cli"]["parse_failures"] == 3
+
+    # After the cooldown a single probe is let through
+    now[0] += 31
+    assert stats.breaker_state("claude_cli") == "half_open"
+    assert stats.available("claude_cli")
+    stats.record_start("claude_cli")
+    assert not stats.available("claude_cli")
+
+    # A failed probe re-opens the breaker for another cooldown
+    stats.record_failure("claude_cli", RuntimeError("still down"))
+    assert stats.breaker_state("claude_cli") == "open"
+
+    now[0] += 31
+    stats.record_start("claude_cli")
+    stats.record_success("claude_cli", 1.0)
+    assert stats.breaker_state("claude_cli") == "closed"
+    assert stats.available("claude_cli")
+
+
+def test_unified_client_routes_around_failing_provider():
+    primary, fallback = _Provider("claude_cli", fail=True), _Provider("openai")
+    client = _unified(primary, fallback)
+
+    first = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+    assert first["fallback_used"] is True
+
+    # One failure is enough to make the healthy fallback the better route
+    result = asyncio.run(client.agenerate_sql("anything", {"tables": []}))
+    assert result["provider"] == "openai"
+    assert "fallback_used" not in result
+    assert client.get_provider_stats()["route"] == ["openai", "claude_cli"]
+
+    # Forced calls keep failing until the breaker opens
+    for _ in range(2):
+        asyncio.run(client.agenerate_sql("anything", {"tables": []}, provider="claude_cli"))
+    assert client.provider_stats.breaker_state("claude_cli") == "open"
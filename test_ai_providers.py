@@ -2,6 +2,7 @@
 Compare OpenAI and Claude side-by-side for SQL generation.
 Run this to see which provider works better for your use case.
 """
+import argparse
 import sys
 import os
 import json
@@ -11,6 +12,39 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(__file__))
 
 
+# Comparison scenario (also replayed by benchmarks/benchmark_ai_replay.py)
+QUESTION = "Show me the top 10 customers by total purchase amount, including their name and total spent"
+
+SCHEMA = {
+    "tables": [
+        {
+            "name": "customers",
+            "columns": [
+                {"name": "id", "type": "INT", "primary_key": True, "nullable": False},
+                {"name": "name", "type": "VARCHAR(100)", "nullable": False},
+                {"name": "email", "type": "VARCHAR(100)", "nullable": True}
+            ]
+        },
+        {
+            "name": "orders",
+            "columns": [
+                {"name": "id", "type": "INT", "primary_key": True, "nullable": False},
+                {"name": "customer_id", "type": "INT", "nullable": False},
+                {"name": "total_amount", "type": "DECIMAL(10,2)", "nullable": False},
+                {"name": "order_date", "type": "DATETIME", "nullable": False}
+            ],
+            "foreign_keys": [
+                {
+                    "columns": ["customer_id"],
+                    "referred_table": "customers",
+                    "referred_columns": ["id"]
+                }
+            ]
+        }
+    ]
+}
+
+
 def test_provider(provider_name, client, question, schema):
     """Test a single provider."""
     print(f"\n{'='*60}")
@@ -49,44 +83,20 @@ def test_provider(provider_name, client, question, schema):
         }
 
 
-def run_comparison():
-    """Run comparison between available providers."""
+def run_comparison(record_path=None):
+    """
+    Run comparison between available providers.
+
+    Args:
+        record_path: Also record the answers and latencies as replay
+            fixtures (see app/core/replay_client.py)
+    """
     print("="*60)
     print("AI PROVIDER COMPARISON TEST")
     print("="*60)
 
-    # Sample question
-    question = "Show me the top 10 customers by total purchase amount, including their name and total spent"
-
-    # Sample schema (minimal)
-    schema = {
-        "tables": [
-            {
-                "name": "customers",
-                "columns": [
-                    {"name": "id", "type": "INT", "primary_key": True, "nullable": False},
-                    {"name": "name", "type": "VARCHAR(100)", "nullable": False},
-                    {"name": "email", "type": "VARCHAR(100)", "nullable": True}
-                ]
-            },
-            {
-                "name": "orders",
-                "columns": [
-                    {"name": "id", "type": "INT", "primary_key": True, "nullable": False},
-                    {"name": "customer_id", "type": "INT", "nullable": False},
-                    {"name": "total_amount", "type": "DECIMAL(10,2)", "nullable": False},
-                    {"name": "order_date", "type": "DATETIME", "nullable": False}
-                ],
-                "foreign_keys": [
-                    {
-                        "columns": ["customer_id"],
-                        "referred_table": "customers",
-                        "referred_columns": ["id"]
-                    }
-                ]
-            }
-        ]
-    }
+    question = QUESTION
+    schema = SCHEMA
 
     print(f"\nTest Question:")
     print(f"  {question}")
@@ -94,6 +104,18 @@ def run_comparison():
 
     results = {}
 
+    store = None
+    if record_path:
+        from app.core.replay_client import FixtureStore
+        store = FixtureStore(record_path)
+        print(f"Recording answers to {record_path}")
+
+    def recorded(name, client):
+        if store is None:
+            return client
+        from app.core.replay_client import RecordingClient
+        return RecordingClient(client, store, name)
+
     # Test Claude
     try:
         print("\n" + "="*60)
@@ -101,7 +123,7 @@ def run_comparison():
         print("="*60)
         from app.core.claude_client import ClaudeClient
         claude = ClaudeClient()
-        results['claude'] = test_provider('Claude', claude, question, schema)
+        results['claude'] = test_provider('Claude', recorded('claude', claude), question, schema)
     except Exception as e:
         print(f"❌ Claude not available: {e}")
         results['claude'] = {'success': False, 'error': str(e)}
@@ -113,7 +135,7 @@ def run_comparison():
         print("="*60)
         from app.core.openai_client import OpenAIClient
         openai = OpenAIClient()
-        results['openai'] = test_provider('OpenAI', openai, question, schema)
+        results['openai'] = test_provider('OpenAI', recorded('openai', openai), question, schema)
     except Exception as e:
         print(f"❌ OpenAI not available: {e}")
         results['openai'] = {'success': False, 'error': str(e)}
@@ -159,8 +181,12 @@ def run_comparison():
 
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compare AI providers for SQL generation")
+    parser.add_argument("--record", metavar="FIXTURES", help="Record answers as replay fixtures (JSONL)")
+    args = parser.parse_args()
+
     try:
-        run_comparison()
+        run_comparison(args.record)
     except KeyboardInterrupt:
         print("\n\nTest cancelled.")
         sys.exit(1)
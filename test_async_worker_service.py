@@ -0,0 +1,101 @@
+"""
+Tests for the single-event-loop worker (async_worker_service.py).
+Runs without the queue, target database or Claude (in-memory queue,
+simulated stages), but needs asyncpg installed:
+python -m pytest test_async_worker_service.py
+"""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+import async_worker_service
+from app.config import settings
+from async_worker_service import AsyncWorkerService
+
+
+class SlowAIGenerator:
+    def __init__(self):
+        self.ai_active = 0
+        self.ai_peak = 0
+
+    def record_success(self, question, result):
+        pass
+
+    async def agenerate_sql(self, question, language='en', ai_limit=None, **kwargs):
+        if question.startswith("ai:"):
+            async with ai_limit:
+                self.ai_active += 1
+                self.ai_peak = max(self.ai_peak, self.ai_active)
+                await asyncio.sleep(0.3)
+                self.ai_active -= 1
+        return {'success': True, 'sql': "SELECT 1"}
+
+
+class SlowDatabase:
+    def get_schema_info(self):
+        return {'tables': [{'name': 'Companies', 'columns': []}]}
+
+    def execute_query(self, sql, fetch_results=True):
+        time.sleep(0.05)
+        return [], 0, 50.0
+
+
+class ListWorker(AsyncWorkerService):
+    def __init__(self, requests, **kwargs):
+        super().__init__(listen=False, poll_interval=0, **kwargs)
+        self.queue = list(requests)
+        self.finished = {}
+
+    async def fetch_pending_requests(self, limit=None):
+        claimed, self.queue = self.queue[:limit], self.queue[limit:]
+        return claimed
+
+    async def update_request_status(self, request_id, status, **kwargs):
+        self.finished[request_id] = (status, time.perf_counter())
+        return True
+
+    async def heartbeat(self):
+        pass
+
+    async def wait_for_requests(self):
+        if not self.queue:
+            self.running = False
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = SlowAIGenerator()
+    monkeypatch.setattr(async_worker_service, "intelligent_sql_generator", generator)
+    monkeypatch.setattr(async_worker_service, "db_manager", SlowDatabase())
+    monkeypatch.setattr(settings, "worker_ai_concurrency", 2)
+    monkeypatch.setattr(settings, "worker_db_concurrency", 4)
+    return generator
+
+
+def test_requests_run_concurrently_within_stage_limits(generator):
+    questions = [f"ai:{i}" for i in range(4)] + [f"cheap {i}" for i in range(16)]
+    worker = ListWorker([{'id': i, 'question': q} for i, q in enumerate(questions)], concurrency=20)
+
+    start = time.perf_counter()
+    asyncio.run(worker.run())
+    elapsed = time.perf_counter() - start
+
+    assert worker.processed_count == 20 and worker.error_count == 0
+    assert generator.ai_peak == 2
+    # Two AI rounds of 0.3s; the 16 queries overlap on the 4 DB threads
+    assert elapsed < 1.0
+
+
+def test_failures_are_recorded(generator, monkeypatch):
+    async def broken(question, **kwargs):
+        return {'success': False, 'error': "no pattern"}
+
+    monkeypatch.setattr(generator, "agenerate_sql", broken)
+    worker = ListWorker([{'id': 1, 'question': "?"}])
+    asyncio.run(worker.run())
+
+    assert worker.finished[1][0] == 'failed'
+    assert worker.error_count == 1
@@ -0,0 +1,134 @@
+"""
+Tests for bulk re-scoring (app/services/bulk_classifier.py).
+Runs without PostgreSQL (fake connections, classification in-process):
+python -m pytest test_bulk_classifier.py
+"""
+import pytest
+
+from app.services import bulk_classifier
+from app.services.bulk_classifier import BulkClassifier, classify_chunk
+
+
+ROWS = [
+    (1, "SELECT * FROM Companies", "READ", "low"),
+    (2, "DELETE FROM Companies", "READ", "low"),
+    (3, "UPDATE Companies SET IsActive = 0 WHERE Id = 3", None, None),
+    (4, "SELECT COUNT(*) FROM Documents", "READ", "low"),
+    (5, "TRUNCATE TABLE Logs", "READ", "low"),
+]
+
+
+class FakeCursor:
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        limit = params[0] if "LIMIT" in sql else None
+        self._remaining = self.conn.rows[:limit]
+
+    def fetchmany(self, size):
+        chunk, self._remaining = self._remaining[:size], self._remaining[size:]
+        return chunk
+
+
+class FakeConnection:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Statements passed to execute_values, with their rows."""
+    calls = []
+    monkeypatch.setattr(
+        bulk_classifier, "execute_values",
+        lambda cursor, sql, rows, page_size=100: calls.append((" ".join(sql.split()), list(rows)))
+    )
+    return calls
+
+
+def make_classifier(rows, chunk_size=2):
+    connections = []
+
+    def connect():
+        conn = FakeConnection(rows)
+        connections.append(conn)
+        return conn
+
+    return BulkClassifier(connect, workers=1, chunk_size=chunk_size), connections
+
+
+def test_classify_chunk_counts_rules_and_reports_changed_rows():
+    stats, changed = classify_chunk(ROWS[:3])
+
+    assert stats[("classification", "read", "READ", "low", False)] == 1
+    assert stats[("classification", "write_no_where", "WRITE_RISKY", "critical", True)] == 1
+    assert stats[("classification", "write_specific_where", "WRITE_SAFE", "medium", True)] == 1
+    assert [row[0] for row in changed] == [2, 3]
+    assert changed[0] == (2, "READ", "low", "WRITE_RISKY", "critical", "write_no_where")
+
+
+def test_rows_are_streamed_in_chunks():
+    bulk, _ = make_classifier(ROWS, chunk_size=2)
+    conn = FakeConnection(ROWS)
+
+    chunks = list(bulk._stream_chunks(conn, "sql_queue", limit=None))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+    limited = list(bulk._stream_chunks(conn, "sql_queue", limit=3))
+    assert [len(chunk) for chunk in limited] == [2, 1]
+    assert conn.executed[-1][0].rstrip().endswith("LIMIT %s")
+
+
+def test_run_writes_changes_per_chunk_then_totals(written):
+    bulk, connections = make_classifier(ROWS, chunk_size=2)
+
+    report = bulk.run(write_changes=True)
+
+    assert (report.rows_scanned, report.rows_changed) == (5, 3)
+    change_writes = [rows for sql, rows in written if "sql_rescore_changes" in sql]
+    # One INSERT per chunk with changes, written as the chunks arrive
+    assert [[row[1] for row in rows] for rows in change_writes] == [[2], [3], [5]]
+    assert all(row[0] == report.run_id for rows in change_writes for row in rows)
+
+    write_conn = connections[0]
+    statements = [" ".join(sql.split()) for sql, _ in write_conn.executed]
+    assert statements[0].startswith("INSERT INTO sql_rescore_runs")
+    assert statements[-1].startswith("UPDATE sql_rescore_runs")
+    assert write_conn.executed[-1][1][1:3] == (5, 3)
+    assert any("sql_rescore_stats" in sql for sql, _ in written)
+    assert all(conn.closed for conn in connections)
+
+
+def test_dry_run_writes_nothing(written):
+    bulk, connections = make_classifier(ROWS)
+
+    report = bulk.run(write_results=False, write_changes=True, limit=4)
+
+    assert (report.rows_scanned, report.rows_changed) == (4, 2)
+    assert written == []
+    assert len(connections) == 1
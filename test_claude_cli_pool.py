@@ -0,0 +1,133 @@
+"""
+Tests for the Claude CLI session pool, using benchmarks/fake_claude_cli.py.
+Runs without Claude installed: python -m pytest test_claude_cli_pool.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from app.core.claude_cli_pool import CallCancelledError, ClaudeCLIPool, PoolExhaustedError
+
+
+FAKE_CLI = [sys.executable, os.path.join(os.path.dirname(__file__), "benchmarks", "fake_claude_cli.py")]
+
+
+@pytest.fixture(autouse=True)
+def fast_fake_cli(monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_STARTUP", "0")
+    monkeypatch.setenv("FAKE_CLI_THINK", "0.05")
+
+
+def test_each_session_answers_one_question():
+    pool = ClaudeCLIPool(FAKE_CLI, size=1)
+    try:
+        for _ in range(3):
+            assert '"sql"' in pool.ask("question", timeout=10)
+        time.sleep(0.5)
+
+        stats = pool.stats()
+        assert stats["requests"] == 3
+        assert stats["recycled"] == 3
+        # One per answer, plus the replacement booted after the last one
+        assert stats["spawned"] == 4
+    finally:
+        pool.close()
+
+
+def test_timeout_covers_queue_wait_and_answer(monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_THINK", "0.4")
+    pool = ClaudeCLIPool(FAKE_CLI, size=1)
+    try:
+        pool.warm()
+        busy = threading.Thread(target=pool.ask, args=("first", 10))
+        busy.start()
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            pool.ask("second", timeout=0.6)
+        elapsed = time.monotonic() - start
+        busy.join()
+
+        # Queue wait (~0.3s) + answer (0.4s) overrun the single 0.6s budget;
+        # separate budgets would have let the call finish
+        assert elapsed < 1.2
+    finally:
+        pool.close()
+
+
+def test_cancel_stops_waiting_and_answering_calls(monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_THINK", "5")
+    pool = ClaudeCLIPool(FAKE_CLI, size=1)
+    errors = []
+    cancel = threading.Event()
+
+    def ask():
+        try:
+            pool.ask("question", timeout=10, cancel=cancel)
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=ask) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.3)
+        start = time.monotonic()
+        cancel.set()
+        for thread in threads:
+            thread.join()
+
+        assert time.monotonic() - start < 0.5
+        assert len(errors) == 2 and all(isinstance(e, CallCancelledError) for e in errors)
+        # The answering session was killed, not left running
+        assert pool.stats()["cancelled"] == 2
+        assert pool.stats()["recycled"] == 1
+    finally:
+        pool.close()
+
+
+def test_waiters_are_served_in_arrival_order():
+    pool = ClaudeCLIPool(FAKE_CLI, size=1, max_queue=10)
+    order = []
+    try:
+        pool.ask("warm up", timeout=10)
+
+        def ask(index):
+            pool.ask(f"question {index}", timeout=10)
+            order.append(index)
+
+        threads = []
+        for index in range(5):
+            thread = threading.Thread(target=ask, args=(index,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        assert order == [0, 1, 2, 3, 4]
+    finally:
+        pool.close()
+
+
+def test_full_queue_is_rejected():
+    pool = ClaudeCLIPool(FAKE_CLI, size=1, max_queue=1)
+    try:
+        pool.ask("warm up", timeout=10)
+        first = threading.Thread(target=pool.ask, args=("slow", 10))
+        second = threading.Thread(target=pool.ask, args=("queued", 10))
+        first.start()
+        time.sleep(0.01)
+        second.start()
+        time.sleep(0.01)
+
+        with pytest.raises(PoolExhaustedError):
+            pool.ask("rejected", timeout=10)
+        first.join()
+        second.join()
+    finally:
+        pool.close()
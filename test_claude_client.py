@@ -0,0 +1,113 @@
+"""
+Tests for the Anthropic API client's prompt-cache layout (no API calls).
+Runs: python -m pytest test_claude_client.py
+"""
+from types import SimpleNamespace
+
+from app.core.ai_client import UnifiedAIClient
+from app.core.claude_client import ClaudeClient
+from app.core.provider_stats import ProviderStats
+from app.services.schema_pruner import SchemaPruner
+
+
+SCHEMA = {
+    "tables": [
+        {"name": "Companies", "columns": [{"name": "Id", "type": "INT", "primary_key": True}], "foreign_keys": []},
+        {"name": "Logs", "columns": [{"name": "Message", "type": "NVARCHAR(MAX)"}], "foreign_keys": []},
+    ]
+}
+
+
+class _FakeMessages:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        first = len(self.requests) == 1
+        usage = SimpleNamespace(
+            input_tokens=15,
+            output_tokens=40,
+            cache_creation_input_tokens=2000 if first else 0,
+            cache_read_input_tokens=0 if first else 2000,
+        )
+        return SimpleNamespace(content=[SimpleNamespace(text='{"sql": "SELECT COUNT(*) FROM Companies"}')], usage=usage)
+
+
+def _client():
+    client = ClaudeClient(api_key="test-key")
+    messages = _FakeMessages()
+    client.client = SimpleNamespace(
+        messages=messages, beta=SimpleNamespace(prompt_caching=SimpleNamespace(messages=messages))
+    )
+    client.caches_schema_prefix = True
+    return client, messages
+
+
+def test_schema_prefix_is_identical_and_only_question_varies():
+    client, messages = _client()
+
+    client.generate_sql("how many companies?", dict(SCHEMA))
+    client.generate_sql("how many logs?", dict(SCHEMA))
+
+    first, second = messages.requests
+    assert first["system"] == second["system"]
+    assert first["system"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert "Companies" in first["system"][-1]["text"]
+    assert first["messages"] == [{"role": "user", "content": "USER QUESTION:\nhow many companies?"}]
+    assert second["messages"][0]["content"].endswith("how many logs?")
+
+
+def test_usage_splits_cached_and_uncached_tokens():
+    client, _ = _client()
+
+    client.generate_sql("how many companies?", dict(SCHEMA))
+    client.generate_sql("how many logs?", dict(SCHEMA))
+
+    stats = client.usage_stats()
+    assert stats["requests"] == 2
+    assert stats["cache_hits"] == 1
+    assert stats["cache_creation_input_tokens"] == 2000
+    assert stats["cache_read_input_tokens"] == 2000
+    assert stats["input_tokens"] == 30
+    assert stats["avg_seconds_cache_hit"] is not None
+    assert stats["avg_seconds_cache_miss"] is not None
+
+
+def test_without_prompt_cache_uses_single_user_message():
+    client, messages = _client()
+    client.caches_schema_prefix = False
+
+    client.generate_sql("how many companies?", dict(SCHEMA))
+
+    request = messages.requests[0]
+    assert isinstance(request["system"], str)
+    assert "DATABASE SCHEMA" in request["messages"][0]["content"]
+
+
+def test_unified_client_sends_full_schema_to_caching_provider():
+    seen = {}
+
+    class _Provider:
+        def __init__(self, name, caches, fail=False):
+            self.name = name
+            self.caches_schema_prefix = caches
+            self.fail = fail
+
+        def generate_sql(self, question, schema_info):
+            seen[self.name] = [t["name"] for t in schema_info["tables"]]
+            if self.fail:
+                raise RuntimeError(f"{self.name} is down")
+            return {"sql": "SELECT 1"}
+
+    client = UnifiedAIClient.__new__(UnifiedAIClient)
+    client.providers = {"claude_cli": _Provider("claude_cli", False, fail=True), "claude": _Provider("claude", True)}
+    client.primary_provider, client.fallback_provider = "claude_cli", "claude"
+    client.schema_pruner = SchemaPruner()
+    client.provider_stats = ProviderStats()
+
+    result = client.generate_sql("how many companies?", dict(SCHEMA))
+
+    assert result["provider"] == "claude"
+    assert seen["claude_cli"] == ["Companies"]
+    assert seen["claude"] == ["Companies", "Logs"]
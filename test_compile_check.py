@@ -0,0 +1,162 @@
+"""
+Tests for the server-side compile check and SQL regeneration.
+Runs without SQL Server: python -m pytest test_compile_check.py
+"""
+import asyncio
+import threading
+
+from app.config import settings
+from app.core.compile_check import (
+    SQLCompileChecker,
+    SQLCompileError,
+    clean_error_message,
+    normalize_statement,
+)
+from app.services.sql_generator import IntelligentSQLGenerator
+
+
+SCHEMA = {"tables": [{"name": "Companies", "columns": [{"name": "CompanyName", "type": "NVARCHAR"}]}]}
+
+
+class _Server:
+    """Stand-in for sp_describe_first_result_set over SCHEMA."""
+
+    def __init__(self, down=False):
+        self.calls = []
+        self.down = down
+
+    def describe(self, sql):
+        self.calls.append(sql)
+        if self.down:
+            raise ConnectionError("Database connection is not available")
+        if "Revenue" in sql:
+            raise SQLCompileError("Invalid column name 'Revenue'.")
+        return [{"name": "CompanyName", "type": "nvarchar(200)", "nullable": False}]
+
+
+def test_normalized_statements_share_a_verdict():
+    server = _Server()
+    checker = SQLCompileChecker(server.describe)
+
+    first = checker.check("SELECT CompanyName FROM Companies;", "v1")
+    again = checker.check("select  CompanyName\n  from Companies -- latest", "v1")
+
+    assert first.valid and not first.cached
+    assert again.valid and again.cached
+    assert again.columns[0]["name"] == "CompanyName"
+    assert len(server.calls) == 1
+
+    # A new schema version is checked again
+    checker.check("SELECT CompanyName FROM Companies", "v2")
+    assert len(server.calls) == 2
+
+
+def test_invalid_verdicts_are_cached_and_unknown_ones_are_not():
+    server = _Server()
+    checker = SQLCompileChecker(server.describe)
+
+    verdict = checker.check("SELECT Revenue FROM Companies")
+    assert verdict.valid is False
+    assert "Revenue" in verdict.error
+    assert checker.check("SELECT Revenue FROM Companies").cached
+
+    server.down = True
+    assert checker.check("SELECT 1").valid is None
+    assert checker.check("SELECT 1").valid is None
+    assert checker.stats()["unknown"] == 2
+
+
+def test_literals_and_identifiers_keep_their_case():
+    assert normalize_statement("select 'Tel Aviv' from [Companies]") == "SELECT 'Tel Aviv' FROM [Companies]"
+    assert normalize_statement("select 'a'") != normalize_statement("select 'A'")
+
+
+def test_odbc_noise_is_stripped_from_errors():
+    message = (
+        "('42S22', \"[42S22] [Microsoft][ODBC Driver 18 for SQL Server][SQL Server]"
+        "Invalid column name 'Revenue'. (207) (SQLExecDirectW)\")"
+    )
+    assert clean_error_message(message).startswith("Invalid column name 'Revenue'.")
+
+
+class _CLI:
+    """Answers with a bad column first, then the fixed SQL once told why."""
+
+    def __init__(self):
+        self.questions = []
+
+    def generate_sql(self, question, schema_info, examples=None, on_sql=None):
+        self.questions.append(question)
+        if "rejected" in question:
+            return {"sql": "SELECT CompanyName FROM Companies", "query_type": "READ"}
+        return {"sql": "SELECT Revenue FROM Companies", "query_type": "READ"}
+
+
+def _generator(server, monkeypatch):
+    monkeypatch.setattr(settings, "sql_compile_max_regenerations", 1)
+    generator = IntelligentSQLGenerator.__new__(IntelligentSQLGenerator)
+    generator.claude_cli_client = _CLI()
+    generator.question_cache = None
+    generator.similarity_index = None
+    generator.schema_pruner = None
+    generator.compile_checker = SQLCompileChecker(server.describe)
+    return generator
+
+
+def test_sql_that_does_not_compile_is_regenerated(monkeypatch):
+    generator = _generator(_Server(), monkeypatch)
+
+    result = generator.generate_with_ai("revenue per company", SCHEMA, matches=[])
+
+    assert result["success"]
+    assert result["sql"] == "SELECT CompanyName FROM Companies"
+    assert result["result_columns"][0]["name"] == "CompanyName"
+    assert "Invalid column name 'Revenue'" in generator.claude_cli_client.questions[1]
+
+
+def test_regeneration_gives_up_after_the_limit(monkeypatch):
+    generator = _generator(_Server(), monkeypatch)
+    monkeypatch.setattr(settings, "sql_compile_max_regenerations", 0)
+
+    result = generator.generate_with_ai("revenue per company", SCHEMA, matches=[])
+
+    assert not result["success"]
+    assert result["method"] == "compile_error"
+    assert len(generator.claude_cli_client.questions) == 1
+
+
+def test_async_path_regenerates_too(monkeypatch):
+    generator = _generator(_Server(), monkeypatch)
+
+    class _AsyncCLI:
+        async def generate_sql(self, *args, **kwargs):
+            return generator.claude_cli_client.generate_sql(*args, **kwargs)
+
+    generator.async_cli_client = _AsyncCLI()
+    result = asyncio.run(generator.agenerate_with_ai("revenue per company", SCHEMA, matches=[]))
+    assert result["sql"] == "SELECT CompanyName FROM Companies"
+
+
+def test_async_path_keeps_cache_queries_off_the_loop(monkeypatch):
+    generator = _generator(_Server(), monkeypatch)
+    threads = []
+
+    class _Cache:
+        def lookup(self, question, version):
+            threads.append(threading.get_ident())
+
+    class _AsyncCLI:
+        async def generate_sql(self, *args, **kwargs):
+            return {"sql": "SELECT CompanyName FROM Companies", "query_type": "READ"}
+
+    async def run():
+        loop_thread = threading.get_ident()
+        result = await generator.agenerate_with_ai("companies", SCHEMA, matches=[])
+        return loop_thread, result
+
+    generator.question_cache = _Cache()
+    generator.async_cli_client = _AsyncCLI()
+    loop_thread, result = asyncio.run(run())
+
+    assert result["success"]
+    assert len(threads) == 1 and loop_thread not in threads
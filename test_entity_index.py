@@ -0,0 +1,106 @@
+"""
+Tests for the schema-derived entity index.
+Runs without a database: python -m pytest test_entity_index.py
+"""
+import json
+import threading
+
+from app.services.entity_index import EntityIndex, name_phrases, split_identifier
+from app.services.sql_generator import IntelligentSQLGenerator
+from app.utils.schema_version import schema_version
+
+
+SCHEMA = {
+    "tables": [
+        {"name": "Groups", "columns": [{"name": "Id", "type": "INT"}]},
+        {
+            "name": "PaymentInvoices",
+            "columns": [
+                {"name": "Id", "type": "INT"},
+                {"name": "TotalAmount", "type": "DECIMAL(10, 2)"},
+                {"name": "Status", "type": "NVARCHAR(50)"},
+                {"name": "IssuedAt", "type": "DATETIME2"},
+                {"name": "CreatedDate", "type": "DATETIME"},
+            ],
+        },
+    ]
+}
+
+
+def test_identifier_splitting_and_plurals():
+    assert split_identifier("CompanySigner1Details") == ["company", "signer", "details"]
+    assert split_identifier("user_access_logs") == ["user", "access", "logs"]
+    assert "contact group" in name_phrases("ContactsGroups")
+    assert "company" in name_phrases("Companies")
+
+
+def test_unknown_table_resolves_through_pattern_path():
+    generator = IntelligentSQLGenerator()
+    result = generator.generate_sql("total amount of payment invoices", schema_info=dict(SCHEMA))
+
+    assert result["method"] == "pattern_matching"
+    assert result["sql"].startswith("SELECT SUM(TotalAmount) as total FROM PaymentInvoices")
+
+
+def test_head_noun_and_default_date_column():
+    generator = IntelligentSQLGenerator()
+    generator.refresh_entities(dict(SCHEMA))
+    entities = generator.extract_entities("recent invoices last week")
+
+    assert entities["table"] == "PaymentInvoices"
+    assert entities["date_column"] == "CreatedDate"
+
+
+def test_incremental_update_only_reindexes_changed_tables():
+    index = EntityIndex()
+    assert index.update(dict(SCHEMA)) is True
+    groups_entries = index._tables["Groups"]
+
+    changed = json.loads(json.dumps(SCHEMA))
+    changed["tables"][1]["columns"].append({"name": "DueDate", "type": "DATE"})
+
+    assert index.update(changed) is True
+    assert index._tables["Groups"] is groups_entries
+    assert index.update(changed) is False
+
+
+def test_concurrent_refreshes_build_the_matcher_once():
+    generator = IntelligentSQLGenerator()
+    builds = []
+    build = generator._build_matcher
+
+    def counting_build():
+        builds.append(1)
+        return build()
+
+    generator._build_matcher = counting_build
+    schema = json.loads(json.dumps(SCHEMA))
+    threads = [threading.Thread(target=generator.refresh_entities, args=(schema,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert generator.extract_entities("recent invoices")["table"] == "PaymentInvoices"
+
+
+def test_schema_version_does_not_modify_the_schema():
+    schema = json.loads(json.dumps(SCHEMA))
+    version = schema_version(schema)
+
+    assert "version" not in schema
+    assert schema_version(schema) == version
+    assert schema_version(json.loads(json.dumps(SCHEMA))) == version
+    assert schema_version({**schema, "version": "given"}) == "given"
+
+
+def test_synonyms_file(tmp_path):
+    path = tmp_path / "synonyms.json"
+    path.write_text(json.dumps({"חשבוניות": "PaymentInvoices"}), encoding="utf-8")
+
+    generator = IntelligentSQLGenerator()
+    generator.entity_index = EntityIndex(synonyms_file=str(path))
+    generator.refresh_entities(dict(SCHEMA))
+
+    assert generator.extract_entities("כמה החשבוניות")["table"] == "PaymentInvoices"
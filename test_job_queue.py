@@ -0,0 +1,261 @@
+"""
+Tests for queue job claiming and LISTEN/NOTIFY wakeup (app/core/job_queue.py).
+Runs without PostgreSQL (recording connection): python -m pytest test_job_queue.py
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from app.core.job_queue import (
+    CLAIM_SQL,
+    REAP_SQL,
+    LeaseKeeper,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    QueueListener,
+    capped_wait,
+    claim_jobs,
+    extend_leases,
+    make_worker_id,
+    reap_expired,
+    release_jobs,
+    seconds_until_due,
+)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = len(conn.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.fail:
+            raise RuntimeError("connection lost")
+        self.conn.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.conn.rows
+
+    def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+
+class FakeConnection:
+    def __init__(self, rows=(), fail=False):
+        self.rows = list(rows)
+        self.fail = fail
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_claim_is_one_skip_locked_update():
+    assert "FOR UPDATE OF q SKIP LOCKED" in CLAIM_SQL
+    assert "RETURNING *" in CLAIM_SQL
+    assert CLAIM_SQL.strip().startswith("UPDATE sql_queue")
+
+
+def test_claim_commits_and_returns_oldest_first():
+    rows = [
+        {"id": 2, "created_at": datetime(2024, 1, 2)},
+        {"id": 1, "created_at": datetime(2024, 1, 1)},
+    ]
+    conn = FakeConnection(rows)
+
+    claimed = claim_jobs(conn, "host:1", limit=5)
+
+    assert [row["id"] for row in claimed] == [1, 2]
+    assert conn.executed[0][1] == {"worker_id": "host:1", "limit": 5, "lease_seconds": 120}
+    assert conn.commits == 1
+
+
+def test_claim_ranks_by_priority_then_round_robin_per_user():
+    assert "PARTITION BY priority, user_id" in CLAIM_SQL
+    assert "ORDER BY q.priority DESC, turns.user_turn, q.created_at" in CLAIM_SQL
+    assert PRIORITY_INTERACTIVE > PRIORITY_BATCH
+
+
+def test_claimed_rows_are_returned_in_priority_order():
+    rows = [
+        {"id": 1, "priority": PRIORITY_BATCH, "created_at": datetime(2024, 1, 1)},
+        {"id": 3, "priority": PRIORITY_INTERACTIVE, "created_at": datetime(2024, 1, 3)},
+        {"id": 2, "priority": PRIORITY_INTERACTIVE, "created_at": datetime(2024, 1, 2)},
+    ]
+
+    claimed = claim_jobs(FakeConnection(rows), "host:1")
+
+    assert [row["id"] for row in claimed] == [2, 3, 1]
+
+
+def test_failed_claim_rolls_back():
+    conn = FakeConnection(fail=True)
+    with pytest.raises(RuntimeError):
+        claim_jobs(conn, "host:1")
+    assert conn.rollbacks == 1 and conn.commits == 0
+
+
+def test_release_only_touches_own_jobs():
+    conn = FakeConnection(rows=[{}, {}])
+
+    assert release_jobs(conn, "host:1", [3, 4]) == 2
+    sql, params = conn.executed[0]
+    assert "claimed_by = %(worker_id)s" in sql
+    assert params == {"worker_id": "host:1", "ids": [3, 4]}
+    # Other workers are woken for the released jobs
+    assert "pg_notify" in conn.executed[1][0]
+
+    assert release_jobs(conn, "host:1", []) == 0
+    assert len(conn.executed) == 2
+
+
+def test_claims_take_a_lease_and_skip_jobs_in_backoff():
+    assert "lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s)" in CLAIM_SQL
+    assert "attempts = attempts + 1" in CLAIM_SQL
+    assert "next_attempt_at <= NOW()" in CLAIM_SQL
+
+
+def test_heartbeat_reports_the_leases_still_owned():
+    conn = FakeConnection(rows=[(3,)])
+
+    assert extend_leases(conn, "host:1", [3, 4], lease_seconds=60) == {3}
+    sql, params = conn.executed[0]
+    assert "claimed_by = %(worker_id)s" in sql
+    assert params == {"worker_id": "host:1", "ids": [3, 4], "lease_seconds": 60}
+    assert conn.commits == 1
+
+
+def test_reaper_backs_off_then_fails():
+    assert "lease_expires_at < NOW()" in REAP_SQL and "SKIP LOCKED" in REAP_SQL
+    assert "POWER(2, GREATEST(attempts - 1, 0))" in REAP_SQL
+    assert "WHEN attempts >= %(max_attempts)s THEN 'failed'" in REAP_SQL
+
+    conn = FakeConnection(rows=[{"id": 5, "status": "pending", "attempts": 1}])
+    assert reap_expired(conn, max_attempts=4) == [{"id": 5, "status": "pending", "attempts": 1}]
+    assert conn.executed[0][1]["max_attempts"] == 4
+
+
+def test_idle_wait_ends_when_a_backed_off_job_is_due():
+    conn = FakeConnection(rows=[(12.5,)])
+    assert seconds_until_due(conn) == 12.5
+    assert "MIN(next_attempt_at)" in conn.executed[0][0]
+    assert seconds_until_due(FakeConnection(rows=[(None,)])) is None
+
+    assert capped_wait(60, None) == 60
+    assert capped_wait(60, 12.5) == 12.5
+    assert capped_wait(5, 12.5) == 5
+    assert capped_wait(60, -1) == 0
+
+
+def test_lease_keeper_drops_lost_leases():
+    conns = iter([
+        FakeConnection(rows=[(1,)]),  # heartbeat: job 2 was reaped
+        FakeConnection(rows=[{"id": 9, "status": "failed", "attempts": 3}]),  # reaper
+    ])
+
+    @contextmanager
+    def connection():
+        yield next(conns)
+
+    keeper = LeaseKeeper(connection, "host:1")
+    keeper.track([1, 2])
+    keeper.heartbeat()
+
+    assert keeper.stats() == {"tracked": 1, "lost": 1, "reaped": 1}
+
+
+def test_worker_id_names_host_and_process():
+    host, pid = make_worker_id().rsplit(":", 1)
+    assert host and pid.isdigit()
+
+
+class PipeConnection:
+    """Listening connection whose notifications arrive through a pipe."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.notifies = []
+        self.executed = []
+        self.autocommit = False
+        self.closed = False
+
+    def fileno(self):
+        return self.read_fd
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    @property
+    def fail(self):
+        return False
+
+    @property
+    def rows(self):
+        return []
+
+    def poll(self):
+        os.set_blocking(self.read_fd, False)
+        try:
+            while os.read(self.read_fd, 64):
+                self.notifies.append("sql_queue_jobs")
+        except BlockingIOError:
+            pass
+
+    def notify(self):
+        os.write(self.write_fd, b"x")
+
+    def close(self):
+        self.closed = True
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+@pytest.fixture
+def listener():
+    conn = PipeConnection()
+    listener = QueueListener(lambda: conn, slice_seconds=0.05)
+    yield listener, conn
+    listener.close()
+
+
+def test_listener_wakes_on_notification(listener):
+    listener, conn = listener
+    threading.Timer(0.05, conn.notify).start()
+
+    start = time.perf_counter()
+    assert listener.wait(5) is True
+    assert time.perf_counter() - start < 1
+    assert conn.autocommit and conn.executed[0][0] == "LISTEN sql_queue_jobs"
+
+
+def test_listener_counts_notifications_received_while_busy(listener):
+    listener, conn = listener
+    listener.listen()
+    conn.notify()
+    assert listener.wait(5) is True
+    assert listener.wait(0.05) is False
+
+
+def test_listener_stops_early(listener):
+    listener, conn = listener
+    start = time.perf_counter()
+    assert listener.wait(5, should_stop=lambda: time.perf_counter() - start > 0.1) is False
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,190 @@
+"""
+Tests for streamed answers: incremental "sql" extraction, the streaming CLI
+paths (benchmarks/fake_claude_cli.py) and early execution.
+Runs without Claude installed: python -m pytest test_json_stream.py
+"""
+import asyncio
+import json
+import os
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.core.ai_provider import AsyncClaudeCLIClient
+from app.core.claude_cli_client import ClaudeCLIClient
+from app.core.claude_cli_pool import PARTIAL_MESSAGES_ARG, STREAM_JSON_ARGS, ClaudeCLIPool
+from app.core.query_executor import QueryExecutor
+from app.services.early_execution import EarlyExecution
+from app.utils.json_stream import SQLFieldExtractor
+
+
+FAKE_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fake_claude_cli.py")
+
+ANSWER = json.dumps({
+    "sql": "SELECT \"Name\" FROM Companies WHERE City = N'Tel\\Aviv'",
+    "query_type": "READ",
+    "explanation": "Companies {in} \"Tel Aviv\"",
+})
+
+
+def feed_chunks(extractor, text, size):
+    found = []
+    for start in range(0, len(text), size):
+        value = extractor.feed(text[start:start + size])
+        if value is not None:
+            found.append((value, start + size))
+    return found
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_sql_is_found_as_soon_as_complete(size):
+    extractor = SQLFieldExtractor()
+    found = feed_chunks(extractor, ANSWER, size)
+
+    assert [value for value, _ in found] == [json.loads(ANSWER)["sql"]]
+    # Reported before the explanation streamed in
+    sql_end = ANSWER.index('", "query_type"') + 1
+    assert found[0][1] < sql_end + size + 1
+    assert extractor.done
+
+
+def test_prose_fences_and_nested_fields_are_ignored():
+    text = 'Here is "the" answer:\n```json\n{"meta": {"sql": "nested"}, "sql": "SELECT 1"}\n```'
+    extractor = SQLFieldExtractor()
+    assert [value for value, _ in feed_chunks(extractor, text, 4)] == ["SELECT 1"]
+
+
+def test_string_values_are_not_mistaken_for_keys():
+    extractor = SQLFieldExtractor()
+    assert extractor.feed('{"explanation": "sql", "note": "x", "sql": "SELECT 2"}') == "SELECT 2"
+
+
+@pytest.fixture
+def cli_client(tmp_path, monkeypatch):
+    """ClaudeCLIClient pointed at the fake CLI, process per question."""
+    monkeypatch.setenv("FAKE_CLI_STARTUP", "0")
+    monkeypatch.setenv("FAKE_CLI_THINK", "0.8")
+    monkeypatch.setenv("FAKE_CLI_CHUNKS", "16")
+
+    wrapper = tmp_path / "claude"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_CLI}" "$@"\n')
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IEXEC)
+
+    client = ClaudeCLIClient.__new__(ClaudeCLIClient)
+    client.claude_cmd = str(wrapper)
+    client.pool = None
+    return client
+
+
+def _timed_callback(start, seen):
+    return lambda sql: seen.append((sql, time.perf_counter() - start))
+
+
+def test_cli_streams_sql_before_answer_completes(cli_client):
+    seen = []
+    start = time.perf_counter()
+    result = cli_client.generate_sql("latest companies", {"tables": []}, on_sql=_timed_callback(start, seen))
+    total = time.perf_counter() - start
+
+    assert [sql for sql, _ in seen] == [result["sql"]]
+    assert seen[0][1] < total * 0.6
+
+
+def test_cli_without_partial_messages_still_streams_whole_message(cli_client, monkeypatch):
+    monkeypatch.setattr(settings, "claude_cli_partial_messages", False)
+    seen = []
+    result = cli_client.generate_sql("latest companies", {"tables": []}, on_sql=seen.append)
+    assert seen == [result["sql"]]
+
+
+def test_async_cli_streams_sql_before_answer_completes(cli_client):
+    provider = AsyncClaudeCLIClient(cli_client, max_concurrency=1)
+    seen = []
+
+    async def run():
+        start = time.perf_counter()
+        result = await provider.generate_sql("latest companies", {"tables": []}, on_sql=_timed_callback(start, seen))
+        return result, time.perf_counter() - start
+
+    result, total = asyncio.run(run())
+    assert [sql for sql, _ in seen] == [result["sql"]]
+    assert seen[0][1] < total * 0.6
+
+
+def test_pool_passes_deltas_once(monkeypatch):
+    monkeypatch.setenv("FAKE_CLI_STARTUP", "0")
+    monkeypatch.setenv("FAKE_CLI_THINK", "0.05")
+    pool = ClaudeCLIPool([sys.executable, FAKE_CLI], size=1, extra_args=STREAM_JSON_ARGS + [PARTIAL_MESSAGES_ARG])
+    try:
+        chunks = []
+        output = pool.ask("question", timeout=10, on_text=chunks.append)
+        # Deltas add up to the answer; the whole message is not repeated
+        assert "".join(chunks) == output
+        assert len(chunks) > 1
+    finally:
+        pool.close()
+
+
+def test_early_execution_reuses_matching_result():
+    calls = []
+
+    def execute(sql):
+        calls.append(sql)
+        return [{"n": 1}], 1, 5.0
+
+    early = EarlyExecution(execute)
+    early.on_sql("SELECT 1")
+    early.on_sql("SELECT 2")  # only the first streamed SQL runs
+
+    assert early.result_for(" SELECT 1\n") == ([{"n": 1}], 1, 5.0)
+    assert calls == ["SELECT 1"]
+
+
+def test_discarded_running_query_does_not_starve_the_next_request():
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    def slow(sql):
+        release.wait(5)
+        return [], 0, 1.0
+
+    try:
+        first = EarlyExecution(slow, executor)
+        first.on_sql("SELECT slow")
+        time.sleep(0.05)
+        first.result_for("SELECT different")  # discarded while running
+
+        second = EarlyExecution(lambda sql: ([{"n": 1}], 1, 1.0), executor)
+        second.on_sql("SELECT 1")
+        start = time.perf_counter()
+        # Its run is queued behind the discarded one: run directly instead
+        assert second.result_for("SELECT 1") is None
+        assert time.perf_counter() - start < 0.5
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+
+
+def test_no_early_execution_before_the_compile_check(monkeypatch):
+    monkeypatch.setattr(settings, "ai_streaming_enabled", True)
+    executor = QueryExecutor.__new__(QueryExecutor)
+
+    executor.sql_generator = SimpleNamespace(compile_checker=object())
+    assert executor._early_execution(True) is None
+
+    executor.sql_generator = SimpleNamespace(compile_checker=None)
+    assert executor._early_execution(True) is not None
+
+
+def test_early_execution_discards_different_sql():
+    early = EarlyExecution(lambda sql: ([], 0, 1.0))
+    early.on_sql("SELECT 1")
+
+    assert early.result_for("SELECT 2") is None
+    assert not early.started
@@ -0,0 +1,63 @@
+"""
+Tests for the Aho-Corasick keyword matcher and the generator's entity extraction.
+Runs without a database: python -m pytest test_keyword_matcher.py
+"""
+from app.utils.keyword_matcher import KeywordMatcher
+from app.services.sql_generator import intelligent_sql_generator
+
+
+def test_longest_match_wins_over_prefix():
+    matcher = KeywordMatcher([("contact", "Contacts"), ("contact groups", "ContactsGroups")])
+    matches = matcher.find_longest("How many contact groups exist?")
+
+    assert [m.keyword for m in matches] == ["contact groups"]
+    assert {m.keyword for m in matcher.find_all("How many contact groups exist?")} == {"contact", "contact groups"}
+
+
+def test_latin_keywords_need_word_boundaries():
+    matcher = KeywordMatcher([("log", "Logs")])
+
+    assert matcher.find_all("show the logo") == []
+    assert [m.start for m in matcher.find_all("Show LOG entries")] == [5]
+
+
+def test_latin_keywords_match_inflected_words():
+    matcher = KeywordMatcher([("count", "COUNT"), ("list", "LIST"), ("show", "LIST"), ("box", "Boxes")])
+
+    assert [m.keyword for m in matcher.find_all("counts of documents")] == ["count"]
+    assert [m.keyword for m in matcher.find_all("listing companies")] == ["list"]
+    assert [m.keyword for m in matcher.find_all("shows users")] == ["show"]
+    assert [m.keyword for m in matcher.find_all("boxes")] == ["box"]
+    # Only those endings: other longer words still do not match
+    assert matcher.find_all("country listed showcase boxer") == []
+
+
+def test_inflected_questions_take_the_pattern_path():
+    for question, pattern_type in [
+        ("counts of companies", "COUNT"),
+        ("listing companies", "SELECT"),
+        ("shows companies", "SELECT"),
+    ]:
+        pattern = intelligent_sql_generator.detect_pattern(question)
+        assert pattern is not None and pattern["pattern_type"] == pattern_type, question
+
+
+def test_hebrew_prefixes_are_allowed():
+    matcher = KeywordMatcher([("חברות", "Companies")])
+
+    assert len(matcher.find_all("כמה החברות יש")) == 1
+    assert len(matcher.find_all("ובחברות")) == 1
+    assert matcher.find_all("אחברות") == []
+
+
+def test_entity_extraction_prefers_longest_table_synonym():
+    entities = intelligent_sql_generator.extract_entities("how many contact groups last week")
+
+    assert entities["table"] == "ContactsGroups"
+    assert (entities["unit"], entities["value"]) == ("week", 1)
+
+
+def test_time_period_priority():
+    entities = intelligent_sql_generator.extract_entities("documents today vs last month")
+
+    assert (entities["unit"], entities["value"]) == ("month", 1)
@@ -0,0 +1,49 @@
+"""
+Tests for the normalized question cache (memory-only, no database needed).
+Runs: python -m pytest test_question_cache.py
+"""
+from app.services.question_cache import QuestionCache, normalize_question, templatize_sql
+
+
+def test_normalization():
+    assert normalize_question("  How   many Companies?") == ("how many companies", [])
+    assert normalize_question("כַּמָּה חֲבָרוֹת") == ("כמה חברות", [])
+    assert normalize_question("Top 10 docs since 2024-01-05") == ("top <num> docs since <date>", ["10", "2024-01-05"])
+
+
+def test_templates_rebind_question_literals():
+    template = templatize_sql(
+        "SELECT TOP 10 * FROM Documents WHERE CreatedDate >= '2024-01-05' AND Name LIKE '{x}'",
+        ["10", "2024-01-05"],
+    )
+    assert template.format("3", "2023-02-01") == (
+        "SELECT TOP 3 * FROM Documents WHERE CreatedDate >= '2023-02-01' AND Name LIKE '{x}'"
+    )
+
+
+def test_untraceable_literals_are_not_cached():
+    cache = QuestionCache()
+
+    assert cache.store("documents from the last 2 weeks", "v1", "SELECT * FROM Documents WHERE d >= DATEADD(day, -14, GETDATE())") is False
+    assert cache.lookup("documents from the last 3 weeks", "v1") is None
+
+
+def test_literal_that_also_appears_as_a_constant_is_not_cached():
+    # Only one of the 1s is the question's "top 1"; re-binding both is wrong
+    assert templatize_sql("SELECT TOP 1 * FROM Companies WHERE IsActive = 1", ["1"]) is None
+
+    cache = QuestionCache()
+    assert cache.store("show top 1 active companies", "v1", "SELECT TOP 1 * FROM Companies WHERE IsActive = 1") is False
+    assert cache.lookup("show top 5 active companies", "v1") is None
+
+
+def test_hits_are_per_schema_version_and_counted():
+    cache = QuestionCache()
+    cache.store("Top 10 companies", "v1", "SELECT TOP 10 * FROM Companies", {"explanation": "top companies"})
+
+    hit = cache.lookup("top 25 companies!", "v1")
+    assert hit == {"explanation": "top companies", "sql": "SELECT TOP 25 * FROM Companies"}
+    assert cache.lookup("top 25 companies", "v2") is None
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
@@ -0,0 +1,141 @@
+"""
+Tests for the pooled queue DB access layer (app/core/queue_db.py).
+Runs without PostgreSQL (in-memory pool): python -m pytest test_queue_db.py
+"""
+import threading
+
+import pytest
+from psycopg2 import extensions
+
+import app.core.queue_db as queue_db_module
+from app.core.queue_db import PoolTimeoutError, QueueDB
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.dead:
+            raise RuntimeError("server closed the connection")
+        self.conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.dead = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool:
+    """Same contract as psycopg2's ThreadedConnectionPool."""
+
+    def __init__(self, minconn, maxconn, **config):
+        self.idle = [FakeConnection() for _ in range(minconn)]
+        self.created = len(self.idle)
+
+    def getconn(self):
+        if self.idle:
+            return self.idle.pop()
+        self.created += 1
+        return FakeConnection()
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.close()
+        else:
+            self.idle.append(conn)
+
+    def closeall(self):
+        for conn in self.idle:
+            conn.close()
+
+
+@pytest.fixture
+def queue_db(monkeypatch):
+    monkeypatch.setattr(queue_db_module, "ThreadedConnectionPool", FakePool)
+    db = QueueDB({}, minconn=1, maxconn=2, acquire_timeout=0.1, health_check_interval=0)
+    yield db
+    db.close()
+
+
+def test_connections_are_reused(queue_db):
+    seen = set()
+    for _ in range(5):
+        with queue_db.connection() as conn:
+            seen.add(id(conn))
+
+    assert len(seen) == 1
+    stats = queue_db.stats()
+    assert stats["acquired"] == 5 and stats["opened"] == 1 and stats["in_use"] == 0
+
+
+def test_open_transaction_is_rolled_back_on_return(queue_db):
+    with queue_db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+
+    assert conn.rollbacks == 1
+    assert conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_dead_idle_connection_is_replaced(queue_db):
+    with queue_db.connection() as first:
+        pass
+    first.dead = True
+
+    with queue_db.connection() as second:
+        assert second is not first
+
+    stats = queue_db.stats()
+    assert stats["health_check_failures"] == 1 and stats["discarded"] == 1
+    assert first.closed
+
+
+def test_exhausted_pool_waits_then_times_out(queue_db):
+    release = threading.Event()
+
+    def hold():
+        with queue_db.connection():
+            release.wait(5)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for holder in holders:
+        holder.start()
+    while queue_db.stats()["in_use"] < 2:
+        pass
+
+    with pytest.raises(PoolTimeoutError):
+        with queue_db.connection():
+            pass
+
+    release.set()
+    for holder in holders:
+        holder.join()
+    with queue_db.connection():
+        pass
+    assert queue_db.stats()["timeouts"] == 1
@@ -0,0 +1,132 @@
+"""
+Tests for the AI record/replay provider.
+Runs offline: python -m pytest test_replay_client.py
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.core.ai_client import UnifiedAIClient
+from app.core.ai_provider import ResponseParseError, make_async_provider
+from app.core.replay_client import (
+    FixtureStore,
+    InjectedFailureError,
+    RecordingClient,
+    ReplayClient,
+    ReplayMissError,
+)
+
+
+SCHEMA = {"tables": [{"name": "Companies", "columns": [{"name": "CompanyName", "type": "NVARCHAR"}]}]}
+
+
+class _Live:
+    def __init__(self, sql="SELECT CompanyName FROM Companies", fail=False):
+        self.sql = sql
+        self.fail = fail
+        self.model = "live-model"
+
+    def generate_sql(self, question, schema_info):
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return {"sql": self.sql, "query_type": "READ", "risk_level": "low", "explanation": question}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FixtureStore(str(tmp_path / "fixtures.jsonl"))
+
+
+def test_record_then_replay_from_file(store):
+    recorder = RecordingClient(_Live(), store, "claude_cli")
+    live = recorder.generate_sql("latest companies", SCHEMA)
+    with pytest.raises(RuntimeError):
+        RecordingClient(_Live(fail=True), store, "openai").generate_sql("latest companies", SCHEMA)
+    assert recorder.model == "live-model"
+
+    reloaded = FixtureStore(store.path)
+    assert reloaded.providers() == ["claude_cli", "openai"]
+    assert reloaded.entries("claude_cli")[0]["latency"] >= 0.05
+
+    replay = ReplayClient(reloaded, provider="claude_cli", latency_scale=0)
+    # Keys ignore case and whitespace of the question
+    assert replay.generate_sql("Latest   companies", SCHEMA) == live
+    # Recorded errors are replayed too
+    with pytest.raises(RuntimeError, match="provider down"):
+        ReplayClient(reloaded, provider="openai", latency_scale=0).generate_sql("latest companies", SCHEMA)
+
+
+def test_misses_are_strict_or_round_robin(store):
+    RecordingClient(_Live("SELECT 1"), store, "claude_cli").generate_sql("one", SCHEMA)
+    RecordingClient(_Live("SELECT 2"), store, "claude_cli").generate_sql("two", SCHEMA)
+
+    with pytest.raises(ReplayMissError):
+        ReplayClient(store, provider="claude_cli", strict=True).generate_sql("three", SCHEMA)
+
+    replay = ReplayClient(store, provider="claude_cli", latency_scale=0)
+    assert [replay.generate_sql("other", SCHEMA)["sql"] for _ in range(3)] == ["SELECT 1", "SELECT 2", "SELECT 1"]
+
+
+def test_latency_modes_and_seeded_repeatability(store):
+    store.record({"key": "k", "provider": "claude_cli", "question": "q", "latency": 2.0, "response": {"sql": "SELECT 1"}})
+
+    assert ReplayClient(store, provider="claude_cli").plan("q", SCHEMA)[0] == 2.0
+    assert ReplayClient(store, provider="claude_cli", latency="fixed", fixed_latency=0.3).plan("q", SCHEMA)[0] == 0.3
+
+    def draws(seed):
+        replay = ReplayClient(store, provider="claude_cli", latency="lognormal", sigma=0.5, seed=seed)
+        return [replay.plan("q", SCHEMA)[0] for _ in range(200)]
+
+    assert draws(7) == draws(7)
+    samples = sorted(draws(7))
+    assert 1.5 < samples[100] < 2.7  # median around the recorded latency
+    assert samples[190] > 3.0        # with a slow tail
+
+    with pytest.raises(ValueError):
+        ReplayClient(store, latency="uniform")
+
+
+def test_failure_injection(store):
+    store.record({"key": "k", "provider": "openai", "question": "q", "latency": 0.0, "response": {"sql": "SELECT 1"}})
+
+    replay = ReplayClient(store, provider="openai", failure_rate=0.2, parse_failure_rate=0.1, seed=1)
+    outcomes = {"ok": 0, "failure": 0, "parse": 0}
+    for _ in range(1000):
+        try:
+            replay.generate_sql("q", SCHEMA)
+            outcomes["ok"] += 1
+        except InjectedFailureError:
+            outcomes["failure"] += 1
+        except ResponseParseError:
+            outcomes["parse"] += 1
+
+    assert 150 < outcomes["failure"] < 250
+    assert 60 < outcomes["parse"] < 140
+
+
+def test_unified_client_replays_recorded_providers(store, monkeypatch):
+    RecordingClient(_Live("SELECT 1"), store, "claude_cli").generate_sql("latest companies", SCHEMA)
+    RecordingClient(_Live("SELECT 2"), store, "openai").generate_sql("latest companies", SCHEMA)
+
+    monkeypatch.setattr(settings, "ai_replay_mode", "replay")
+    monkeypatch.setattr(settings, "ai_replay_fixtures", store.path)
+    monkeypatch.setattr(settings, "ai_replay_latency_scale", 0.0)
+    monkeypatch.setattr(settings, "ai_replay_failure_rate", 0.0)
+    monkeypatch.setattr(settings, "ai_replay_parse_failure_rate", 0.0)
+    monkeypatch.setattr(settings, "ai_replay_strict", True)
+    client = UnifiedAIClient()
+
+    assert set(client.providers) == {"claude_cli", "openai"}
+    assert client.generate_sql("latest companies", SCHEMA, provider="openai")["sql"] == "SELECT 2"
+    result = asyncio.run(client.agenerate_sql("latest companies", SCHEMA, provider="claude_cli"))
+    assert result["sql"] == "SELECT 1"
+
+
+def test_recording_needs_an_async_counterpart(store):
+    recorder = RecordingClient(_Live(), store, "claude_cli")
+    # Unknown client types have no async counterpart to record
+    with pytest.raises(ValueError):
+        make_async_provider(recorder)
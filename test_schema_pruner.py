@@ -0,0 +1,51 @@
+"""
+Tests for relevance-based schema pruning (no database needed).
+Runs: python -m pytest test_schema_pruner.py
+"""
+from app.services.schema_pruner import SchemaPruner
+
+
+def _table(name, columns, fks=()):
+    return {
+        "name": name,
+        "columns": [{"name": c, "type": "NVARCHAR(100)"} for c in columns],
+        "foreign_keys": [
+            {"columns": [col], "referred_table": ref, "referred_columns": ["Id"]} for col, ref in fks
+        ],
+    }
+
+
+SCHEMA = {
+    "tables": [
+        _table("Companies", ["Id", "Name", "Status"]),
+        _table("Documents", ["Id", "Name", "Status", "CompanyId"], [("CompanyId", "Companies")]),
+        _table("DocumentSigners", ["Id", "DocumentId", "Email"], [("DocumentId", "Documents")]),
+        _table("Logs", ["Id", "Message", "Level"]),
+        _table("Templates", ["Id", "Name", "Body"]),
+    ]
+    + [_table(f"Archive{i}", ["Id", "Payload"]) for i in range(20)]
+}
+
+
+def test_keeps_mentioned_tables_and_join_neighbours():
+    pruned, report = SchemaPruner().prune("which documents are pending?", SCHEMA)
+    names = [t["name"] for t in pruned["tables"]]
+
+    assert names[:3] == ["Companies", "Documents", "DocumentSigners"]
+    assert "Logs" not in names and "Archive3" not in names
+    assert report.pruned and report.seeds[0] == "Documents"
+    assert report.reduction > 0.5
+
+
+def test_no_match_sends_full_schema():
+    pruned, report = SchemaPruner().prune("what is the meaning of life", SCHEMA)
+
+    assert pruned is SCHEMA
+    assert not report.pruned and report.reduction == 0
+
+
+def test_budget_limits_tables():
+    pruned, report = SchemaPruner(max_tables=1).prune("show documents", SCHEMA)
+
+    assert [t["name"] for t in pruned["tables"]] == ["Documents"]
+    assert report.tables_kept == 1
@@ -0,0 +1,90 @@
+"""
+Tests for the shared schema prompt renderer (no database needed).
+Runs: python -m pytest test_schema_renderer.py
+"""
+import pytest
+
+from app.core.schema_renderer import SchemaRenderer
+from app.services.schema_pruner import SchemaPruner
+from app.utils.schema_version import schema_version
+
+
+SCHEMA = {
+    "tables": [
+        {
+            "name": "Companies",
+            "columns": [
+                {"name": "Id", "type": "INT", "nullable": False, "primary_key": True},
+                {"name": "Name", "type": "NVARCHAR(200)", "nullable": False},
+                {"name": "ClosedDate", "type": "DATETIME", "nullable": True},
+            ],
+            "foreign_keys": [],
+        },
+        {
+            "name": "Documents",
+            "columns": [
+                {"name": "Id", "type": "INT", "nullable": False, "primary_key": True},
+                {"name": "CompanyId", "type": "INT", "nullable": False},
+            ],
+            "foreign_keys": [{"columns": ["CompanyId"], "referred_table": "Companies", "referred_columns": ["Id"]}],
+        },
+        {"name": "Logs", "columns": [{"name": "Message", "type": "NVARCHAR(MAX)", "nullable": True}], "foreign_keys": []},
+    ],
+    "views": ["ActiveCompanies"],
+}
+
+
+def _schema():
+    return {**SCHEMA, "tables": list(SCHEMA["tables"])}
+
+
+def test_compact_style_is_ddl_like():
+    text = SchemaRenderer().render(_schema(), "compact")
+
+    assert "Companies(Id INT PK, Name NVARCHAR(200), ClosedDate DATETIME NULL)" in text
+    assert "  FK (CompanyId) -> Companies(Id)" in text
+    assert text.endswith("Views: ActiveCompanies")
+
+
+def test_verbose_style_matches_previous_client_format():
+    text = SchemaRenderer().render(_schema(), "verbose")
+
+    assert "\nTable: Companies\n  Columns:\n    - Id: INT NOT NULL (PRIMARY KEY)" in text
+    assert "  Foreign Keys:\n    - CompanyId -> Companies(Id)" in text
+    assert "\nViews:\n  - ActiveCompanies" in text
+
+
+def test_renders_are_memoized_per_version_and_style():
+    renderer = SchemaRenderer()
+    schema = _schema()
+
+    first = renderer.render(schema, "compact")
+    assert renderer.render(schema, "compact") is first
+    assert renderer.stats()["texts"]["hits"] == 1
+
+    # A refreshed schema (new dict, new version) renders again
+    changed = _schema()
+    changed["tables"] = changed["tables"][:2]
+    assert "Logs" not in renderer.render(changed, "compact")
+
+
+def test_subset_and_pruned_schema_reuse_fragments():
+    renderer = SchemaRenderer()
+    schema = _schema()
+    renderer.render(schema, "compact")
+
+    subset = renderer.render(schema, "compact", tables=["Documents"])
+    assert subset.startswith("Documents(")
+    assert not any(line.startswith("Companies(") for line in subset.splitlines())
+
+    pruned, _ = SchemaPruner().prune("documents per company", schema)
+    assert pruned["source_version"] == schema_version(schema)
+    text = renderer.render(pruned, "compact")
+    assert "Documents(" in text and "Logs(" not in text
+    # Fragments came from the full schema's cache entry
+    assert renderer.stats()["fragments"]["size"] == 1
+
+
+def test_unknown_style():
+    with pytest.raises(ValueError):
+        SchemaRenderer().render(_schema(), "yaml")
@@ -0,0 +1,76 @@
+"""
+Tests for the local question/SQL similarity index (no database needed).
+Runs: python -m pytest test_similarity_index.py
+"""
+from app.services.question_cache import QuestionCache
+from app.services.similarity_index import SimilarityIndex
+from app.services.sql_generator import IntelligentSQLGenerator
+
+
+PAIRS = [
+    ("How many documents were signed last month?", "SELECT COUNT(*) FROM Documents WHERE SignedDate >= DATEADD(month, -1, GETDATE())"),
+    ("Top 5 companies by number of contacts", "SELECT TOP 5 CompanyId, COUNT(*) FROM Contacts GROUP BY CompanyId ORDER BY 2 DESC"),
+    ("כמה מסמכים נחתמו החודש", "SELECT COUNT(*) FROM Documents WHERE MONTH(SignedDate) = MONTH(GETDATE())"),
+]
+
+
+def test_near_duplicate_ranks_first():
+    index = SimilarityIndex()
+    index.add_many(PAIRS)
+
+    best = index.search("how many documents were signed last month", k=2)
+    assert best[0].question == PAIRS[0][0]
+    assert best[0].score > 0.95
+    assert len(best) == 2 and best[1].score < best[0].score
+
+
+def test_numbers_compare_as_placeholders():
+    index = SimilarityIndex()
+    index.add_many(PAIRS)
+
+    best = index.search("top 10 companies by number of contacts", k=1)[0]
+    assert best.score > 0.95
+    assert best.params == ("5",)
+
+
+def test_incremental_add_and_min_score():
+    index = SimilarityIndex()
+    index.add_many(PAIRS[:1])
+    index.add(*PAIRS[2])
+
+    assert index.search("כמה מסמכים נחתמו החודש?", k=1)[0].sql == PAIRS[2][1]
+    assert index.search("completely unrelated words", min_score=0.5) == []
+
+
+class _CLI:
+    def __init__(self):
+        self.examples = []
+
+    def generate_sql(self, question, schema_info, examples=None, on_sql=None):
+        self.examples.append(examples)
+        return {"sql": "SELECT COUNT(*) FROM Documents WHERE SignedDate IS NULL", "query_type": "READ"}
+
+
+def test_similar_pairs_are_examples_and_only_executed_answers_are_added():
+    generator = IntelligentSQLGenerator.__new__(IntelligentSQLGenerator)
+    generator.claude_cli_client = _CLI()
+    generator.question_cache = QuestionCache()
+    generator.schema_pruner = None
+    generator.compile_checker = None
+    generator.similarity_index = SimilarityIndex()
+    generator.similarity_index.add_many(PAIRS)
+    generator.similarity_index.loaded = True
+    schema = {"tables": [{"name": "Documents", "columns": []}]}
+
+    # Nearly the same characters, opposite meaning: still goes to the AI
+    question = "How many documents were not signed last month?"
+    result = generator.generate_with_ai(question, schema, matches=[])
+    assert result["method"] == "claude_cli"
+    assert generator.claude_cli_client.examples[0][0]["question"] == PAIRS[0][0]
+    assert len(generator.similarity_index) == len(PAIRS)
+    # Not cached either until it has run: SQL failing at runtime is never served
+    assert generator.question_cache.stats()["stores"] == 0
+
+    generator.record_success(question, result)
+    assert len(generator.similarity_index) == len(PAIRS) + 1
+    assert generator.question_cache.lookup(question, result["schema_version"])["sql"] == result["sql"]
@@ -0,0 +1,128 @@
+"""
+Tests for the shared T-SQL lexer and the classifier checks built on it.
+Runs without a database: python -m pytest test_sql_lexer.py
+"""
+from app.core.sql_lexer import TokenType, tokenize, split_statements, statement_keyword, is_read_only
+from app.core.query_classifier import QueryClassifier
+from app.models.query_models import QueryType, RiskLevel
+
+
+classifier = QueryClassifier()
+
+
+def test_strings_brackets_and_comments_are_single_tokens():
+    tokens = tokenize("SELECT [Order], N'it''s WHERE' /* a /* nested */ b */ FROM t -- WHERE")
+    types = [t.type for t in tokens]
+
+    assert types == [
+        TokenType.KEYWORD,
+        TokenType.QUOTED_IDENTIFIER,
+        TokenType.PUNCTUATION,
+        TokenType.STRING,
+        TokenType.COMMENT,
+        TokenType.KEYWORD,
+        TokenType.IDENTIFIER,
+        TokenType.COMMENT,
+    ]
+    assert tokens[3].value == "N'it''s WHERE'"
+
+
+def test_keywords_inside_identifiers_are_not_keywords():
+    tokens = tokenize("SELECT LastUpdated, t.Update FROM Documents t")
+    assert [t.value for t in tokens if t.type == TokenType.KEYWORD] == ["SELECT", "FROM"]
+
+
+def test_cte_resolves_to_main_statement():
+    statements = split_statements(tokenize(
+        "WITH a AS (SELECT 1 AS x), b (y) AS (SELECT x FROM a) DELETE FROM t WHERE id IN (SELECT y FROM b)"
+    ))
+    assert statement_keyword(statements[0]) == "DELETE"
+
+
+def test_read_only_check():
+    assert is_read_only("SELECT LastUpdated FROM Documents WHERE Note = 'DELETE me'")
+    assert is_read_only("WITH c AS (SELECT * FROM Companies) SELECT COUNT(*) FROM c")
+    assert not is_read_only("SELECT 1; DROP TABLE Companies")
+    assert not is_read_only("WITH c AS (SELECT Id FROM Companies) DELETE FROM Companies WHERE Id IN (SELECT Id FROM c)")
+    assert not is_read_only("-- SELECT\nUPDATE Companies SET Name = 'x'")
+
+
+def test_where_inside_string_is_not_a_where_clause():
+    query_type, risk = classifier.classify_query("DELETE FROM Logs -- WHERE id = 1")
+    assert (query_type, risk) == (QueryType.WRITE_RISKY, RiskLevel.CRITICAL)
+
+    query_type, risk = classifier.classify_query("UPDATE Logs SET Message = 'WHERE id = 1'")
+    assert (query_type, risk) == (QueryType.WRITE_RISKY, RiskLevel.CRITICAL)
+
+
+def test_where_clause_safety():
+    assert classifier.classify_query("UPDATE c SET s = 1 WHERE id = 7") == (QueryType.WRITE_SAFE, RiskLevel.MEDIUM)
+    assert classifier.classify_query("DELETE FROM c WHERE id > 0") == (QueryType.WRITE_RISKY, RiskLevel.HIGH)
+    assert classifier.classify_query("DELETE FROM c WHERE x IS NOT NULL") == (QueryType.WRITE_RISKY, RiskLevel.HIGH)
+
+
+def test_batch_takes_riskiest_statement():
+    assert classifier.classify_query("SELECT 1; DROP TABLE t") == (QueryType.ADMIN, RiskLevel.CRITICAL)
+
+
+def test_statements_split_without_semicolons():
+    statements = split_statements(tokenize("SELECT 1 DELETE FROM t"))
+    assert [statement_keyword(s) for s in statements] == ["SELECT", "DELETE"]
+
+    assert classifier.classify_query("SELECT 1 DELETE FROM t") == (QueryType.WRITE_RISKY, RiskLevel.CRITICAL)
+    assert classifier.classify_query("SELECT Name FROM c DROP TABLE c") == (QueryType.ADMIN, RiskLevel.CRITICAL)
+    assert not is_read_only("SELECT 1 SELECT 2 UPDATE t SET a = 1 WHERE id = 7")
+
+
+def test_keywords_that_continue_a_statement_do_not_split():
+    for sql in [
+        "WITH c AS (SELECT 1 AS x) INSERT INTO t SELECT x FROM c UNION ALL SELECT 2",
+        "SELECT a FROM t EXCEPT SELECT a FROM u",
+        "INSERT INTO t EXEC dbo.LoadRows",
+        "MERGE t USING s ON t.id = s.id WHEN MATCHED THEN UPDATE SET a = 1 "
+        "WHEN NOT MATCHED THEN INSERT (a) VALUES (1) WHEN NOT MATCHED BY SOURCE THEN DELETE",
+        "GRANT SELECT, INSERT ON t TO u",
+        "ALTER TABLE t DROP COLUMN a",
+        "ALTER TABLE t ADD CONSTRAINT f FOREIGN KEY (a) REFERENCES r (id) ON DELETE CASCADE",
+        "CREATE VIEW v AS SELECT a FROM t",
+        "DECLARE c CURSOR FOR SELECT a FROM t",
+    ]:
+        assert len(split_statements(tokenize(sql))) == 1, sql
+
+    statements = split_statements(tokenize("INSERT INTO t VALUES (1) SELECT * FROM t"))
+    assert [statement_keyword(s) for s in statements] == ["INSERT", "SELECT"]
+
+
+def test_validation_warnings():
+    is_valid, warnings = classifier.validate_query("SELECT * FROM t WHERE 1 = 1; DROP TABLE t", QueryType.READ)
+    assert is_valid
+    assert "Possible SQL injection: DROP after semicolon" in warnings
+    assert "WHERE 1=1 detected - effectively no filtering" in warnings
+
+    is_valid, warnings = classifier.validate_query("SELECT '--not a comment' FROM t", QueryType.READ)
+    assert warnings == []
+
+
+def test_impact_table_names():
+    assert classifier.estimate_impact("INSERT INTO [dbo].[Contacts] SELECT * FROM Staging", QueryType.WRITE_SAFE) == \
+        "Will insert new row(s) into table 'dbo.Contacts'"
+    assert classifier.estimate_impact("DROP TABLE IF EXISTS Logs", QueryType.ADMIN) == \
+        "🚨 CRITICAL: Will permanently delete Logs"
+
+
+def test_memoized_results_are_not_shared():
+    memoized = QueryClassifier(cache_size=8)
+    sql = "SELECT * FROM t -- note"
+
+    _, first = memoized.validate_query(sql, QueryType.READ)
+    first.append("mutated by caller")
+    _, second = memoized.validate_query(sql, QueryType.READ)
+
+    assert second == ["SQL comment detected"]
+    assert memoized.cache_stats()["validation"]["hits"] == 1
+
+
+def test_classification_reports_rule():
+    assert classifier.classify_with_rule("DELETE FROM c WHERE id = 3")[2] == "write_specific_where"
+    assert classifier.classify_with_rule("TRUNCATE TABLE Logs")[2] == "truncate_merge"
+    assert classifier.classify_with_rule("BACKUP DATABASE x TO DISK = 'y'")[2] == "unknown_operation"
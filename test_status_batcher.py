@@ -0,0 +1,146 @@
+"""
+Tests for write-behind batching of queue status updates
+(app/core/status_batcher.py).
+Runs without PostgreSQL (recording connection): python -m pytest test_status_batcher.py
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from app.core.status_batcher import StatusBatcher, build_update
+
+
+class RecordingDB:
+    """QueueDB stand-in recording statements per commit."""
+
+    def __init__(self, fail=False, owned=None):
+        self.fail = fail
+        self.owned = owned
+        self.commits = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        statements = []
+        db = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                if db.fail:
+                    raise RuntimeError("deadlock detected")
+                statements.append((sql, params))
+
+            def fetchall(self):
+                return [(key,) for key in db.owned]
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def commit(self):
+                with db._lock:
+                    db.commits.append(statements)
+
+        yield Connection()
+
+
+def test_build_update_is_one_multi_row_statement():
+    sql, params = build_update(
+        "id",
+        [(1, {"status": "completed", "rows_affected": 3}), (2, {"status": "failed", "rows_affected": 0})],
+        now_columns=["completed_at"],
+    )
+
+    assert sql.startswith("UPDATE sql_queue AS q")
+    assert "FROM (VALUES (%s::integer, %s::integer, %s::varchar)" in sql
+    assert "AS v(key, rows_affected, status)" in sql
+    assert "completed_at = NOW()" in sql and "WHERE q.id = v.key" in sql
+    assert params == [1, 3, "completed", 2, 0, "failed"]
+
+
+def test_unknown_columns_are_rejected():
+    with pytest.raises(ValueError):
+        build_update("id", [(1, {"status; DROP TABLE sql_queue": "x"})])
+
+
+def test_concurrent_updates_share_commits():
+    db = RecordingDB()
+    batcher = StatusBatcher(db, max_batch=1000, max_delay=0.05)
+    futures = []
+    lock = threading.Lock()
+
+    def finish(job_id):
+        future = batcher.submit(job_id, {"status": "completed"}, now_columns=["completed_at"])
+        with lock:
+            futures.append(future)
+
+    threads = [threading.Thread(target=finish, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=5)
+    batcher.close()
+
+    assert len(db.commits) < 5
+    assert sum(len(params) for commit in db.commits for _, params in commit) == 100
+    assert batcher.stats()["rows"] == 50
+
+
+def test_full_batch_flushes_without_waiting_for_the_delay():
+    db = RecordingDB()
+    batcher = StatusBatcher(db, max_batch=3, max_delay=60)
+    futures = [batcher.submit(i, {"status": "completed"}) for i in range(3)]
+
+    start = time.perf_counter()
+    for future in futures:
+        future.result(timeout=5)
+    assert time.perf_counter() - start < 1
+    batcher.close()
+
+
+def test_updates_to_one_job_are_merged():
+    db = RecordingDB()
+    batcher = StatusBatcher(db, max_delay=60)
+    batcher.submit(7, {"status": "processing", "sql_query": "SELECT 1"})
+    batcher.submit(7, {"status": "completed", "sql_query": None, "rows_affected": 1})
+    batcher.close()
+
+    [[(sql, params)]] = db.commits
+    assert params == [7, 1, "SELECT 1", "completed"]
+
+
+def test_failed_flush_reaches_every_waiter():
+    batcher = StatusBatcher(RecordingDB(fail=True), max_delay=60)
+    futures = [batcher.submit(i, {"status": "completed"}) for i in range(2)]
+    batcher.flush()
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=1)
+    assert batcher.stats()["failures"] == 1
+    batcher.close()
+
+
+def test_owner_only_updates_jobs_still_claimed():
+    sql, params = build_update("id", [(1, {"status": "completed"})], owner="host:1")
+    assert sql.endswith("WHERE q.id = v.key AND q.claimed_by = %s\nRETURNING q.id")
+    assert params == [1, "completed", "host:1"]
+
+    batcher = StatusBatcher(RecordingDB(owned=[1]), max_delay=60, owner="host:1")
+    kept = batcher.submit(1, {"status": "completed"})
+    lost = batcher.submit(2, {"status": "completed"})
+    batcher.close()
+
+    assert kept.result(timeout=1) is True
+    assert lost.result(timeout=1) is False
+    assert batcher.stats()["not_owned"] == 1
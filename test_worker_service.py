@@ -0,0 +1,116 @@
+"""
+Tests for concurrent request processing in WorkerService.
+Runs without the queue, target database or Claude (in-memory queue,
+simulated stages): python -m pytest test_worker_service.py
+"""
+import signal
+import threading
+import time
+
+import pytest
+
+import worker_service
+from app.config import settings
+from worker_service import WorkerService
+
+
+class SlowAIGenerator:
+    def __init__(self):
+        self.ai_active = 0
+        self.ai_peak = 0
+        self.schemas = []
+        self._lock = threading.Lock()
+
+    def record_success(self, question, result):
+        pass
+
+    def generate_sql(self, question, language='en', schema_info=None, ai_limit=None, **kwargs):
+        self.schemas.append(schema_info)
+        if question.startswith("ai:"):
+            with ai_limit:
+                with self._lock:
+                    self.ai_active += 1
+                    self.ai_peak = max(self.ai_peak, self.ai_active)
+                time.sleep(0.3)
+                with self._lock:
+                    self.ai_active -= 1
+        return {'success': True, 'sql': "SELECT 1"}
+
+
+class InstantDatabase:
+    def __init__(self):
+        self.schema_loads = 0
+
+    def get_schema_info(self):
+        self.schema_loads += 1
+        return {'tables': [{'name': 'Companies', 'columns': []}]}
+
+    def execute_query(self, sql, fetch_results=True):
+        return [], 0, 0.0
+
+
+class ListWorker(WorkerService):
+    def __init__(self, requests, **kwargs):
+        super().__init__(listen=False, poll_interval=0, **kwargs)
+        self.queue = list(requests)
+        self.finished = {}
+        self.lease_keeper.heartbeat = lambda: None
+
+    def fetch_pending_requests(self, limit=None):
+        claimed, self.queue = self.queue[:limit], self.queue[limit:]
+        return claimed
+
+    def update_request_status(self, request_id, status, **kwargs):
+        self.finished[request_id] = (status, time.perf_counter())
+
+    def wait_for_requests(self):
+        if not self.queue:
+            self.running = False
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = SlowAIGenerator()
+    monkeypatch.setattr(worker_service, "intelligent_sql_generator", generator)
+    monkeypatch.setattr(worker_service, "db_manager", InstantDatabase())
+    monkeypatch.setattr(settings, "worker_ai_concurrency", 2)
+    # WorkerService installs its own SIGINT/SIGTERM handlers
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    yield generator
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
+
+
+def requests_with_ai(ai_count, cheap_count):
+    questions = [f"ai:{i}" for i in range(ai_count)] + [f"cheap {i}" for i in range(cheap_count)]
+    return [{'id': i, 'question': q} for i, q in enumerate(questions)]
+
+
+def test_cheap_requests_do_not_wait_behind_ai(generator):
+    requests = requests_with_ai(1, 9)
+    worker = ListWorker(requests, concurrency=4)
+    start = time.perf_counter()
+    worker.run()
+
+    assert worker.processed_count == 10
+    cheap_done = [worker.finished[r['id']][1] - start for r in requests[1:]]
+    assert max(cheap_done) < 0.25
+
+
+def test_ai_stage_limit_and_shutdown_waits_for_in_flight(generator):
+    worker = ListWorker(requests_with_ai(6, 0), concurrency=6)
+    worker.run()
+
+    # run() returned only after every in-flight request finished
+    assert len(worker.finished) == 6
+    assert all(status == 'completed' for status, _ in worker.finished.values())
+    assert generator.ai_peak == 2
+
+
+def test_generator_gets_the_schema_loaded_once(generator):
+    worker = ListWorker(requests_with_ai(0, 8), concurrency=4)
+    worker.run()
+
+    assert worker_service.db_manager.schema_loads == 1
+    assert len(generator.schemas) == 8
+    assert all(schema and schema['tables'] for schema in generator.schemas)
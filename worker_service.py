@@ -4,32 +4,86 @@ Background Worker Service - Automated Queue Processing
 Runs 24/7 to automatically process text-to-SQL requests
 """
 import asyncio
+import threading
 import time
 import signal
 import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from typing import Optional
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from loguru import logger
 
 from app.config import settings
 from app.services.sql_generator import intelligent_sql_generator
 from app.core.database import db_manager
+from app.core.job_queue import (
+    LeaseKeeper,
+    QueueListener,
+    capped_wait,
+    claim_jobs,
+    make_worker_id,
+    release_jobs,
+    seconds_until_due,
+)
+from app.core.queue_db import get_queue_db
+from app.core.status_batcher import StatusBatcher
 from app.services.teams_notifier import send_proactive_message
 
 
 class WorkerService:
     """Background worker for automated queue processing."""
 
-    def __init__(self, poll_interval: int = 10):
+    def __init__(
+        self,
+        poll_interval: int = 10,
+        batch_size: int = 10,
+        listen: Optional[bool] = None,
+        concurrency: Optional[int] = None
+    ):
         """
         Initialize worker service.
 
         Args:
-            poll_interval: Seconds between queue checks (default: 10)
+            poll_interval: Seconds between queue checks without LISTEN/NOTIFY
+                (default: 10)
+            batch_size: Jobs claimed per poll (default: 10)
+            listen: Wake on queue notifications (default: QUEUE_LISTEN_ENABLED)
+            concurrency: Requests processed at once (default: WORKER_CONCURRENCY)
         """
         self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency or settings.worker_concurrency)
+        # Per-stage limits: in-flight requests share the AI providers and the
+        # target database pool, so neither is oversubscribed
+        self.ai_slots = threading.BoundedSemaphore(max(1, settings.worker_ai_concurrency))
+        self.db_slots = threading.BoundedSemaphore(max(1, settings.worker_db_concurrency))
+        self._stats_lock = threading.Lock()
+        # Target database schema, loaded once: without it the generator can
+        # neither match patterns nor fall back to the AI
+        self.schema_cache: Optional[dict] = None
+        self._schema_lock = threading.Lock()
+        self.worker_id = make_worker_id()
+        self.queue_db = get_queue_db()
+        # Final statuses of concurrent requests share statements and commits
+        self.status_batcher = StatusBatcher(
+            self.queue_db,
+            max_batch=settings.queue_status_batch_size,
+            max_delay=settings.queue_status_flush_interval,
+            owner=self.worker_id
+        ) if settings.queue_status_batching_enabled else None
+        # Heartbeats keep claimed jobs leased to us; expired leases (of any
+        # worker) are reaped back to the queue
+        self.lease_keeper = LeaseKeeper(
+            self.queue_db.connection,
+            self.worker_id,
+            lease_seconds=settings.queue_lease_seconds,
+            interval=settings.queue_heartbeat_interval,
+            max_attempts=settings.queue_max_attempts,
+            backoff_seconds=settings.queue_retry_backoff,
+            backoff_max_seconds=settings.queue_retry_backoff_max
+        )
+        listen = settings.queue_listen_enabled if listen is None else listen
+        self.listener = QueueListener(self.get_queue_connection) if listen else None
         self.running = False
         self.processed_count = 0
         self.error_count = 0
@@ -38,7 +92,10 @@ class WorkerService:
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
-        logger.info(f"Worker service initialized (poll_interval={poll_interval}s)")
+        logger.info(
+            f"Worker service {self.worker_id} initialized "
+            f"(poll_interval={poll_interval}s, concurrency={self.concurrency})"
+        )
 
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully."""
@@ -46,31 +103,71 @@ class WorkerService:
         self.running = False
 
     def get_queue_connection(self):
-        """Get connection to PostgreSQL queue database."""
-        return psycopg2.connect(
-            host=settings.queue_db_host,
-            port=settings.queue_db_port,
-            dbname=settings.queue_db_name,
-            user=settings.queue_db_user,
-            password=settings.queue_db_password
-        )
+        """
+        Get a dedicated connection to PostgreSQL queue database (for LISTEN,
+        which holds it for the worker's lifetime; everything else borrows
+        from self.queue_db).
+        """
+        return self.queue_db.connect()
 
-    def fetch_pending_requests(self) -> list:
-        """Fetch pending requests from queue."""
+    def fetch_pending_requests(self, limit: Optional[int] = None) -> list:
+        """
+        Claim pending requests from queue.
+
+        Claimed requests are 'processing' and owned by this worker, so other
+        workers polling the same queue never get them.
+
+        Args:
+            limit: Maximum requests to claim (default: batch_size)
+        """
         try:
-            with self.get_queue_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("""
-                        SELECT *
-                        FROM sql_queue
-                        WHERE status = 'pending'
-                        ORDER BY created_at ASC
-                        LIMIT 10
-                    """)
-                    return cur.fetchall()
+            with self.queue_db.connection() as conn:
+                claimed = claim_jobs(conn, self.worker_id, limit or self.batch_size, settings.queue_lease_seconds)
         except Exception as e:
             logger.error(f"Failed to fetch pending requests: {e}")
             return []
+        self.lease_keeper.track([r['id'] for r in claimed])
+        return claimed
+
+    def release_requests(self, requests: list):
+        """Hand claimed requests this worker will not process back to the queue."""
+        if not requests:
+            return
+        self.lease_keeper.untrack([r['id'] for r in requests])
+        try:
+            with self.queue_db.connection() as conn:
+                released = release_jobs(conn, self.worker_id, [r['id'] for r in requests])
+            logger.info(f"Released {released} unprocessed request(s) back to the queue")
+        except Exception as e:
+            logger.error(f"Failed to release requests: {e}")
+
+    def next_due(self) -> Optional[float]:
+        """Seconds until a job in retry backoff is claimable (see job_queue.seconds_until_due)."""
+        try:
+            with self.queue_db.connection() as conn:
+                return seconds_until_due(conn)
+        except Exception as e:
+            logger.warning(f"Could not check retry backoffs: {e}")
+            return None
+
+    def wait_for_requests(self):
+        """
+        Wait until new requests may be pending: a queue notification, the
+        safety-net poll interval, a reaped job's backoff ending, or shutdown.
+        Without a listener (or while it cannot connect) this is a
+        poll_interval sleep.
+        """
+        due = self.next_due()
+        if self.listener is not None:
+            try:
+                self.listener.wait(
+                    capped_wait(settings.queue_safety_poll_interval, due),
+                    should_stop=lambda: not self.running
+                )
+                return
+            except Exception as e:
+                logger.warning(f"Queue listener unavailable, polling: {e}")
+        time.sleep(capped_wait(self.poll_interval, due))
 
     def update_request_status(
         self,
@@ -81,10 +178,32 @@ class WorkerService:
         error_message: Optional[str] = None,
         rows_affected: Optional[int] = None,
         execution_time_ms: Optional[float] = None
-    ):
-        """Update request status in queue."""
+    ) -> Optional[Future]:
+        """
+        Update request status in queue, if this worker still holds the
+        job's lease (claimed_by).
+
+        With status batching the update is queued and the returned Future
+        completes once it is committed; otherwise it is written right away.
+        The Future's result is False when the job had been reaped and the
+        update was skipped.
+        """
+        if self.status_batcher is not None:
+            return self.status_batcher.submit(
+                request_id,
+                {
+                    'status': status,
+                    'sql_query': generated_sql,
+                    'query_results': result_data,
+                    'error_message': error_message,
+                    'rows_affected': rows_affected,
+                    'execution_time_ms': execution_time_ms,
+                },
+                now_columns=('completed_at',)
+            )
+        done: Future = Future()
         try:
-            with self.get_queue_connection() as conn:
+            with self.queue_db.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("""
                         UPDATE sql_queue
@@ -96,6 +215,7 @@ class WorkerService:
                             execution_time_ms = COALESCE(%s, execution_time_ms),
                             completed_at = CURRENT_TIMESTAMP
                         WHERE id = %s
+                          AND claimed_by = %s
                     """, (
                         status,
                         generated_sql,
@@ -103,11 +223,27 @@ class WorkerService:
                         error_message,
                         rows_affected,
                         execution_time_ms,
-                        request_id
+                        request_id,
+                        self.worker_id
                     ))
+                    owned = cur.rowcount == 1
                     conn.commit()
+            if not owned:
+                logger.warning(f"Request {request_id} is no longer claimed by this worker (lease expired); update skipped")
+            done.set_result(owned)
         except Exception as e:
             logger.error(f"Failed to update request {request_id}: {e}")
+            done.set_exception(e)
+        return done
+
+    def get_schema(self) -> dict:
+        """Get the target database schema (cached, loaded by the first request)."""
+        if self.schema_cache is None:
+            with self._schema_lock:
+                if self.schema_cache is None:
+                    logger.info("Loading database schema...")
+                    self.schema_cache = db_manager.get_schema_info()
+        return self.schema_cache
 
     def process_request(self, request: dict):
         """Process a single request from queue."""
@@ -124,7 +260,9 @@ class WorkerService:
             logger.info(f"Generating SQL for: {question}")
             sql_result = intelligent_sql_generator.generate_sql(
                 question=question,
-                language=language
+                language=language,
+                schema_info=self.get_schema(),
+                ai_limit=self.ai_slots
             )
 
             if not sql_result['success']:
@@ -135,19 +273,22 @@ class WorkerService:
 
             # Step 2: Execute SQL query
             logger.info("Executing SQL query...")
-            results, rows_affected, execution_time = db_manager.execute_query(
-                sql=generated_sql,
-                fetch_results=True
-            )
+            with self.db_slots:
+                results, rows_affected, execution_time = db_manager.execute_query(
+                    sql=generated_sql,
+                    fetch_results=True
+                )
 
             logger.info(f"Query executed: {rows_affected} rows, {execution_time:.2f}ms")
+            # An AI answer that ran is cached and an example for similar questions
+            intelligent_sql_generator.record_success(question, sql_result)
 
             # Step 3: Format results
             import json
             result_data = json.dumps(results, default=str, ensure_ascii=False)
 
             # Step 4: Update database
-            self.update_request_status(
+            durable = self.update_request_status(
                 request_id=request_id,
                 status='completed',
                 generated_sql=generated_sql,
@@ -159,6 +300,13 @@ class WorkerService:
             # Step 5: Send proactive Teams message with results (if Teams info available)
             if user_id and conversation_id:
                 try:
+                    # Only once the result is committed: a job whose status
+                    # was lost is processed again and would notify twice
+                    owned = True
+                    if durable is not None:
+                        owned = durable.result(timeout=settings.queue_db_pool_timeout + 5)
+                    if owned is False:
+                        raise RuntimeError("job was reaped and is another worker's now")
                     asyncio.run(send_proactive_message(
                         user_id=user_id,
                         conversation_id=conversation_id,
@@ -174,7 +322,8 @@ class WorkerService:
             else:
                 logger.info("Skipping Teams notification (no user_id/conversation_id)")
 
-            self.processed_count += 1
+            with self._stats_lock:
+                self.processed_count += 1
             logger.success(f"Request {request_id} completed successfully")
 
         except Exception as e:
@@ -184,39 +333,77 @@ class WorkerService:
                 status='failed',
                 error_message=str(e)
             )
-            self.error_count += 1
+            with self._stats_lock:
+                self.error_count += 1
+        finally:
+            self.lease_keeper.untrack([request_id])
+
+    def wait_for_slot(self, in_flight: set):
+        """Wait (at most a second, so shutdown is noticed) for an in-flight request to finish."""
+        wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
 
     def run(self):
         """Main worker loop - runs continuously."""
         self.running = True
         logger.info("=" * 60)
         logger.info("🚀 Worker Service Started")
-        logger.info(f"Poll Interval: {self.poll_interval}s")
+        logger.info(f"Worker ID: {self.worker_id}")
+        if self.listener is not None:
+            logger.info(f"Wakeup: LISTEN/NOTIFY (safety poll {settings.queue_safety_poll_interval}s)")
+        else:
+            logger.info(f"Poll Interval: {self.poll_interval}s")
+        logger.info(
+            f"Concurrency: {self.concurrency} "
+            f"(AI {settings.worker_ai_concurrency}, DB {settings.worker_db_concurrency})"
+        )
         logger.info(f"Environment: {settings.deployment_environment}")
         logger.info("=" * 60)
 
+        # Listen before the first claim, so a request inserted in between
+        # still wakes us (wait_for_requests reconnects if this fails)
+        if self.listener is not None:
+            try:
+                self.listener.listen()
+            except Exception as e:
+                logger.warning(f"Queue listener unavailable, polling: {e}")
+
+        self.lease_keeper.start()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="worker-request")
+        in_flight = set()
+
         while self.running:
             try:
-                # Fetch pending requests
-                pending = self.fetch_pending_requests()
+                in_flight = {future for future in in_flight if not future.done()}
+                free = self.concurrency - len(in_flight)
+                if free <= 0:
+                    self.wait_for_slot(in_flight)
+                    continue
+
+                # Claim only what can start now; the rest stays available
+                # to other workers
+                limit = min(self.batch_size, free)
+                pending = self.fetch_pending_requests(limit)
 
                 if pending:
                     logger.info(f"Found {len(pending)} pending request(s)")
 
-                    for request in pending:
+                    for index, request in enumerate(pending):
                         if not self.running:
+                            self.release_requests(pending[index:])
                             break
-                        self.process_request(request)
+                        in_flight.add(executor.submit(self.process_request, request))
                 else:
                     # No pending requests, show status
                     if self.processed_count > 0 and self.processed_count % 10 == 0:
                         logger.info(
                             f"Status: {self.processed_count} processed, "
-                            f"{self.error_count} errors"
+                            f"{self.error_count} errors, "
+                            f"queue DB pool {self.queue_db.stats()}"
                         )
 
-                # Wait before next poll
-                time.sleep(self.poll_interval)
+                # A full claim means more are likely queued: claim again now
+                if len(pending) < limit:
+                    self.wait_for_requests()
 
             except KeyboardInterrupt:
                 logger.info("Interrupted by user")
@@ -225,11 +412,28 @@ class WorkerService:
                 logger.error(f"Worker loop error: {e}")
                 time.sleep(self.poll_interval)
 
+        # Graceful shutdown: let in-flight requests finish
+        in_flight = {future for future in in_flight if not future.done()}
+        if in_flight:
+            logger.info(f"Waiting for {len(in_flight)} in-flight request(s) to finish...")
+        executor.shutdown(wait=True)
+        if self.status_batcher is not None:
+            self.status_batcher.close()
+        self.lease_keeper.close()
+
+        if self.listener is not None:
+            self.listener.close()
+
         logger.info("=" * 60)
         logger.info("Worker Service Stopped")
         logger.info(f"Total Processed: {self.processed_count}")
         logger.info(f"Total Errors: {self.error_count}")
+        logger.info(f"Queue DB pool: {self.queue_db.stats()}")
+        logger.info(f"Leases: {self.lease_keeper.stats()}")
+        if self.status_batcher is not None:
+            logger.info(f"Status batches: {self.status_batcher.stats()}")
         logger.info("=" * 60)
+        self.queue_db.close()
 
 
 def main():
@@ -249,11 +453,56 @@ def main():
         help='Fast mode: 5 second polling'
     )
 
+    parser.add_argument(
+        '--no-listen',
+        action='store_true',
+        help='Poll every --poll-interval seconds instead of waking on LISTEN/NOTIFY'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='Requests processed at once (default: WORKER_CONCURRENCY, or WORKER_ASYNC_CONCURRENCY with --async)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=10,
+        help='Jobs claimed per poll (default: 10)'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Process requests as tasks on one event loop (async_worker_service.py)'
+    )
+
     args = parser.parse_args()
 
     poll_interval = 5 if args.fast else args.poll_interval
 
-    worker = WorkerService(poll_interval=poll_interval)
+    if args.use_async:
+        from async_worker_service import AsyncWorkerService
+
+        async_worker = AsyncWorkerService(
+            poll_interval=poll_interval,
+            batch_size=args.batch_size,
+            listen=False if args.no_listen else None,
+            concurrency=args.concurrency
+        )
+        try:
+            asyncio.run(async_worker.run())
+        except Exception as e:
+            logger.error(f"Fatal error: {e}")
+            sys.exit(1)
+        return
+
+    worker = WorkerService(
+        poll_interval=poll_interval,
+        batch_size=args.batch_size,
+        listen=False if args.no_listen else None,
+        concurrency=args.concurrency
+    )
 
     try:
         worker.run()